@@ -0,0 +1,73 @@
+"""
+Benchmark for the point lookups of the KeyValueAdapter: Save a generated document and measure the mean duration of
+get_record, compared with the SqliteAdapter and the SimpleInMemoryAdapter.
+
+Run with::
+
+    python -m benchmarks.key_value_benchmark --records 2000
+
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from provdbconnector import ProvDb
+from provdbconnector.db_adapters.baseadapter import DbRecord, METADATA_KEY_IDENTIFIER
+from provdbconnector.db_adapters.in_memory import SimpleInMemoryAdapter
+from provdbconnector.db_adapters.key_value import KeyValueAdapter
+from provdbconnector.db_adapters.sqlite import SqliteAdapter
+
+from benchmarks.memory_benchmark import create_document
+
+
+def measure_lookups(prov_api, repeat=3):
+    """
+    Read each record of the adapter by its id and measure the mean duration
+
+    :param prov_api: The ProvDb instance with the saved document
+    :type prov_api: ProvDb
+    :param repeat: Number of reads per record
+    :type repeat: int
+    :return: Tuple with (mean get_record duration in seconds, number of records)
+    :rtype: tuple
+    """
+    adapter = prov_api._adapter
+    node_ids = [record.metadata[METADATA_KEY_IDENTIFIER] for record in adapter.get_records_by_filter() if
+                isinstance(record, DbRecord)]
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for node_id in node_ids:
+            adapter.get_record(node_id)
+    record_duration = (time.perf_counter() - start) / (repeat * len(node_ids))
+    return record_duration, len(node_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the point lookups of the KeyValueAdapter")
+    parser.add_argument("--records", type=int, default=2000, help="Number of entities in the document")
+    args = parser.parse_args()
+
+    prov_document = create_document(args.records)
+    with tempfile.TemporaryDirectory() as directory:
+        candidates = [
+            ("in memory", SimpleInMemoryAdapter, None),
+            ("sqlite", SqliteAdapter, {"path": os.path.join(directory, "prov.sqlite")}),
+            ("key value", KeyValueAdapter, {"path": os.path.join(directory, "prov.db")}),
+        ]
+        for (name, adapter, auth_info) in candidates:
+            prov_api = ProvDb(adapter=adapter, auth_info=auth_info)
+            if isinstance(prov_api._adapter, SimpleInMemoryAdapter):
+                prov_api._adapter.all_nodes = dict()
+                prov_api._adapter.all_relations = dict()
+            prov_api.save_document(prov_document)
+
+            (record_duration, count) = measure_lookups(prov_api)
+            print("{:<10}: get_record {:8.2f} us ({} records)".format(name, record_duration * 1e6, count))
+            if hasattr(prov_api._adapter, "close"):
+                prov_api._adapter.close()
+
+
+if __name__ == '__main__':
+    main()
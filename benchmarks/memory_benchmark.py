@@ -0,0 +1,81 @@
+"""
+Benchmark for the memory usage of the in memory adapters: Save a generated document and measure the allocated
+bytes per stored record with tracemalloc.
+
+Run with::
+
+    python -m benchmarks.memory_benchmark --records 2000
+
+"""
+import argparse
+import gc
+import tracemalloc
+
+from prov.model import ProvDocument
+
+from provdbconnector import ProvDb
+from provdbconnector.db_adapters.in_memory import SimpleInMemoryAdapter, CompactInMemoryAdapter
+
+
+def create_document(records=2000):
+    """
+    Create a document with a chain of entities, each entity is derived from the previous one
+
+    :param records: Number of entities, the document contains nearly the same number of relations
+    :type records: int
+    :return: The document
+    :rtype: prov.model.ProvDocument
+    """
+    prov_document = ProvDocument()
+    prov_document.add_namespace("ex", "http://example.com/")
+    prov_document.add_namespace("dcterms", "http://purl.org/dc/terms/")
+
+    for index in range(records):
+        prov_document.entity("ex:entity{}".format(index), {"dcterms:title": "Entity {}".format(index),
+                                                          "prov:type": "ex:Document"})
+        if index > 0:
+            prov_document.wasDerivedFrom("ex:entity{}".format(index), "ex:entity{}".format(index - 1))
+    return prov_document
+
+
+def measure_bytes_per_record(adapter, prov_document):
+    """
+    Save the document into a new adapter and measure the allocated memory of the stored records
+
+    :param adapter: The adapter class
+    :type adapter: SimpleInMemoryAdapter
+    :param prov_document: The document to save
+    :type prov_document: prov.model.ProvDocument
+    :return: The allocated bytes per record (nodes and relations)
+    :rtype: float
+    """
+    prov_api = ProvDb(adapter=adapter, auth_info=None)
+    prov_api._adapter.all_nodes = dict()
+    prov_api._adapter.all_relations = dict()
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    prov_api.save_document(prov_document)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    nodes = len(prov_api._adapter.all_nodes)
+    relations = sum(len(relations) for relations in prov_api._adapter.all_relations.values())
+    return (after - before) / (nodes + relations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the memory usage of the in memory adapters")
+    parser.add_argument("--records", type=int, default=2000, help="Number of entities in the document")
+    args = parser.parse_args()
+
+    prov_document = create_document(args.records)
+    for adapter in (SimpleInMemoryAdapter, CompactInMemoryAdapter):
+        print("{:<24}: {:8.1f} bytes per record".format(adapter.__name__,
+                                                        measure_bytes_per_record(adapter, prov_document)))
+
+
+if __name__ == '__main__':
+    main()
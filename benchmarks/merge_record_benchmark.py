@@ -0,0 +1,78 @@
+"""
+Benchmark for the merge of records: Re-ingest the same document ten times into the SimpleInMemoryAdapter.
+
+The first run creates all records, each further run merges the same records again.
+
+Run with::
+
+    python -m benchmarks.merge_record_benchmark
+
+"""
+import argparse
+import time
+
+from provdbconnector import ProvDb
+from provdbconnector.db_adapters.in_memory import SimpleInMemoryAdapter
+from provdbconnector.tests.examples import primer_example
+from provdbconnector.utils.serializer import merge_record
+
+
+def reingest_document(prov_document, repeat=10):
+    """
+    Save the same document several times and measure the time for each run
+
+    :param prov_document: The document to save
+    :type prov_document: prov.model.ProvDocument
+    :param repeat: How often the document should be saved
+    :type repeat: int
+    :return: The duration of each run in seconds
+    :rtype: list
+    """
+    prov_api = ProvDb(adapter=SimpleInMemoryAdapter, auth_info=None)
+    prov_api._adapter.all_nodes = dict()
+    prov_api._adapter.all_relations = dict()
+
+    durations = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        prov_api.save_document(prov_document)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def merge_identical_records(repeat=100000):
+    """
+    Measure the merge of a record with an identical copy of itself
+
+    :param repeat: Number of merge operations
+    :type repeat: int
+    :return: The average duration of one merge in seconds
+    :rtype: float
+    """
+    prov_api = ProvDb(adapter=SimpleInMemoryAdapter, auth_info=None)
+    record = list(primer_example().get_records())[0]
+    (metadata, attributes) = prov_api._get_metadata_and_attributes_for_record(record)
+    other_metadata = metadata.copy()
+    other_attributes = attributes.copy()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        merge_record(attributes, metadata, other_attributes, other_metadata)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-ingest the same document into the SimpleInMemoryAdapter")
+    parser.add_argument("--repeat", type=int, default=10, help="How often the document is saved")
+    args = parser.parse_args()
+
+    durations = reingest_document(primer_example(), repeat=args.repeat)
+    for (run, duration) in enumerate(durations, start=1):
+        print("run {:>3}: {:8.2f} ms".format(run, duration * 1000))
+    print("re-ingest average (run 2-{}): {:8.2f} ms".format(
+        args.repeat, sum(durations[1:]) * 1000 / max(len(durations) - 1, 1)))
+    print("merge_record identical record: {:8.2f} us".format(merge_identical_records() * 1000000))
+
+
+if __name__ == '__main__':
+    main()
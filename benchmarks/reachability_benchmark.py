@@ -0,0 +1,142 @@
+"""
+Benchmark for the reachability index of the SimpleInMemoryAdapter: Save a generated provenance DAG (each new entity
+is derived from some older entities) directly into the adapter and compare the queries per second of
+is_reachable with a breadth first search over the graph index.
+
+Run with::
+
+    python -m benchmarks.reachability_benchmark --edges 1000000
+
+"""
+import argparse
+import random
+import time
+
+from prov.constants import PROV_DERIVATION, PROV_ENTITY
+
+from provdbconnector.db_adapters.baseadapter import METADATA_KEY_IDENTIFIER, METADATA_KEY_PROV_TYPE
+from provdbconnector.db_adapters.in_memory import SimpleInMemoryAdapter
+
+
+def create_graph(adapter, edges, parents=4, seed=1):
+    """
+    Save a random provenance DAG, each new entity is derived from up to `parents` older entities
+
+    :param adapter: The adapter
+    :type adapter: SimpleInMemoryAdapter
+    :param edges: Number of relations
+    :type edges: int
+    :param parents: Max number of relations per entity
+    :type parents: int
+    :param seed: The seed of the random generator
+    :type seed: int
+    :return: The identifiers of the entities
+    :rtype: list
+    """
+    generator = random.Random(seed)
+    identifiers = list()
+    relation_metadata = {METADATA_KEY_PROV_TYPE: PROV_DERIVATION}
+
+    saved_edges = 0
+    while saved_edges < edges:
+        identifier = "http://example.com/entity{}".format(len(identifiers))
+        adapter.save_element(dict(), {METADATA_KEY_IDENTIFIER: identifier, METADATA_KEY_PROV_TYPE: PROV_ENTITY})
+        if len(identifiers) > 0:
+            count = min(generator.randint(1, parents), len(identifiers), edges - saved_edges)
+            # prefer recent entities, like the versions of a document
+            for parent in set(identifiers[-generator.randint(1, min(len(identifiers), 1000))] for _ in range(count)):
+                adapter.save_relation(identifier, parent, dict(), relation_metadata)
+                saved_edges += 1
+        identifiers.append(identifier)
+    return identifiers
+
+
+def bfs_is_reachable(adapter, source, target):
+    """
+    Breadth first search over the graph index of the adapter, the baseline without the reachability index
+
+    :param adapter: The adapter
+    :type adapter: SimpleInMemoryAdapter
+    :param source: The start identifier
+    :type source: str
+    :param target: The end identifier
+    :type target: str
+    :rtype: bool
+    """
+    graph = adapter._graph
+    target_id = graph.node_ids[target]
+    frontier = [graph.node_ids[source]]
+    visited = set(frontier)
+    while len(frontier) > 0:
+        next_frontier = list()
+        for node_id in frontier:
+            for (other_id, edge) in graph.successors(node_id):
+                if other_id == target_id:
+                    return True
+                if other_id not in visited:
+                    visited.add(other_id)
+                    next_frontier.append(other_id)
+        frontier = next_frontier
+    return source == target
+
+
+def measure_queries(function, queries, max_duration):
+    """
+    Run the queries until all are done or the max duration is over
+
+    :param function: The function (source, target) -> bool
+    :type function: function
+    :param queries: List of (source, target) tuples
+    :type queries: list
+    :param max_duration: Max duration in seconds
+    :type max_duration: float
+    :return: Tuple with (queries per second, number of reachable targets, number of queries)
+    :rtype: tuple
+    """
+    reachable = 0
+    count = 0
+    start = time.perf_counter()
+    for (source, target) in queries:
+        reachable += function(source, target)
+        count += 1
+        if time.perf_counter() - start > max_duration:
+            break
+    return count / (time.perf_counter() - start), reachable, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the reachability queries of the SimpleInMemoryAdapter")
+    parser.add_argument("--edges", type=int, default=1000000, help="Number of relations in the DAG")
+    parser.add_argument("--queries", type=int, default=10000, help="Number of queries")
+    parser.add_argument("--max-duration", type=float, default=30, help="Max seconds per measurement")
+    args = parser.parse_args()
+
+    adapter = SimpleInMemoryAdapter()
+    adapter.all_nodes = dict()
+    adapter.all_relations = dict()
+    adapter.connect({"reachability_index": True})
+
+    start = time.perf_counter()
+    identifiers = create_graph(adapter, args.edges)
+    print("save:  {:10.0f} relations/s ({} entities)".format(args.edges / (time.perf_counter() - start),
+                                                           len(identifiers)))
+
+    # an older entity as target, so a part of the queries is reachable
+    generator = random.Random(2)
+    queries = list()
+    for _ in range(args.queries):
+        source = generator.randrange(1, len(identifiers))
+        queries.append((identifiers[source], identifiers[max(0, source - generator.randint(1, 5000))]))
+
+    start = time.perf_counter()
+    adapter._get_reachability_index()
+    print("index: {:10.3f} s".format(time.perf_counter() - start))
+
+    for (name, function) in (("index", adapter.is_reachable),
+                             ("bfs", lambda source, target: bfs_is_reachable(adapter, source, target))):
+        (queries_per_second, reachable, count) = measure_queries(function, queries, args.max_duration)
+        print("{:<5}: {:10.0f} queries/s ({} of {} reachable)".format(name, queries_per_second, reachable, count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark for the cold start of the SimpleInMemoryAdapter: Compare the re-ingest of the primer document (scaled up
+with different namespaces) from PROV-JSON with loading a snapshot of the same data.
+
+Run with::
+
+    python -m benchmarks.snapshot_benchmark --scale 100
+
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from provdbconnector import ProvDb
+from provdbconnector.db_adapters.in_memory import SimpleInMemoryAdapter
+from provdbconnector.tests.examples import primer_example
+
+
+def create_json_documents(scale=100):
+    """
+    Create copies of the primer document as PROV-JSON, each copy uses a different namespace uri
+
+    :param scale: Number of copies
+    :type scale: int
+    :return: List of PROV-JSON documents as bytes
+    :rtype: list
+    """
+    primer_json = primer_example().serialize(format="json")
+    return [primer_json.replace("http://example/", "http://example/{}/".format(index)).encode("utf-8") for index in
+            range(scale)]
+
+
+def reingest(json_documents):
+    """
+    Save the PROV-JSON documents into a new adapter
+
+    :param json_documents: The documents
+    :type json_documents: list
+    :return: Tuple with (duration in seconds, the ProvDb instance)
+    :rtype: tuple
+    """
+    prov_api = ProvDb(adapter=SimpleInMemoryAdapter, auth_info=None)
+    prov_api._adapter.all_nodes = dict()
+    prov_api._adapter.all_relations = dict()
+
+    start = time.perf_counter()
+    for json_document in json_documents:
+        prov_api.save_document_from_json(json_document)
+    return time.perf_counter() - start, prov_api
+
+
+def cold_start(path):
+    """
+    Load the snapshot into a new adapter and read one record
+
+    :param path: The snapshot file
+    :type path: str
+    :return: The duration in seconds
+    :rtype: float
+    """
+    start = time.perf_counter()
+    adapter = SimpleInMemoryAdapter()
+    adapter.load_snapshot(path)
+    adapter.get_record(next(iter(adapter.all_nodes)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the re-ingest with loading a snapshot")
+    parser.add_argument("--scale", type=int, default=100, help="Number of primer document copies")
+    args = parser.parse_args()
+
+    (reingest_duration, prov_api) = reingest(create_json_documents(args.scale))
+
+    (handle, path) = tempfile.mkstemp(suffix=".snapshot")
+    os.close(handle)
+    try:
+        start = time.perf_counter()
+        prov_api._adapter.save_snapshot(path)
+        save_duration = time.perf_counter() - start
+
+        print("records                : {:>10}".format(len(prov_api._adapter.all_nodes)))
+        print("snapshot size          : {:>10} bytes".format(os.path.getsize(path)))
+        print("re-ingest from json    : {:10.2f} ms".format(reingest_duration * 1000))
+        print("save snapshot          : {:10.2f} ms".format(save_duration * 1000))
+        print("cold start (snapshot)  : {:10.2f} ms".format(cold_start(path) * 1000))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark for the write and traversal throughput of the SqliteAdapter: Save a generated chain document with the bulk
+insert and with one transaction per record, then traverse the whole chain with get_records_tail.
+
+Run with::
+
+    python -m benchmarks.sqlite_benchmark --records 2000
+
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from provdbconnector import ProvDb
+from provdbconnector.db_adapters.baseadapter import BaseAdapter, METADATA_KEY_IDENTIFIER
+from provdbconnector.db_adapters.in_memory import SimpleInMemoryAdapter
+from provdbconnector.db_adapters.sqlite import SqliteAdapter
+
+from benchmarks.memory_benchmark import create_document
+
+
+class SingleRecordSqliteAdapter(SqliteAdapter):
+    """
+    SqliteAdapter without the bulk insert, each record is saved in its own transaction
+    """
+
+    def save_bulk(self, elements, relations):
+        return BaseAdapter.save_bulk(self, elements, relations)
+
+
+def measure_save(adapter, auth_info, prov_document):
+    """
+    Save the document and measure the duration
+
+    :param adapter: The adapter class
+    :type adapter: BaseAdapter
+    :param auth_info: The options for the connect function
+    :type auth_info: dict
+    :param prov_document: The document to save
+    :type prov_document: prov.model.ProvDocument
+    :return: Tuple with (duration in seconds, the ProvDb instance)
+    :rtype: tuple
+    """
+    prov_api = ProvDb(adapter=adapter, auth_info=auth_info)
+    if isinstance(prov_api._adapter, SimpleInMemoryAdapter):
+        prov_api._adapter.all_nodes = dict()
+        prov_api._adapter.all_relations = dict()
+
+    start = time.perf_counter()
+    prov_api.save_document(prov_document)
+    return time.perf_counter() - start, prov_api
+
+
+def measure_tail(prov_api, identifier):
+    """
+    Traverse the chain from the entity with the identifier
+
+    :param prov_api: The ProvDb instance with the saved document
+    :type prov_api: ProvDb
+    :param identifier: The start entity
+    :type identifier: str
+    :return: Tuple with (duration in seconds, number of records)
+    :rtype: tuple
+    """
+    start = time.perf_counter()
+    records = prov_api._adapter.get_records_tail(metadata_dict={METADATA_KEY_IDENTIFIER: identifier})
+    return time.perf_counter() - start, len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the write and traversal throughput of the SqliteAdapter")
+    parser.add_argument("--records", type=int, default=2000, help="Number of entities in the document")
+    args = parser.parse_args()
+
+    prov_document = create_document(args.records)
+    record_count = len(prov_document.get_records())
+    # the chain is derived backwards, so the tail of the last entity contains the whole chain
+    last_identifier = "http://example.com/entity{}".format(args.records - 1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        candidates = [
+            ("in memory", SimpleInMemoryAdapter, None),
+            ("sqlite bulk", SqliteAdapter, {"path": os.path.join(directory, "bulk.sqlite")}),
+            ("sqlite single records", SingleRecordSqliteAdapter, {"path": os.path.join(directory, "single.sqlite")}),
+        ]
+        for (name, adapter, auth_info) in candidates:
+            (save_duration, prov_api) = measure_save(adapter, auth_info, prov_document)
+            (tail_duration, tail_records) = measure_tail(prov_api, last_identifier)
+            print("{:<22}: {:>10.0f} records/s, tail of {} records in {:.2f} ms".format(
+                name, record_count / save_duration, tail_records, tail_duration * 1000))
+            if isinstance(prov_api._adapter, SqliteAdapter):
+                prov_api._adapter.close()
+
+
+if __name__ == '__main__':
+    main()
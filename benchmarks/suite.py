@@ -0,0 +1,355 @@
+"""
+Benchmark suite for the ingest, export and query paths of ProvDb: Save a generated document with bundles into each
+local adapter at several scales and measure save_document, get_document_as_prov / _json / _provn, get_element,
+get_bundle and get_records_tail.
+
+The documents are generated deterministically and each operation is repeated, the result of an operation is the
+fastest and the median duration of the repeats. The results are written as JSON and can be compared with a stored
+baseline, the command exits with 1 if an operation is slower than the baseline by more than the threshold.
+
+Run with::
+
+    python -m benchmarks.suite --output baseline.json
+    python -m benchmarks.suite --output current.json --compare baseline.json --threshold 0.2
+
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+import prov
+from prov.model import ProvDocument
+
+from provdbconnector import ProvDb
+from provdbconnector.db_adapters.baseadapter import METADATA_KEY_IDENTIFIER
+from provdbconnector.db_adapters.in_memory import SimpleInMemoryAdapter, CompactInMemoryAdapter
+from provdbconnector.db_adapters.key_value import KeyValueAdapter
+from provdbconnector.db_adapters.sqlite import SqliteAdapter
+
+from benchmarks.memory_benchmark import create_document
+
+RESULT_FORMAT_VERSION = 1
+
+OPERATION_SAVE_DOCUMENT = "save_document"
+OPERATION_GET_DOCUMENT_AS_PROV = "get_document_as_prov"
+OPERATION_GET_DOCUMENT_AS_JSON = "get_document_as_json"
+OPERATION_GET_DOCUMENT_AS_PROVN = "get_document_as_provn"
+OPERATION_GET_ELEMENT = "get_element"
+OPERATION_GET_BUNDLE = "get_bundle"
+OPERATION_GET_RECORDS_TAIL = "get_records_tail"
+
+# Number of bundles of the generated documents and the max number of get_element calls per repeat
+BUNDLES = 4
+ELEMENT_SAMPLES = 100
+
+# The local adapters, each with a function that returns the auth_info for a new database in a directory
+ADAPTERS = OrderedDict([
+    ("in_memory", (SimpleInMemoryAdapter, lambda directory, name: None)),
+    ("compact_in_memory", (CompactInMemoryAdapter, lambda directory, name: None)),
+    ("sqlite", (SqliteAdapter, lambda directory, name: {"path": os.path.join(directory, name + ".sqlite")})),
+    ("key_value", (KeyValueAdapter, lambda directory, name: {"path": os.path.join(directory, name + ".db")})),
+])
+
+
+def create_suite_document(records=1000, bundles=BUNDLES):
+    """
+    Create the document of the suite: A chain of entities and bundles with chains of a tenth of the size
+
+    :param records: Number of entities in the document
+    :type records: int
+    :param bundles: Number of bundles
+    :type bundles: int
+    :return: The document
+    :rtype: prov.model.ProvDocument
+    """
+    prov_document = create_document(records)
+    bundle_records = max(1, records // 10)
+    for bundle_index in range(bundles):
+        bundle = prov_document.bundle("ex:bundle{}".format(bundle_index))
+        for index in range(bundle_records):
+            bundle.entity("ex:bundle{}entity{}".format(bundle_index, index),
+                          {"dcterms:title": "Bundle entity {}".format(index)})
+            if index > 0:
+                bundle.wasDerivedFrom("ex:bundle{}entity{}".format(bundle_index, index),
+                                      "ex:bundle{}entity{}".format(bundle_index, index - 1))
+    return prov_document
+
+
+def create_prov_db(adapter, auth_info):
+    """
+    Create a ProvDb with an empty database
+
+    :param adapter: The adapter class
+    :type adapter: BaseAdapter
+    :param auth_info: The options for the connect function
+    :type auth_info: dict
+    :rtype: ProvDb
+    """
+    prov_api = ProvDb(adapter=adapter, auth_info=auth_info)
+    if isinstance(prov_api._adapter, SimpleInMemoryAdapter):
+        prov_api._adapter.all_nodes = dict()
+        prov_api._adapter.all_relations = dict()
+    return prov_api
+
+
+def close_prov_db(prov_api):
+    """
+    Close the database of a ProvDb if the adapter supports it
+
+    :param prov_api: The ProvDb instance
+    :type prov_api: ProvDb
+    """
+    if hasattr(prov_api._adapter, "close"):
+        prov_api._adapter.close()
+
+
+def measure(function, repeat, setup=None):
+    """
+    Call the function repeat times and measure the durations, the setup is not measured
+
+    :param function: The measured function, gets the result of the setup as argument if there is a setup
+    :type function: function
+    :param repeat: Number of calls
+    :type repeat: int
+    :param setup: Function that is called before each call, optional
+    :type setup: function
+    :return: The durations in seconds
+    :rtype: list(float)
+    """
+    durations = list()
+    for index in range(repeat):
+        arguments = (setup(index),) if setup is not None else ()
+        start = time.perf_counter()
+        function(*arguments)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def create_result(adapter_name, records, operation, durations, calls=1):
+    """
+    Create the result of an operation
+
+    :param adapter_name: The name of the adapter
+    :type adapter_name: str
+    :param records: The scale of the document
+    :type records: int
+    :param operation: The name of the operation
+    :type operation: str
+    :param durations: The durations of the repeats
+    :type durations: list(float)
+    :param calls: The number of calls per repeat, the durations are divided by it
+    :type calls: int
+    :rtype: dict
+    """
+    return OrderedDict([
+        ("adapter", adapter_name),
+        ("records", records),
+        ("operation", operation),
+        ("min", min(durations) / calls),
+        ("median", statistics.median(durations) / calls),
+        ("repeat", len(durations)),
+    ])
+
+
+def run_adapter(adapter_name, directory, records, prov_document, repeat):
+    """
+    Run all operations for one adapter and one scale
+
+    :param adapter_name: The name of the adapter in ADAPTERS
+    :type adapter_name: str
+    :param directory: The directory for the database files
+    :type directory: str
+    :param records: The scale of the document
+    :type records: int
+    :param prov_document: The document
+    :type prov_document: prov.model.ProvDocument
+    :param repeat: The number of repeats per operation
+    :type repeat: int
+    :return: The results
+    :rtype: list(dict)
+    """
+    (adapter, get_auth_info) = ADAPTERS[adapter_name]
+    results = list()
+
+    # each save goes into a new database
+    databases = list()
+
+    def setup_save(index):
+        prov_api = create_prov_db(adapter, get_auth_info(directory, "{}-{}-{}".format(adapter_name, records, index)))
+        databases.append(prov_api)
+        return prov_api
+
+    durations = measure(lambda prov_api: prov_api.save_document(prov_document), repeat, setup_save)
+    results.append(create_result(adapter_name, records, OPERATION_SAVE_DOCUMENT, durations))
+    for prov_api in databases[1:]:
+        close_prov_db(prov_api)
+
+    prov_api = databases[0]
+    document_id = prov_api.save_document(prov_document)
+    for (operation, function) in ((OPERATION_GET_DOCUMENT_AS_PROV, prov_api.get_document_as_prov),
+                                  (OPERATION_GET_DOCUMENT_AS_JSON, prov_api.get_document_as_json),
+                                  (OPERATION_GET_DOCUMENT_AS_PROVN, prov_api.get_document_as_provn)):
+        durations = measure(lambda: function(document_id), repeat)
+        results.append(create_result(adapter_name, records, operation, durations))
+
+    step = max(1, records // ELEMENT_SAMPLES)
+    identifiers = [prov_document.valid_qualified_name("ex:entity{}".format(index)) for index in
+                   range(0, records, step)]
+
+    def get_elements():
+        for identifier in identifiers:
+            prov_api.get_element(identifier)
+
+    durations = measure(get_elements, repeat)
+    results.append(create_result(adapter_name, records, OPERATION_GET_ELEMENT, durations, len(identifiers)))
+
+    bundle_identifiers = [bundle.identifier for bundle in prov_document.bundles]
+
+    def get_bundles():
+        for identifier in bundle_identifiers:
+            prov_api.get_bundle(identifier)
+
+    durations = measure(get_bundles, repeat)
+    results.append(create_result(adapter_name, records, OPERATION_GET_BUNDLE, durations, len(bundle_identifiers)))
+
+    # the chain is derived backwards, so the tail of the last entity contains the whole chain
+    last_identifier = "http://example.com/entity{}".format(records - 1)
+    durations = measure(lambda: prov_api._adapter.get_records_tail(
+        metadata_dict={METADATA_KEY_IDENTIFIER: last_identifier}), repeat)
+    results.append(create_result(adapter_name, records, OPERATION_GET_RECORDS_TAIL, durations))
+
+    close_prov_db(prov_api)
+    return results
+
+
+def run_suite(adapter_names, scales, repeat):
+    """
+    Run the suite
+
+    :param adapter_names: The names of the adapters in ADAPTERS
+    :type adapter_names: list(str)
+    :param scales: The numbers of entities of the documents
+    :type scales: list(int)
+    :param repeat: The number of repeats per operation
+    :type repeat: int
+    :return: The report with the environment, the settings and the results
+    :rtype: dict
+    """
+    results = list()
+    with tempfile.TemporaryDirectory() as directory:
+        for records in scales:
+            prov_document = create_suite_document(records)
+            for adapter_name in adapter_names:
+                results.extend(run_adapter(adapter_name, directory, records, prov_document, repeat))
+
+    return OrderedDict([
+        ("version", RESULT_FORMAT_VERSION),
+        ("environment", OrderedDict([
+            ("python", platform.python_version()),
+            ("implementation", platform.python_implementation()),
+            ("platform", platform.platform()),
+            ("prov", prov.__version__),
+        ])),
+        ("settings", OrderedDict([
+            ("adapters", list(adapter_names)),
+            ("scales", list(scales)),
+            ("repeat", repeat),
+        ])),
+        ("results", results),
+    ])
+
+
+def compare(report, baseline, threshold):
+    """
+    Compare the min durations of the results with the baseline
+
+    :param report: The report of the current run
+    :type report: dict
+    :param baseline: The stored report
+    :type baseline: dict
+    :param threshold: The allowed relative slowdown, 0.2 means 20 percent
+    :type threshold: float
+    :return: The list of (result, baseline duration, ratio, is regression) for all results in both reports
+    :rtype: list(tuple)
+    """
+    baseline_durations = dict(((result["adapter"], result["records"], result["operation"]), result["min"]) for
+                              result in baseline["results"])
+    comparison = list()
+    for result in report["results"]:
+        baseline_duration = baseline_durations.get((result["adapter"], result["records"], result["operation"]))
+        if baseline_duration is None or baseline_duration <= 0:
+            continue
+        ratio = result["min"] / baseline_duration
+        comparison.append((result, baseline_duration, ratio, ratio > 1 + threshold))
+    return comparison
+
+
+def print_results(results):
+    """
+    Print the results as table
+
+    :param results: The results of a report
+    :type results: list(dict)
+    """
+    for result in results:
+        print("{:<18} {:>7} {:<22}: min {:10.3f} ms, median {:10.3f} ms".format(
+            result["adapter"], result["records"], result["operation"], result["min"] * 1000,
+            result["median"] * 1000))
+
+
+def print_comparison(comparison):
+    """
+    Print the comparison with the baseline
+
+    :param comparison: The result of :py:func:`compare`
+    :type comparison: list(tuple)
+    """
+    for (result, baseline_duration, ratio, regression) in comparison:
+        print("{:<18} {:>7} {:<22}: {:10.3f} ms -> {:10.3f} ms ({:+6.1f} %){}".format(
+            result["adapter"], result["records"], result["operation"], baseline_duration * 1000,
+            result["min"] * 1000, (ratio - 1) * 100, " REGRESSION" if regression else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the ingest, export and query paths of ProvDb")
+    parser.add_argument("--scales", default="100,1000", help="Comma separated numbers of entities of the documents")
+    parser.add_argument("--adapters", default=",".join(ADAPTERS.keys()),
+                        help="Comma separated adapters, any of {}".format(", ".join(ADAPTERS.keys())))
+    parser.add_argument("--repeat", type=int, default=5, help="Number of repeats per operation")
+    parser.add_argument("--output", help="Write the results as JSON into this file")
+    parser.add_argument("--compare", help="Compare the results with this baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed relative slowdown against the baseline, 0.2 means 20 percent")
+    args = parser.parse_args()
+
+    adapter_names = [name.strip() for name in args.adapters.split(",") if name.strip()]
+    for name in adapter_names:
+        if name not in ADAPTERS:
+            parser.error("Unknown adapter {}, use any of {}".format(name, ", ".join(ADAPTERS.keys())))
+    scales = [int(scale) for scale in args.scales.split(",")]
+
+    report = run_suite(adapter_names, scales, args.repeat)
+    print_results(report["results"])
+
+    if args.output is not None:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        comparison = compare(report, baseline, args.threshold)
+        print()
+        print_comparison(comparison)
+        if any(regression for (result, baseline_duration, ratio, regression) in comparison):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
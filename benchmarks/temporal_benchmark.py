@@ -0,0 +1,93 @@
+"""
+Benchmark for the temporal index of the SimpleInMemoryAdapter: Save the activities of one year directly into the
+adapter and compare the time of a query for one day with the filter over all records of the default implementation
+in the BaseAdapter.
+
+Run with::
+
+    python -m benchmarks.temporal_benchmark --activities 100000
+
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from prov.constants import PROV_ACTIVITY, PROV_ATTR_STARTTIME, PROV_ATTR_ENDTIME
+
+from provdbconnector.db_adapters.baseadapter import BaseAdapter, METADATA_KEY_IDENTIFIER, METADATA_KEY_PROV_TYPE
+from provdbconnector.db_adapters.in_memory import SimpleInMemoryAdapter
+
+YEAR_START = datetime(2017, 1, 1, tzinfo=timezone.utc)
+
+
+def create_activities(adapter, count, seed=1):
+    """
+    Save activities with a random start time in one year and a duration of up to 2 hours
+
+    :param adapter: The adapter
+    :type adapter: SimpleInMemoryAdapter
+    :param count: Number of activities
+    :type count: int
+    :param seed: The seed of the random generator
+    :type seed: int
+    """
+    generator = random.Random(seed)
+    for index in range(count):
+        start = YEAR_START + timedelta(seconds=generator.randrange(365 * 24 * 3600))
+        end = start + timedelta(seconds=generator.randrange(2 * 3600))
+        adapter.save_element({PROV_ATTR_STARTTIME: start, PROV_ATTR_ENDTIME: end},
+                             {METADATA_KEY_IDENTIFIER: "http://example.com/activity{}".format(index),
+                              METADATA_KEY_PROV_TYPE: PROV_ACTIVITY})
+
+
+def measure_queries(function, queries):
+    """
+    Run the day queries
+
+    :param function: The function (start, end) -> list
+    :type function: function
+    :param queries: List of (start, end) tuples
+    :type queries: list
+    :return: Tuple with (milliseconds per query, average number of results)
+    :rtype: tuple
+    """
+    results = 0
+    start = time.perf_counter()
+    for (range_start, range_end) in queries:
+        results += len(function(range_start, range_end))
+    duration = time.perf_counter() - start
+    return duration * 1000 / len(queries), results / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the time range queries of the SimpleInMemoryAdapter")
+    parser.add_argument("--activities", type=int, default=100000, help="Number of activities in one year")
+    parser.add_argument("--queries", type=int, default=20, help="Number of day queries")
+    args = parser.parse_args()
+
+    adapter = SimpleInMemoryAdapter()
+    adapter.all_nodes = dict()
+    adapter.all_relations = dict()
+    adapter.connect(None)
+    create_activities(adapter, args.activities)
+
+    start = time.perf_counter()
+    adapter._get_temporal_index()
+    print("index: {:10.3f} s".format(time.perf_counter() - start))
+
+    generator = random.Random(2)
+    queries = list()
+    for _ in range(args.queries):
+        day = YEAR_START + timedelta(days=generator.randrange(365))
+        queries.append((day, day + timedelta(days=1)))
+
+    for (name, function) in (("index", adapter.get_records_in_time_range),
+                             ("scan", lambda range_start, range_end: BaseAdapter.get_records_in_time_range(
+                                 adapter, range_start, range_end))):
+        (milliseconds, results) = measure_queries(function, queries)
+        print("{:<5}: {:10.2f} ms/query ({:.0f} records per day)".format(name, milliseconds, results))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,11 @@
 from provdbconnector.prov_db import ProvDb
 
 from provdbconnector.exceptions.provapi import ProvDbException
+from provdbconnector.utils.filters import F
 from provdbconnector import db_adapters
 from provdbconnector.db_adapters.neo4j.neo4jadapter import Neo4jAdapter
 from provdbconnector.db_adapters.neo4j.neo4jadapter import NEO4J_USER, NEO4J_PASS, NEO4J_HOST, NEO4J_HTTP_PORT, NEO4J_BOLT_PORT
 
-from provdbconnector.db_adapters.in_memory import SimpleInMemoryAdapter
+from provdbconnector.db_adapters.in_memory import SimpleInMemoryAdapter, CompactInMemoryAdapter
+from provdbconnector.db_adapters.sqlite import SqliteAdapter
+from provdbconnector.db_adapters.key_value import KeyValueAdapter
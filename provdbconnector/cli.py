@@ -0,0 +1,543 @@
+"""
+Command line tool for the bulk import and export of PROV documents, installed as `provdb`.
+
+.. code:: sh
+
+    # parse the files in 8 processes and save them into neo4j with 4 writers, prints "document_id<TAB>path" per file
+    provdb import --workers 8 --writers 4 data/ "more/**/*.json" > ids.tsv
+
+    # write the documents as PROV-JSON into a directory
+    provdb export --ids-file ids.tsv --output export/ --format json
+
+    # the number of records by prov type in a sqlite database
+    provdb --adapter sqlite --option path=prov.sqlite stats
+
+The import and the export show the throughput and the remaining time on stderr. SQLite, the key value store and
+the in memory adapters allow only one writer, the writes then run in the main thread.
+
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from time import perf_counter
+
+from provdbconnector.db_adapters.in_memory import SimpleInMemoryAdapter, CompactInMemoryAdapter
+from provdbconnector.db_adapters.key_value import KeyValueAdapter
+from provdbconnector.db_adapters.neo4j.neo4jadapter import Neo4jAdapter, NEO4J_USER, NEO4J_PASS, NEO4J_HOST, \
+    NEO4J_BOLT_PORT
+from provdbconnector.db_adapters.sqlite import SqliteAdapter
+from provdbconnector.exceptions.provapi import ProvDbException
+from provdbconnector.prov_db import ProvDb
+from provdbconnector.utils.converter import form_string
+from provdbconnector.utils.filters import F
+
+# The adapters by name, with the flag if several connections can write at the same time
+ADAPTERS = {
+    "neo4j": (Neo4jAdapter, True),
+    "sqlite": (SqliteAdapter, False),
+    "key_value": (KeyValueAdapter, False),
+    "in_memory": (SimpleInMemoryAdapter, False),
+    "compact_in_memory": (CompactInMemoryAdapter, False),
+}
+
+DEFAULT_NEO4J_OPTIONS = {
+    "user_name": NEO4J_USER,
+    "user_password": NEO4J_PASS,
+    "host": NEO4J_HOST + ":" + NEO4J_BOLT_PORT,
+}
+
+# The file extensions of the import and of the export formats
+IMPORT_EXTENSIONS = (".json", ".xml", ".provn")
+EXPORT_FORMATS = {
+    "json": ".json",
+    "xml": ".xml",
+    "provn": ".provn",
+}
+
+DEFAULT_WRITERS = 4
+
+# The max number of files per worker that are parsed or written at the same time
+QUEUE_SIZE_PER_WORKER = 4
+
+
+class Progress(object):
+    """
+    Shows the done items, the throughput and the estimated remaining time in one line
+
+    """
+
+    def __init__(self, total, unit, stream=None, interval=0.5):
+        """
+        :param total: The number of items
+        :type total: int
+        :param unit: The name of the items, for example "files"
+        :type unit: str
+        :param stream: The output stream, None to show nothing
+        :param interval: The min seconds between two updates of the line
+        :type interval: float
+        """
+        self.total = total
+        self.unit = unit
+        self.stream = stream
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.records = 0
+        self._start = perf_counter()
+        self._last_update = None
+
+    def update(self, records=0, failed=False):
+        """
+        Count one done item
+
+        :param records: The number of records of the item
+        :type records: int
+        :param failed: True if the item failed
+        :type failed: bool
+        """
+        self.done += 1
+        self.records += records
+        if failed:
+            self.failed += 1
+        now = perf_counter()
+        if self._last_update is None or now - self._last_update >= self.interval:
+            self._last_update = now
+            self._write("\r" + self.get_status())
+
+    def get_status(self):
+        """
+        Returns the status line
+
+        :rtype: str
+        """
+        seconds = perf_counter() - self._start
+        rate = self.done / seconds if seconds > 0 else 0.0
+        remaining = (self.total - self.done) / rate if rate > 0 else 0.0
+        return "{}/{} {} ({} failed), {} records, {:.1f} {}/s, {:.0f} records/s, ETA {}".format(
+            self.done, self.total, self.unit, self.failed, self.records, rate, self.unit,
+            self.records / seconds if seconds > 0 else 0.0, format_duration(remaining))
+
+    def finish(self):
+        """
+        End the status line
+
+        """
+        self._write("\r" + self.get_status() + ", {} elapsed\n".format(format_duration(perf_counter() -
+                                                                                      self._start)))
+
+    def _write(self, text):
+        if self.stream is not None:
+            self.stream.write(text)
+            self.stream.flush()
+
+
+def format_duration(seconds):
+    """
+    Format a duration as h:mm:ss
+
+    :param seconds: The duration
+    :type seconds: float
+    :rtype: str
+    """
+    seconds = int(round(seconds))
+    return "{}:{:02d}:{:02d}".format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def parse_option(text):
+    """
+    Parse an adapter option key=value, the value is parsed as JSON if possible, like 5 or true
+
+    :param text: The option
+    :type text: str
+    :return: The key and the value
+    :rtype: tuple
+    """
+    if "=" not in text:
+        raise argparse.ArgumentTypeError("The option {} should be key=value".format(text))
+    (key, value) = text.split("=", 1)
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass
+    return key, value
+
+
+def expand_paths(inputs):
+    """
+    Returns the files of the inputs: files, directories (with all PROV files in it) and glob patterns
+
+    :param inputs: The inputs
+    :type inputs: list(str)
+    :return: The sorted files without duplicates
+    :rtype: list(str)
+    """
+    paths = set()
+    for path in inputs:
+        if os.path.isdir(path):
+            for (directory, directories, files) in os.walk(path):
+                paths.update(os.path.join(directory, name) for name in files if name.endswith(IMPORT_EXTENSIONS))
+        elif os.path.isfile(path):
+            paths.add(path)
+        else:
+            paths.update(match for match in glob.glob(path, recursive=True) if os.path.isfile(match))
+    return sorted(paths)
+
+
+def parse_file(path):
+    """
+    Parse a PROV-JSON, PROV-XML or PROV-N file, runs in the worker processes
+
+    :param path: The file
+    :type path: str
+    :return: Tuple with (path, document, error message)
+    :rtype: tuple
+    """
+    try:
+        with open(path, "rb") as prov_file:
+            return path, form_string(prov_file.read()), None
+    except Exception as e:
+        return path, None, "{}: {}".format(type(e).__name__, e)
+
+
+def iter_bounded(executor, function, items, size):
+    """
+    Apply the function to the items with the executor, at most size calls run at the same time
+
+    :param executor: The executor
+    :type executor: concurrent.futures.Executor
+    :param function: The function
+    :type function: function
+    :param items: The arguments
+    :type items: iterable
+    :param size: The max number of running calls
+    :type size: int
+    :return: Generator of the results in completion order
+    :rtype: generator
+    """
+    items = iter(items)
+    running = set()
+    for item in items:
+        running.add(executor.submit(function, item))
+        if len(running) >= size:
+            (done, running) = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    while len(running) > 0:
+        (done, running) = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+
+class InlineExecutor(Executor):
+    """
+    Executor that runs the calls in the current thread, used for one worker or one writer
+    because the connections of some adapters can only be used in the thread that opened them
+
+    """
+
+    def submit(self, function, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(function(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def create_executor(workers, processes=False):
+    """
+    Returns the executor for a number of workers
+
+    :param workers: The number of workers
+    :type workers: int
+    :param processes: True for a process pool, False for a thread pool
+    :type processes: bool
+    :rtype: concurrent.futures.Executor
+    """
+    if workers == 1:
+        return InlineExecutor()
+    if processes:
+        return ProcessPoolExecutor(workers)
+    return ThreadPoolExecutor(workers)
+
+
+class Connections(object):
+    """
+    One ProvDb per thread, because the database connections are not shared between threads
+
+    """
+
+    def __init__(self, adapter, auth_info):
+        """
+        :param adapter: The adapter class
+        :type adapter: provdbconnector.db_adapters.baseadapter.BaseAdapter
+        :param auth_info: The options of the adapter
+        :type auth_info: dict
+        """
+        self.adapter = adapter
+        self.auth_info = auth_info
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all = list()
+
+    def get(self):
+        """
+        Returns the ProvDb of the current thread
+
+        :rtype: ProvDb
+        """
+        prov_api = getattr(self._local, "prov_api", None)
+        if prov_api is None:
+            prov_api = ProvDb(adapter=self.adapter, auth_info=self.auth_info)
+            self._local.prov_api = prov_api
+            with self._lock:
+                self._all.append(prov_api)
+        return prov_api
+
+    def close(self):
+        """
+        Close the database connections
+
+        """
+        with self._lock:
+            for prov_api in self._all:
+                if hasattr(prov_api._adapter, "close"):
+                    prov_api._adapter.close()
+            self._all = list()
+
+
+def get_record_count(prov_document):
+    """
+    Returns the number of records of the document and its bundles
+
+    :param prov_document: The document
+    :type prov_document: prov.model.ProvDocument
+    :rtype: int
+    """
+    return len(prov_document.get_records()) + sum(len(bundle.get_records()) for bundle in prov_document.bundles)
+
+
+def run_import(args, adapter, auth_info, output, errors):
+    """
+    Parse the files in a process pool and save them with the writer threads
+
+    :return: The exit code
+    :rtype: int
+    """
+    paths = expand_paths(args.inputs)
+    if len(paths) == 0:
+        errors.write("No files found\n")
+        return 1
+
+    connections = Connections(adapter, auth_info)
+    progress = Progress(len(paths), "files", None if args.quiet else errors)
+    pending = deque()
+
+    def save(path, prov_document):
+        try:
+            return path, connections.get().save_document(prov_document), get_record_count(prov_document), None
+        except Exception as e:
+            return path, None, 0, "{}: {}".format(type(e).__name__, e)
+
+    def report(future):
+        (path, document_id, records, error) = future.result()
+        if error is not None:
+            errors.write("\nerror: {}: {}\n".format(path, error))
+            progress.update(failed=True)
+            return
+        output.write("{}\t{}\n".format(document_id, path))
+        progress.update(records)
+
+    queue_size = max(args.workers, args.writers) * QUEUE_SIZE_PER_WORKER
+    try:
+        with create_executor(args.workers, processes=True) as parsers, create_executor(args.writers) as writers:
+            for (path, prov_document, error) in iter_bounded(parsers, parse_file, paths, queue_size):
+                if error is not None:
+                    errors.write("\nerror: {}: {}\n".format(path, error))
+                    progress.update(failed=True)
+                    continue
+                pending.append(writers.submit(save, path, prov_document))
+                while len(pending) >= queue_size or (len(pending) > 0 and pending[0].done()):
+                    report(pending.popleft())
+            while len(pending) > 0:
+                report(pending.popleft())
+    finally:
+        connections.close()
+    progress.finish()
+    return 1 if progress.failed > 0 else 0
+
+
+def read_document_ids(args):
+    """
+    Returns the document ids of the arguments and of the ids file, the first column of the import output
+
+    :rtype: list(str)
+    """
+    document_ids = list(args.document_ids)
+    if args.ids_file is not None:
+        ids_file = sys.stdin if args.ids_file == "-" else open(args.ids_file)
+        try:
+            for line in ids_file:
+                line = line.strip()
+                if len(line) > 0:
+                    document_ids.append(line.split("\t")[0])
+        finally:
+            if ids_file is not sys.stdin:
+                ids_file.close()
+    return document_ids
+
+
+def run_export(args, adapter, auth_info, output, errors):
+    """
+    Write the documents into the output directory with the writer threads
+
+    :return: The exit code
+    :rtype: int
+    """
+    document_ids = read_document_ids(args)
+    if len(document_ids) == 0:
+        errors.write("No document ids\n")
+        return 1
+    os.makedirs(args.output, exist_ok=True)
+
+    connections = Connections(adapter, auth_info)
+    progress = Progress(len(document_ids), "documents", None if args.quiet else errors)
+
+    def export(document_id):
+        try:
+            prov_document = connections.get().get_document_as_prov(document_id)
+            path = os.path.join(args.output, str(document_id) + EXPORT_FORMATS[args.format])
+            with open(path, "w") as prov_file:
+                prov_file.write(prov_document.serialize(format=args.format))
+            return document_id, path, get_record_count(prov_document), None
+        except Exception as e:
+            return document_id, None, 0, "{}: {}".format(type(e).__name__, e)
+
+    try:
+        with create_executor(args.writers) as writers:
+            for (document_id, path, records, error) in iter_bounded(writers, export, document_ids,
+                                                                    args.writers * QUEUE_SIZE_PER_WORKER):
+                if error is not None:
+                    errors.write("\nerror: {}: {}\n".format(document_id, error))
+                    progress.update(failed=True)
+                    continue
+                output.write("{}\t{}\n".format(document_id, path))
+                progress.update(records)
+    finally:
+        connections.close()
+    progress.finish()
+    return 1 if progress.failed > 0 else 0
+
+
+def run_stats(args, adapter, auth_info, output, errors):
+    """
+    Print the number of records and the number by prov type or by an attribute
+
+    :return: The exit code
+    :rtype: int
+    """
+    connections = Connections(adapter, auth_info)
+    try:
+        prov_api = connections.get()
+        expression = None
+        if args.document_id is not None:
+            expression = F(args.document_id, metadata=True).exists()
+        output.write("records\t{}\n".format(prov_api.count(expression)))
+        counts = prov_api.group_count(args.by, expression)
+        for (value, count) in sorted(counts.items(), key=lambda item: (-item[1], str(item[0]))):
+            output.write("{}\t{}\n".format(value, count))
+    finally:
+        connections.close()
+    return 0
+
+
+def create_parser():
+    """
+    Returns the parser of the command line arguments
+
+    :rtype: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(prog="provdb", description="Bulk import and export of PROV documents")
+    parser.add_argument("--adapter", choices=sorted(ADAPTERS.keys()), default="neo4j", help="The database adapter")
+    parser.add_argument("--option", type=parse_option, action="append", default=list(), metavar="KEY=VALUE",
+                        help="An option of the adapter, for example path=prov.sqlite. The neo4j adapter uses the "
+                             "NEO4J_USERNAME, NEO4J_PASSWORD, NEO4J_HOST and NEO4J_BOLT_PORT environment variables "
+                             "without options")
+    parser.add_argument("--quiet", action="store_true", help="Don't show the progress")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    import_parser = commands.add_parser("import", help="Save PROV-JSON, PROV-XML and PROV-N files")
+    import_parser.add_argument("inputs", nargs="+", help="Files, directories or glob patterns")
+    import_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                               help="The number of processes that parse the files")
+    import_parser.add_argument("--writers", type=int,
+                               help="The number of threads that save the documents, by default {} for the adapters "
+                                    "with parallel writes".format(DEFAULT_WRITERS))
+    import_parser.set_defaults(run=run_import)
+
+    export_parser = commands.add_parser("export", help="Write documents into a directory")
+    export_parser.add_argument("document_ids", nargs="*", help="The document ids")
+    export_parser.add_argument("--ids-file", help="File with a document id per line, like the import output, "
+                                                  "- for stdin")
+    export_parser.add_argument("--output", required=True, help="The output directory")
+    export_parser.add_argument("--format", choices=sorted(EXPORT_FORMATS.keys()), default="json")
+    export_parser.add_argument("--writers", type=int,
+                               help="The number of threads that read and write the documents, by default {} for "
+                                    "the adapters with parallel reads".format(DEFAULT_WRITERS))
+    export_parser.set_defaults(run=run_export)
+
+    stats_parser = commands.add_parser("stats", help="Count the records")
+    stats_parser.add_argument("--by", default="prov_type",
+                              help="Count by prov_type or by an attribute, for example prov:type")
+    stats_parser.add_argument("--document-id", help="Count only the records of this document")
+    stats_parser.set_defaults(run=run_stats)
+    return parser
+
+
+def main(argv=None, output=None, errors=None):
+    """
+    Run the command line tool
+
+    :param argv: The arguments, by default sys.argv
+    :type argv: list(str)
+    :param output: The output stream, by default stdout
+    :param errors: The stream of the errors and the progress, by default stderr
+    :return: The exit code
+    :rtype: int
+    """
+    output = sys.stdout if output is None else output
+    errors = sys.stderr if errors is None else errors
+    parser = create_parser()
+    args = parser.parse_args(argv)
+    for name in ("workers", "writers"):
+        value = getattr(args, name, None)
+        if value is not None and value < 1:
+            parser.error("The number of {} must be at least 1".format(name))
+
+    (adapter, parallel_writers) = ADAPTERS[args.adapter]
+    if hasattr(args, "writers") and args.writers is None:
+        args.writers = DEFAULT_WRITERS if parallel_writers else 1
+    auth_info = dict(args.option)
+    if args.adapter == "neo4j" and len(auth_info) == 0:
+        auth_info = dict(DEFAULT_NEO4J_OPTIONS)
+    elif len(auth_info) == 0:
+        auth_info = None
+    if not parallel_writers and getattr(args, "writers", 1) > 1:
+        errors.write("The {} adapter supports only one writer\n".format(args.adapter))
+        args.writers = 1
+
+    try:
+        return args.run(args, adapter, auth_info, output, errors)
+    except ProvDbException as e:
+        errors.write("error: {}\n".format(e))
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,8 @@
 import logging
 from collections import namedtuple
 
+from provdbconnector.utils.temporal import get_time_interval, to_timestamp
+
 log = logging.getLogger(__name__).addHandler(logging.NullHandler())
 
 METADATA_PARENT_ID = "parent_id"
@@ -10,6 +12,16 @@ METADATA_KEY_IDENTIFIER_ORIGINAL = "identifier_original"
 METADATA_KEY_NAMESPACES = "namespaces"
 METADATA_KEY_TYPE_MAP = "type_map"
 
+# The metadata of a projected record, only the keys that are required to create the prov record
+PROJECTION_METADATA_KEYS = frozenset([METADATA_KEY_PROV_TYPE, METADATA_KEY_IDENTIFIER, METADATA_KEY_IDENTIFIER_ORIGINAL,
+                                      METADATA_KEY_NAMESPACES, METADATA_KEY_TYPE_MAP])
+
+# Directions for the lineage traversal, upstream follows the relations from the start to the end node
+# (for example from the generated to the used entity of a derivation), downstream the other way around
+LINEAGE_UPSTREAM = "upstream"
+LINEAGE_DOWNSTREAM = "downstream"
+LINEAGE_DIRECTIONS = (LINEAGE_UPSTREAM, LINEAGE_DOWNSTREAM)
+
 # Return types for adapter classes
 DbDocument = namedtuple("DbDocument", "document, bundles")
 DbBundle = namedtuple("DbBundle", "records, bundle_record")
@@ -17,12 +29,24 @@ DbBundle = namedtuple("DbBundle", "records, bundle_record")
 DbRecord = namedtuple("DbRecord", "attributes, metadata")
 DbRelation = namedtuple("DbRelation", "attributes, metadata")
 
+# Argument and return types for bulk operations
+DbBulkRelation = namedtuple("DbBulkRelation", "from_node, to_node, attributes, metadata")
+DbBulkResult = namedtuple("DbBulkResult", "element_ids, relation_ids")
+
+# Return type for the paged queries, last_identifier is None on the last page
+DbPage = namedtuple("DbPage", "records, last_identifier")
+
 
 class BaseAdapter():
     """
     Interface class for a prov database adapter
     """
 
+    tracer = None
+    """
+    The tracer of the ProvDb for the spans inside the adapter, see :py:mod:`provdbconnector.utils.tracing`
+    """
+
     def __init__(self, *args, **kwargs):
         pass
 
@@ -68,7 +92,25 @@ class BaseAdapter():
         """
         raise NotImplementedError("Abstract method")
 
-    def get_records_by_filter(self, attributes_dict=None, metadata_dict=None):
+    def save_bulk(self, elements, relations):
+        """
+        Saves a batch of elements and relations, all elements are saved before the relations.
+        The default implementation calls save_element and save_relation for each record,
+        override this method if your database supports bulk operations
+
+        :param elements: The elements as list of DbRecord(attributes, metadata)
+        :type elements: list
+        :param relations: The relations as list of DbBulkRelation(from_node, to_node, attributes, metadata)
+        :type relations: list
+        :return: The ids of the elements and relations in the same order as the input
+        :rtype: DbBulkResult
+        """
+        element_ids = [self.save_element(attributes, metadata) for (attributes, metadata) in elements]
+        relation_ids = [self.save_relation(from_node, to_node, attributes, metadata) for
+                        (from_node, to_node, attributes, metadata) in relations]
+        return DbBulkResult(element_ids, relation_ids)
+
+    def get_records_by_filter(self, attributes_dict=None, metadata_dict=None, fields=None):
         """
         Returns all records (nodes and relations) based on a filter dict.
         The filter dict's are and AND combination but only the start node must fulfill the conditions.
@@ -78,12 +120,131 @@ class BaseAdapter():
         :type attributes_dict: dict
         :param metadata_dict:
         :type metadata_dict: dict
+        :param fields: The attribute keys of the records, the metadata contains only the PROJECTION_METADATA_KEYS.
+            Default to the whole records
+        :type fields: list(str or prov.model.QualifiedName)
         :return: list of relations and nodes
         :rtype: list
         """
         raise NotImplementedError("Abstract method")
 
-    def get_records_tail(self, attributes_dict=None, metadata_dict=None, depth=None):
+    def get_records_by_filter_page(self, attributes_dict=None, metadata_dict=None, limit=1000, after=None,
+                                   fields=None):
+        """
+        Returns one page of the nodes that match the filter, ordered by the identifier, together with the relations
+        that start at a node of the page and end at a matching node. Over all pages this are the same records as
+        returned by :py:meth:`get_records_by_filter`.
+        The default implementation pages the result of get_records_by_filter, so each page costs as much as the whole
+        result and the relations are part of the last page. Override this method to page in your database with
+        ``identifier > after ORDER BY identifier LIMIT limit``
+
+        :param attributes_dict: A filter dict with a conjunction of all values in the attributes_dict and metadata_dict
+        :type attributes_dict: dict
+        :param metadata_dict: A filter for the metadata with a conjunction of all values (also in the attributes_dict )
+        :type metadata_dict: dict
+        :param limit: The max number of nodes in the page
+        :type limit: int
+        :param after: The last identifier of the previous page, None for the first page
+        :type after: str
+        :param fields: The attribute keys of the records, the metadata contains only the PROJECTION_METADATA_KEYS.
+            Default to the whole records
+        :type fields: list(str or prov.model.QualifiedName)
+        :return: The nodes and relations of the page and the identifier of the last node if there are more pages
+        :rtype: DbPage
+        """
+        records = self.get_records_by_filter(attributes_dict, metadata_dict, fields=fields)
+        nodes = sorted((record for record in records if isinstance(record, DbRecord)),
+                       key=lambda record: str(record.metadata[METADATA_KEY_IDENTIFIER]))
+        if after is not None:
+            nodes = [record for record in nodes if str(record.metadata[METADATA_KEY_IDENTIFIER]) > after]
+
+        if len(nodes) > limit:
+            page = nodes[:limit]
+            return DbPage(page, str(page[-1].metadata[METADATA_KEY_IDENTIFIER]))
+        return DbPage(nodes + [record for record in records if not isinstance(record, DbRecord)], None)
+
+    def get_records_by_expression(self, expression):
+        """
+        Returns the nodes and relations that match a filter expression, see :py:mod:`provdbconnector.utils.filters`.
+        The default implementation filters all records, override this method to push the filter down to your
+        database
+
+        :param expression: The filter expression
+        :type expression: provdbconnector.utils.filters.FilterExpression
+        :return: list of relations and nodes
+        :rtype: list
+        """
+        # imported here, the serializer of the filters depends on this module
+        from provdbconnector.utils.filters import compile_predicate
+
+        predicate = compile_predicate(expression)
+        return [record for record in self.get_records_by_filter() if predicate(record.attributes, record.metadata)]
+
+    def count_records(self, expression=None):
+        """
+        Returns the number of nodes and relations that match a filter expression.
+        The default implementation counts the result of :py:meth:`get_records_by_expression`, override this method
+        to count in your database without reading the records
+
+        :param expression: The filter expression, None to count all records
+        :type expression: provdbconnector.utils.filters.FilterExpression
+        :return: The number of records
+        :rtype: int
+        """
+        if expression is None:
+            return len(self.get_records_by_filter(fields=list()))
+        return len(self.get_records_by_expression(expression))
+
+    def document_exists(self, document_id):
+        """
+        Check if a document or bundle with the id is saved, the records of a document have the metadata
+        `{document_id: True}`.
+        The default implementation reads the first page of the document nodes with ``limit=1``, override this method
+        if your database has an index of the metadata keys
+
+        :param document_id: The document id or bundle id
+        :type document_id: str
+        :return: True if at least one record of the document is saved
+        :rtype: bool
+        """
+        page = self.get_records_by_filter_page(metadata_dict={str(document_id): True}, limit=1, fields=list())
+        return len(page.records) > 0
+
+    def group_count_records(self, field, expression=None):
+        """
+        Returns the number of nodes and relations that match a filter expression for each value of a field.
+        The values are in the primitive representation (see
+        :py:func:`provdbconnector.utils.filters.get_field_value`) and the records without the field are counted with
+        the value None.
+        The default implementation counts the result of :py:meth:`get_records_by_expression`, override this method
+        to aggregate in your database
+
+        :param field: The field to group by, for example F("prov_type", metadata=True)
+        :type field: provdbconnector.utils.filters.F
+        :param expression: The filter expression, None to count all records
+        :type expression: provdbconnector.utils.filters.FilterExpression
+        :return: The number of records by the value of the field
+        :rtype: dict
+        """
+        # imported here, the serializer of the filters depends on this module
+        from provdbconnector.utils.filters import get_field_value
+
+        if expression is not None:
+            records = self.get_records_by_expression(expression)
+        elif not field.metadata:
+            records = self.get_records_by_filter(fields=[field.key])
+        elif field.key in PROJECTION_METADATA_KEYS:
+            records = self.get_records_by_filter(fields=list())
+        else:
+            records = self.get_records_by_filter()
+
+        counts = dict()
+        for record in records:
+            value = get_field_value(field, record.attributes, record.metadata)
+            counts[value] = counts.get(value, 0) + 1
+        return counts
+
+    def get_records_tail(self, attributes_dict=None, metadata_dict=None, depth=None, fields=None):
         """
         Returns all connected nodes and relations based on a filter.
         The filter is an AND combination and this describes the filter only for the origin nodes.
@@ -94,12 +255,106 @@ class BaseAdapter():
         :type metadata_dict: dict
         :param depth:
         :type depth: int
+        :param fields: The attribute keys of the records, the metadata contains only the PROJECTION_METADATA_KEYS.
+            Default to the whole records
+        :type fields: list(str or prov.model.QualifiedName)
         :return: a list of relations and nodes
         :rtype: list
         """
         raise NotImplementedError("Abstract method")
 
-    def get_bundle_records(self, bundle_identifier):
+    def get_lineage(self, identifier, direction=LINEAGE_UPSTREAM, relation_types=None, max_depth=None):
+        """
+        Returns the start node and all nodes and relations that are reachable in one direction.
+        Upstream follows the relations from their start node to their end node ("where did this come from"),
+        downstream from the end node to the start node ("what was derived from this").
+        The internal bundle associations are never traversed.
+
+        :param identifier: The identifier of the start node
+        :type identifier: str
+        :param direction: LINEAGE_UPSTREAM or LINEAGE_DOWNSTREAM
+        :type direction: str
+        :param relation_types: The prov types of the relations to follow, default to all relations
+        :type relation_types: list(prov.model.QualifiedName)
+        :param max_depth: The max number of relations between the start node and a result node, default to infinite
+        :type max_depth: int
+        :return: a list of relations and nodes, the first record is the start node
+        :rtype: list
+        :raise NotFoundException:
+        """
+        raise NotImplementedError("Abstract method")
+
+    def is_reachable(self, source, target, relation_types=None):
+        """
+        Check if there is a path from the source to the target node that follows the relations in their direction
+        (for example if the source was transitively derived from the target).
+        The default implementation searches the target in the upstream lineage of the source, override this method
+        if your database has a faster way
+
+        :param source: The identifier of the start node
+        :type source: str
+        :param target: The identifier of the end node
+        :type target: str
+        :param relation_types: The prov types of the relations to follow, default to all relations
+        :type relation_types: list(prov.model.QualifiedName)
+        :return: True if there is a path from the source to the target, a node is always reachable from itself
+        :rtype: bool
+        :raise NotFoundException: If the source node doesn't exist
+        """
+        records = self.get_lineage(source, LINEAGE_UPSTREAM, relation_types)
+        return any(str(record.metadata[METADATA_KEY_IDENTIFIER]) == str(target) for record in records)
+
+    def get_path(self, from_identifier, to_identifier, max_depth=None, relation_types=None, directed=True):
+        """
+        Returns a shortest path between two nodes.
+        A directed path follows the relations from their start node to their end node (upstream), an undirected path
+        follows the relations in both directions. The internal bundle associations are never traversed.
+
+        :param from_identifier: The identifier of the start node
+        :type from_identifier: str
+        :param to_identifier: The identifier of the end node
+        :type to_identifier: str
+        :param max_depth: The max number of relations in the path, default to infinite
+        :type max_depth: int
+        :param relation_types: The prov types of the relations to follow, default to all relations
+        :type relation_types: list(prov.model.QualifiedName)
+        :param directed: Follow the relations only in their direction
+        :type directed: bool
+        :return: The records in the order of the path (node, relation, node, ...) or an empty list if there is no path
+        :rtype: list
+        :raise NotFoundException: If one of the nodes doesn't exist
+        """
+        raise NotImplementedError("Abstract method")
+
+    def get_records_in_time_range(self, start, end, prov_types=None):
+        """
+        Returns the records with a prov:startTime / prov:endTime or prov:time that overlaps the time range, see
+        :py:func:`provdbconnector.utils.temporal.get_time_interval`.
+        The default implementation filters all records, override this method if your database has a time index
+
+        :param start: The start of the range, inclusive
+        :type start: datetime.datetime
+        :param end: The end of the range, inclusive
+        :type end: datetime.datetime
+        :param prov_types: The prov types of the records, default to all records
+        :type prov_types: list(prov.model.QualifiedName)
+        :return: a list of relations and nodes
+        :rtype: list
+        """
+        start = to_timestamp(start)
+        end = to_timestamp(end)
+        type_keys = None if prov_types is None else set(str(prov_type) for prov_type in prov_types)
+
+        records = list()
+        for record in self.get_records_by_filter():
+            if type_keys is not None and str(record.metadata[METADATA_KEY_PROV_TYPE]) not in type_keys:
+                continue
+            interval = get_time_interval(record.attributes)
+            if interval is not None and interval.start <= end and interval.end >= start:
+                records.append(record)
+        return records
+
+    def get_bundle_records(self, bundle_identifier, fields=None):
         """
         Returns the relations and nodes for a specific bundle identifier.
         Please use the bundle association to get all bundle nodes.
@@ -108,6 +363,9 @@ class BaseAdapter():
 
         :param bundle_identifier: The bundle identifier
         :type bundle_identifier: str
+        :param fields: The attribute keys of the records, the metadata contains only the PROJECTION_METADATA_KEYS.
+            Default to the whole records
+        :type fields: list(str or prov.model.QualifiedName)
         :return: list of nodes and bundles
         :rtype: list
         """
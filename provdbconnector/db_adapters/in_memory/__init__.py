@@ -1 +1,2 @@
 from provdbconnector.db_adapters.in_memory.simple_in_memory import SimpleInMemoryAdapter
+from provdbconnector.db_adapters.in_memory.compact_in_memory import CompactInMemoryAdapter
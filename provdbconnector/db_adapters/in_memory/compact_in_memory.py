@@ -0,0 +1,199 @@
+import logging
+import sys
+
+from prov.model import QualifiedName
+
+from provdbconnector.db_adapters.in_memory.simple_in_memory import SimpleInMemoryAdapter, StoreIndexes
+
+log = logging.getLogger(__name__)
+
+
+class CompactRecord(object):
+    """
+    Memory efficient node representation.
+    The keys of the attributes and metadata are stored as shared tuples, the values as tuples in the same order.
+    The record unpacks into (attributes, metadata) like the tuples of the SimpleInMemoryAdapter
+
+    """
+    __slots__ = ("attribute_keys", "attribute_values", "metadata_keys", "metadata_values")
+
+    def __init__(self, attribute_keys, attribute_values, metadata_keys, metadata_values):
+        self.attribute_keys = attribute_keys
+        self.attribute_values = attribute_values
+        self.metadata_keys = metadata_keys
+        self.metadata_values = metadata_values
+
+    @property
+    def attributes(self):
+        """
+        Returns a new attributes dict
+
+        :rtype: dict
+        """
+        return dict(zip(self.attribute_keys, self.attribute_values))
+
+    @property
+    def metadata(self):
+        """
+        Returns a new metadata dict
+
+        :rtype: dict
+        """
+        return dict(zip(self.metadata_keys, self.metadata_values))
+
+    def __iter__(self):
+        yield self.attributes
+        yield self.metadata
+
+
+class CompactRelation(CompactRecord):
+    """
+    Memory efficient relation representation, unpacks into (to_identifier, attributes, metadata)
+
+    """
+    __slots__ = ("to_node",)
+
+    def __init__(self, to_node, attribute_keys, attribute_values, metadata_keys, metadata_values):
+        super(CompactRelation, self).__init__(attribute_keys, attribute_values, metadata_keys, metadata_values)
+        self.to_node = to_node
+
+    def __iter__(self):
+        yield self.to_node
+        yield self.attributes
+        yield self.metadata
+
+
+class CompactStoreIndexes(StoreIndexes):
+    """
+    The indexes of the CompactInMemoryAdapter with the pools of the shared keys and values.
+    The pools are replaced together with the dicts (for example to clear the database), so they only keep the values
+    of the current records
+
+    """
+
+    def __init__(self, all_nodes, all_relations):
+        super(CompactStoreIndexes, self).__init__(all_nodes, all_relations)
+        self.key_tuples = dict()
+        """
+        Pool of the interned key tuples with the structure `((keys, key_strings), keys)`
+        """
+        self.shared_values = dict()
+        """
+        Pool of the deduplicated qualified names and metadata dicts with the structure `(value_key, value)`
+        """
+
+
+class CompactInMemoryAdapter(SimpleInMemoryAdapter):
+    """
+    In memory adapter with the same behaviour as the SimpleInMemoryAdapter but a compact storage format.
+
+    - Nodes and relations are stored as __slots__ objects instead of a tuple of dicts
+    - The key tuples are interned and shared between all records with the same keys
+    - Identifiers are interned strings
+    - Equal qualified names and metadata dicts (namespaces and type map) are deduplicated and shared between all
+      records, the pools are kept next to the dicts, see :py:class:`CompactStoreIndexes`
+
+    The shared dicts are never modified by the adapter, the merge creates new dicts for changed values.
+    Use this adapter for big datasets, the packing costs some cpu time for each read and write.
+
+    """
+    all_nodes = dict()
+    """
+    Contains all nodes as CompactRecord
+    """
+    all_relations = dict()
+    """
+    Contains all relation according to the following structure
+    `(start_identifier, (relation_id, CompactRelation))``
+    """
+
+    def _create_indexes(self):
+        """
+        Returns new indexes with empty pools for the current dicts
+
+        :rtype: CompactStoreIndexes
+        """
+        return CompactStoreIndexes(self.all_nodes, self.all_relations)
+
+    def _pack_node(self, attributes, metadata):
+        """
+        Returns the node as CompactRecord
+
+        :param attributes: The actual provenance data
+        :type attributes: dict
+        :param metadata: Some metadata that are not PROV-O related
+        :type metadata: dict
+        :return: The stored node
+        :rtype: CompactRecord
+        """
+        indexes = self._get_indexes()
+        (attribute_keys, attribute_values) = self._pack_dict(attributes, indexes)
+        (metadata_keys, metadata_values) = self._pack_dict(metadata, indexes)
+        return CompactRecord(attribute_keys, attribute_values, metadata_keys, metadata_values)
+
+    def _pack_relation(self, to_node, attributes, metadata):
+        """
+        Returns the relation as CompactRelation
+
+        :param to_node: The identifier for the end node
+        :type to_node: str
+        :param attributes: The actual provenance data
+        :type attributes: dict
+        :param metadata: Some metadata that are not PROV-O related
+        :type metadata: dict
+        :return: The stored relation
+        :rtype: CompactRelation
+        """
+        indexes = self._get_indexes()
+        (attribute_keys, attribute_values) = self._pack_dict(attributes, indexes)
+        (metadata_keys, metadata_values) = self._pack_dict(metadata, indexes)
+        return CompactRelation(sys.intern(str(to_node)), attribute_keys, attribute_values, metadata_keys,
+                               metadata_values)
+
+    def _pack_dict(self, values, indexes):
+        """
+        Split the dict into a shared key tuple and a value tuple
+
+        :param values: The attributes or metadata
+        :type values: dict
+        :param indexes: The indexes with the pools
+        :type indexes: CompactStoreIndexes
+        :return: Tuple with (keys, values)
+        :rtype: tuple
+        """
+        keys = tuple(values.keys())
+
+        # QualifiedNames with the same uri are equal, so the prefix must be part of the pool key
+        keys = indexes.key_tuples.setdefault((keys, tuple(map(str, keys))), keys)
+        return keys, tuple(self._share_value(value, indexes.shared_values) for value in values.values())
+
+    @staticmethod
+    def _share_value(value, shared_values):
+        """
+        Returns a shared instance for qualified names and dicts of strings (namespaces and type map),
+        other values are returned as they are. Strings are interned, because the same identifiers are used in many
+        records
+
+        :param value: The attribute or metadata value
+        :param shared_values: The pool of the shared values
+        :type shared_values: dict
+        :return: The shared value
+        """
+        value_type = type(value)
+        if value_type is str:
+            return sys.intern(value)
+        elif value_type is QualifiedName:
+            key = (value_type, str(value), value.uri)
+        elif value_type is dict:
+            if not all(type(item_key) is str and type(item) is str for (item_key, item) in value.items()):
+                return value
+            key = (value_type, frozenset(value.items()))
+        else:
+            return value
+
+        shared_value = shared_values.get(key)
+        if shared_value is None:
+            # copy dicts, the caller could modify the original
+            shared_value = dict(value) if value_type is dict else value
+            shared_values[key] = shared_value
+        return shared_value
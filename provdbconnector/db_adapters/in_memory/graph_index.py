@@ -0,0 +1,237 @@
+from array import array
+
+# Minimum number of edges in the delta buffer before the adjacency is compacted
+COMPACTION_MIN_DELTA = 1024
+
+
+class CsrAdjacency(object):
+    """
+    Adjacency list of one edge direction in the compressed sparse row (CSR) format.
+
+    The neighbours of the node ``n`` are ``targets[offsets[n]:offsets[n + 1]]`` and the ids of the connecting edges are
+    stored at the same positions in ``edges``. New edges are collected in a delta buffer and merged into the CSR
+    arrays by :py:meth:`compact`.
+
+    """
+
+    def __init__(self):
+        self.offsets = array("q", [0])
+        """
+        Start position of the neighbours for each node id, the last entry is the number of edges
+        """
+        self.targets = array("q")
+        """
+        The neighbour node ids
+        """
+        self.edges = array("q")
+        """
+        The edge ids in the same order as the targets
+        """
+        self.delta = dict()
+        """
+        New edges since the last compaction with the structure `(node_id, array([target, edge, target, edge, ...]))`
+        """
+        self.delta_size = 0
+
+    def add(self, source, target, edge):
+        """
+        Add an edge to the delta buffer
+
+        :param source: The start node id
+        :type source: int
+        :param target: The end node id
+        :type target: int
+        :param edge: The edge id
+        :type edge: int
+        """
+        neighbours = self.delta.get(source)
+        if neighbours is None:
+            neighbours = array("q")
+            self.delta[source] = neighbours
+        neighbours.append(target)
+        neighbours.append(edge)
+        self.delta_size += 1
+
+    def neighbours(self, source):
+        """
+        Returns the neighbours of the node in insert order
+
+        :param source: The node id
+        :type source: int
+        :return: Generator of (target, edge) tuples
+        :rtype: generator
+        """
+        offsets = self.offsets
+        if source < len(offsets) - 1:
+            targets = self.targets
+            edges = self.edges
+            for position in range(offsets[source], offsets[source + 1]):
+                yield targets[position], edges[position]
+
+        neighbours = self.delta.get(source)
+        if neighbours is not None:
+            for position in range(0, len(neighbours), 2):
+                yield neighbours[position], neighbours[position + 1]
+
+    def needs_compaction(self):
+        """
+        Returns true if the delta buffer is big compared to the CSR arrays
+
+        :rtype: bool
+        """
+        return self.delta_size > max(COMPACTION_MIN_DELTA, len(self.targets) // 2)
+
+    def compact(self, node_count, is_alive=None):
+        """
+        Merge the delta buffer into the CSR arrays
+
+        :param node_count: The number of node ids
+        :type node_count: int
+        :param is_alive: Optional function (source, edge) -> bool, edges that are not alive are removed
+        :type is_alive: function
+        """
+        offsets = array("q", [0])
+        targets = array("q")
+        edges = array("q")
+
+        for source in range(node_count):
+            for (target, edge) in self.neighbours(source):
+                if is_alive is None or is_alive(source, edge):
+                    targets.append(target)
+                    edges.append(edge)
+            offsets.append(len(targets))
+
+        self.offsets = offsets
+        self.targets = targets
+        self.edges = edges
+        self.delta = dict()
+        self.delta_size = 0
+
+
+class GraphIndex(object):
+    """
+    Graph structure of the relations with dense integer ids for the nodes and edges.
+    The identifiers are interned once, the outgoing and incoming edges are stored as :py:class:`CsrAdjacency`
+
+    The index is kept in addition to the relation dicts of the adapter, which stay the primary storage. It speeds up
+    the traversals but it does not reduce the memory of the stored relations.
+
+    """
+
+    def __init__(self):
+        self.node_ids = dict()
+        """
+        Interned node identifiers with the structure `(identifier, node_id)`
+        """
+        self.node_names = list()
+        """
+        The node identifiers by node id
+        """
+        self.edge_names = list()
+        """
+        The relation ids by edge id
+        """
+        self.edge_sources = array("q")
+        """
+        The start node id by edge id
+        """
+        self.outgoing = CsrAdjacency()
+        self.incoming = CsrAdjacency()
+
+    def get_node_id(self, identifier):
+        """
+        Returns the integer id of the node identifier, the id is created if necessary
+
+        :param identifier: The node identifier
+        :type identifier: str
+        :return: The node id
+        :rtype: int
+        """
+        node_id = self.node_ids.get(identifier)
+        if node_id is None:
+            node_id = len(self.node_names)
+            self.node_ids[identifier] = node_id
+            self.node_names.append(identifier)
+        return node_id
+
+    def add_edge(self, from_identifier, to_identifier, relation_id):
+        """
+        Add a relation to the graph
+
+        :param from_identifier: The start node identifier
+        :type from_identifier: str
+        :param to_identifier: The end node identifier
+        :type to_identifier: str
+        :param relation_id: The id of the relation
+        :type relation_id: str
+        :return: The edge id
+        :rtype: int
+        """
+        source = self.get_node_id(from_identifier)
+        target = self.get_node_id(to_identifier)
+
+        edge = len(self.edge_names)
+        self.edge_names.append(relation_id)
+        self.edge_sources.append(source)
+
+        self.outgoing.add(source, target, edge)
+        self.incoming.add(target, source, edge)
+        return edge
+
+    def successors(self, node_id):
+        """
+        Returns the outgoing edges of the node
+
+        :param node_id: The node id
+        :type node_id: int
+        :return: Generator of (target, edge) tuples
+        :rtype: generator
+        """
+        return self.outgoing.neighbours(node_id)
+
+    def predecessors(self, node_id):
+        """
+        Returns the incoming edges of the node
+
+        :param node_id: The node id
+        :type node_id: int
+        :return: Generator of (source, edge) tuples
+        :rtype: generator
+        """
+        return self.incoming.neighbours(node_id)
+
+    def needs_compaction(self):
+        """
+        Returns true if one of the delta buffers should be compacted
+
+        :rtype: bool
+        """
+        return self.outgoing.needs_compaction() or self.incoming.needs_compaction()
+
+    def compact(self, is_alive=None):
+        """
+        Merge the delta buffers into the CSR arrays
+
+        :param is_alive: Optional function (from_identifier, relation_id) -> bool, dead edges are removed
+        :type is_alive: function
+        """
+        edge_is_alive = None
+        if is_alive is not None:
+            node_names = self.node_names
+            edge_names = self.edge_names
+            edge_sources = self.edge_sources
+            alive_edges = set()
+            for edge in range(len(edge_names)):
+                if edge_names[edge] is None:
+                    continue
+                if is_alive(node_names[edge_sources[edge]], edge_names[edge]):
+                    alive_edges.add(edge)
+                else:
+                    # release the relation id of removed edges
+                    edge_names[edge] = None
+
+            def edge_is_alive(node, edge):
+                return edge in alive_edges
+
+        self.outgoing.compact(len(self.node_names), edge_is_alive)
+        self.incoming.compact(len(self.node_names), edge_is_alive)
@@ -0,0 +1,148 @@
+from provdbconnector.db_adapters.baseadapter import PROJECTION_METADATA_KEYS
+
+
+class MembershipIndex(object):
+    """
+    Index of the nodes and relations by the keys of their metadata, for example the document and bundle ids that are
+    saved as `{document_id: True}` in the metadata of each record of the document.
+
+    The keys that each record has (identifier, prov type, namespaces ...) are not indexed, for all other keys the
+    index contains the records that have the key, so the number of records of a document is the size of a set and
+    the records of a document are found without a scan. The index keeps one set entry for each record and key.
+
+    """
+
+    def __init__(self):
+        """
+        Create an empty index
+
+        """
+        self.nodes = dict()
+        """
+        The identifiers of the nodes with the structure `(metadata_key, set(identifier))`
+        """
+        self.relations = dict()
+        """
+        The ids of the relations with the structure `(metadata_key, set(relation_id))`
+        """
+
+    @staticmethod
+    def is_indexed(key):
+        """
+        Check if the records with the metadata key are in the index
+
+        :param key: The metadata key
+        :type key: str
+        :rtype: bool
+        """
+        return str(key) not in PROJECTION_METADATA_KEYS
+
+    def add_node(self, identifier, metadata):
+        """
+        Add a saved or merged node for all indexed keys of the metadata
+
+        :param identifier: The identifier of the node
+        :type identifier: str
+        :param metadata: The metadata of the node
+        :type metadata: dict
+        """
+        self._add(self.nodes, identifier, metadata)
+
+    def remove_node(self, identifier, metadata):
+        """
+        Remove a deleted node
+
+        :param identifier: The identifier of the node
+        :type identifier: str
+        :param metadata: The metadata of the node
+        :type metadata: dict
+        """
+        self._remove(self.nodes, identifier, metadata)
+
+    def add_relation(self, relation_id, metadata):
+        """
+        Add a saved or merged relation for all indexed keys of the metadata
+
+        :param relation_id: The id of the relation
+        :type relation_id: str
+        :param metadata: The metadata of the relation
+        :type metadata: dict
+        """
+        self._add(self.relations, relation_id, metadata)
+
+    def remove_relation(self, relation_id, metadata):
+        """
+        Remove a deleted relation
+
+        :param relation_id: The id of the relation
+        :type relation_id: str
+        :param metadata: The metadata of the relation
+        :type metadata: dict
+        """
+        self._remove(self.relations, relation_id, metadata)
+
+    def count(self, key):
+        """
+        Returns the number of nodes and relations with the metadata key
+
+        :param key: An indexed metadata key
+        :type key: str
+        :rtype: int
+        """
+        return len(self.nodes.get(key, ())) + len(self.relations.get(key, ()))
+
+    def get_nodes(self, key):
+        """
+        Returns the identifiers of the nodes with the metadata key
+
+        :param key: An indexed metadata key
+        :type key: str
+        :rtype: set
+        """
+        return self.nodes.get(key, frozenset())
+
+    def get_relations(self, key):
+        """
+        Returns the ids of the relations with the metadata key
+
+        :param key: An indexed metadata key
+        :type key: str
+        :rtype: set
+        """
+        return self.relations.get(key, frozenset())
+
+    def _add(self, members, record_key, metadata):
+        """
+        Add the record to the sets of the indexed metadata keys
+
+        :param members: The nodes or relations dict of the index
+        :type members: dict
+        :param record_key: The identifier or relation id
+        :type record_key: str
+        :param metadata: The metadata of the record
+        :type metadata: dict
+        """
+        for key in metadata.keys():
+            if self.is_indexed(key):
+                members.setdefault(str(key), set()).add(record_key)
+
+    def _remove(self, members, record_key, metadata):
+        """
+        Remove the record from the sets of the indexed metadata keys, empty sets are removed
+
+        :param members: The nodes or relations dict of the index
+        :type members: dict
+        :param record_key: The identifier or relation id
+        :type record_key: str
+        :param metadata: The metadata of the record
+        :type metadata: dict
+        """
+        for key in metadata.keys():
+            if not self.is_indexed(key):
+                continue
+            records = members.get(str(key))
+            if records is None:
+                continue
+            records.discard(record_key)
+            if len(records) == 0:
+                del members[str(key)]
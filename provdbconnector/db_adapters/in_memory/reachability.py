@@ -0,0 +1,267 @@
+from array import array
+
+# Position of the nodes that are not connected by an indexed relation yet
+NO_POSITION = -2 ** 63
+
+# Type code of the edges that are not part of the index (bundle associations, deleted relations)
+NOT_INDEXED = -1
+
+
+class ReachabilityIndex(object):
+    """
+    Incremental reachability labels for the edges of a :py:class:`GraphIndex`.
+
+    The strongly connected components are merged into one node (union find) and the components are kept in a
+    topological order, each edge goes from a lower to a higher position. The order is maintained on each new edge with
+    the dynamic topological sort of Pearce and Kelly, which only reorders the components between the positions of the
+    two end nodes. A cycle found during the reorder is merged into one component.
+
+    With these labels a query is answered in constant time if both nodes are in the same component or if the position
+    of the target is lower than the position of the source. Otherwise the depth first search is restricted to the
+    components between the two positions.
+
+    """
+
+    def __init__(self, graph):
+        """
+        Create an empty index, the edges are added with :py:meth:`add_edge`
+
+        :param graph: The graph with the adjacency of the edges
+        :type graph: GraphIndex
+        """
+        self.graph = graph
+        self.edge_types = array("h")
+        """
+        The type code by edge id, NOT_INDEXED for edges that are not part of the index
+        """
+        self.type_codes = dict()
+        """
+        The type codes with the structure `(prov_type, code)`
+        """
+        self.parent = array("q")
+        """
+        Union find forest of the components by node id
+        """
+        self.position = array("q")
+        """
+        The topological position by node id, only valid for the representative node of a component
+        """
+        self.members = dict()
+        """
+        The member node ids of the merged components with the structure `(representative, list(node_id))`
+        """
+        self._min_position = 0
+        self._max_position = -1
+
+    def find(self, node_id):
+        """
+        Returns the representative node of the component
+
+        :param node_id: The node id
+        :type node_id: int
+        :return: The node id of the representative
+        :rtype: int
+        """
+        parent = self.parent
+        while parent[node_id] != node_id:
+            parent[node_id] = parent[parent[node_id]]
+            node_id = parent[node_id]
+        return node_id
+
+    def add_edge(self, source, target, edge, prov_type):
+        """
+        Add an edge of the graph to the index and update the topological order
+
+        :param source: The start node id
+        :type source: int
+        :param target: The end node id
+        :type target: int
+        :param edge: The edge id
+        :type edge: int
+        :param prov_type: The prov type of the relation, None if the edge should not be indexed
+        :type prov_type: prov.model.QualifiedName or str
+        """
+        edge_types = self.edge_types
+        while len(edge_types) <= edge:
+            edge_types.append(NOT_INDEXED)
+        if prov_type is None:
+            return
+        edge_types[edge] = self.type_codes.setdefault(str(prov_type), len(self.type_codes))
+
+        parent = self.parent
+        position = self.position
+        while len(parent) <= max(source, target):
+            parent.append(len(parent))
+            position.append(NO_POSITION)
+
+        # a node without edges can be placed anywhere, so a new start node goes before and a new end node after
+        # all other nodes
+        if position[source] == NO_POSITION:
+            self._min_position -= 1
+            position[source] = self._min_position
+        if position[target] == NO_POSITION:
+            self._max_position += 1
+            position[target] = self._max_position
+
+        source_component = self.find(source)
+        target_component = self.find(target)
+        if source_component == target_component or position[source_component] < position[target_component]:
+            return
+        self._reorder(source_component, target_component)
+
+    def _get_members(self, component):
+        """
+        Returns the node ids of a component
+
+        :param component: The representative node id
+        :type component: int
+        :rtype: list
+        """
+        return self.members.get(component, (component,))
+
+    def _search(self, start, bound, forward):
+        """
+        Returns the components that are reachable from the start component inside the affected region
+
+        :param start: The start component
+        :type start: int
+        :param bound: The max position for the forward search, the min position for the backward search
+        :type bound: int
+        :param forward: Follow the edges forward or backward
+        :type forward: bool
+        :return: The visited components
+        :rtype: set
+        """
+        graph = self.graph
+        get_neighbours = graph.successors if forward else graph.predecessors
+        edge_types = self.edge_types
+        edge_count = len(edge_types)
+        position = self.position
+
+        visited = {start}
+        stack = [start]
+        while len(stack) > 0:
+            for node_id in self._get_members(stack.pop()):
+                for (other_id, edge) in get_neighbours(node_id):
+                    if edge >= edge_count or edge_types[edge] == NOT_INDEXED:
+                        continue
+                    component = self.find(other_id)
+                    if component in visited:
+                        continue
+                    if (position[component] > bound) if forward else (position[component] < bound):
+                        continue
+                    visited.add(component)
+                    stack.append(component)
+        return visited
+
+    def _reorder(self, source_component, target_component):
+        """
+        Restore the topological order after a new edge from a higher to a lower position.
+        The components that are reachable from the target and the components that reach the source are moved, the
+        ones that reach the source get the lower positions of the affected region.
+
+        :param source_component: The component of the start node
+        :type source_component: int
+        :param target_component: The component of the end node
+        :type target_component: int
+        """
+        position = self.position
+        forward = self._search(target_component, position[source_component], True)
+        backward = self._search(source_component, position[target_component], False)
+
+        cycle = forward & backward
+        positions = sorted(position[component] for component in forward | backward)
+
+        forward = sorted(forward - cycle, key=position.__getitem__)
+        backward = sorted(backward - cycle, key=position.__getitem__)
+
+        for (component, new_position) in zip(backward, positions):
+            position[component] = new_position
+        for (component, new_position) in zip(reversed(forward), reversed(positions)):
+            position[component] = new_position
+
+        if len(cycle) > 0:
+            # the new edge closes a cycle, all components on it are merged between the moved components
+            representative = self._merge(cycle)
+            position[representative] = positions[len(backward)]
+
+    def _merge(self, components):
+        """
+        Merge components into one
+
+        :param components: The representative node ids
+        :type components: set
+        :return: The representative of the merged component
+        :rtype: int
+        """
+        representative = min(components)
+        members = list()
+        for component in components:
+            members.extend(self.members.pop(component, (component,)))
+            self.parent[component] = representative
+        self.members[representative] = members
+        return representative
+
+    def is_reachable(self, source, target, prov_types=None):
+        """
+        Check if there is a path of indexed edges from the source to the target node
+
+        :param source: The start node id
+        :type source: int
+        :param target: The end node id
+        :type target: int
+        :param prov_types: Only follow edges of these prov types, default to all indexed edges
+        :type prov_types: list
+        :return: True if the target is reachable, a node is always reachable from itself
+        :rtype: bool
+        """
+        if source == target:
+            return True
+        if max(source, target) >= len(self.parent):
+            return False
+
+        position = self.position
+        source_component = self.find(source)
+        target_component = self.find(target)
+        if position[source_component] == NO_POSITION or position[target_component] == NO_POSITION:
+            return False
+
+        type_codes = None
+        if prov_types is not None:
+            type_codes = set(self.type_codes[str(prov_type)] for prov_type in prov_types if
+                             str(prov_type) in self.type_codes)
+            if len(type_codes) == 0:
+                return False
+        elif source_component == target_component:
+            return True
+
+        # each node on a path between the two nodes is between them in the topological order
+        upper_bound = position[target_component]
+        if position[source_component] > upper_bound:
+            return False
+
+        graph = self.graph
+        edge_types = self.edge_types
+        edge_count = len(edge_types)
+
+        visited = {source}
+        stack = [source]
+        while len(stack) > 0:
+            for (other_id, edge) in graph.successors(stack.pop()):
+                if edge >= edge_count:
+                    continue
+                edge_type = edge_types[edge]
+                if edge_type == NOT_INDEXED or (type_codes is not None and edge_type not in type_codes):
+                    continue
+                if other_id == target:
+                    return True
+                if other_id in visited:
+                    continue
+                component = self.find(other_id)
+                if type_codes is None and component == target_component:
+                    return True
+                if position[component] > upper_bound:
+                    continue
+                visited.add(other_id)
+                stack.append(other_id)
+        return False
@@ -1,15 +1,108 @@
 import logging
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter
 from uuid import uuid4
 
 from prov.constants import PROV_ASSOCIATION, PROV_TYPE, PROV_MENTION
-from provdbconnector.db_adapters.baseadapter import BaseAdapter, DbRecord, DbRelation, METADATA_KEY_IDENTIFIER, \
-    METADATA_KEY_PROV_TYPE
+from prov.model import PROV_REC_CLS, ProvRelation
+from provdbconnector.db_adapters.baseadapter import BaseAdapter, DbRecord, DbRelation, DbPage, \
+    METADATA_KEY_IDENTIFIER, METADATA_KEY_PROV_TYPE, LINEAGE_UPSTREAM
+from provdbconnector.db_adapters.in_memory.graph_index import GraphIndex
+from provdbconnector.db_adapters.in_memory.membership_index import MembershipIndex
+from provdbconnector.db_adapters.in_memory.reachability import ReachabilityIndex
+from provdbconnector.db_adapters.in_memory.temporal_index import TemporalIndex
+from provdbconnector.db_adapters.in_memory.snapshot import write_snapshot, read_snapshot
+from provdbconnector.db_adapters.in_memory.wal import WriteAheadLog, read_log, FSYNC_BATCH, FSYNC_POLICIES, \
+    WAL_SAVE_ELEMENT, WAL_SAVE_RELATION, WAL_DELETE_RECORD, WAL_DELETE_RELATION, WAL_DELETE_RECORDS_BY_FILTER
 from provdbconnector.exceptions.database import InvalidOptionsException, NotFoundException
 from provdbconnector.utils.serializer import encode_dict_values_to_primitive, split_into_formal_and_other_attributes, \
-    merge_record
+    merge_record, get_formal_attributes_key, get_projection, encode_projected_record
+from provdbconnector.utils.filters import compile_predicate, get_equality_candidates, get_field_value, \
+    get_group_key, get_required_keys, Comparison, OPERATOR_EXISTS
+from provdbconnector.utils.temporal import get_time_interval, to_timestamp
+from provdbconnector.utils.traversal import find_shortest_path, SearchPath
 
 log = logging.getLogger(__name__)
 
+# Supported options of the connect function for the write ahead log
+WAL_OPTIONS = ("wal_path", "snapshot_path", "fsync", "group_commit_size", "group_commit_interval", "compaction_size")
+
+# Supported options of the connect function for the indexes
+INDEX_OPTIONS = ("reachability_index",)
+
+# The prov types of the relations as text, to skip the nodes or relations for a filter expression
+RELATION_TYPE_KEYS = frozenset(str(prov_type) for (prov_type, cls) in PROV_REC_CLS.items() if
+                               issubclass(cls, ProvRelation))
+
+
+class StoreIndexes(object):
+    """
+    The indexes of one pair of nodes and relations dicts.
+
+    The indexes are stored at the same level as the dicts (see :py:meth:`SimpleInMemoryAdapter._get_indexes`), so all
+    adapters that share the dicts, for example the class level dicts, also share the indexes and each change of one
+    adapter is visible for the others. The indexes are built on the first access.
+
+    """
+
+    def __init__(self, all_nodes, all_relations):
+        self.all_nodes = all_nodes
+        """
+        The nodes dict of the indexes
+        """
+        self.all_relations = all_relations
+        """
+        The relations dict of the indexes
+        """
+        self.relation_index = None
+        """
+        Relation index with the structure `((from_identifier, to_identifier, prov_type, formal_attributes), relation_id)`
+        """
+        self.relation_keys = None
+        """
+        Reverse relation index with the structure `(relation_id, (from_identifier, to_identifier, prov_type, formal_attributes))`
+        """
+        self.relation_types = None
+        """
+        The ids of the relations by the prov type with the structure `(prov_type, set(relation_id))`, updated with the
+        relation index
+        """
+        self.graph = None
+        """
+        Adjacency of all relations with integer node ids, used for the traversals. Built and updated together with the
+        relation index
+        """
+        self.reachability = None
+        """
+        The reachability index of the graph, built by the first adapter that uses it and then updated on each saved
+        relation. None if it must be rebuilt before the next query
+        """
+        self.temporal = None
+        """
+        The temporal index, built on the first time range query and then updated on each save
+        """
+        self.sorted_identifiers = None
+        """
+        The identifiers of all nodes in sorted order for the paged queries, built on the first page and then updated
+        with the new identifiers before the next page. It can contain the identifiers of deleted nodes
+        """
+        self.new_identifiers = set()
+        """
+        The identifiers of the nodes that were saved after the sorted identifiers were built or updated
+        """
+        self.node_types = None
+        """
+        The identifiers of the nodes by the prov type with the structure `(prov_type, set(identifier))`, built on the
+        first group count or filter by the prov type and then updated on each saved, merged or deleted node
+        """
+        self.membership = None
+        """
+        The records by their metadata keys, for example the document ids. Built on the first count or filter of a
+        document and then updated on each save and delete
+        """
+
 
 class SimpleInMemoryAdapter(BaseAdapter):
     """
@@ -40,23 +133,257 @@ class SimpleInMemoryAdapter(BaseAdapter):
         :param args:
         """
         super(SimpleInMemoryAdapter, self).__init__()
-        pass
+        self._reachability_enabled = False
+
+        self._wal = None
+        """
+        The write ahead log, only if the adapter is connected with the wal_path option
+        """
+        self._snapshot_path = None
+        self._snapshot_sequence = 0
+        """
+        The sequence number of the last log entry in the loaded snapshot, 0 if it is not a snapshot of the log
+        compaction
+        """
+        self._compaction_size = None
+        self._compaction = None
 
     def connect(self, authentication_info):
         """
         This function setups your database connection (auth / service discover)
 
-        :param authentication_info: The info to connect to the db
+        Without options the adapter keeps the records only in memory. With the ``wal_path`` option each change is
+        written into a write ahead log and the records are restored from the log (and the compacted snapshot) on
+        connect:
+
+        .. code:: python
+
+            prov_api = ProvDb(adapter=SimpleInMemoryAdapter, auth_info={"wal_path": "/var/lib/prov/prov.wal"})
+
+        - wal_path: The path of the log file
+        - snapshot_path: The path of the snapshot for the log compaction, default to `wal_path + ".snapshot"`
+        - fsync: The fsync policy: "always", "batch" (default, once per group commit) or "never"
+        - group_commit_size: Max number of log entries in one group commit, default 128
+        - group_commit_interval: Max seconds until an entry is committed, default 0.01
+        - compaction_size: Start the log compaction in the background if the log file is bigger than this number of
+          bytes, default no automatic compaction
+
+        The option ``reachability_index`` enables the index for :py:meth:`is_reachable`, also without the log.
+
+        :param authentication_info: None or the write ahead log and index options
         :type authentication_info: dict or None
         :return: The result of the connection attempt
         :rtype: Bool
         """
 
-        if authentication_info is not None:
-            raise InvalidOptionsException()
+        if authentication_info is None:
+            return True
+
+        if not isinstance(authentication_info, dict):
+            raise InvalidOptionsException("Only the options {} are supported".format(WAL_OPTIONS + INDEX_OPTIONS))
+
+        unknown_options = set(authentication_info.keys()) - set(WAL_OPTIONS) - set(INDEX_OPTIONS)
+        if len(unknown_options) > 0:
+            raise InvalidOptionsException("Unknown options {}".format(sorted(unknown_options)))
+
+        wal_options = {key: value for (key, value) in authentication_info.items() if key in WAL_OPTIONS}
+        if len(wal_options) > 0 and "wal_path" not in wal_options:
+            raise InvalidOptionsException("The write ahead log options {} require the wal_path".format(WAL_OPTIONS))
+
+        if wal_options.get("fsync", FSYNC_BATCH) not in FSYNC_POLICIES:
+            raise InvalidOptionsException("The fsync policy must be one of {}".format(FSYNC_POLICIES))
+
+        if authentication_info.get("reachability_index", False):
+            self.enable_reachability_index()
+
+        if len(wal_options) > 0:
+            self._open_wal(**wal_options)
+        return True
+
+    def enable_reachability_index(self):
+        """
+        Maintain a reachability index on each saved relation, see :py:meth:`is_reachable`.
+        The index is built from the existing relations, after a deleted relation it is rebuilt on the next query.
+
+        """
+        self._reachability_enabled = True
+        self._get_reachability_index()
+
+    def _open_wal(self, wal_path, snapshot_path=None, fsync=FSYNC_BATCH, group_commit_size=128,
+                  group_commit_interval=0.01, compaction_size=None):
+        """
+        Restore the records from the snapshot and the log files and open the log for new entries
+
+        :param wal_path: The path of the log file
+        :type wal_path: str
+        :param snapshot_path: The path of the snapshot
+        :type snapshot_path: str
+        :param fsync: The fsync policy
+        :type fsync: str
+        :param group_commit_size: Max number of log entries in one group commit
+        :type group_commit_size: int
+        :param group_commit_interval: Max seconds until an entry is committed
+        :type group_commit_interval: float
+        :param compaction_size: Log size in bytes for the automatic compaction
+        :type compaction_size: int
+        """
+        self.close()
+
+        if snapshot_path is None:
+            snapshot_path = wal_path + ".snapshot"
+        rotated_path = self._get_rotated_wal_path(wal_path)
+
+        self.all_nodes = dict()
+        self.all_relations = dict()
+        self._snapshot_sequence = 0
+        if os.path.exists(snapshot_path):
+            self.load_snapshot(snapshot_path)
+
+        # the rotated log and the log can be older than the snapshot (if the compaction was interrupted before they
+        # were removed or truncated), skip the entries that the snapshot already contains
+        sequence = self._snapshot_sequence
+        for path in (rotated_path, wal_path):
+            if not os.path.exists(path):
+                continue
+            log_content = read_log(path)
+            for log_entry in log_content.entries:
+                if log_entry.sequence > self._snapshot_sequence:
+                    self._replay_log_entry(log_entry.entry)
+                sequence = max(sequence, log_entry.sequence)
+            if log_content.valid_length < os.path.getsize(path):
+                # remove the broken end of the log, otherwise new entries would be appended after it
+                os.truncate(path, log_content.valid_length)
+
+        if os.path.exists(rotated_path):
+            # the last compaction was interrupted, finish it before new entries are written
+            if self._write_compacted_snapshot(snapshot_path, rotated_path, self.all_nodes, self.all_relations,
+                                              sequence):
+                os.truncate(wal_path, 0)
+
+        self._snapshot_path = snapshot_path
+        self._compaction_size = compaction_size
+        self._wal = WriteAheadLog(wal_path, fsync=fsync, group_commit_size=group_commit_size,
+                                  group_commit_interval=group_commit_interval, sequence=sequence)
+
+    @staticmethod
+    def _get_rotated_wal_path(wal_path):
+        """
+        Returns the path of the log file during the log compaction
+
+        :param wal_path: The path of the log file
+        :type wal_path: str
+        :return: The path
+        :rtype: str
+        """
+        return wal_path + ".compacting"
+
+    def _replay_log_entry(self, entry):
+        """
+        Apply a log entry, the entries that are already part of the snapshot are skipped by :py:meth:`_open_wal`
+
+        :param entry: The log entry
+        :type entry: tuple
+        """
+        entry_type = entry[0]
+        try:
+            if entry_type == WAL_SAVE_ELEMENT:
+                self.save_element(*entry[1:])
+            elif entry_type == WAL_SAVE_RELATION:
+                self._save_relation(*entry[1:])
+            elif entry_type == WAL_DELETE_RECORD:
+                self.delete_record(*entry[1:])
+            elif entry_type == WAL_DELETE_RELATION:
+                self.delete_relation(*entry[1:])
+            elif entry_type == WAL_DELETE_RECORDS_BY_FILTER:
+                self.delete_records_by_filter(*entry[1:])
+            else:
+                log.warning("Ignore unknown log entry {}".format(entry_type))
+        except NotFoundException:
+            # the record was already deleted in the snapshot
+            pass
+
+    def _log(self, entry):
+        """
+        Append the entry to the write ahead log and start the compaction if necessary
+
+        :param entry: The log entry
+        :type entry: tuple
+        """
+        self._wal.append(entry)
+        if self._compaction_size is not None and self._wal.size >= self._compaction_size:
+            self.compact_log()
 
+    def compact_log(self, wait=False):
+        """
+        Replace the write ahead log with a snapshot of all records.
+        The log is rotated directly, the snapshot is written in a background thread.
+
+        :param wait: Wait until the snapshot is written
+        :type wait: bool
+        """
+        if self._wal is None:
+            return
+
+        if self._compaction is None or not self._compaction.is_alive():
+            rotated_path = self._get_rotated_wal_path(self._wal.path)
+
+            # if a failed compaction left a rotated log, keep it, the new snapshot contains all records anyway
+            if not os.path.exists(rotated_path):
+                self._wal.rotate(rotated_path)
+
+            # copy the containers, the records itself are not modified in place
+            all_nodes = dict(self.all_nodes.items())
+            all_relations = {identifier: dict(relations) for (identifier, relations) in self.all_relations.items()}
+
+            self._compaction = threading.Thread(target=self._write_compacted_snapshot, name="wal-compaction",
+                                                args=(self._snapshot_path, rotated_path, all_nodes, all_relations,
+                                                      self._wal.sequence),
+                                                daemon=True)
+            self._compaction.start()
+
+        if wait:
+            self._compaction.join()
+
+    @staticmethod
+    def _write_compacted_snapshot(snapshot_path, rotated_path, all_nodes, all_relations, sequence):
+        """
+        Write the snapshot and remove the rotated log
+
+        :param snapshot_path: The path of the snapshot
+        :type snapshot_path: str
+        :param rotated_path: The path of the rotated log
+        :type rotated_path: str
+        :param all_nodes: The nodes
+        :type all_nodes: dict
+        :param all_relations: The relations
+        :type all_relations: dict
+        :param sequence: The sequence number of the last log entry that is contained in the records
+        :type sequence: int
+        :return: True if the snapshot was written, False if the logs must be kept
+        :rtype: bool
+        """
+        try:
+            # without indexes, they are rebuilt on load
+            write_snapshot(snapshot_path, all_nodes, all_relations, {"log_sequence": sequence})
+            os.remove(rotated_path)
+        except OSError:
+            log.exception("The log compaction failed, the log {} is kept".format(rotated_path))
+            return False
         return True
 
+    def close(self):
+        """
+        Commit and close the write ahead log, the records stay in memory
+
+        """
+        if self._compaction is not None:
+            self._compaction.join()
+            self._compaction = None
+
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None
+
     def save_element(self, attributes, metadata):
         """
         Store a single node in the database and if necessary and possible merge the node
@@ -69,31 +396,72 @@ class SimpleInMemoryAdapter(BaseAdapter):
         :rtype: str
         """
 
-        # because it is in memory, we should copy the dicts to prevent others from modify the data
-        attributes = attributes.copy()
-        metadata = metadata.copy()
-
         # save all record information and return record id as string
 
         identifier = metadata[METADATA_KEY_IDENTIFIER]
         if str(identifier) in self.all_nodes:
-            # try to merge nodes
+            # try to merge nodes, merge_record returns the stored dicts if nothing changed
             (old_attributes, old_metadata) = self.all_nodes[str(identifier)]
             (merged_attributes, merged_metadata) = merge_record(old_attributes, old_metadata, attributes, metadata)
 
-            self.all_nodes.update({str(identifier): (merged_attributes, merged_metadata)})
+            if merged_attributes is not old_attributes or merged_metadata is not old_metadata:
+                self.all_nodes.update({str(identifier): self._pack_node(merged_attributes, merged_metadata)})
+                self._add_to_temporal_index(str(identifier), merged_attributes)
+                self._update_node_types(str(identifier), old_metadata, merged_metadata)
+                self._update_membership_index(merged_metadata, identifier=str(identifier))
 
         else:
+            # because it is in memory, we should copy the dicts to prevent others from modify the data
+            attributes = attributes.copy()
+            metadata = metadata.copy()
 
             # encode your variables, based on your database architecture
             # (in this case it is not really necessary but for demonstration propose I saved the encoded vars )
             # attr = encode_dict_values_to_primitive(attributes)
             # meta = encode_dict_values_to_primitive(metadata)
 
-            self.all_nodes.update({str(identifier): (attributes, metadata)})
+            self.all_nodes.update({str(identifier): self._pack_node(attributes, metadata)})
+            self._add_to_temporal_index(str(identifier), attributes)
+            self._add_to_identifier_index(str(identifier))
+            self._update_node_types(str(identifier), None, metadata)
+            self._update_membership_index(metadata, identifier=str(identifier))
+
+        if self._wal is not None:
+            self._log((WAL_SAVE_ELEMENT, attributes, metadata))
 
         return str(identifier)
 
+    def _pack_node(self, attributes, metadata):
+        """
+        Returns the value that is stored for a node in all_nodes.
+        Subclasses can override this to change the storage format, the value must unpack into (attributes, metadata)
+
+        :param attributes: The actual provenance data
+        :type attributes: dict
+        :param metadata: Some metadata that are not PROV-O related
+        :type metadata: dict
+        :return: The stored node
+        :rtype: tuple
+        """
+        return attributes, metadata
+
+    def _pack_relation(self, to_node, attributes, metadata):
+        """
+        Returns the value that is stored for a relation in all_relations.
+        Subclasses can override this to change the storage format, the value must unpack into
+        (to_identifier, attributes, metadata)
+
+        :param to_node: The identifier for the end node
+        :type to_node: str
+        :param attributes: The actual provenance data
+        :type attributes: dict
+        :param metadata: Some metadata that are not PROV-O related
+        :type metadata: dict
+        :return: The stored relation
+        :rtype: tuple
+        """
+        return to_node, attributes, metadata
+
     def save_relation(self, from_node, to_node, attributes, metadata):
         """
         Store a relation between 2 nodes in the database.
@@ -110,54 +478,217 @@ class SimpleInMemoryAdapter(BaseAdapter):
         :return: The id of the relation
         :rtype: str
         """
+        relation_id = self._save_relation(from_node, to_node, attributes, metadata)
 
-        # save all relation information and return the relation id as string
+        if self._wal is not None:
+            self._log((WAL_SAVE_RELATION, str(from_node), str(to_node), attributes, metadata, relation_id))
 
-        # because it is in memory, we should copy the dicts to prevent others from modify the data
-        attributes = attributes.copy()
-        metadata = metadata.copy()
+        return relation_id
+
+    def _save_relation(self, from_node, to_node, attributes, metadata, new_relation_id=None):
+        """
+        Store or merge the relation, see :py:meth:`save_relation`
+
+        :param from_node: The identifier for the start node
+        :type from_node: prov.model.Identifier
+        :param to_node: The identifier for the end node
+        :type to_node: prov.model.Identifier
+        :param attributes: The actual provenance data
+        :type attributes: dict
+        :param metadata: Some metadata that are not PROV-O related
+        :type metadata: dict
+        :param new_relation_id: The id for a new relation, default to a new uuid (used for the log replay)
+        :type new_relation_id: str
+        :return: The id of the relation
+        :rtype: str
+        """
+
+        # save all relation information and return the relation id as string
 
         # add dict if it is the first relation
         if str(from_node) not in self.all_relations:
             self.all_relations.update({str(from_node): dict()})
 
+        indexes = self._ensure_relation_index()
+
         # ===============
         # MERGE RELATION
         # ===============
-        new_relation_formal_attributes = split_into_formal_and_other_attributes(attributes, metadata)
-
-        # check that the from node already has some relations
-        if str(from_node) in self.all_relations:
-
-            # for each relation with the origin "from_node"
-            for (relation_id, (to_identifier, old_attributes, old_metadata)) in self.all_relations[
-                str(from_node)].items():
-                # check if connection is to the same identifier
-                if str(to_node) == to_identifier and metadata[METADATA_KEY_PROV_TYPE] == old_metadata[
-                    METADATA_KEY_PROV_TYPE]:
-                    # okay got potential duplicate... lets check the formal attributes
-                    old_relation_formal_attributes = split_into_formal_and_other_attributes(old_attributes,
-                                                                                            old_metadata)
-
-                    if old_relation_formal_attributes.formal == new_relation_formal_attributes.formal:
-                        # got duplicate
-                        (merged_attributes, merged_metadata) = merge_record(old_attributes, old_metadata, attributes,
-                                                                            metadata)
-                        self.all_relations[str(from_node)].update(
-                            {relation_id: (to_identifier, merged_attributes, merged_metadata)})
-                        return relation_id
+        relation_key = self._get_relation_key(from_node, to_node, attributes, metadata)
+        relation_id = indexes.relation_index.get(relation_key)
+
+        if relation_id is not None:
+            # same start and end node, same prov type and the same formal attributes => got duplicate
+            (to_identifier, old_attributes, old_metadata) = self.all_relations[str(from_node)][relation_id]
+            (merged_attributes, merged_metadata) = merge_record(old_attributes, old_metadata, attributes, metadata)
+            if merged_attributes is not old_attributes or merged_metadata is not old_metadata:
+                self.all_relations[str(from_node)].update(
+                    {relation_id: self._pack_relation(to_identifier, merged_attributes, merged_metadata)})
+                self._add_to_temporal_index((str(from_node), relation_id), merged_attributes)
+                self._update_membership_index(merged_metadata, relation_id=relation_id)
+            return relation_id
 
         # ===============
         # CREATE NEW RELATION
         # ===============
 
-        id = str(uuid4())
+        # because it is in memory, we should copy the dicts to prevent others from modify the data
+        attributes = attributes.copy()
+        metadata = metadata.copy()
+
+        id = new_relation_id if new_relation_id is not None else str(uuid4())
 
         relations = self.all_relations[str(from_node)]
-        relations.update({id: (str(to_node), attributes, metadata)})
+        relations.update({id: self._pack_relation(str(to_node), attributes, metadata)})
+        indexes.relation_index[relation_key] = id
+        indexes.relation_keys[id] = relation_key
+        indexes.relation_types.setdefault(get_group_key(relation_key[2]), set()).add(id)
+        self._add_to_temporal_index((str(from_node), id), attributes)
+        self._update_membership_index(metadata, relation_id=id)
+
+        graph = indexes.graph
+        edge = graph.add_edge(str(from_node), str(to_node), id)
+        if indexes.reachability is not None:
+            indexes.reachability.add_edge(graph.node_ids[str(from_node)], graph.node_ids[str(to_node)], edge,
+                                          self._get_reachability_type(attributes, metadata))
+        if graph.needs_compaction():
+            self._compact_graph()
 
         return id
 
+    @staticmethod
+    def _get_relation_key(from_node, to_node, attributes, metadata):
+        """
+        Returns the key that identifies a relation for the merge.
+        Two relations are the same if they have the same start and end node, the same prov type and the same formal attributes
+
+        :param from_node: The identifier for the start node
+        :type from_node: str
+        :param to_node: The identifier for the end node
+        :type to_node: str
+        :param attributes: The actual provenance data
+        :type attributes: dict
+        :param metadata: Some metadata that are not PROV-O related
+        :type metadata: dict
+        :return: The merge key
+        :rtype: tuple
+        """
+        formal_attributes = split_into_formal_and_other_attributes(attributes, metadata).formal
+        return str(from_node), str(to_node), metadata[METADATA_KEY_PROV_TYPE], get_formal_attributes_key(
+            formal_attributes)
+
+    def _get_indexes(self):
+        """
+        Returns the indexes of the nodes and relations dicts.
+        The indexes are stored at the same level as the dicts: on the adapter if it has own dicts, otherwise on the
+        class that defines the shared dicts. New indexes are created if the dicts were replaced (for example to clear
+        the database)
+
+        :rtype: StoreIndexes
+        """
+        owner = next(owner for owner in (self,) + type(self).__mro__ if
+                     "all_nodes" in vars(owner) or "all_relations" in vars(owner))
+        indexes = vars(owner).get("_store_indexes")
+        if indexes is None or indexes.all_nodes is not self.all_nodes or \
+                indexes.all_relations is not self.all_relations:
+            indexes = self._create_indexes()
+            setattr(owner, "_store_indexes", indexes)
+        return indexes
+
+    def _create_indexes(self):
+        """
+        Returns new empty indexes for the current dicts.
+        Subclasses can override this to keep more data next to the dicts
+
+        :rtype: StoreIndexes
+        """
+        return StoreIndexes(self.all_nodes, self.all_relations)
+
+    def _ensure_relation_index(self):
+        """
+        Returns the indexes with the relation index and the graph, both are built on the first access after the
+        relations dict was replaced (for example to clear the database)
+
+        :rtype: StoreIndexes
+        """
+        indexes = self._get_indexes()
+        if indexes.relation_index is None:
+            indexes.relation_index = dict()
+            indexes.relation_keys = dict()
+            indexes.relation_types = dict()
+            indexes.graph = GraphIndex()
+            for (from_identifier, relations) in self.all_relations.items():
+                for (relation_id, (to_identifier, attributes, metadata)) in relations.items():
+                    relation_key = self._get_relation_key(from_identifier, to_identifier, attributes, metadata)
+                    indexes.relation_index[relation_key] = relation_id
+                    indexes.relation_keys[relation_id] = relation_key
+                    indexes.relation_types.setdefault(get_group_key(relation_key[2]), set()).add(relation_id)
+                    indexes.graph.add_edge(from_identifier, to_identifier, relation_id)
+            indexes.graph.compact()
+
+        return indexes
+
+    def _compact_graph(self):
+        """
+        Merge the new relations into the compact adjacency arrays and remove the deleted relations
+
+        """
+        all_relations = self.all_relations
+
+        def is_alive(from_identifier, relation_id):
+            return relation_id in all_relations.get(from_identifier, ())
+
+        self._ensure_relation_index().graph.compact(is_alive)
+
+    def save_snapshot(self, path):
+        """
+        Save all nodes, relations and indexes into a snapshot file, see :py:meth:`load_snapshot`
+
+        .. code:: python
+
+            adapter.save_snapshot("/tmp/prov.snapshot")
+
+            # In a new process
+            adapter = SimpleInMemoryAdapter()
+            adapter.load_snapshot("/tmp/prov.snapshot")
+
+        :param path: The path of the snapshot file, an existing file will be replaced
+        :type path: str
+        """
+        indexes = self._ensure_relation_index()
+        self._compact_graph()
+        write_snapshot(path, self.all_nodes, self.all_relations, {
+            "relation_index": indexes.relation_index,
+            "relation_keys": indexes.relation_keys,
+            "graph": indexes.graph
+        })
+
+    def load_snapshot(self, path):
+        """
+        Replace the content of this adapter with the content of a snapshot file.
+        The file is memory mapped, so only the indexes are loaded at once and the records are loaded on the first
+        access. Changes after the load are not written back to the file, use :py:meth:`save_snapshot` again.
+
+        :param path: The path of the snapshot file
+        :type path: str
+        """
+        (all_nodes, all_relations, index) = read_snapshot(path)
+
+        self.all_nodes = all_nodes
+        self.all_relations = all_relations
+        self._snapshot_sequence = index.get("log_sequence", 0)
+
+        # the snapshot of the log compaction has no indexes, they are built on the first access
+        if "relation_index" in index:
+            indexes = self._get_indexes()
+            indexes.relation_index = index["relation_index"]
+            indexes.relation_keys = index["relation_keys"]
+            indexes.relation_types = dict()
+            for (relation_id, relation_key) in indexes.relation_keys.items():
+                indexes.relation_types.setdefault(get_group_key(relation_key[2]), set()).add(relation_id)
+            indexes.graph = index["graph"]
+            indexes.reachability = None
+
     def get_record(self, record_id):
         """
         Get a ProvDocument from the database based on the document id
@@ -187,17 +718,18 @@ class SimpleInMemoryAdapter(BaseAdapter):
         :rtype: DbRelation
         """
 
-        for (from_uri, relations) in self.all_relations.items():
-            if relation_id in relations:
-                (to_uri, attributes, metadata) = relations[relation_id]
+        relation_key = self._ensure_relation_index().relation_keys.get(relation_id)
+
+        if relation_key is not None:
+            (to_uri, attributes, metadata) = self.all_relations[relation_key[0]][relation_id]
 
-                attributes = encode_dict_values_to_primitive(attributes)
-                metadata = encode_dict_values_to_primitive(metadata)
+            attributes = encode_dict_values_to_primitive(attributes)
+            metadata = encode_dict_values_to_primitive(metadata)
 
-                return DbRelation(attributes, metadata)
+            return DbRelation(attributes, metadata)
         raise NotFoundException("could't find the relation with id {}".format(relation_id))
 
-    def get_records_by_filter(self, attributes_dict=None, metadata_dict=None):
+    def get_records_by_filter(self, attributes_dict=None, metadata_dict=None, fields=None):
         """
         Filter all nodes based on the provided attributes and metadata dict
         The filter is currently defined as follows:
@@ -209,6 +741,8 @@ class SimpleInMemoryAdapter(BaseAdapter):
         :type attributes_dict: dict
         :param metadata_dict: A filter for the metadata with a conjunction of all values (also in the attributes_dict )
         :type metadata_dict: dict
+        :param fields: The attribute keys of the records, see :py:meth:`BaseAdapter.get_records_by_filter`
+        :type fields: list(str or prov.model.QualifiedName)
         :return: The list of matching relations and nodes
         :rtype: List(DbRecord or Dbrelation)
         """
@@ -217,6 +751,7 @@ class SimpleInMemoryAdapter(BaseAdapter):
         if metadata_dict is None:
             metadata_dict = dict()
 
+        projection = get_projection(fields)
         return_records = list()
         return_keys = set()
         properties_filter_dict = encode_dict_values_to_primitive(attributes_dict.copy())
@@ -228,10 +763,7 @@ class SimpleInMemoryAdapter(BaseAdapter):
                                                      metadata=metadata,
                                                      attributes=attributes):
 
-                meta_encoded = encode_dict_values_to_primitive(metadata)
-                attr_encoded = encode_dict_values_to_primitive(attributes)
-
-                return_records.append(DbRecord(attr_encoded, meta_encoded))
+                return_records.append(encode_projected_record(DbRecord, attributes, metadata, projection))
                 return_keys.add(identifier)
 
             else:
@@ -245,14 +777,339 @@ class SimpleInMemoryAdapter(BaseAdapter):
 
                 for (relation_id, (to_id, attributes, metadata)) in relations.items():
                     if to_id in return_keys:
-                        attributes = encode_dict_values_to_primitive(attributes)
-                        metadata = encode_dict_values_to_primitive(metadata)
-
-                        return_records.append(DbRelation(attributes, metadata))
+                        return_records.append(encode_projected_record(DbRelation, attributes, metadata, projection))
 
         return return_records
 
-    def get_records_tail(self, attributes_dict=None, metadata_dict=None, depth=None):
+    def _add_to_identifier_index(self, identifier):
+        """
+        Remember the identifier of a new node for the sorted identifiers, if they were already built. The identifiers
+        are merged in one batch before the next page instead of an insert into the list for each node
+
+        :param identifier: The identifier of the node
+        :type identifier: str
+        """
+        indexes = self._get_indexes()
+        if indexes.sorted_identifiers is not None:
+            indexes.new_identifiers.add(identifier)
+
+    def _get_identifier_index(self):
+        """
+        Returns the sorted identifiers of the nodes, the list is built on the first access after the nodes dict was
+        replaced and the new identifiers are merged on the next access. It can contain the identifiers of deleted
+        nodes.
+
+        :rtype: list(str)
+        """
+        indexes = self._get_indexes()
+        if indexes.sorted_identifiers is None:
+            indexes.sorted_identifiers = sorted(self.all_nodes.keys())
+        elif len(indexes.new_identifiers) > 0:
+            sorted_identifiers = indexes.sorted_identifiers
+
+            def is_indexed(identifier):
+                # the identifier of a deleted node is still in the list
+                position = bisect_left(sorted_identifiers, identifier)
+                return position < len(sorted_identifiers) and sorted_identifiers[position] == identifier
+
+            new_identifiers = sorted(identifier for identifier in indexes.new_identifiers if not is_indexed(identifier))
+            indexes.new_identifiers = set()
+            # the sort of the two sorted runs is a linear merge
+            sorted_identifiers.extend(new_identifiers)
+            sorted_identifiers.sort()
+        return indexes.sorted_identifiers
+
+    def get_records_by_filter_page(self, attributes_dict=None, metadata_dict=None, limit=1000, after=None,
+                                   fields=None):
+        """
+        Returns one page of the matching nodes and their relations, see :py:meth:`BaseAdapter.get_records_by_filter_page`.
+        The nodes are read from the sorted identifiers after the position of the last identifier, so the cost of a
+        page depends on the page size (and on the share of matching nodes) and not on the number of nodes.
+
+        :param attributes_dict: A filter dict with a conjunction of all values in the attributes_dict and metadata_dict
+        :type attributes_dict: dict
+        :param metadata_dict: A filter for the metadata with a conjunction of all values (also in the attributes_dict )
+        :type metadata_dict: dict
+        :param limit: The max number of nodes in the page
+        :type limit: int
+        :param after: The last identifier of the previous page, None for the first page
+        :type after: str
+        :param fields: The attribute keys of the records, see :py:meth:`BaseAdapter.get_records_by_filter`
+        :type fields: list(str or prov.model.QualifiedName)
+        :return: The nodes and relations of the page and the identifier of the last node if there are more pages
+        :rtype: DbPage
+        """
+        projection = get_projection(fields)
+        properties_filter_dict = encode_dict_values_to_primitive(attributes_dict or dict())
+        metadata_filter_dict = encode_dict_values_to_primitive(metadata_dict or dict())
+
+        def is_match(identifier):
+            node = self.all_nodes.get(identifier)
+            if node is None:
+                return False
+            (attributes, metadata) = node
+            return self._check_attribute_metadata_filter(attributes_filter=properties_filter_dict,
+                                                         metadata_filter=metadata_filter_dict,
+                                                         metadata=metadata,
+                                                         attributes=attributes)
+
+        identifiers = self._get_identifier_index()
+        position = 0 if after is None else bisect_right(identifiers, after)
+
+        # one more node to know if there is a next page
+        page_identifiers = list()
+        while position < len(identifiers) and len(page_identifiers) <= limit:
+            if is_match(identifiers[position]):
+                page_identifiers.append(identifiers[position])
+            position += 1
+
+        last_identifier = None
+        if len(page_identifiers) > limit:
+            page_identifiers = page_identifiers[:limit]
+            last_identifier = page_identifiers[-1]
+
+        return_records = list()
+        for identifier in page_identifiers:
+            (attributes, metadata) = self.all_nodes[identifier]
+            return_records.append(encode_projected_record(DbRecord, attributes, metadata, projection))
+        for identifier in page_identifiers:
+            for (to_identifier, attributes, metadata) in self.all_relations.get(identifier, dict()).values():
+                if is_match(to_identifier):
+                    return_records.append(encode_projected_record(DbRelation, attributes, metadata, projection))
+
+        return DbPage(return_records, last_identifier)
+
+    def get_records_by_expression(self, expression):
+        """
+        Filter the nodes and relations with a compiled filter expression, see
+        :py:meth:`BaseAdapter.get_records_by_expression`.
+        Only the fields of the expression are encoded for each record. The indexed predicates are:
+
+        - the identifier (equality or in), the nodes are looked up directly
+        - the prov type (equality or in), only the nodes and relations of these types are read
+        - a required metadata key of the membership index (for example the document id), only the records with this
+          key are read
+
+        The smallest of these candidate sets is read and the full expression is checked on each candidate, all other
+        expressions scan the nodes and relations.
+
+        :param expression: The filter expression
+        :type expression: provdbconnector.utils.filters.FilterExpression
+        :return: The list of matching relations and nodes
+        :rtype: list(DbRecord or DbRelation)
+        """
+        return [record_cls(encode_dict_values_to_primitive(attributes), encode_dict_values_to_primitive(metadata)) for
+                (record_cls, attributes, metadata) in self._get_expression_matches(expression)]
+
+    def _get_expression_matches(self, expression):
+        """
+        Returns the unencoded nodes and relations that match the filter expression,
+        see :py:meth:`get_records_by_expression`
+
+        :param expression: The filter expression, None for all records
+        :type expression: provdbconnector.utils.filters.FilterExpression
+        :return: Generator of (DbRecord or DbRelation, attributes, metadata) tuples
+        :rtype: generator
+        """
+        if expression is None:
+            predicate = None
+            prov_types = None
+            identifiers = None
+            member_keys = list()
+        else:
+            predicate = compile_predicate(expression)
+            prov_types = get_equality_candidates(expression, METADATA_KEY_PROV_TYPE)
+            identifiers = get_equality_candidates(expression, METADATA_KEY_IDENTIFIER)
+            member_keys = [key for key in get_required_keys(expression) if MembershipIndex.is_indexed(key)]
+
+        search_nodes = True
+        search_relations = True
+        if prov_types is not None:
+            search_relations = any(prov_type in RELATION_TYPE_KEYS for prov_type in prov_types)
+            search_nodes = any(prov_type not in RELATION_TYPE_KEYS for prov_type in prov_types)
+
+        # the candidates from the indexes, None to scan all records
+        node_candidates = None
+        relation_candidates = None
+        if len(member_keys) > 0:
+            membership = self._get_membership_index()
+            node_candidates = min((membership.get_nodes(key) for key in member_keys), key=len)
+            relation_candidates = min((membership.get_relations(key) for key in member_keys), key=len)
+        if prov_types is not None:
+            if search_nodes:
+                node_types = self._get_node_types()
+                type_nodes = set().union(*(node_types.get(prov_type, ()) for prov_type in prov_types if
+                                           prov_type not in RELATION_TYPE_KEYS))
+                if node_candidates is None or len(type_nodes) < len(node_candidates):
+                    node_candidates = type_nodes
+            if search_relations:
+                relation_types = self._ensure_relation_index().relation_types
+                type_relations = set().union(*(relation_types.get(prov_type, ()) for prov_type in prov_types if
+                                               prov_type in RELATION_TYPE_KEYS))
+                if relation_candidates is None or len(type_relations) < len(relation_candidates):
+                    relation_candidates = type_relations
+        if identifiers is not None:
+            node_candidates = identifiers if node_candidates is None else \
+                [identifier for identifier in identifiers if identifier in node_candidates]
+
+        if search_nodes:
+            if node_candidates is None:
+                nodes = self.all_nodes.values()
+            else:
+                nodes = (self.all_nodes[identifier] for identifier in node_candidates if identifier in self.all_nodes)
+
+            for (attributes, metadata) in nodes:
+                if predicate is None or predicate(attributes, metadata):
+                    yield DbRecord, attributes, metadata
+
+        if search_relations:
+            if relation_candidates is None:
+                relations = (relation for relations in self.all_relations.values() for relation in relations.values())
+            else:
+                relation_keys = self._ensure_relation_index().relation_keys
+                relations = (self.all_relations[relation_keys[relation_id][0]][relation_id] for relation_id in
+                             relation_candidates)
+
+            for (to_identifier, attributes, metadata) in relations:
+                if predicate is None or predicate(attributes, metadata):
+                    yield DbRelation, attributes, metadata
+
+    def count_records(self, expression=None):
+        """
+        Count the nodes and relations that match the filter expression, see :py:meth:`BaseAdapter.count_records`.
+        Without an expression the count is the size of the node dict and of the relation index, the size of a
+        document (an expression `F(document_id, metadata=True).exists()`) is the size of the membership index for the
+        document id.
+
+        :param expression: The filter expression, None to count all records
+        :type expression: provdbconnector.utils.filters.FilterExpression
+        :return: The number of records
+        :rtype: int
+        """
+        if expression is None:
+            return len(self.all_nodes) + len(self._ensure_relation_index().relation_keys)
+        if isinstance(expression, Comparison) and expression.operator == OPERATOR_EXISTS and \
+                expression.field.metadata and MembershipIndex.is_indexed(expression.field.key):
+            return self._get_membership_index().count(expression.field.key)
+        return sum(1 for match in self._get_expression_matches(expression))
+
+    def document_exists(self, document_id):
+        """
+        Check if a document or bundle with the id is saved with a lookup in the membership index, see
+        :py:meth:`BaseAdapter.document_exists`
+
+        :param document_id: The document id or bundle id
+        :type document_id: str
+        :return: True if at least one record of the document is saved
+        :rtype: bool
+        """
+        return self._get_membership_index().count(str(document_id)) > 0
+
+    def group_count_records(self, field, expression=None):
+        """
+        Count the nodes and relations that match the filter expression by the value of a field, see
+        :py:meth:`BaseAdapter.group_count_records`.
+        The count of all records by the prov type is answered from the type counts of the nodes and relations.
+
+        :param field: The field to group by
+        :type field: provdbconnector.utils.filters.F
+        :param expression: The filter expression, None to count all records
+        :type expression: provdbconnector.utils.filters.FilterExpression
+        :return: The number of records by the value of the field
+        :rtype: dict
+        """
+        if expression is None and field.metadata and field.key == METADATA_KEY_PROV_TYPE:
+            counts = Counter({prov_type: len(identifiers) for (prov_type, identifiers) in
+                              self._get_node_types().items()})
+            for (prov_type, relation_ids) in self._ensure_relation_index().relation_types.items():
+                counts[prov_type] += len(relation_ids)
+            return dict(counts)
+
+        counts = Counter()
+        for (record_cls, attributes, metadata) in self._get_expression_matches(expression):
+            counts[get_field_value(field, attributes, metadata)] += 1
+        return dict(counts)
+
+    def _update_node_types(self, identifier, old_metadata, metadata):
+        """
+        Move a node to the set of its prov type, if the index was already built
+
+        :param identifier: The identifier of the node
+        :type identifier: str
+        :param old_metadata: The metadata before the change, None for a new node
+        :type old_metadata: dict
+        :param metadata: The metadata after the change, None for a deleted node
+        :type metadata: dict
+        """
+        node_types = self._get_indexes().node_types
+        if node_types is None:
+            return
+        old_type = None if old_metadata is None else get_group_key(old_metadata.get(METADATA_KEY_PROV_TYPE))
+        new_type = None if metadata is None else get_group_key(metadata.get(METADATA_KEY_PROV_TYPE))
+        if old_metadata is not None and metadata is not None and old_type == new_type:
+            return
+
+        if old_metadata is not None and old_type in node_types:
+            node_types[old_type].discard(identifier)
+            if len(node_types[old_type]) == 0:
+                del node_types[old_type]
+        if metadata is not None:
+            node_types.setdefault(new_type, set()).add(identifier)
+
+    def _get_node_types(self):
+        """
+        Returns the identifiers of the nodes by the prov type, the index is built on the first call
+
+        :rtype: dict
+        """
+        indexes = self._get_indexes()
+        if indexes.node_types is None:
+            node_types = dict()
+            for (identifier, (attributes, metadata)) in self.all_nodes.items():
+                node_types.setdefault(get_group_key(metadata.get(METADATA_KEY_PROV_TYPE)), set()).add(identifier)
+            indexes.node_types = node_types
+        return indexes.node_types
+
+    def _update_membership_index(self, metadata, identifier=None, relation_id=None, remove=False):
+        """
+        Add or remove a node or a relation in the membership index, if the index was already built
+
+        :param metadata: The metadata of the saved, merged or deleted record
+        :type metadata: dict
+        :param identifier: The identifier of a node
+        :type identifier: str
+        :param relation_id: The id of a relation
+        :type relation_id: str
+        :param remove: True for a deleted record
+        :type remove: bool
+        """
+        membership = self._get_indexes().membership
+        if membership is None:
+            return
+        if identifier is not None:
+            (membership.remove_node if remove else membership.add_node)(identifier, metadata)
+        else:
+            (membership.remove_relation if remove else membership.add_relation)(relation_id, metadata)
+
+    def _get_membership_index(self):
+        """
+        Returns the membership index, the index is built on the first access after the nodes or relations dict was
+        replaced
+
+        :rtype: MembershipIndex
+        """
+        indexes = self._ensure_relation_index()
+        if indexes.membership is None:
+            membership = MembershipIndex()
+            for (identifier, (attributes, metadata)) in self.all_nodes.items():
+                membership.add_node(identifier, metadata)
+            for relations in self.all_relations.values():
+                for (relation_id, (to_identifier, attributes, metadata)) in relations.items():
+                    membership.add_relation(relation_id, metadata)
+            indexes.membership = membership
+        return indexes.membership
+
+    def get_records_tail(self, attributes_dict=None, metadata_dict=None, depth=None, fields=None):
         """
         Return the provenance based on a filter combination.
         The filter dicts are only relevant for the start nodes.
@@ -265,60 +1122,410 @@ class SimpleInMemoryAdapter(BaseAdapter):
         :type metadata_dict: dict
         :param depth: The level of detail, default to infinite
         :type depth: int
+        :param fields: The attribute keys of the records, see :py:meth:`BaseAdapter.get_records_by_filter`
+        :type fields: list(str or prov.model.QualifiedName)
         :return: A list of DbRelations and DbRecords
         :rtype: list(DbRelation or DbRecord)
         """
-        # only transform dict into list
-        return list(self._get_records_tail_internal(attributes_dict, metadata_dict).values())
+        if attributes_dict is None:
+            attributes_dict = dict()
+        if metadata_dict is None:
+            metadata_dict = dict()
+
+        if depth is not None and depth <= 0:
+            return list()
+
+        graph = self._ensure_relation_index().graph
+
+        start_ids = set()
+        for record in self.get_records_by_filter(attributes_dict, metadata_dict):
+            start_id = graph.node_ids.get(str(record.metadata[METADATA_KEY_IDENTIFIER]))
+            if start_id is not None:
+                start_ids.add(start_id)
 
-    def _get_records_tail_internal(self, attributes_dict=None, metadata_dict=None, max_depth=None, current_depth=0,
-                                   result_records=None):
+        result_records = self._get_records_tail_internal(start_ids, depth)
+        return self._project_records(result_records.values(), fields)
+
+    @staticmethod
+    def _project_records(records, fields):
         """
-        Internal function, because we need to call it recursive. This function is only neccecary in this in memory adapter.
-        It's your choice how you implement the get_records_tail function
+        Returns the encoded projection of the records, or the records if there is no projection
 
-        :param attributes_dict: A filter dict with a conjunction of all values in the attributes_dict and metadata_dict
-        :type attributes_dict: dict
-        :param metadata_dict: A filter for the metadata with a conjunction of all values (also in the attributes_dict )
-        :type metadata_dict: dict
-        :param max_depth:
-        :param current_depth:
-        :param result_records:
-        :return:
+        :param records: The records with the stored attributes and metadata
+        :type records: iterable(DbRecord or DbRelation)
+        :param fields: The attribute keys or None for the whole records
+        :type fields: list(str or prov.model.QualifiedName)
+        :return: A list of DbRelations and DbRecords
+        :rtype: list(DbRelation or DbRecord)
         """
+        projection = get_projection(fields)
+        if projection is None:
+            return list(records)
+        return [encode_projected_record(type(record), record.attributes, record.metadata, projection) for record in
+                records]
 
-        if attributes_dict is None:
-            attributes_dict = dict()
-        if metadata_dict is None:
-            metadata_dict = dict()
+    def _get_records_tail_internal(self, start_ids, max_depth):
+        """
+        Internal function for the breadth first traversal from the start nodes over the graph index.
+        The nodes are expanded level by level, so each node is expanded at its shortest distance from the start nodes
+        and the result does not depend on the order of the relations.
+
+        :param start_ids: The node ids of the start nodes
+        :type start_ids: set
+        :param max_depth: The max number of steps from the start nodes, None for infinite
+        :type max_depth: int
+        :return: The result dict with the structure `(identifier or relation_id, DbRecord or DbRelation)`
+        :rtype: dict
+        """
+        graph = self._ensure_relation_index().graph
+        node_names = graph.node_names
+        edge_names = graph.edge_names
+
+        result_records = dict()
+        visited = set(start_ids)
+        frontier = list(start_ids)
+        depth = 0
+        while len(frontier) > 0 and depth != max_depth:
+            depth += 1
+            next_frontier = list()
+            for node_id in frontier:
+                relations = self.all_relations.get(node_names[node_id], dict())
+                for (to_id, edge) in graph.successors(node_id):
+                    relation_id = edge_names[edge]
+                    relation = relations.get(relation_id)
+                    if relation is None:
+                        # deleted relation
+                        continue
+                    (to_identifier, attributes, metadata) = relation
 
-        origin_records = self.get_records_by_filter(attributes_dict, metadata_dict)
-
-        if result_records is None:
-            result_records = dict()
-        if current_depth == max_depth:
-            return dict()
-        for record in origin_records:
-            from_identifier = record.metadata[METADATA_KEY_IDENTIFIER]
-            if from_identifier in self.all_relations:
-                for (relation_id, (to_identifier, attributes, metadata)) in self.all_relations[from_identifier].items():
-                    # find to node
                     if to_identifier not in result_records:
                         (to_attributes, to_metadata) = self.all_nodes[to_identifier]
                         result_records.update({to_identifier: DbRecord(to_attributes, to_metadata)})
+                    result_records.update({relation_id: DbRelation(attributes, metadata)})
 
-                        # add other nodes recursive
-                        result_records.update(
-                            self._get_records_tail_internal(metadata_dict={METADATA_KEY_IDENTIFIER: to_identifier},
-                                                            current_depth=current_depth + 1,
-                                                            result_records=result_records))
+                    if to_id not in visited:
+                        visited.add(to_id)
+                        next_frontier.append(to_id)
+            frontier = next_frontier
 
-                    # add relation to result
-                    result_records.update({relation_id: DbRelation(attributes, metadata)})
+        return result_records
+
+    def get_lineage(self, identifier, direction=LINEAGE_UPSTREAM, relation_types=None, max_depth=None):
+        """
+        Breadth first traversal over the graph index in one direction, see :py:meth:`BaseAdapter.get_lineage`.
+        Only the adjacency of the visited nodes is read, upstream the outgoing and downstream the incoming relations.
+
+        :param identifier: The identifier of the start node
+        :type identifier: str
+        :param direction: LINEAGE_UPSTREAM or LINEAGE_DOWNSTREAM
+        :type direction: str
+        :param relation_types: The prov types of the relations to follow, default to all relations
+        :type relation_types: list(prov.model.QualifiedName)
+        :param max_depth: The max number of relations between the start node and a result node, default to infinite
+        :type max_depth: int
+        :return: A list of DbRelations and DbRecords, the first record is the start node
+        :rtype: list(DbRelation or DbRecord)
+        """
+        identifier = str(identifier)
+        if identifier not in self.all_nodes:
+            raise NotFoundException("Record {} not found".format(identifier))
+
+        (attributes, metadata) = self.all_nodes[identifier]
+        result_records = [DbRecord(encode_dict_values_to_primitive(attributes),
+                                   encode_dict_values_to_primitive(metadata))]
+
+        graph = self._ensure_relation_index().graph
+        node_names = graph.node_names
+        edge_names = graph.edge_names
+
+        start_id = graph.node_ids.get(identifier)
+        if start_id is None or max_depth == 0:
+            return result_records
+
+        upstream = direction == LINEAGE_UPSTREAM
+        get_neighbours = graph.successors if upstream else graph.predecessors
+        type_keys = None if relation_types is None else set(str(prov_type) for prov_type in relation_types)
+
+        visited = {start_id}
+        frontier = [start_id]
+        depth = 0
+        while len(frontier) > 0 and depth != max_depth:
+            depth += 1
+            next_frontier = list()
+            for node_id in frontier:
+                for (other_id, edge) in get_neighbours(node_id):
+                    from_identifier = node_names[node_id if upstream else other_id]
+                    relation = self.all_relations.get(from_identifier, dict()).get(edge_names[edge])
+                    if relation is None:
+                        # deleted relation
+                        continue
+                    (to_identifier, attributes, metadata) = relation
+                    if type_keys is not None and str(metadata[METADATA_KEY_PROV_TYPE]) not in type_keys:
+                        continue
+                    if metadata[METADATA_KEY_PROV_TYPE] == PROV_ASSOCIATION and str(
+                            attributes.get(PROV_TYPE)) == "prov:bundleAssociation":
+                        continue
+
+                    result_records.append(DbRelation(encode_dict_values_to_primitive(attributes),
+                                                     encode_dict_values_to_primitive(metadata)))
+                    if other_id in visited:
+                        continue
+                    visited.add(other_id)
+                    next_frontier.append(other_id)
+
+                    node = self.all_nodes.get(node_names[other_id])
+                    if node is not None:
+                        (attributes, metadata) = node
+                        result_records.append(DbRecord(encode_dict_values_to_primitive(attributes),
+                                                       encode_dict_values_to_primitive(metadata)))
+            frontier = next_frontier
+
+        return result_records
+
+    @staticmethod
+    def _get_reachability_type(attributes, metadata):
+        """
+        Returns the prov type of a relation for the reachability index, None for the bundle associations
+
+        :param attributes: The actual provenance data
+        :type attributes: dict
+        :param metadata: Some metadata that are not PROV-O related
+        :type metadata: dict
+        :return: The prov type or None
+        :rtype: prov.model.QualifiedName
+        """
+        if metadata[METADATA_KEY_PROV_TYPE] == PROV_ASSOCIATION and str(
+                attributes.get(PROV_TYPE)) == "prov:bundleAssociation":
+            return None
+        return metadata[METADATA_KEY_PROV_TYPE]
+
+    def _get_reachability_index(self):
+        """
+        Returns the reachability index, the index is rebuilt from the graph if necessary
+
+        :rtype: ReachabilityIndex
+        """
+        indexes = self._ensure_relation_index()
+        if indexes.reachability is not None:
+            return indexes.reachability
+
+        graph = indexes.graph
+        node_names = graph.node_names
+        index = ReachabilityIndex(graph)
+        for (edge, relation_id) in enumerate(graph.edge_names):
+            relation = self.all_relations.get(node_names[graph.edge_sources[edge]], dict()).get(relation_id)
+            if relation is None:
+                continue
+            (to_identifier, attributes, metadata) = relation
+            index.add_edge(graph.edge_sources[edge], graph.node_ids[to_identifier], edge,
+                           self._get_reachability_type(attributes, metadata))
+
+        indexes.reachability = index
+        return index
+
+    def is_reachable(self, source, target, relation_types=None):
+        """
+        Check with the reachability index if the target is reachable from the source, see
+        :py:meth:`BaseAdapter.is_reachable`. Without the index (see :py:meth:`enable_reachability_index`) the lineage
+        of the source is searched.
+
+        :param source: The identifier of the start node
+        :type source: str
+        :param target: The identifier of the end node
+        :type target: str
+        :param relation_types: The prov types of the relations to follow, default to all relations
+        :type relation_types: list(prov.model.QualifiedName)
+        :return: True if there is a path from the source to the target
+        :rtype: bool
+        """
+        if not self._reachability_enabled:
+            return super(SimpleInMemoryAdapter, self).is_reachable(source, target, relation_types)
+
+        if str(source) not in self.all_nodes:
+            raise NotFoundException("Record {} not found".format(source))
+
+        index = self._get_reachability_index()
+        source_id = index.graph.node_ids.get(str(source))
+        target_id = index.graph.node_ids.get(str(target))
+        if source_id is None or target_id is None:
+            return str(source) == str(target)
+        return index.is_reachable(source_id, target_id, relation_types)
+
+    def get_path(self, from_identifier, to_identifier, max_depth=None, relation_types=None, directed=True):
+        """
+        Bidirectional breadth first search over the graph index, see :py:meth:`BaseAdapter.get_path`
+
+        :param from_identifier: The identifier of the start node
+        :type from_identifier: str
+        :param to_identifier: The identifier of the end node
+        :type to_identifier: str
+        :param max_depth: The max number of relations in the path, default to infinite
+        :type max_depth: int
+        :param relation_types: The prov types of the relations to follow, default to all relations
+        :type relation_types: list(prov.model.QualifiedName)
+        :param directed: Follow the relations only in their direction
+        :type directed: bool
+        :return: The DbRecords and DbRelations in the order of the path or an empty list
+        :rtype: list(DbRelation or DbRecord)
+        """
+        from_identifier = str(from_identifier)
+        to_identifier = str(to_identifier)
+        for identifier in (from_identifier, to_identifier):
+            if identifier not in self.all_nodes:
+                raise NotFoundException("Record {} not found".format(identifier))
+
+        graph = self._ensure_relation_index().graph
+        node_names = graph.node_names
+        edge_names = graph.edge_names
+        type_keys = None if relation_types is None else set(str(prov_type) for prov_type in relation_types)
+
+        def get_relation(source_id, edge):
+            relation = self.all_relations.get(node_names[source_id], dict()).get(edge_names[edge])
+            if relation is None:
+                # deleted relation
+                return None
+            (_, attributes, metadata) = relation
+            if type_keys is not None and str(metadata[METADATA_KEY_PROV_TYPE]) not in type_keys:
+                return None
+            if self._get_reachability_type(attributes, metadata) is None:
+                return None
+            return relation
+
+        def expand(frontier, forward):
+            for node_id in frontier:
+                if forward or not directed:
+                    for (other_id, edge) in graph.successors(node_id):
+                        relation = get_relation(node_id, edge)
+                        if relation is not None:
+                            yield node_id, other_id, relation
+                if not forward or not directed:
+                    for (other_id, edge) in graph.predecessors(node_id):
+                        relation = get_relation(other_id, edge)
+                        if relation is not None:
+                            yield node_id, other_id, relation
+
+        from_id = graph.node_ids.get(from_identifier)
+        to_id = graph.node_ids.get(to_identifier)
+        if from_id is None or to_id is None:
+            path = SearchPath([from_identifier], list()) if from_identifier == to_identifier else None
+        else:
+            path = find_shortest_path(from_id, to_id, lambda frontier: expand(frontier, True),
+                                      lambda frontier: expand(frontier, False), max_depth)
+            if path is not None:
+                path = SearchPath([node_names[node_id] for node_id in path.nodes], path.edges)
+        if path is None:
+            return list()
+
+        result_records = list()
+        for (position, identifier) in enumerate(path.nodes):
+            if position > 0:
+                (_, attributes, metadata) = path.edges[position - 1]
+                result_records.append(DbRelation(encode_dict_values_to_primitive(attributes),
+                                                 encode_dict_values_to_primitive(metadata)))
+            (attributes, metadata) = self.all_nodes[identifier]
+            result_records.append(DbRecord(encode_dict_values_to_primitive(attributes),
+                                           encode_dict_values_to_primitive(metadata)))
+        return result_records
+
+    def _add_to_temporal_index(self, key, attributes):
+        """
+        Add the time of a saved record to the temporal index, if the index was already built
+
+        :param key: The identifier of a node or the tuple (from_identifier, relation_id) for a relation
+        :type key: str or tuple
+        :param attributes: The attributes of the record
+        :type attributes: dict
+        """
+        temporal = self._get_indexes().temporal
+        if temporal is None:
+            return
+        interval = get_time_interval(attributes)
+        if interval is not None:
+            temporal.add(key, interval)
+
+    def _get_temporal_index(self):
+        """
+        Returns the temporal index, the index is built on the first access after the nodes or relations dict was
+        replaced (for example to clear the database)
+
+        :rtype: TemporalIndex
+        """
+        indexes = self._get_indexes()
+        if indexes.temporal is not None:
+            return indexes.temporal
+
+        entries = list()
+        for (identifier, (attributes, metadata)) in self.all_nodes.items():
+            interval = get_time_interval(attributes)
+            if interval is not None:
+                entries.append((interval, identifier))
+        for (from_identifier, relations) in self.all_relations.items():
+            for (relation_id, (to_identifier, attributes, metadata)) in relations.items():
+                interval = get_time_interval(attributes)
+                if interval is not None:
+                    entries.append((interval, (from_identifier, relation_id)))
+        entries.sort(key=lambda entry: entry[0].start)
+
+        index = TemporalIndex()
+        for (interval, key) in entries:
+            index.add(key, interval)
+
+        indexes.temporal = index
+        return index
+
+    def get_records_in_time_range(self, start, end, prov_types=None):
+        """
+        Returns the records with a time in the range from the temporal index, see
+        :py:meth:`BaseAdapter.get_records_in_time_range`. The index is built on the first query and then updated on
+        each save, the intervals are sorted by the start time in classes of similar length, so the cost of a query is
+        proportional to the number of results and long intervals don't slow down the queries over the short ones.
+
+        :param start: The start of the range
+        :type start: datetime.datetime
+        :param end: The end of the range
+        :type end: datetime.datetime
+        :param prov_types: The prov types of the records, default to all records
+        :type prov_types: list(prov.model.QualifiedName)
+        :return: A list of DbRecords and DbRelations
+        :rtype: list(DbRelation or DbRecord)
+        """
+        start = to_timestamp(start)
+        end = to_timestamp(end)
+        type_keys = None if prov_types is None else set(str(prov_type) for prov_type in prov_types)
+
+        result_records = list()
+        visited = set()
+        for key in self._get_temporal_index().search(start, end):
+            if key in visited:
+                continue
+            visited.add(key)
+
+            if isinstance(key, tuple):
+                record = self.all_relations.get(key[0], dict()).get(key[1])
+                if record is None:
+                    continue
+                (to_identifier, attributes, metadata) = record
+                record_cls = DbRelation
+            else:
+                record = self.all_nodes.get(key)
+                if record is None:
+                    continue
+                (attributes, metadata) = record
+                record_cls = DbRecord
+
+            if type_keys is not None and str(metadata[METADATA_KEY_PROV_TYPE]) not in type_keys:
+                continue
 
+            # the index keeps the old interval of a merged record
+            interval = get_time_interval(attributes)
+            if interval is None or interval.start > end or interval.end < start:
+                continue
+
+            result_records.append(record_cls(encode_dict_values_to_primitive(attributes),
+                                             encode_dict_values_to_primitive(metadata)))
         return result_records
 
-    def get_bundle_records(self, bundle_identifier):
+    def get_bundle_records(self, bundle_identifier, fields=None):
         """
         Get the records for a specific bundle identifier
 
@@ -329,38 +1536,53 @@ class SimpleInMemoryAdapter(BaseAdapter):
 
         :param bundle_identifier: The identifier of the bundle
         :type bundle_identifier: prov.model.Identifier
+        :param fields: The attribute keys of the records, see :py:meth:`BaseAdapter.get_records_by_filter`
+        :type fields: list(str or prov.model.QualifiedName)
         :return: The list with the bundle nodes and all connections where the start node and end node in the bundle.
         :rtype: list(DbRelation or DbRecord )
         """
-        bundle_records = dict()
+        graph = self._ensure_relation_index().graph
+        node_names = graph.node_names
+        edge_names = graph.edge_names
 
-        # get all nodes for the bundle
-        for (from_identifier, relations) in self.all_relations.items():
-            # search in all relations for a relation that points to the bundle and also fulfill the other constraints
-            for (relation_id, (to_identifier, attributes, metadata)) in relations.items():
+        bundle_records = dict()
+        bundle_id = graph.node_ids.get(str(bundle_identifier))
+        if bundle_id is None:
+            return list()
+
+        # get all nodes for the bundle, search in all relations that points to the bundle
+        for (from_id, edge) in graph.predecessors(bundle_id):
+            from_identifier = node_names[from_id]
+            relation = self.all_relations.get(from_identifier, dict()).get(edge_names[edge])
+            if relation is None:
+                continue
+            (to_identifier, attributes, metadata) = relation
 
-                if to_identifier == str(bundle_identifier):
-                    # got potential bundle association, check prov:type to be sure
-
-                    if metadata[METADATA_KEY_PROV_TYPE] == PROV_ASSOCIATION and str(
-                            attributes[PROV_TYPE]) == "prov:bundleAssociation":
-                        (attributes, metadata) = self.all_nodes[from_identifier]
-                        bundle_records.update({from_identifier: DbRecord(attributes, metadata)})
+            # got potential bundle association, check prov:type to be sure
+            if metadata[METADATA_KEY_PROV_TYPE] == PROV_ASSOCIATION and str(
+                    attributes[PROV_TYPE]) == "prov:bundleAssociation":
+                (attributes, metadata) = self.all_nodes[from_identifier]
+                bundle_records.update({from_identifier: DbRecord(attributes, metadata)})
 
         # search for all relations between the bundle nodes
         for from_identifier in bundle_records.copy().keys():
-            if from_identifier in self.all_relations:
-                for (relation_id, (to_identifier, attributes, metadata)) in self.all_relations[from_identifier].items():
+            relations = self.all_relations.get(from_identifier, dict())
+            for (to_id, edge) in graph.successors(graph.node_ids[from_identifier]):
+                relation_id = edge_names[edge]
+                relation = relations.get(relation_id)
+                if relation is None:
+                    continue
+                (to_identifier, attributes, metadata) = relation
 
-                    # If the target of the relation is also in the bundle the relation belongs to the bundle
-                    if to_identifier in bundle_records:
-                        bundle_records.update({relation_id: DbRelation(attributes, metadata)})
+                # If the target of the relation is also in the bundle the relation belongs to the bundle
+                if to_identifier in bundle_records:
+                    bundle_records.update({relation_id: DbRelation(attributes, metadata)})
 
-                    elif metadata[METADATA_KEY_PROV_TYPE] == PROV_MENTION:
-                        # prov mentions used to connect between bundles , see w3c bundle links
-                        bundle_records.update({relation_id: DbRelation(attributes, metadata)})
+                elif metadata[METADATA_KEY_PROV_TYPE] == PROV_MENTION:
+                    # prov mentions used to connect between bundles , see w3c bundle links
+                    bundle_records.update({relation_id: DbRelation(attributes, metadata)})
 
-        return list(bundle_records.values())
+        return self._project_records(bundle_records.values(), fields)
 
     def delete_records_by_filter(self, attributes_dict=None, metadata_dict=None):
         """
@@ -382,19 +1604,26 @@ class SimpleInMemoryAdapter(BaseAdapter):
         if len(attributes_dict) == 0 and len(metadata_dict) == 0:
             del self.all_nodes
             self.all_nodes = dict()
-            return True
 
-        # erase only matching nodes
-        records_to_delete = self.get_records_by_filter(attributes_dict, metadata_dict)
+        else:
+            # erase only matching nodes
+            records_to_delete = self.get_records_by_filter(attributes_dict, metadata_dict)
 
-        for record in records_to_delete:
-            if not isinstance(record, DbRecord):
-                continue
-            identifier = record.metadata[METADATA_KEY_IDENTIFIER]
+            for record in records_to_delete:
+                if not isinstance(record, DbRecord):
+                    continue
+                identifier = record.metadata[METADATA_KEY_IDENTIFIER]
 
-            if identifier not in self.all_nodes:
-                raise NotFoundException("We cant find the id ")
-            del self.all_nodes[identifier]
+                if identifier not in self.all_nodes:
+                    raise NotFoundException("We cant find the id ")
+                (attributes, metadata) = self.all_nodes[identifier]
+                self._update_node_types(identifier, metadata, None)
+                self._update_membership_index(metadata, identifier=identifier, remove=True)
+                del self.all_nodes[identifier]
+
+        # log after the change, a compaction that is started by the log must contain the change
+        if self._wal is not None:
+            self._log((WAL_DELETE_RECORDS_BY_FILTER, attributes_dict, metadata_dict))
 
         return True
 
@@ -411,8 +1640,14 @@ class SimpleInMemoryAdapter(BaseAdapter):
         if record_id not in self.all_nodes:
             raise NotFoundException()
 
+        (attributes, metadata) = self.all_nodes[record_id]
+        self._update_node_types(record_id, metadata, None)
+        self._update_membership_index(metadata, identifier=record_id, remove=True)
         del self.all_nodes[record_id]
 
+        if self._wal is not None:
+            self._log((WAL_DELETE_RECORD, record_id))
+
         return True
 
     def delete_relation(self, relation_id):
@@ -425,10 +1660,23 @@ class SimpleInMemoryAdapter(BaseAdapter):
         :rtype: Bool
         """
 
-        for (from_key, relations) in self.all_relations.items():
-            if relation_id in relations:
-                del relations[relation_id]
-                break
+        indexes = self._ensure_relation_index()
+        relation_key = indexes.relation_keys.pop(relation_id, None)
+
+        if relation_key is not None:
+            (to_identifier, attributes, metadata) = self.all_relations[relation_key[0]][relation_id]
+            self._update_membership_index(metadata, relation_id=relation_id, remove=True)
+            del self.all_relations[relation_key[0]][relation_id]
+            del indexes.relation_index[relation_key]
+            type_relations = indexes.relation_types[get_group_key(relation_key[2])]
+            type_relations.discard(relation_id)
+            if len(type_relations) == 0:
+                del indexes.relation_types[get_group_key(relation_key[2])]
+            # the index can only grow, rebuild it without the relation
+            indexes.reachability = None
+
+            if self._wal is not None:
+                self._log((WAL_DELETE_RELATION, relation_id))
 
         return True
     @staticmethod
@@ -0,0 +1,157 @@
+import mmap
+import os
+import pickle
+import struct
+from collections.abc import MutableMapping
+
+from provdbconnector.exceptions.database import DatabaseException
+from provdbconnector.utils.serializer import dumps_pickle
+
+SNAPSHOT_MAGIC = b"PROVSNAP"
+SNAPSHOT_VERSION = 1
+
+# magic, version, offset of the index, length of the index
+SNAPSHOT_HEADER = struct.Struct("<8sIQQ")
+
+
+class LazyRecordMapping(MutableMapping):
+    """
+    Dict like view on the records of a memory mapped snapshot file.
+    The records are unpickled on the first access, changes are kept in memory and never written back to the file
+
+    """
+
+    def __init__(self, buffer, offsets):
+        """
+        :param buffer: The memory mapped snapshot file
+        :type buffer: mmap.mmap
+        :param offsets: The position of each record in the file with the structure `(key, (offset, length))`
+        :type offsets: dict
+        """
+        self._buffer = buffer
+        self._offsets = offsets
+        self._loaded = dict()
+
+    def __getitem__(self, key):
+        if key in self._loaded:
+            return self._loaded[key]
+
+        (offset, length) = self._offsets[key]
+        value = pickle.loads(self._buffer[offset:offset + length])
+        self._loaded[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self._loaded[key] = value
+
+    def __delitem__(self, key):
+        found = False
+        if key in self._loaded:
+            del self._loaded[key]
+            found = True
+        if key in self._offsets:
+            del self._offsets[key]
+            found = True
+        if not found:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self._loaded or key in self._offsets
+
+    def __iter__(self):
+        for key in self._offsets:
+            yield key
+        for key in self._loaded:
+            if key not in self._offsets:
+                yield key
+
+    def __len__(self):
+        return len(self._offsets) + sum(1 for key in self._loaded if key not in self._offsets)
+
+    def __repr__(self):
+        return "<{}: {} records, {} loaded>".format(type(self).__name__, len(self), len(self._loaded))
+
+
+def write_snapshot(path, all_nodes, all_relations, index):
+    """
+    Write the records into a snapshot file.
+
+    The file starts with a fixed size header, followed by the pickled records (one pickle per node and one pickle per
+    relation dict of a start node) and the pickled index with the offsets of the records.
+    The file is written to a temporary file first and then moved to the path.
+
+    :param path: The path of the snapshot file
+    :type path: str
+    :param all_nodes: The nodes with the structure `(identifier, node)`
+    :type all_nodes: dict
+    :param all_relations: The relations with the structure `(start_identifier, (relation_id, relation))`
+    :type all_relations: dict
+    :param index: Additional data that is loaded together with the offsets, for example the adapter indexes
+    :type index: dict
+    """
+    temp_path = "{}.tmp".format(path)
+    with open(temp_path, "wb") as snapshot_file:
+        snapshot_file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, 0))
+
+        node_offsets = dict()
+        for (identifier, node) in all_nodes.items():
+            node_offsets[identifier] = _write_pickle(snapshot_file, node)
+
+        relation_offsets = dict()
+        for (identifier, relations) in all_relations.items():
+            relation_offsets[identifier] = _write_pickle(snapshot_file, relations)
+
+        index = dict(index)
+        index.update({"nodes": node_offsets, "relations": relation_offsets})
+        (index_offset, index_length) = _write_pickle(snapshot_file, index)
+
+        snapshot_file.seek(0)
+        snapshot_file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, index_offset, index_length))
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+
+    os.replace(temp_path, path)
+
+
+def read_snapshot(path):
+    """
+    Memory map the snapshot file, only the index is loaded, the records are loaded on access
+
+    :param path: The path of the snapshot file
+    :type path: str
+    :return: Tuple with (all_nodes, all_relations, index)
+    :rtype: tuple
+    """
+    with open(path, "rb") as snapshot_file:
+        if os.fstat(snapshot_file.fileno()).st_size < SNAPSHOT_HEADER.size:
+            raise DatabaseException("The file {} is not a snapshot".format(path))
+        # the mapping stays valid after the file is closed
+        buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    (magic, version, index_offset, index_length) = SNAPSHOT_HEADER.unpack_from(buffer, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise DatabaseException("The file {} is not a snapshot".format(path))
+    if version != SNAPSHOT_VERSION:
+        raise DatabaseException("Unsupported snapshot version {}".format(version))
+    if index_length == 0:
+        raise DatabaseException("The snapshot {} is incomplete".format(path))
+
+    index = pickle.loads(buffer[index_offset:index_offset + index_length])
+    all_nodes = LazyRecordMapping(buffer, index.pop("nodes"))
+    all_relations = LazyRecordMapping(buffer, index.pop("relations"))
+    return all_nodes, all_relations, index
+
+
+def _write_pickle(snapshot_file, value):
+    """
+    Append the pickled value to the file
+
+    :param snapshot_file: The open snapshot file
+    :param value: The value to pickle
+    :return: Tuple with (offset, length)
+    :rtype: tuple
+    """
+    data = dumps_pickle(value)
+    offset = snapshot_file.tell()
+    snapshot_file.write(data)
+    return offset, len(data)
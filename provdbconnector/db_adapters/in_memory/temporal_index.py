@@ -0,0 +1,156 @@
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+
+# Min size of the unsorted buffer of a run before it is merged into the sorted arrays
+MIN_PENDING = 64
+
+
+class _IntervalRun(object):
+    """
+    The intervals of one length class, sorted by the start time with an unsorted buffer for intervals that are added
+    out of time order
+
+    """
+
+    def __init__(self):
+        self.starts = array("d")
+        """
+        The start times of the intervals in ascending order
+        """
+        self.ends = array("d")
+        """
+        The end times in the same order as the start times
+        """
+        self.keys = list()
+        """
+        The record keys in the same order as the start times
+        """
+        self.pending = list()
+        """
+        The intervals that are not yet merged with the structure `(start, end, key)`
+        """
+        self.max_length = 0.0
+
+    def __len__(self):
+        return len(self.keys) + len(self.pending)
+
+    def add(self, key, start, end):
+        """
+        Append the interval or add it to the buffer, the buffer is merged when it is larger than the square root of
+        the sorted intervals, so an out of order interval costs amortized O(sqrt(n)) instead of an O(n) insert
+
+        """
+        if len(self.starts) == 0 or start >= self.starts[-1]:
+            self.starts.append(start)
+            self.ends.append(end)
+            self.keys.append(key)
+        else:
+            self.pending.append((start, end, key))
+            if len(self.pending) > max(MIN_PENDING, math.sqrt(len(self.keys))):
+                self._merge()
+        self.max_length = max(self.max_length, end - start)
+
+    def _merge(self):
+        """
+        Merge the buffer into the sorted arrays, the sort of the two sorted runs takes linear time
+
+        """
+        entries = list(zip(self.starts, self.ends, self.keys))
+        entries.extend(sorted(self.pending, key=itemgetter(0)))
+        entries.sort(key=itemgetter(0))
+        self.starts = array("d", (start for (start, end, key) in entries))
+        self.ends = array("d", (end for (start, end, key) in entries))
+        self.keys = [key for (start, end, key) in entries]
+        self.pending = list()
+
+    def search(self, start, end):
+        """
+        Returns the keys of the intervals that overlap the time range
+
+        """
+        starts = self.starts
+        ends = self.ends
+        keys = self.keys
+        for position in range(bisect_left(starts, start - self.max_length), bisect_right(starts, end)):
+            if ends[position] >= start:
+                yield keys[position]
+        for (interval_start, interval_end, key) in self.pending:
+            if interval_start <= end and interval_end >= start:
+                yield key
+
+
+class TemporalIndex(object):
+    """
+    Index of the time intervals of the records, see :py:func:`provdbconnector.utils.temporal.get_time_interval`.
+
+    The intervals are partitioned by their length into classes of powers of two and each class is sorted by the
+    start time. A query for all intervals that overlap a time range reads in each class only the intervals that start
+    between the start of the range minus the longest interval of the class and the end of the range. All intervals of a
+    class are at least half as long as the longest, so at most half of the read intervals before the range don't
+    overlap it and one long interval doesn't widen the query over the short intervals.
+    For records that are saved in time order a new interval is appended to the end of its class, the other intervals
+    are buffered and merged in batches.
+
+    The index is never updated in place: a merged record is added again with the new interval, so the caller must
+    check the current interval of each result.
+
+    """
+
+    def __init__(self):
+        """
+        Create an empty index
+
+        """
+        self.runs = dict()
+        """
+        The sorted intervals by the length class with the structure `(length_class, _IntervalRun)`
+        """
+
+    def __len__(self):
+        return sum(len(run) for run in self.runs.values())
+
+    @staticmethod
+    def get_length_class(length):
+        """
+        Returns the length class of an interval, the binary exponent of the length
+
+        :param length: The length of the interval in seconds
+        :type length: float
+        :rtype: int
+        """
+        if length <= 0:
+            return None
+        return math.frexp(length)[1]
+
+    def add(self, key, interval):
+        """
+        Add the interval of a record
+
+        :param key: The key of the record
+        :type key: hashable
+        :param interval: The time interval
+        :type interval: TimeInterval
+        """
+        (start, end) = interval
+        length_class = self.get_length_class(end - start)
+        run = self.runs.get(length_class)
+        if run is None:
+            run = self.runs[length_class] = _IntervalRun()
+        run.add(key, start, end)
+
+    def search(self, start, end):
+        """
+        Returns the keys of the intervals that overlap the time range, a key can be returned multiple times
+
+        :param start: The start of the range in seconds since the epoch
+        :type start: float
+        :param end: The end of the range in seconds since the epoch
+        :type end: float
+        :return: Generator of the keys
+        :rtype: generator
+        """
+        for run in self.runs.values():
+            for key in run.search(start, end):
+                yield key
@@ -0,0 +1,203 @@
+import logging
+import os
+import pickle
+import struct
+import threading
+import zlib
+from collections import namedtuple
+
+from provdbconnector.utils.serializer import dumps_pickle
+
+log = logging.getLogger(__name__)
+
+# fsync after each write
+FSYNC_ALWAYS = "always"
+# fsync once per group commit
+FSYNC_BATCH = "batch"
+# leave the fsync to the operating system
+FSYNC_NEVER = "never"
+
+FSYNC_POLICIES = (FSYNC_ALWAYS, FSYNC_BATCH, FSYNC_NEVER)
+
+# length and crc32 of the pickled (sequence number, entry) tuple
+WAL_FRAME_HEADER = struct.Struct("<II")
+
+# Log entry types
+WAL_SAVE_ELEMENT = "save_element"
+WAL_SAVE_RELATION = "save_relation"
+WAL_DELETE_RECORD = "delete_record"
+WAL_DELETE_RELATION = "delete_relation"
+WAL_DELETE_RECORDS_BY_FILTER = "delete_records_by_filter"
+
+LogContent = namedtuple("LogContent", "entries, valid_length")
+LogEntry = namedtuple("LogEntry", "sequence, entry")
+
+
+class WriteAheadLog(object):
+    """
+    Append only log file for the changes of the in memory adapter.
+
+    Each entry is a pickled tuple with a frame header (length and crc32) and a sequence number, that increases with
+    each entry and is also counted across the rotations of the log. A snapshot stores the sequence number of the last
+    entry it contains, so the replay can skip the entries of an older log. The entries are collected in a buffer and
+    written with one group commit by a background thread every ``group_commit_interval`` seconds, or directly if the
+    buffer contains ``group_commit_size`` entries. With the fsync policy ``always`` each entry is committed directly.
+
+    """
+
+    def __init__(self, path, fsync=FSYNC_BATCH, group_commit_size=128, group_commit_interval=0.01, sequence=0):
+        """
+        Open the log file for appending
+
+        :param path: The path of the log file
+        :type path: str
+        :param fsync: The fsync policy, one of FSYNC_POLICIES
+        :type fsync: str
+        :param group_commit_size: Max number of entries in one group commit
+        :type group_commit_size: int
+        :param group_commit_interval: Max seconds between the append and the commit of an entry
+        :type group_commit_interval: float
+        :param sequence: The sequence number of the last entry, the next entry gets the sequence number + 1
+        :type sequence: int
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError("Unsupported fsync policy {}".format(fsync))
+
+        self.path = path
+        self.fsync = fsync
+        self.group_commit_size = group_commit_size
+        self.group_commit_interval = group_commit_interval
+        self.sequence = sequence
+        """
+        The sequence number of the last appended entry
+        """
+
+        self._lock = threading.Lock()
+        self._buffer = list()
+        self._file = open(path, "ab")
+        self._closed = threading.Event()
+
+        self._flusher = None
+        if fsync != FSYNC_ALWAYS:
+            self._flusher = threading.Thread(target=self._flush_periodically, name="wal-flusher", daemon=True)
+            self._flusher.start()
+
+    @property
+    def size(self):
+        """
+        The size of the log file in bytes, without the uncommitted entries
+
+        :rtype: int
+        """
+        return self._file.tell()
+
+    def append(self, entry):
+        """
+        Append an entry to the log
+
+        :param entry: The entry, a tuple with the entry type as first value
+        :type entry: tuple
+        :return: The sequence number of the entry
+        :rtype: int
+        """
+        with self._lock:
+            self.sequence += 1
+            data = dumps_pickle((self.sequence, entry))
+            self._buffer.append(WAL_FRAME_HEADER.pack(len(data), zlib.crc32(data)) + data)
+            # the background thread commits after the interval, commit here only if the buffer is full
+            if self.fsync == FSYNC_ALWAYS or len(self._buffer) >= self.group_commit_size:
+                self._commit()
+            return self.sequence
+
+    def commit(self):
+        """
+        Write all buffered entries into the file
+
+        """
+        with self._lock:
+            self._commit()
+
+    def _commit(self):
+        """
+        Write the buffer, the caller must hold the lock
+
+        """
+        if len(self._buffer) == 0:
+            return
+
+        self._file.write(b"".join(self._buffer))
+        self._buffer = list()
+        self._file.flush()
+        if self.fsync != FSYNC_NEVER:
+            os.fsync(self._file.fileno())
+
+    def rotate(self, rotated_path):
+        """
+        Commit the buffer and move the log file to rotated_path, the new entries are written to an empty log file
+
+        :param rotated_path: The new path of the current log file
+        :type rotated_path: str
+        """
+        with self._lock:
+            self._commit()
+            self._file.close()
+            os.replace(self.path, rotated_path)
+            self._file = open(self.path, "ab")
+
+    def close(self):
+        """
+        Commit the buffer and close the file
+
+        """
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+
+        with self._lock:
+            if not self._file.closed:
+                self._commit()
+                if self.fsync == FSYNC_NEVER:
+                    os.fsync(self._file.fileno())
+                self._file.close()
+
+    def _flush_periodically(self):
+        """
+        Background thread to commit the buffered entries after the group commit interval
+
+        """
+        while not self._closed.wait(self.group_commit_interval):
+            with self._lock:
+                if len(self._buffer) > 0 and not self._file.closed:
+                    self._commit()
+
+
+def read_log(path):
+    """
+    Read the entries of a log file, a truncated or corrupt entry at the end of the file (for example after a crash
+    during the write) ends the log
+
+    :param path: The path of the log file
+    :type path: str
+    :return: The entries with their sequence numbers and the length of the valid part of the file
+    :rtype: LogContent
+    """
+    with open(path, "rb") as log_file:
+        content = log_file.read()
+
+    entries = list()
+    position = 0
+    while position < len(content):
+        if position + WAL_FRAME_HEADER.size > len(content):
+            log.warning("Ignore truncated entry at the end of the log {}".format(path))
+            break
+        (length, checksum) = WAL_FRAME_HEADER.unpack_from(content, position)
+        start = position + WAL_FRAME_HEADER.size
+        data = content[start:start + length]
+        if len(data) != length or zlib.crc32(data) != checksum:
+            log.warning("Ignore corrupt entry at the end of the log {}".format(path))
+            break
+
+        entries.append(LogEntry(*pickle.loads(data)))
+        position = start + length
+
+    return LogContent(entries, position)
@@ -0,0 +1 @@
+from provdbconnector.db_adapters.key_value.key_value_adapter import KeyValueAdapter
@@ -0,0 +1,937 @@
+import logging
+import pickle
+import struct
+
+from prov.constants import PROV_ASSOCIATION, PROV_MENTION, PROV_TYPE
+
+from provdbconnector.db_adapters.baseadapter import BaseAdapter, DbRecord, DbRelation, DbBulkResult, DbPage, \
+    METADATA_KEY_IDENTIFIER, METADATA_KEY_PROV_TYPE, LINEAGE_UPSTREAM, PROJECTION_METADATA_KEYS
+from provdbconnector.db_adapters.key_value.stores import open_store
+from provdbconnector.exceptions.database import InvalidOptionsException, NotFoundException, DatabaseException
+from provdbconnector.utils.serializer import encode_dict_values_to_primitive, merge_record, get_relation_merge_key, \
+    get_projection, encode_projected_dict_values_to_primitive, dumps_pickle
+from provdbconnector.utils.traversal import find_shortest_path
+
+log = logging.getLogger(__name__)
+
+# Supported options of the connect function
+KEY_VALUE_OPTIONS = ("path", "backend", "map_size")
+
+# Keyspaces, each key starts with one prefix byte
+NODE_ID_KEY = b"i"  # + identifier -> interned node id
+NODE_KEY = b"n"  # + node id -> node value
+RELATION_KEY = b"r"  # + relation id -> relation value
+MERGE_KEY = b"m"  # + merge key digest -> relation id
+OUTGOING_KEY = b"o"  # + start node id + relation id -> end node id
+INCOMING_KEY = b"c"  # + end node id + relation id -> start node id
+BUNDLE_KEY = b"b"  # + bundle node id + relation id -> member node id
+COUNTER_KEY = b"s"  # + counter name -> last id
+
+KEYSPACES = (NODE_ID_KEY, NODE_KEY, RELATION_KEY, MERGE_KEY, OUTGOING_KEY, INCOMING_KEY, BUNDLE_KEY)
+
+# big endian, so the keys of a keyspace are ordered by the id
+ID_FORMAT = struct.Struct(">Q")
+
+# length of the pickled metadata and attributes, followed by the metadata and the attributes
+NODE_HEADER = struct.Struct("<II")
+# start node id, end node id, merge key digest, length of the pickled metadata and attributes
+RELATION_HEADER = struct.Struct("<QQ20sII")
+
+
+class KeyValueAdapter(BaseAdapter):
+    """
+    Adapter for an embedded key value store, LMDB if the lmdb package is installed and a dbm file otherwise.
+
+    The node identifiers are interned to integer ids, the keys of the records and of the adjacency lists
+    (outgoing and incoming relations, bundle members) are built from these ids. Each adjacency entry has an own key
+    with the node id and the relation id, so a new relation writes only its entries and the adjacency list of a node
+    is read with a prefix scan. The values have a small binary header
+    with the lengths of the pickled metadata and attributes, so the metadata for a filter is decoded without the
+    attributes, with LMDB directly from the memory mapped file.
+
+    .. code:: python
+
+        prov_api = ProvDb(adapter=KeyValueAdapter, auth_info={"path": "prov.lmdb"})
+
+    """
+
+    def __init__(self, *args):
+        """
+        Setup the class
+
+        :param args: None
+        """
+        super(KeyValueAdapter, self).__init__()
+        self.store = None
+
+    def connect(self, authentication_info):
+        """
+        Open the key value store
+
+        :param authentication_info: Dict with the "path" of the database file and optionally the "backend"
+                                    ("lmdb" or "dbm") and the "map_size" of a lmdb database in bytes
+        :type authentication_info: dict
+        :return: True
+        :rtype: bool
+        :raises: InvalidOptionsException
+        """
+        if not isinstance(authentication_info, dict) or "path" not in authentication_info:
+            raise InvalidOptionsException("The path of the database is required")
+
+        unknown_options = set(authentication_info.keys()) - set(KEY_VALUE_OPTIONS)
+        if len(unknown_options) > 0:
+            raise InvalidOptionsException("Unknown options {}".format(", ".join(sorted(unknown_options))))
+
+        store = open_store(**authentication_info)
+
+        self.close()
+        self.store = store
+        return True
+
+    def close(self):
+        """
+        Close the key value store
+
+        """
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def _begin(self, write=False):
+        """
+        Start a transaction on the store
+
+        :param write: True for a write transaction
+        :type write: bool
+        :return: The transaction as context manager
+        """
+        if self.store is None:
+            raise DatabaseException("The adapter is not connected")
+        return self.store.begin(write=write)
+
+    def save_element(self, attributes, metadata):
+        """
+        Store a single node in the database and if necessary and possible merge the node
+
+        :param attributes: The actual provenance data
+        :type attributes: dict
+        :param metadata: Some metadata that are not PROV-O related
+        :type metadata: dict
+        :return: id of the record
+        :rtype: str
+        """
+        with self._begin(write=True) as transaction:
+            return self._save_element(transaction, attributes, metadata)
+
+    def save_relation(self, from_node, to_node, attributes, metadata):
+        """
+        Store a single relation in the database, relations with the same start and end node, the same prov type and
+        the same formal attributes are merged
+
+        :param from_node: The identifier for the start node
+        :type from_node: prov.model.Identifier
+        :param to_node: The identifier for the end node
+        :type to_node: prov.model.Identifier
+        :param attributes: The actual provenance data
+        :type attributes: dict
+        :param metadata: Some metadata that are not PROV-O related
+        :type metadata: dict
+        :return: The id of the relation
+        :rtype: str
+        """
+        with self._begin(write=True) as transaction:
+            return self._save_relation(transaction, from_node, to_node, attributes, metadata)
+
+    def save_bulk(self, elements, relations):
+        """
+        Saves a batch of elements and relations in one write transaction, a failed merge discards the whole batch
+
+        :param elements: The elements as list of DbRecord(attributes, metadata)
+        :type elements: list
+        :param relations: The relations as list of DbBulkRelation(from_node, to_node, attributes, metadata)
+        :type relations: list
+        :return: The ids of the elements and relations in the same order as the input
+        :rtype: DbBulkResult
+        """
+        with self._begin(write=True) as transaction:
+            element_ids = [self._save_element(transaction, attributes, metadata) for (attributes, metadata) in
+                           elements]
+            relation_ids = [self._save_relation(transaction, from_node, to_node, attributes, metadata) for
+                            (from_node, to_node, attributes, metadata) in relations]
+        return DbBulkResult(element_ids, relation_ids)
+
+    def _save_element(self, transaction, attributes, metadata):
+        """
+        Insert or merge the node, see :py:meth:`save_element`
+
+        :param transaction: The write transaction
+        :param attributes: The actual provenance data
+        :type attributes: dict
+        :param metadata: Some metadata that are not PROV-O related
+        :type metadata: dict
+        :return: id of the record
+        :rtype: str
+        """
+        identifier = str(metadata[METADATA_KEY_IDENTIFIER])
+        key = NODE_KEY + ID_FORMAT.pack(self._get_node_id(transaction, identifier, create=True))
+
+        stored = transaction.get(key)
+        if stored is not None:
+            (header, metadata_view, attributes_view) = _unpack_value(stored, NODE_HEADER)
+            (old_attributes, old_metadata) = (pickle.loads(attributes_view), pickle.loads(metadata_view))
+            (attributes, metadata) = merge_record(old_attributes, old_metadata, attributes, metadata)
+            if attributes is old_attributes and metadata is old_metadata:
+                return identifier
+
+        transaction.put(key, _pack_value(NODE_HEADER, (), attributes, metadata))
+        return identifier
+
+    def _save_relation(self, transaction, from_node, to_node, attributes, metadata):
+        """
+        Insert or merge the relation, see :py:meth:`save_relation`
+
+        :param transaction: The write transaction
+        :param from_node: The identifier for the start node
+        :type from_node: prov.model.Identifier
+        :param to_node: The identifier for the end node
+        :type to_node: prov.model.Identifier
+        :param attributes: The actual provenance data
+        :type attributes: dict
+        :param metadata: Some metadata that are not PROV-O related
+        :type metadata: dict
+        :return: The id of the relation
+        :rtype: str
+        """
+        digest = bytes.fromhex(get_relation_merge_key(from_node, to_node, attributes, metadata))
+
+        stored_id = transaction.get(MERGE_KEY + digest)
+        if stored_id is not None:
+            relation_id = ID_FORMAT.unpack(stored_id)[0]
+            key = RELATION_KEY + ID_FORMAT.pack(relation_id)
+            (header, metadata_view, attributes_view) = _unpack_value(transaction.get(key), RELATION_HEADER)
+            (old_attributes, old_metadata) = (pickle.loads(attributes_view), pickle.loads(metadata_view))
+            (merged_attributes, merged_metadata) = merge_record(old_attributes, old_metadata, attributes, metadata)
+            if merged_attributes is not old_attributes or merged_metadata is not old_metadata:
+                transaction.put(key, _pack_value(RELATION_HEADER, header, merged_attributes, merged_metadata))
+            return str(relation_id)
+
+        from_id = self._get_node_id(transaction, str(from_node), create=True)
+        to_id = self._get_node_id(transaction, str(to_node), create=True)
+        relation_id = self._next_id(transaction, b"relation")
+
+        transaction.put(RELATION_KEY + ID_FORMAT.pack(relation_id),
+                        _pack_value(RELATION_HEADER, (from_id, to_id, digest), attributes, metadata))
+        transaction.put(MERGE_KEY + digest, ID_FORMAT.pack(relation_id))
+        self._add_adjacency(transaction, OUTGOING_KEY, from_id, to_id, relation_id)
+        self._add_adjacency(transaction, INCOMING_KEY, to_id, from_id, relation_id)
+        if metadata.get(METADATA_KEY_PROV_TYPE) == PROV_ASSOCIATION and str(
+                attributes.get(PROV_TYPE)) == "prov:bundleAssociation":
+            self._add_adjacency(transaction, BUNDLE_KEY, to_id, from_id, relation_id)
+
+        return str(relation_id)
+
+    @staticmethod
+    def _next_id(transaction, name):
+        """
+        Increment the counter and return the new id
+
+        :param transaction: The write transaction
+        :param name: The name of the counter
+        :type name: bytes
+        :return: The new id
+        :rtype: int
+        """
+        key = COUNTER_KEY + name
+        value = transaction.get(key)
+        next_id = ID_FORMAT.unpack(value)[0] + 1 if value is not None else 1
+        transaction.put(key, ID_FORMAT.pack(next_id))
+        return next_id
+
+    def _get_node_id(self, transaction, identifier, create=False):
+        """
+        Returns the interned id of the node identifier
+
+        :param transaction: The transaction, a write transaction if create is True
+        :param identifier: The node identifier
+        :type identifier: str
+        :param create: Create the id if the identifier is unknown
+        :type create: bool
+        :return: The node id or None
+        :rtype: int
+        """
+        key = NODE_ID_KEY + identifier.encode("utf-8")
+        value = transaction.get(key)
+        if value is not None:
+            return ID_FORMAT.unpack(value)[0]
+        if not create:
+            return None
+
+        node_id = self._next_id(transaction, b"node")
+        transaction.put(key, ID_FORMAT.pack(node_id))
+        return node_id
+
+    @staticmethod
+    def _get_adjacency(transaction, keyspace, node_id):
+        """
+        Returns the entries of an adjacency list with a prefix scan over the keys of the node
+
+        :param transaction: The transaction
+        :param keyspace: One of OUTGOING_KEY, INCOMING_KEY or BUNDLE_KEY
+        :type keyspace: bytes
+        :param node_id: The node id
+        :type node_id: int
+        :return: List of (node id, relation id) tuples
+        :rtype: list
+        """
+        prefix = keyspace + ID_FORMAT.pack(node_id)
+        entries = list()
+        for key in transaction.keys(prefix):
+            (relation_id,) = ID_FORMAT.unpack_from(key, len(prefix))
+            (other_id,) = ID_FORMAT.unpack(transaction.get(key))
+            entries.append((other_id, relation_id))
+        return entries
+
+    @staticmethod
+    def _add_adjacency(transaction, keyspace, node_id, other_id, relation_id):
+        """
+        Add an entry to an adjacency list, each entry has an own key so the other entries are not rewritten
+
+        :param transaction: The write transaction
+        :param keyspace: One of OUTGOING_KEY, INCOMING_KEY or BUNDLE_KEY
+        :type keyspace: bytes
+        :param node_id: The node id of the list
+        :type node_id: int
+        :param other_id: The node id on the other side of the relation
+        :type other_id: int
+        :param relation_id: The relation id
+        :type relation_id: int
+        """
+        transaction.put(keyspace + ID_FORMAT.pack(node_id) + ID_FORMAT.pack(relation_id), ID_FORMAT.pack(other_id))
+
+    @staticmethod
+    def _remove_adjacency(transaction, keyspace, node_id, relation_id):
+        """
+        Remove the entry of the relation from an adjacency list
+
+        :param transaction: The write transaction
+        :param keyspace: One of OUTGOING_KEY, INCOMING_KEY or BUNDLE_KEY
+        :type keyspace: bytes
+        :param node_id: The node id of the list
+        :type node_id: int
+        :param relation_id: The relation id
+        :type relation_id: int
+        """
+        transaction.delete(keyspace + ID_FORMAT.pack(node_id) + ID_FORMAT.pack(relation_id))
+
+    @staticmethod
+    def _get_node_record(transaction, node_id, projection=None):
+        """
+        Returns the decoded node or None
+
+        :param transaction: The transaction
+        :param node_id: The node id
+        :type node_id: int
+        :param projection: The attribute keys, see get_projection, None for the whole node
+        :type projection: frozenset
+        :rtype: DbRecord
+        """
+        value = transaction.get(NODE_KEY + ID_FORMAT.pack(node_id))
+        if value is None:
+            return None
+        (header, metadata_view, attributes_view) = _unpack_value(value, NODE_HEADER)
+        return DbRecord(*_decode_views(attributes_view, metadata_view, projection))
+
+    @staticmethod
+    def _get_relation_record(transaction, relation_id, projection=None):
+        """
+        Returns the decoded relation or None
+
+        :param transaction: The transaction
+        :param relation_id: The relation id
+        :type relation_id: int
+        :param projection: The attribute keys, see get_projection, None for the whole relation
+        :type projection: frozenset
+        :rtype: DbRelation
+        """
+        value = transaction.get(RELATION_KEY + ID_FORMAT.pack(relation_id))
+        if value is None:
+            return None
+        (header, metadata_view, attributes_view) = _unpack_value(value, RELATION_HEADER)
+        return DbRelation(*_decode_views(attributes_view, metadata_view, projection))
+
+    def get_record(self, record_id):
+        """
+        Return a single record
+
+        :param record_id: The identifier of the node
+        :type record_id: str
+        :return: DbRecord
+        :rtype: DbRecord
+        """
+        with self._begin() as transaction:
+            node_id = self._get_node_id(transaction, str(record_id))
+            record = self._get_node_record(transaction, node_id) if node_id is not None else None
+        if record is None:
+            raise NotFoundException("Record {} not found".format(record_id))
+        return record
+
+    def get_relation(self, relation_id):
+        """
+        Return a single relation
+
+        :param relation_id: The id of the relation
+        :type relation_id: str
+        :return: DbRelation
+        :rtype: DbRelation
+        """
+        with self._begin() as transaction:
+            relation = self._get_relation_record(transaction, _parse_relation_id(relation_id))
+        if relation is None:
+            raise NotFoundException("Relation {} not found".format(relation_id))
+        return relation
+
+    def _filter_nodes(self, transaction, attributes_dict, metadata_dict):
+        """
+        Returns the nodes that match the filter, the attributes are only decoded if the metadata matches
+
+        :param transaction: The transaction
+        :param attributes_dict: A filter dict with a conjunction of all values in the attributes_dict and metadata_dict
+        :type attributes_dict: dict
+        :param metadata_dict: A filter for the metadata with a conjunction of all values (also in the attributes_dict )
+        :type metadata_dict: dict
+        :return: The matching nodes with the structure `(node_id, DbRecord)`
+        :rtype: dict
+        """
+        attributes_filter = encode_dict_values_to_primitive(attributes_dict or dict())
+        metadata_filter = encode_dict_values_to_primitive(metadata_dict or dict())
+
+        if METADATA_KEY_IDENTIFIER in metadata_filter:
+            # point lookup over the interned identifier
+            node_id = self._get_node_id(transaction, metadata_filter[METADATA_KEY_IDENTIFIER])
+            node_ids = [node_id] if node_id is not None else list()
+        else:
+            node_ids = [ID_FORMAT.unpack(key[len(NODE_KEY):])[0] for key in transaction.keys(NODE_KEY)]
+
+        matched = dict()
+        for node_id in node_ids:
+            record = self._match_node(transaction, node_id, attributes_filter, metadata_filter)
+            if record is not None:
+                matched[node_id] = record
+        return matched
+
+    @staticmethod
+    def _match_node(transaction, node_id, attributes_filter, metadata_filter):
+        """
+        Returns the node if it matches the encoded filters, the attributes are only decoded if the metadata matches
+
+        :param transaction: The transaction
+        :param node_id: The node id
+        :type node_id: int
+        :param attributes_filter: The encoded attributes filter
+        :type attributes_filter: dict
+        :param metadata_filter: The encoded metadata filter
+        :type metadata_filter: dict
+        :return: The node or None
+        :rtype: DbRecord
+        """
+        value = transaction.get(NODE_KEY + ID_FORMAT.pack(node_id))
+        if value is None:
+            return None
+        (header, metadata_view, attributes_view) = _unpack_value(value, NODE_HEADER)
+
+        metadata = _decode_view(metadata_view)
+        if not _match_filter(metadata, metadata_filter):
+            return None
+        attributes = _decode_view(attributes_view)
+        if not _match_filter(attributes, attributes_filter):
+            return None
+        return DbRecord(attributes, metadata)
+
+    def get_records_by_filter(self, attributes_dict=None, metadata_dict=None, fields=None):
+        """
+        Filter all nodes based on the provided attributes and metadata dict, the result contains the matching nodes
+        and the relations between them
+
+        :param attributes_dict: A filter dict with a conjunction of all values in the attributes_dict and metadata_dict
+        :type attributes_dict: dict
+        :param metadata_dict: A filter for the metadata with a conjunction of all values (also in the attributes_dict )
+        :type metadata_dict: dict
+        :param fields: The attribute keys of the records, see :py:meth:`BaseAdapter.get_records_by_filter`
+        :type fields: list(str or prov.model.QualifiedName)
+        :return: The list of matching relations and nodes
+        :rtype: List(DbRecord or Dbrelation)
+        """
+        projection = get_projection(fields)
+        with self._begin() as transaction:
+            matched = self._filter_nodes(transaction, attributes_dict, metadata_dict)
+
+            records = [_project_record(record, projection) for record in matched.values()]
+            for node_id in matched:
+                for (to_id, relation_id) in self._get_adjacency(transaction, OUTGOING_KEY, node_id):
+                    if to_id in matched:
+                        records.append(self._get_relation_record(transaction, relation_id, projection))
+        return records
+
+    def get_records_by_filter_page(self, attributes_dict=None, metadata_dict=None, limit=1000, after=None,
+                                   fields=None):
+        """
+        Returns one page of the matching nodes and their relations, see
+        :py:meth:`BaseAdapter.get_records_by_filter_page`. The nodes are read in the order of the interned identifier
+        keys, the utf-8 keys have the same order as the identifiers. With LMDB the page starts with a seek to the
+        key after the last identifier.
+
+        :param attributes_dict: A filter dict with a conjunction of all values in the attributes_dict and metadata_dict
+        :type attributes_dict: dict
+        :param metadata_dict: A filter for the metadata with a conjunction of all values (also in the attributes_dict )
+        :type metadata_dict: dict
+        :param limit: The max number of nodes in the page
+        :type limit: int
+        :param after: The last identifier of the previous page, None for the first page
+        :type after: str
+        :param fields: The attribute keys of the records, see :py:meth:`BaseAdapter.get_records_by_filter`
+        :type fields: list(str or prov.model.QualifiedName)
+        :return: The nodes and relations of the page and the identifier of the last node if there are more pages
+        :rtype: DbPage
+        """
+        projection = get_projection(fields)
+        attributes_filter = encode_dict_values_to_primitive(attributes_dict or dict())
+        metadata_filter = encode_dict_values_to_primitive(metadata_dict or dict())
+        # the smallest key after the last identifier
+        start = None if after is None else NODE_ID_KEY + str(after).encode("utf-8") + b"\x00"
+
+        with self._begin() as transaction:
+            # one more node to know if there is a next page
+            page = list()
+            for key in transaction.keys(NODE_ID_KEY, start=start):
+                node_id = ID_FORMAT.unpack(transaction.get(key))[0]
+                record = self._match_node(transaction, node_id, attributes_filter, metadata_filter)
+                if record is not None:
+                    page.append((key[len(NODE_ID_KEY):].decode("utf-8"), node_id, record))
+                    if len(page) > limit:
+                        break
+
+            last_identifier = None
+            if len(page) > limit:
+                page = page[:limit]
+                last_identifier = page[-1][0]
+
+            records = [_project_record(record, projection) for (identifier, node_id, record) in page]
+            matched = dict()
+            for (identifier, node_id, record) in page:
+                for (to_id, relation_id) in self._get_adjacency(transaction, OUTGOING_KEY, node_id):
+                    if to_id not in matched:
+                        matched[to_id] = self._match_node(transaction, to_id, attributes_filter,
+                                                          metadata_filter) is not None
+                    if matched[to_id]:
+                        records.append(self._get_relation_record(transaction, relation_id, projection))
+        return DbPage(records, last_identifier)
+
+    def get_records_tail(self, attributes_dict=None, metadata_dict=None, depth=None, fields=None):
+        """
+        Return the provenance based on a filter combination.
+        The filter dicts are only relevant for the start nodes, from there the outgoing relations are traversed
+
+        :param attributes_dict: A filter dict with a conjunction of all values in the attributes_dict and metadata_dict
+        :type attributes_dict: dict
+        :param metadata_dict: A filter for the metadata with a conjunction of all values (also in the attributes_dict )
+        :type metadata_dict: dict
+        :param depth: The level of detail, default to infinite
+        :type depth: int
+        :param fields: The attribute keys of the records, see :py:meth:`BaseAdapter.get_records_by_filter`
+        :type fields: list(str or prov.model.QualifiedName)
+        :return: A list of DbRelations and DbRecords
+        :rtype: list(DbRelation or DbRecord)
+        """
+        if depth is not None and depth <= 0:
+            return list()
+
+        projection = get_projection(fields)
+        result_records = dict()
+        with self._begin() as transaction:
+            frontier = list(self._filter_nodes(transaction, attributes_dict, metadata_dict).keys())
+            visited = set(frontier)
+            current_depth = 0
+            # breadth first, so each node is expanded with its shortest distance to a start node
+            while len(frontier) > 0 and current_depth != depth:
+                current_depth += 1
+                next_frontier = list()
+                for node_id in frontier:
+                    for (to_id, relation_id) in self._get_adjacency(transaction, OUTGOING_KEY, node_id):
+                        if ("node", to_id) not in result_records:
+                            record = self._get_node_record(transaction, to_id, projection)
+                            if record is not None:
+                                result_records[("node", to_id)] = record
+                        result_records[("relation", relation_id)] = self._get_relation_record(
+                            transaction, relation_id, projection)
+
+                        if to_id not in visited:
+                            visited.add(to_id)
+                            next_frontier.append(to_id)
+                frontier = next_frontier
+        return list(result_records.values())
+
+    def get_lineage(self, identifier, direction=LINEAGE_UPSTREAM, relation_types=None, max_depth=None):
+        """
+        Breadth first traversal over the outgoing (upstream) or incoming (downstream) adjacency lists,
+        see :py:meth:`BaseAdapter.get_lineage`. The attributes of a relation are only decoded if the type matches.
+
+        :param identifier: The identifier of the start node
+        :type identifier: str
+        :param direction: LINEAGE_UPSTREAM or LINEAGE_DOWNSTREAM
+        :type direction: str
+        :param relation_types: The prov types of the relations to follow, default to all relations
+        :type relation_types: list(prov.model.QualifiedName)
+        :param max_depth: The max number of relations between the start node and a result node, default to infinite
+        :type max_depth: int
+        :return: A list of DbRelations and DbRecords, the first record is the start node
+        :rtype: list(DbRelation or DbRecord)
+        """
+        keyspace = OUTGOING_KEY if direction == LINEAGE_UPSTREAM else INCOMING_KEY
+        type_keys = None if relation_types is None else set(str(prov_type) for prov_type in relation_types)
+
+        with self._begin() as transaction:
+            start_id = self._get_node_id(transaction, str(identifier))
+            start_record = self._get_node_record(transaction, start_id) if start_id is not None else None
+            if start_record is None:
+                raise NotFoundException("Record {} not found".format(identifier))
+
+            records = [start_record]
+            visited = {start_id}
+            frontier = [start_id]
+            depth = 0
+            while len(frontier) > 0 and depth != max_depth:
+                depth += 1
+                next_frontier = list()
+                for node_id in frontier:
+                    for (other_id, relation_id) in self._get_adjacency(transaction, keyspace, node_id):
+                        value = transaction.get(RELATION_KEY + ID_FORMAT.pack(relation_id))
+                        (header, metadata_view, attributes_view) = _unpack_value(value, RELATION_HEADER)
+                        metadata = pickle.loads(metadata_view)
+                        if type_keys is not None and str(metadata[METADATA_KEY_PROV_TYPE]) not in type_keys:
+                            continue
+                        attributes = _decode_view(attributes_view)
+                        if metadata[METADATA_KEY_PROV_TYPE] == PROV_ASSOCIATION and str(
+                                attributes.get(str(PROV_TYPE))) == "prov:bundleAssociation":
+                            continue
+
+                        records.append(DbRelation(attributes, encode_dict_values_to_primitive(metadata)))
+                        if other_id in visited:
+                            continue
+                        visited.add(other_id)
+                        next_frontier.append(other_id)
+
+                        record = self._get_node_record(transaction, other_id)
+                        if record is not None:
+                            records.append(record)
+                frontier = next_frontier
+        return records
+
+    def get_path(self, from_identifier, to_identifier, max_depth=None, relation_types=None, directed=True):
+        """
+        Bidirectional breadth first search over the adjacency lists, see :py:meth:`BaseAdapter.get_path`
+
+        :param from_identifier: The identifier of the start node
+        :type from_identifier: str
+        :param to_identifier: The identifier of the end node
+        :type to_identifier: str
+        :param max_depth: The max number of relations in the path, default to infinite
+        :type max_depth: int
+        :param relation_types: The prov types of the relations to follow, default to all relations
+        :type relation_types: list(prov.model.QualifiedName)
+        :param directed: Follow the relations only in their direction
+        :type directed: bool
+        :return: The DbRecords and DbRelations in the order of the path or an empty list
+        :rtype: list(DbRelation or DbRecord)
+        """
+        type_keys = None if relation_types is None else set(str(prov_type) for prov_type in relation_types)
+
+        with self._begin() as transaction:
+            node_ids = list()
+            for identifier in (from_identifier, to_identifier):
+                node_id = self._get_node_id(transaction, str(identifier))
+                if node_id is None or self._get_node_record(transaction, node_id) is None:
+                    raise NotFoundException("Record {} not found".format(identifier))
+                node_ids.append(node_id)
+
+            def get_relation(relation_id):
+                value = transaction.get(RELATION_KEY + ID_FORMAT.pack(relation_id))
+                (header, metadata_view, attributes_view) = _unpack_value(value, RELATION_HEADER)
+                metadata = pickle.loads(metadata_view)
+                if type_keys is not None and str(metadata[METADATA_KEY_PROV_TYPE]) not in type_keys:
+                    return None
+                attributes = _decode_view(attributes_view)
+                if metadata[METADATA_KEY_PROV_TYPE] == PROV_ASSOCIATION and str(
+                        attributes.get(str(PROV_TYPE))) == "prov:bundleAssociation":
+                    return None
+                return DbRelation(attributes, encode_dict_values_to_primitive(metadata))
+
+            def expand(frontier, forward):
+                keyspaces = (OUTGOING_KEY if forward else INCOMING_KEY,)
+                if not directed:
+                    keyspaces = (OUTGOING_KEY, INCOMING_KEY)
+                for node_id in frontier:
+                    for keyspace in keyspaces:
+                        for (other_id, relation_id) in self._get_adjacency(transaction, keyspace, node_id):
+                            relation = get_relation(relation_id)
+                            if relation is not None:
+                                yield node_id, other_id, relation
+
+            path = find_shortest_path(node_ids[0], node_ids[1], lambda frontier: expand(frontier, True),
+                                      lambda frontier: expand(frontier, False), max_depth)
+            if path is None:
+                return list()
+
+            records = list()
+            for (position, node_id) in enumerate(path.nodes):
+                if position > 0:
+                    records.append(path.edges[position - 1])
+                records.append(self._get_node_record(transaction, node_id))
+        return records
+
+    def get_bundle_records(self, bundle_identifier, fields=None):
+        """
+        Get the records for a specific bundle identifier
+
+        This include all nodes that have a relation of the prov:type = prov:bundleAssociation and also
+        all relation where the start and end node are in the bundle.
+        Also the prov mentionOf relations where the start node is in the bundle are included.
+        See https://www.w3.org/TR/prov-links/
+
+        :param bundle_identifier: The identifier of the bundle
+        :type bundle_identifier: prov.model.Identifier
+        :param fields: The attribute keys of the records, see :py:meth:`BaseAdapter.get_records_by_filter`
+        :type fields: list(str or prov.model.QualifiedName)
+        :return: The list with the bundle nodes and all connections where the start node and end node in the bundle.
+        :rtype: list(DbRelation or DbRecord )
+        """
+        projection = get_projection(fields)
+        with self._begin() as transaction:
+            bundle_id = self._get_node_id(transaction, str(bundle_identifier))
+            if bundle_id is None:
+                return list()
+
+            members = dict()
+            for (member_id, relation_id) in self._get_adjacency(transaction, BUNDLE_KEY, bundle_id):
+                record = self._get_node_record(transaction, member_id, projection)
+                if record is not None:
+                    members[member_id] = record
+
+            records = list(members.values())
+            for member_id in members:
+                for (to_id, relation_id) in self._get_adjacency(transaction, OUTGOING_KEY, member_id):
+                    value = transaction.get(RELATION_KEY + ID_FORMAT.pack(relation_id))
+                    (header, metadata_view, attributes_view) = _unpack_value(value, RELATION_HEADER)
+                    metadata = pickle.loads(metadata_view)
+
+                    # prov mentions are used to connect between bundles, see w3c bundle links
+                    if to_id in members or metadata[METADATA_KEY_PROV_TYPE] == PROV_MENTION:
+                        records.append(DbRelation(
+                            _decode_view(attributes_view, projection),
+                            encode_projected_dict_values_to_primitive(
+                                metadata, None if projection is None else PROJECTION_METADATA_KEYS)))
+        return records
+
+    def _delete_relation(self, transaction, relation_id):
+        """
+        Delete the relation with the merge key and the adjacency entries
+
+        :param transaction: The write transaction
+        :param relation_id: The relation id
+        :type relation_id: int
+        :return: True if the relation existed
+        :rtype: bool
+        """
+        key = RELATION_KEY + ID_FORMAT.pack(relation_id)
+        value = transaction.get(key)
+        if value is None:
+            return False
+
+        (from_id, to_id, digest) = RELATION_HEADER.unpack_from(value)[:3]
+        transaction.delete(key)
+        transaction.delete(MERGE_KEY + digest)
+        self._remove_adjacency(transaction, OUTGOING_KEY, from_id, relation_id)
+        self._remove_adjacency(transaction, INCOMING_KEY, to_id, relation_id)
+        self._remove_adjacency(transaction, BUNDLE_KEY, to_id, relation_id)
+        return True
+
+    def _delete_node(self, transaction, node_id):
+        """
+        Delete the node and all its relations
+
+        :param transaction: The write transaction
+        :param node_id: The node id
+        :type node_id: int
+        """
+        for keyspace in (OUTGOING_KEY, INCOMING_KEY):
+            for (other_id, relation_id) in self._get_adjacency(transaction, keyspace, node_id):
+                self._delete_relation(transaction, relation_id)
+        transaction.delete(NODE_KEY + ID_FORMAT.pack(node_id))
+
+    def delete_records_by_filter(self, attributes_dict=None, metadata_dict=None):
+        """
+        Delete a set of records based on filter conditions, the relations of the deleted nodes are also deleted
+
+        :param attributes_dict: A filter dict with a conjunction of all values in the attributes_dict and metadata_dict
+        :type attributes_dict: dict
+        :param metadata_dict: A filter for the metadata with a conjunction of all values (also in the attributes_dict )
+        :type metadata_dict: dict
+        :return: The result of the operation
+        :rtype: Bool
+        """
+        with self._begin(write=True) as transaction:
+            if not attributes_dict and not metadata_dict:
+                # erase all if no filter set, the counters are kept so the relation ids are not reused
+                for keyspace in KEYSPACES:
+                    for key in list(transaction.keys(keyspace)):
+                        transaction.delete(key)
+                return True
+
+            for node_id in self._filter_nodes(transaction, attributes_dict, metadata_dict):
+                self._delete_node(transaction, node_id)
+        return True
+
+    def delete_record(self, record_id):
+        """
+        Delete a single record and its relations
+
+        :param record_id: The node id
+        :type record_id: str
+        :return: Result of the delete operation
+        :rtype: Bool
+        """
+        with self._begin(write=True) as transaction:
+            node_id = self._get_node_id(transaction, str(record_id))
+            if node_id is None or transaction.get(NODE_KEY + ID_FORMAT.pack(node_id)) is None:
+                raise NotFoundException("Record {} not found".format(record_id))
+            self._delete_node(transaction, node_id)
+        return True
+
+    def delete_relation(self, relation_id):
+        """
+        Delete the relation
+
+        :param relation_id: The relation id
+        :type relation_id: str
+        :return: Result of the delete operation
+        :rtype: Bool
+        """
+        relation_id = _parse_relation_id(relation_id)
+        with self._begin(write=True) as transaction:
+            self._delete_relation(transaction, relation_id)
+        return True
+
+
+def _pack_value(header, fields, attributes, metadata):
+    """
+    Encode a node or relation value: the header fields, the lengths and the pickled metadata and attributes
+
+    :param header: NODE_HEADER or RELATION_HEADER
+    :type header: struct.Struct
+    :param fields: The header fields before the lengths
+    :type fields: tuple
+    :param attributes: The actual provenance data
+    :type attributes: dict
+    :param metadata: Some metadata that are not PROV-O related
+    :type metadata: dict
+    :return: The encoded value
+    :rtype: bytes
+    """
+    metadata_data = dumps_pickle(metadata)
+    attributes_data = dumps_pickle(attributes)
+    return header.pack(*fields, len(metadata_data), len(attributes_data)) + metadata_data + attributes_data
+
+
+def _unpack_value(value, header):
+    """
+    Split a node or relation value without copying the data
+
+    :param value: The stored value
+    :type value: bytes or memoryview
+    :param header: NODE_HEADER or RELATION_HEADER
+    :type header: struct.Struct
+    :return: Tuple with (header fields before the lengths, metadata view, attributes view)
+    :rtype: tuple
+    """
+    view = memoryview(value)
+    fields = header.unpack_from(view)
+    (metadata_length, attributes_length) = fields[-2:]
+    metadata_end = header.size + metadata_length
+    return fields[:-2], view[header.size:metadata_end], view[metadata_end:metadata_end + attributes_length]
+
+
+def _decode_view(view, keys=None):
+    """
+    Unpickle a dict and encode the values to primitive types
+
+    :param view: The pickled dict
+    :type view: memoryview
+    :param keys: Only encode and return these keys, None for all keys
+    :type keys: frozenset
+    :rtype: dict
+    """
+    return encode_projected_dict_values_to_primitive(pickle.loads(view), keys)
+
+
+def _decode_views(attributes_view, metadata_view, projection):
+    """
+    Decode the attributes with the projection and the metadata with the PROJECTION_METADATA_KEYS
+
+    :param attributes_view: The pickled attributes
+    :type attributes_view: memoryview
+    :param metadata_view: The pickled metadata
+    :type metadata_view: memoryview
+    :param projection: The attribute keys, None for the whole record
+    :type projection: frozenset
+    :return: Tuple with (attributes, metadata)
+    :rtype: tuple
+    """
+    if projection is None:
+        return _decode_view(attributes_view), _decode_view(metadata_view)
+    return _decode_view(attributes_view, projection), _decode_view(metadata_view, PROJECTION_METADATA_KEYS)
+
+
+def _project_record(record, projection):
+    """
+    Returns the record with the projected attributes and the PROJECTION_METADATA_KEYS of the metadata
+
+    :param record: The decoded record
+    :type record: DbRecord or DbRelation
+    :param projection: The attribute keys, None for the whole record
+    :type projection: frozenset
+    :rtype: DbRecord or DbRelation
+    """
+    if projection is None:
+        return record
+    return type(record)({key: value for (key, value) in record.attributes.items() if key in projection},
+                        {key: value for (key, value) in record.metadata.items() if key in PROJECTION_METADATA_KEYS})
+
+
+def _match_filter(values, filter_dict):
+    """
+    Check the encoded values against the encoded filter
+
+    :param values: The encoded attributes or metadata
+    :type values: dict
+    :param filter_dict: The encoded filter
+    :type filter_dict: dict
+    :rtype: bool
+    """
+    for (key, value) in filter_dict.items():
+        if key not in values or values[key] != value:
+            return False
+    return True
+
+
+def _parse_relation_id(relation_id):
+    """
+    Returns the relation id as int
+
+    :param relation_id: The relation id
+    :type relation_id: str
+    :rtype: int
+    :raises: NotFoundException
+    """
+    try:
+        return int(relation_id)
+    except (TypeError, ValueError):
+        raise NotFoundException("Relation {} not found".format(relation_id))
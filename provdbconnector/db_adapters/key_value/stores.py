@@ -0,0 +1,260 @@
+import dbm
+
+try:
+    import lmdb
+except ImportError:
+    lmdb = None
+
+from provdbconnector.exceptions.database import InvalidOptionsException
+
+BACKEND_LMDB = "lmdb"
+BACKEND_DBM = "dbm"
+
+BACKENDS = (BACKEND_LMDB, BACKEND_DBM)
+
+# Length of the key prefix that groups the keys of the dbm store, one keyspace byte and an 8 byte id
+KEY_GROUP_LENGTH = 9
+
+
+class LmdbStore(object):
+    """
+    Key value store in a memory mapped LMDB file.
+    The values are returned as memoryview into the mapped file, they are only valid inside the transaction.
+    Several processes can open the same file, LMDB serializes the writers and readers don't block.
+
+    """
+
+    def __init__(self, path, map_size):
+        """
+        Open or create the LMDB file
+
+        :param path: The path of the database file
+        :type path: str
+        :param map_size: The max size of the database in bytes
+        :type map_size: int
+        """
+        if lmdb is None:
+            raise InvalidOptionsException("The lmdb backend requires the lmdb package, install prov-db-connector[lmdb]")
+        try:
+            self.environment = lmdb.open(path, map_size=map_size, subdir=False)
+        except lmdb.Error as e:
+            raise InvalidOptionsException(e)
+
+    def begin(self, write=False):
+        """
+        Start a transaction
+
+        :param write: True for a write transaction
+        :type write: bool
+        :return: The transaction as context manager, it is committed on exit and aborted on an exception
+        :rtype: LmdbTransaction
+        """
+        return LmdbTransaction(self.environment.begin(write=write, buffers=True))
+
+    def close(self):
+        self.environment.close()
+
+
+class LmdbTransaction(object):
+    """
+    Transaction of the :py:class:`LmdbStore`
+
+    """
+
+    def __init__(self, transaction):
+        self._transaction = transaction
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._transaction.commit()
+        else:
+            self._transaction.abort()
+        return False
+
+    def get(self, key):
+        return self._transaction.get(key)
+
+    def put(self, key, value):
+        self._transaction.put(key, value)
+
+    def delete(self, key):
+        self._transaction.delete(key)
+
+    def keys(self, prefix, start=None):
+        """
+        Returns all keys with the prefix in key order
+
+        :param prefix: The key prefix
+        :type prefix: bytes
+        :param start: The first key, default to the prefix
+        :type start: bytes
+        :return: Generator of keys
+        :rtype: generator
+        """
+        cursor = self._transaction.cursor()
+        if not cursor.set_range(prefix if start is None else max(prefix, start)):
+            return
+        for key in cursor.iternext(keys=True, values=False):
+            key = bytes(key)
+            if not key.startswith(prefix):
+                break
+            yield key
+
+
+class DbmStore(object):
+    """
+    Key value store in a dbm file of the standard library, used if lmdb is not installed.
+    The writes of a transaction are buffered and applied on commit, only one process should open the file.
+
+    A dbm file has no key order, so the store keeps the keys in memory grouped by their first KEY_GROUP_LENGTH bytes
+    (the keyspace and the node id of the adjacency keys). A prefix scan of at least this length only reads one group.
+
+    """
+
+    def __init__(self, path):
+        """
+        Open or create the dbm file
+
+        :param path: The path of the database file
+        :type path: str
+        """
+        try:
+            self.database = dbm.open(path, "c")
+        except dbm.error as e:
+            raise InvalidOptionsException(e)
+
+        self.key_groups = dict()
+        """
+        The keys of the file with the structure `(key[:KEY_GROUP_LENGTH], set(key))`
+        """
+        for key in self.database.keys():
+            self.key_groups.setdefault(key[:KEY_GROUP_LENGTH], set()).add(key)
+
+    def begin(self, write=False):
+        """
+        Start a transaction
+
+        :param write: True for a write transaction
+        :type write: bool
+        :return: The transaction as context manager, the writes are applied on exit without an exception
+        :rtype: DbmTransaction
+        """
+        return DbmTransaction(self)
+
+    def get_keys(self, prefix):
+        """
+        Returns the keys of the file with the prefix, unordered
+
+        :param prefix: The key prefix
+        :type prefix: bytes
+        :rtype: set
+        """
+        if len(prefix) >= KEY_GROUP_LENGTH:
+            return set(key for key in self.key_groups.get(prefix[:KEY_GROUP_LENGTH], ()) if key.startswith(prefix))
+        return set(key for (group, keys) in self.key_groups.items() if group.startswith(prefix) for key in keys)
+
+    def put(self, key, value):
+        self.database[key] = value
+        self.key_groups.setdefault(key[:KEY_GROUP_LENGTH], set()).add(key)
+
+    def delete(self, key):
+        group = self.key_groups.get(key[:KEY_GROUP_LENGTH])
+        if group is None or key not in group:
+            return
+        del self.database[key]
+        group.discard(key)
+        if len(group) == 0:
+            del self.key_groups[key[:KEY_GROUP_LENGTH]]
+
+    def close(self):
+        self.database.close()
+
+
+class DbmTransaction(object):
+    """
+    Transaction of the :py:class:`DbmStore`
+
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self._database = store.database
+        self._writes = dict()
+        """
+        Buffered writes, None marks a deleted key
+        """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None and len(self._writes) > 0:
+            for (key, value) in self._writes.items():
+                if value is None:
+                    self._store.delete(key)
+                else:
+                    self._store.put(key, value)
+            if hasattr(self._database, "sync"):
+                self._database.sync()
+        self._writes = dict()
+        return False
+
+    def get(self, key):
+        if key in self._writes:
+            return self._writes[key]
+        return self._database.get(key)
+
+    def put(self, key, value):
+        self._writes[key] = bytes(value)
+
+    def delete(self, key):
+        self._writes[key] = None
+
+    def keys(self, prefix, start=None):
+        """
+        Returns all keys with the prefix in key order
+
+        :param prefix: The key prefix
+        :type prefix: bytes
+        :param start: The first key, default to the prefix
+        :type start: bytes
+        :return: List of keys
+        :rtype: list
+        """
+        keys = self._store.get_keys(prefix)
+        for (key, value) in self._writes.items():
+            if not key.startswith(prefix):
+                continue
+            if value is None:
+                keys.discard(key)
+            else:
+                keys.add(key)
+        if start is not None:
+            keys = set(key for key in keys if key >= start)
+        return sorted(keys)
+
+
+def open_store(path, backend=None, map_size=2 ** 30):
+    """
+    Open a key value store, the default backend is lmdb if the package is installed and dbm otherwise
+
+    :param path: The path of the database file
+    :type path: str
+    :param backend: One of BACKENDS or None
+    :type backend: str
+    :param map_size: The max size of a lmdb database in bytes
+    :type map_size: int
+    :return: The store
+    :rtype: LmdbStore or DbmStore
+    """
+    if backend is None:
+        backend = BACKEND_LMDB if lmdb is not None else BACKEND_DBM
+
+    if backend == BACKEND_LMDB:
+        return LmdbStore(path, map_size)
+    elif backend == BACKEND_DBM:
+        return DbmStore(path)
+    raise InvalidOptionsException("Unsupported backend {}, use one of {}".format(backend, ", ".join(BACKENDS)))
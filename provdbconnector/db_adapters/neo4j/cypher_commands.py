@@ -27,49 +27,156 @@ NEO4J_CREATE_RELATION_RETURN_ID = """
                                 RETURN
                                     ID(node) as ID, check
                                 """  # args: provType, values
+# range indexes for the time range queries, only the activities have a time as node
+NEO4J_CREATE_TIME_INDEXES = [
+    "CREATE INDEX ON :Activity(`meta:time_start`)",
+    "CREATE INDEX ON :Activity(`meta:time_end`)"
+]
+# indexes of the identifier for the lookups and the ordered pages of the elements
+NEO4J_CREATE_IDENTIFIER_INDEXES = [
+    "CREATE INDEX ON :Entity(`meta:identifier`)",
+    "CREATE INDEX ON :Activity(`meta:identifier`)",
+    "CREATE INDEX ON :Agent(`meta:identifier`)"
+]
 # get
+# the {projection} returns the variable re or a map projection of it
 NEO4J_GET_RECORDS_BY_PROPERTY_DICT = """
                             CYPHER 3.5 
                             MATCH (d {{{filter_dict}}} )-[r]-(x {{{filter_dict}}})
-                            RETURN DISTINCT r as re
+                            WITH DISTINCT r as re
+                            RETURN {projection} as re
                             //Get all nodes that are alone without connections to other nodes
                             UNION
                             MATCH (a {{{filter_dict}}})
-                            RETURN DISTINCT a as re
+                            WITH DISTINCT a as re
+                            RETURN {projection} as re
+                        """
+# args: label, filter dict and the condition for the previous page
+NEO4J_GET_RECORDS_PAGE_BY_PROPERTY_DICT = """
+                            CYPHER 3.5
+                            MATCH (d{label} {{{filter_dict}}})
+                            WHERE {after}
+                            WITH d ORDER BY d.`meta:identifier` LIMIT {{page_limit}}
+                            OPTIONAL MATCH (d)-[r]->(x {{{filter_dict}}})
+                            RETURN {node_projection} as node, collect({relation_projection}) as relations
+                            ORDER BY node.`meta:identifier`
+                        """
+NEO4J_PAGE_AFTER_CONDITION = "d.`meta:identifier` > {page_after}"
+# args: condition of the filter expression for the variable x
+NEO4J_GET_RECORDS_BY_EXPRESSION = """
+                            CYPHER 3.5
+                            MATCH (x)
+                            WHERE {condition}
+                            RETURN x as re
+                            UNION
+                            MATCH ()-[x]->()
+                            WHERE {condition}
+                            RETURN x as re
+                        """
+# counts of the nodes and relationships, the {condition} is a compiled filter expression or true
+NEO4J_COUNT_RECORDS = """
+                            CYPHER 3.5
+                            MATCH (x)
+                            WHERE {condition}
+                            RETURN count(x) as count
+                            UNION ALL
+                            MATCH ()-[x]->()
+                            WHERE {condition}
+                            RETURN count(x) as count
+                        """
+# the {group_property} is the property of x to group by, the values of nodes and relationships are added in python
+NEO4J_GROUP_COUNT_RECORDS = """
+                            CYPHER 3.5
+                            MATCH (x)
+                            WHERE {condition}
+                            RETURN {group_property} as value, count(x) as count
+                            UNION ALL
+                            MATCH ()-[x]->()
+                            WHERE {condition}
+                            RETURN {group_property} as value, count(x) as count
                         """
 NEO4J_GET_RECORDS_TAIL_BY_FILTER = """
                             CYPHER 3.5
                             MATCH (x {{{filter_dict}}})-[r *{depth}]-(y)
-                            RETURN  DISTINCT y as re
+                            WITH DISTINCT y as re
+                            RETURN {projection} as re
                             UNION
                             MATCH (x {{{filter_dict}}})-[r *{depth}]-(y)
                             WITH REDUCE(output = [], r IN r | output + r) AS flat
                             UNWIND flat as re
+                            WITH DISTINCT re
+                            RETURN {projection} as re
+                        """
+
+NEO4J_GET_LINEAGE_START_NODE = """
+                            CYPHER 3.5
+                            MATCH (x {`meta:identifier`: {`meta:identifier`}})
+                            RETURN x as re
+                        """
+# args: direction arrows, relation types as label expression and depth range
+NEO4J_GET_LINEAGE = """
+                            CYPHER 3.5
+                            MATCH (x {{`meta:identifier`: {{`meta:identifier`}}}})
+                            RETURN x as re
+                            UNION
+                            MATCH (x {{`meta:identifier`: {{`meta:identifier`}}}}){left}-[r{relation_types} *{depth}]-{right}(y)
+                            WHERE NONE (rel in r WHERE rel.`prov:type` = 'prov:bundleAssociation')
+                            RETURN DISTINCT y as re
+                            UNION
+                            MATCH (x {{`meta:identifier`: {{`meta:identifier`}}}}){left}-[r{relation_types} *{depth}]-{right}(y)
+                            WHERE NONE (rel in r WHERE rel.`prov:type` = 'prov:bundleAssociation')
+                            UNWIND r as re
                             RETURN DISTINCT re
                         """
+# args: label
+NEO4J_GET_NODES_IN_TIME_RANGE = """
+                            CYPHER 3.5
+                            MATCH (x:{label})
+                            WHERE x.`meta:time_end` >= {{start}} AND x.`meta:time_start` <= {{end}}
+                            RETURN x as re
+                        """
+# args: relation types as label expression
+NEO4J_GET_RELATIONS_IN_TIME_RANGE = """
+                            CYPHER 3.5
+                            MATCH ()-[r{relation_types}]->()
+                            WHERE r.`meta:time_end` >= {{start}} AND r.`meta:time_start` <= {{end}}
+                            RETURN r as re
+                        """
+# args: direction arrows, relation types as label expression and depth range
+NEO4J_GET_PATH = """
+                            CYPHER 3.5
+                            MATCH (x {{`meta:identifier`: {{from_identifier}}}}), (y {{`meta:identifier`: {{to_identifier}}}})
+                            OPTIONAL MATCH p = shortestPath((x){left}-[r{relation_types} *{depth}]-{right}(y))
+                            WHERE NONE (rel in r WHERE rel.`prov:type` = 'prov:bundleAssociation')
+                            RETURN nodes(p) as nodes, relationships(p) as relations
+                        """
 
+# args: projection
 NEO4J_GET_BUNDLE_RECORDS = """
                             CYPHER 3.5
-                            MATCH (x {`meta:identifier`: {`meta:identifier`}})-[r *1]-(y)
+                            MATCH (x {{`meta:identifier`: {{`meta:identifier`}}}})-[r *1]-(y)
                             WHERE ALL (rel in r WHERE rel.`prov:type` = 'prov:bundleAssociation')
-                            RETURN  DISTINCT y as re
+                            WITH DISTINCT y as re
+                            RETURN {projection} as re
                             UNION
                             //get all relations between the nodes
-                            MATCH (origin {`meta:identifier`: {`meta:identifier`}})-[r *1]-(x)-[r_return *1]-(y)-[r_2 *1]-(origin {`meta:identifier`: {`meta:identifier`}})
+                            MATCH (origin {{`meta:identifier`: {{`meta:identifier`}}}})-[r *1]-(x)-[r_return *1]-(y)-[r_2 *1]-(origin {{`meta:identifier`: {{`meta:identifier`}}}})
                             WHERE ALL (rel in r WHERE rel.`prov:type` = 'prov:bundleAssociation')
                             AND ALL (rel in r_2 WHERE rel.`prov:type` = 'prov:bundleAssociation')
                             WITH REDUCE(output = [], r IN r_return | output + r) AS flat
                             UNWIND flat as re
-                            RETURN DISTINCT re
+                            WITH DISTINCT re
+                            RETURN {projection} as re
                             //get all mentionof relations
                             UNION
-                            MATCH (bundle_1 {`meta:identifier`: {`meta:identifier`}})-[r *1]-(x)-[r_return *1]-(y)-[r_2 *1]-(bundle_2)
+                            MATCH (bundle_1 {{`meta:identifier`: {{`meta:identifier`}}}})-[r *1]-(x)-[r_return *1]-(y)-[r_2 *1]-(bundle_2)
                             WHERE ALL (rel in r WHERE rel.`prov:type` = 'prov:bundleAssociation')
                             AND ALL (rel in r_2 WHERE rel.`prov:type` = 'prov:bundleAssociation')
                             AND ALL (rel in r_return WHERE rel.`meta:prov_type` = 'prov:Mention'  and startNode(rel) = x)
                             WITH REDUCE(output = [], r IN r_return | output + r) AS flat
                             UNWIND flat as re
-                            RETURN DISTINCT re
+                            WITH DISTINCT re
+                            RETURN {projection} as re
 
  """
 
@@ -1,21 +1,26 @@
 import os
+from datetime import datetime, timezone
 
 from neo4j.exceptions import ConfigurationError
 from neo4j.graph import Relationship
 
 import provdbconnector.db_adapters.neo4j.cypher_commands as cypher_commands
-from provdbconnector.db_adapters.baseadapter import BaseAdapter
+from provdbconnector.db_adapters.baseadapter import BaseAdapter, DbPage
 from provdbconnector.db_adapters.baseadapter import METADATA_KEY_PROV_TYPE, METADATA_KEY_TYPE_MAP, \
-    METADATA_KEY_IDENTIFIER, METADATA_KEY_NAMESPACES
+    METADATA_KEY_IDENTIFIER, METADATA_KEY_NAMESPACES, LINEAGE_UPSTREAM, PROJECTION_METADATA_KEYS
 
 from provdbconnector.exceptions.database import InvalidOptionsException, AuthException, \
     DatabaseException, CreateRecordException, NotFoundException, CreateRelationException, MergeException
 
 from neo4j import GraphDatabase, basic_auth
 from prov.constants import PROV_N_MAP
+from prov.model import PROV_REC_CLS, ProvRelation
 from collections import namedtuple
 from provdbconnector.utils.serializer import encode_string_value_to_primitive, encode_dict_values_to_primitive, \
-    split_into_formal_and_other_attributes
+    split_into_formal_and_other_attributes, get_projection
+from provdbconnector.utils.filters import And, Or, Not, OPERATOR_EXISTS, get_group_key
+from provdbconnector.utils.temporal import get_time_interval
+from provdbconnector.utils.tracing import trace_span, SPAN_BUILD_QUERY, SPAN_RUN_QUERY
 
 import logging
 
@@ -30,6 +35,10 @@ NEO4J_HTTP_PORT = os.environ.get('NEO4J_HTTP_PORT', '7474')
 
 NEO4J_META_PREFIX = "meta:"
 
+# Native datetime properties with the time interval of a record, see get_records_in_time_range
+NEO4J_TIME_START = "time_start"
+NEO4J_TIME_END = "time_end"
+
 
 
 class Neo4jAdapter(BaseAdapter):
@@ -89,7 +98,9 @@ class Neo4jAdapter(BaseAdapter):
         except ConfigurationError as e:
             raise InvalidOptionsException(e)
 
-        self._create_session()
+        session = self._create_session()
+        for command in cypher_commands.NEO4J_CREATE_TIME_INDEXES + cypher_commands.NEO4J_CREATE_IDENTIFIER_INDEXES:
+            session.run(command)
 
     @staticmethod
     def _prefix_metadata(metadata):
@@ -151,6 +162,24 @@ class Neo4jAdapter(BaseAdapter):
             statements.append(cypher_template.format(attr_name=key))
         return " ".join(statements)
 
+    @staticmethod
+    def _get_time_properties(attributes):
+        """
+        Returns the time interval of a record as native datetime properties, so the range index of neo4j can be used
+
+        :param attributes: The attributes dict
+        :type attributes: dict
+        :return: The properties dict, empty if the record has no time
+        :rtype: dict
+        """
+        interval = get_time_interval(attributes)
+        if interval is None:
+            return dict()
+        return {
+            NEO4J_META_PREFIX + NEO4J_TIME_START: datetime.fromtimestamp(interval.start, timezone.utc),
+            NEO4J_META_PREFIX + NEO4J_TIME_END: datetime.fromtimestamp(interval.end, timezone.utc)
+        }
+
     def save_element(self, attributes, metadata):
         """
         Saves a single record
@@ -163,60 +192,65 @@ class Neo4jAdapter(BaseAdapter):
         :rtype: str
         """
 
-        metadata = metadata.copy()
-        prefixed_metadata = self._prefix_metadata(metadata)
+        with trace_span(self.tracer, SPAN_BUILD_QUERY):
+            metadata = metadata.copy()
+            prefixed_metadata = self._prefix_metadata(metadata)
 
-        # setup merge attributes
-        (formal_attributes, other_attributes) = split_into_formal_and_other_attributes(attributes, metadata)
+            # setup merge attributes
+            (formal_attributes, other_attributes) = split_into_formal_and_other_attributes(attributes, metadata)
 
-        merge_relevant_keys = list()
-        merge_relevant_keys.append("meta:{}".format(METADATA_KEY_IDENTIFIER))
-        merge_relevant_keys = merge_relevant_keys + list(formal_attributes.keys())
+            merge_relevant_keys = list()
+            merge_relevant_keys.append("meta:{}".format(METADATA_KEY_IDENTIFIER))
+            merge_relevant_keys = merge_relevant_keys + list(formal_attributes.keys())
 
-        other_db_attribute_keys = list()
-        other_db_attribute_keys = other_db_attribute_keys + list(other_attributes.keys())
-        other_db_attribute_keys = other_db_attribute_keys + list(prefixed_metadata.keys())
+            other_db_attribute_keys = list()
+            other_db_attribute_keys = other_db_attribute_keys + list(other_attributes.keys())
+            other_db_attribute_keys = other_db_attribute_keys + list(prefixed_metadata.keys())
 
-        # get set statement for non formal attributes
-        attr_for_simple_set = other_db_attribute_keys.copy()
-        attr_for_simple_set.remove("meta:" + METADATA_KEY_NAMESPACES)
-        attr_for_simple_set.remove("meta:" + METADATA_KEY_TYPE_MAP)
-        cypher_set_statement = self._get_attributes_set_cypher_string(attr_for_simple_set)
+            # get set statement for non formal attributes
+            attr_for_simple_set = other_db_attribute_keys.copy()
+            attr_for_simple_set.remove("meta:" + METADATA_KEY_NAMESPACES)
+            attr_for_simple_set.remove("meta:" + METADATA_KEY_TYPE_MAP)
+            time_properties = self._get_time_properties(attributes)
+            attr_for_simple_set += list(time_properties.keys())
+            cypher_set_statement = self._get_attributes_set_cypher_string(attr_for_simple_set)
 
-        attr_for_list_merge = list()
-        attr_for_list_merge.append("meta:" + METADATA_KEY_NAMESPACES)
-        attr_for_list_merge.append("meta:" + METADATA_KEY_TYPE_MAP)
-        cypher_set_statement += self._get_attributes_set_cypher_string(attr_for_list_merge,
-                                                                       cypher_commands.NEO4J_CREATE_NODE_SET_PART_MERGE_ATTR)
+            attr_for_list_merge = list()
+            attr_for_list_merge.append("meta:" + METADATA_KEY_NAMESPACES)
+            attr_for_list_merge.append("meta:" + METADATA_KEY_TYPE_MAP)
+            cypher_set_statement += self._get_attributes_set_cypher_string(attr_for_list_merge,
+                                                                           cypher_commands.NEO4J_CREATE_NODE_SET_PART_MERGE_ATTR)
 
-        # get CASE WHEN ... statement to check if a attribute is different
-        cypher_merge_check_statement = self._get_attributes_set_cypher_string(attr_for_simple_set,
-                                                                              cypher_commands.NEO4J_CREATE_NODE_MERGE_CHECK_PART)
+            # get CASE WHEN ... statement to check if a attribute is different
+            cypher_merge_check_statement = self._get_attributes_set_cypher_string(attr_for_simple_set,
+                                                                                  cypher_commands.NEO4J_CREATE_NODE_MERGE_CHECK_PART)
 
-        # get cypher string for the merge relevant attributes
-        cypher_merge_relevant_str = self._get_attributes_identifiers_cypher_string(merge_relevant_keys)
+            # get cypher string for the merge relevant attributes
+            cypher_merge_relevant_str = self._get_attributes_identifiers_cypher_string(merge_relevant_keys)
 
-        # get prov type
-        provtype = metadata[METADATA_KEY_PROV_TYPE]
+            # get prov type
+            provtype = metadata[METADATA_KEY_PROV_TYPE]
 
-        # get db_attributes as dict
-        db_attributes = self._parse_to_primitive_attributes(attributes, prefixed_metadata)
+            # get db_attributes as dict
+            db_attributes = self._parse_to_primitive_attributes(attributes, prefixed_metadata)
+            db_attributes.update(time_properties)
 
-        session = self._create_session()
+            session = self._create_session()
 
-        command = cypher_commands.NEO4J_CREATE_NODE_RETURN_ID.format(label=provtype.localpart,
-                                                     formal_attributes=cypher_merge_relevant_str,
-                                                     set_statement=cypher_set_statement,
-                                                     merge_check_statement=cypher_merge_check_statement)
+            command = cypher_commands.NEO4J_CREATE_NODE_RETURN_ID.format(label=provtype.localpart,
+                                                         formal_attributes=cypher_merge_relevant_str,
+                                                         set_statement=cypher_set_statement,
+                                                         merge_check_statement=cypher_merge_check_statement)
         with session.begin_transaction() as tx:
 
-            result = tx.run(command, dict(db_attributes))
+            with trace_span(self.tracer, SPAN_RUN_QUERY):
+                result = tx.run(command, dict(db_attributes))
 
-            record_id = None
-            merge_success = 0
-            for record in result:
-                record_id = record["ID"]
-                merge_success = record["check"]
+                record_id = None
+                merge_success = 0
+                for record in result:
+                    record_id = record["ID"]
+                    merge_success = record["check"]
 
             if record_id is None:
                 raise CreateRecordException("No ID property returned by database for the command {}".format(command))
@@ -246,45 +280,49 @@ class Neo4jAdapter(BaseAdapter):
         :rtype: str
         """
 
-        metadata = metadata.copy()
+        with trace_span(self.tracer, SPAN_BUILD_QUERY):
+            metadata = metadata.copy()
 
-        prefixed_metadata = self._prefix_metadata(metadata)
+            prefixed_metadata = self._prefix_metadata(metadata)
 
-        # setup merge attributes
-        (formal_attributes, other_attributes) = split_into_formal_and_other_attributes(attributes, metadata)
+            # setup merge attributes
+            (formal_attributes, other_attributes) = split_into_formal_and_other_attributes(attributes, metadata)
 
-        merge_relevant_keys = list()
-        merge_relevant_keys.append("meta:{}".format(METADATA_KEY_IDENTIFIER))
-        merge_relevant_keys = merge_relevant_keys + list(formal_attributes.keys())
+            merge_relevant_keys = list()
+            merge_relevant_keys.append("meta:{}".format(METADATA_KEY_IDENTIFIER))
+            merge_relevant_keys = merge_relevant_keys + list(formal_attributes.keys())
 
-        other_db_attribute_keys = list()
-        other_db_attribute_keys = other_db_attribute_keys + list(other_attributes.keys())
-        other_db_attribute_keys = other_db_attribute_keys + list(prefixed_metadata.keys())
+            other_db_attribute_keys = list()
+            other_db_attribute_keys = other_db_attribute_keys + list(other_attributes.keys())
+            other_db_attribute_keys = other_db_attribute_keys + list(prefixed_metadata.keys())
 
-        # get set statement for non formal attributes
+            # get set statement for non formal attributes
 
-        # Remove namespace and type_map from the direct set statement, because this attributes need to be merged
-        attr_for_simple_set = other_db_attribute_keys.copy()
-        attr_for_simple_set.remove("meta:" + METADATA_KEY_NAMESPACES)
-        attr_for_simple_set.remove("meta:" + METADATA_KEY_TYPE_MAP)
-        cypher_set_statement = self._get_attributes_set_cypher_string(attr_for_simple_set)
+            # Remove namespace and type_map from the direct set statement, because this attributes need to be merged
+            attr_for_simple_set = other_db_attribute_keys.copy()
+            attr_for_simple_set.remove("meta:" + METADATA_KEY_NAMESPACES)
+            attr_for_simple_set.remove("meta:" + METADATA_KEY_TYPE_MAP)
+            time_properties = self._get_time_properties(attributes)
+            attr_for_simple_set += list(time_properties.keys())
+            cypher_set_statement = self._get_attributes_set_cypher_string(attr_for_simple_set)
 
-        # Add separate cypher command to merge the namespaces and tpye map into a list
-        attr_for_list_merge = list()
-        attr_for_list_merge.append("meta:" + METADATA_KEY_NAMESPACES)
-        attr_for_list_merge.append("meta:" + METADATA_KEY_TYPE_MAP)
-        cypher_set_statement += self._get_attributes_set_cypher_string(attr_for_list_merge,
-                                                                       cypher_commands.NEO4J_CREATE_NODE_SET_PART_MERGE_ATTR)
+            # Add separate cypher command to merge the namespaces and tpye map into a list
+            attr_for_list_merge = list()
+            attr_for_list_merge.append("meta:" + METADATA_KEY_NAMESPACES)
+            attr_for_list_merge.append("meta:" + METADATA_KEY_TYPE_MAP)
+            cypher_set_statement += self._get_attributes_set_cypher_string(attr_for_list_merge,
+                                                                           cypher_commands.NEO4J_CREATE_NODE_SET_PART_MERGE_ATTR)
 
-        # get CASE WHEN ... statement to check if a attribute is different
-        cypher_merge_check_statement = self._get_attributes_set_cypher_string(attr_for_simple_set,
-                                                                              cypher_commands.NEO4J_CREATE_NODE_MERGE_CHECK_PART)
+            # get CASE WHEN ... statement to check if a attribute is different
+            cypher_merge_check_statement = self._get_attributes_set_cypher_string(attr_for_simple_set,
+                                                                                  cypher_commands.NEO4J_CREATE_NODE_MERGE_CHECK_PART)
 
-        # get cypher string for the merge relevant attributes
-        cypher_merge_relevant_str = self._get_attributes_identifiers_cypher_string(merge_relevant_keys)
+            # get cypher string for the merge relevant attributes
+            cypher_merge_relevant_str = self._get_attributes_identifiers_cypher_string(merge_relevant_keys)
 
-        # get db_attributes as dict
-        db_attributes = self._parse_to_primitive_attributes(attributes, prefixed_metadata)
+            # get db_attributes as dict
+            db_attributes = self._parse_to_primitive_attributes(attributes, prefixed_metadata)
+            db_attributes.update(time_properties)
 
         with self._create_session() as session:
 
@@ -299,13 +337,14 @@ class Neo4jAdapter(BaseAdapter):
                                                              )
             with session.begin_transaction() as tx:
 
-                result = tx.run(command, dict(db_attributes))
+                with trace_span(self.tracer, SPAN_RUN_QUERY):
+                    result = tx.run(command, dict(db_attributes))
 
-                record_id = None
-                merge_success = 0
-                for record in result:
-                    record_id = record["ID"]
-                    merge_success = record["check"]
+                    record_id = None
+                    merge_success = 0
+                    for record in result:
+                        record_id = record["ID"]
+                        merge_success = record["check"]
 
                 if record_id is None:
                     raise CreateRelationException("No ID property returned by database for the command {}".format(command))
@@ -324,15 +363,24 @@ class Neo4jAdapter(BaseAdapter):
         This functions splits a db node back into attributes and metadata, based on the prefix
 
 
-        :param db_node:
-        :type db_node: dict
+        :param db_node: The node or relationship, or the map of a projection
+        :type db_node: neo4j.graph.Entity or dict
         :return: namedTuple(attributes,metadata)
         """
         record = namedtuple('Record', 'attributes, metadata')
+        if isinstance(db_node, dict):
+            # the missing properties of a map projection are null
+            properties = {k: v for k, v in db_node.items() if v is not None}
+        else:
+            properties = db_node._properties
+
         # split data
-        metadata = {k.replace(NEO4J_META_PREFIX, ""): v for k, v in db_node._properties.items() if
+        metadata = {k.replace(NEO4J_META_PREFIX, ""): v for k, v in properties.items() if
                     k.startswith(NEO4J_META_PREFIX, 0, len(NEO4J_META_PREFIX))}
-        attributes = {k: v for k, v in db_node._properties.items() if
+        # the time properties are only for the index
+        metadata.pop(NEO4J_TIME_START, None)
+        metadata.pop(NEO4J_TIME_END, None)
+        attributes = {k: v for k, v in properties.items() if
                       not k.startswith(NEO4J_META_PREFIX, 0, len(NEO4J_META_PREFIX))}
 
         # convert a list of namespace into a string if it is only one item
@@ -374,7 +422,26 @@ class Neo4jAdapter(BaseAdapter):
         cypher_str = self._get_attributes_identifiers_cypher_string(filter.keys())
         return encoded_params, cypher_str
 
-    def get_records_by_filter(self, attributes_dict=None, metadata_dict=None):
+    @staticmethod
+    def _get_cypher_projection(variable, fields):
+        """
+        Returns the map projection of a node or relationship with the attribute keys and the PROJECTION_METADATA_KEYS,
+        so only these properties are sent by the database
+
+        :param variable: The name of the node or relationship in the query
+        :type variable: str
+        :param fields: The attribute keys or None for the whole node or relationship
+        :type fields: list(str or prov.model.QualifiedName)
+        :return: The variable or the map projection
+        :rtype: str
+        """
+        projection = get_projection(fields)
+        if projection is None:
+            return variable
+        keys = sorted(projection) + sorted(NEO4J_META_PREFIX + key for key in PROJECTION_METADATA_KEYS)
+        return "{} {{{}}}".format(variable, ", ".join(".`{}`".format(key.replace("`", "``")) for key in keys))
+
+    def get_records_by_filter(self, attributes_dict=None, metadata_dict=None, fields=None):
         """
         Return the records by a certain filter
 
@@ -382,6 +449,8 @@ class Neo4jAdapter(BaseAdapter):
         :type attributes_dict: dict
         :param metadata_dict: Filter dict for metadata
         :type metadata_dict: dict
+        :param fields: The attribute keys of the records, see :py:meth:`BaseAdapter.get_records_by_filter`
+        :type fields: list(str or prov.model.QualifiedName)
         :return: list of all nodes and relations that fit the conditions
         :rtype: list(DbRecord and DbRelation)
         """
@@ -395,7 +464,9 @@ class Neo4jAdapter(BaseAdapter):
 
         session = self._create_session()
         records = list()
-        result_set = session.run(cypher_commands.NEO4J_GET_RECORDS_BY_PROPERTY_DICT.format(filter_dict=cypher_str), encoded_params)
+        command = cypher_commands.NEO4J_GET_RECORDS_BY_PROPERTY_DICT.format(
+            filter_dict=cypher_str, projection=self._get_cypher_projection("re", fields))
+        result_set = session.run(command, encoded_params)
         for result in result_set:
             record = result["re"]
 
@@ -405,7 +476,184 @@ class Neo4jAdapter(BaseAdapter):
             records.append(relation_record)
         return records
 
-    def get_records_tail(self, attributes_dict=None, metadata_dict=None, depth=None):
+    def get_records_by_filter_page(self, attributes_dict=None, metadata_dict=None, limit=1000, after=None,
+                                   fields=None):
+        """
+        Returns one page of the matching nodes and their relations with ``identifier > after ORDER BY identifier
+        LIMIT limit``, see :py:meth:`BaseAdapter.get_records_by_filter_page`. A filter by the prov type of an element
+        is also used as label, so the identifier index of the label orders the nodes.
+
+        :param attributes_dict: Filter dict
+        :type attributes_dict: dict
+        :param metadata_dict: Filter dict for metadata
+        :type metadata_dict: dict
+        :param limit: The max number of nodes in the page
+        :type limit: int
+        :param after: The last identifier of the previous page, None for the first page
+        :type after: str
+        :param fields: The attribute keys of the records, see :py:meth:`BaseAdapter.get_records_by_filter`
+        :type fields: list(str or prov.model.QualifiedName)
+        :return: The nodes and relations of the page and the identifier of the last node if there are more pages
+        :rtype: DbPage
+        """
+        if attributes_dict is None:
+            attributes_dict = dict()
+        if metadata_dict is None:
+            metadata_dict = dict()
+
+        (encoded_params, cypher_str) = self._get_cypher_filter_params(attributes_dict, metadata_dict)
+
+        label = ""
+        prov_type = metadata_dict.get(METADATA_KEY_PROV_TYPE)
+        if prov_type in PROV_REC_CLS and not issubclass(PROV_REC_CLS[prov_type], ProvRelation):
+            label = ":" + prov_type.localpart
+
+        after_condition = "true"
+        if after is not None:
+            after_condition = cypher_commands.NEO4J_PAGE_AFTER_CONDITION
+            encoded_params["page_after"] = str(after)
+        # one more node to know if there is a next page
+        encoded_params["page_limit"] = limit + 1
+
+        command = cypher_commands.NEO4J_GET_RECORDS_PAGE_BY_PROPERTY_DICT.format(
+            label=label, filter_dict=cypher_str, after=after_condition,
+            node_projection=self._get_cypher_projection("d", fields),
+            relation_projection=self._get_cypher_projection("r", fields))
+        session = self._create_session()
+        results = list(session.run(command, encoded_params))
+
+        last_identifier = None
+        if len(results) > limit:
+            results = results[:limit]
+            last_identifier = str(results[-1]["node"][NEO4J_META_PREFIX + METADATA_KEY_IDENTIFIER])
+
+        nodes = list()
+        relations = list()
+        for result in results:
+            if result["node"] is None:
+                raise DatabaseException("Record response should not be None")
+            nodes.append(self._split_attributes_metadata_from_node(result["node"]))
+            relations.extend(self._split_attributes_metadata_from_node(relation) for relation in result["relations"])
+        return DbPage(nodes + relations, last_identifier)
+
+    @staticmethod
+    def _get_cypher_filter_expression(expression, variable, parameters):
+        """
+        Compile a filter expression into a cypher condition, the values are added to the parameters
+
+        :param expression: The filter expression
+        :type expression: provdbconnector.utils.filters.FilterExpression
+        :param variable: The name of the node or relationship in the query
+        :type variable: str
+        :param parameters: The parameters of the query
+        :type parameters: dict
+        :return: The condition
+        :rtype: str
+        """
+        if isinstance(expression, And):
+            return "(" + " AND ".join(Neo4jAdapter._get_cypher_filter_expression(operand, variable, parameters) for
+                                      operand in expression.operands) + ")"
+        if isinstance(expression, Or):
+            return "(" + " OR ".join(Neo4jAdapter._get_cypher_filter_expression(operand, variable, parameters) for
+                                     operand in expression.operands) + ")"
+        if isinstance(expression, Not):
+            return "(NOT " + Neo4jAdapter._get_cypher_filter_expression(expression.operand, variable, parameters) + ")"
+
+        db_property = Neo4jAdapter._get_cypher_property(expression.field, variable)
+        if expression.operator == OPERATOR_EXISTS:
+            return "exists({})".format(db_property)
+
+        parameter_name = "filter_{}".format(len(parameters))
+        parameters[parameter_name] = expression.value
+        return "{} {} {{{}}}".format(db_property, expression.operator, parameter_name)
+
+    @staticmethod
+    def _get_cypher_property(field, variable):
+        """
+        Returns the property of a node or relationship for a field of a filter expression
+
+        :param field: The field
+        :type field: provdbconnector.utils.filters.F
+        :param variable: The name of the node or relationship in the query
+        :type variable: str
+        :return: The property, for example x.`meta:prov_type`
+        :rtype: str
+        """
+        key = field.key
+        if field.metadata:
+            key = NEO4J_META_PREFIX + key
+        return "{}.`{}`".format(variable, key.replace("`", "``"))
+
+    def get_records_by_expression(self, expression):
+        """
+        Return the nodes and relationships that match the filter expression, the expression is compiled into a
+        parameterized cypher WHERE clause. See :py:meth:`BaseAdapter.get_records_by_expression`
+
+        :param expression: The filter expression
+        :type expression: provdbconnector.utils.filters.FilterExpression
+        :return: list of nodes and relations
+        :rtype: list(DbRecord and DbRelation)
+        """
+        parameters = dict()
+        condition = self._get_cypher_filter_expression(expression, "x", parameters)
+
+        session = self._create_session()
+        records = list()
+        for result in session.run(cypher_commands.NEO4J_GET_RECORDS_BY_EXPRESSION.format(condition=condition),
+                                  parameters):
+            record = result["re"]
+            if record is None:
+                raise DatabaseException("Record response should not be None")
+            records.append(self._split_attributes_metadata_from_node(record))
+        return records
+
+    def count_records(self, expression=None):
+        """
+        Count the nodes and relationships that match the filter expression with a cypher count aggregation, see
+        :py:meth:`BaseAdapter.count_records`
+
+        :param expression: The filter expression, None to count all records
+        :type expression: provdbconnector.utils.filters.FilterExpression
+        :return: The number of records
+        :rtype: int
+        """
+        parameters = dict()
+        condition = "true"
+        if expression is not None:
+            condition = self._get_cypher_filter_expression(expression, "x", parameters)
+
+        session = self._create_session()
+        results = session.run(cypher_commands.NEO4J_COUNT_RECORDS.format(condition=condition), parameters)
+        return sum(result["count"] for result in results)
+
+    def group_count_records(self, field, expression=None):
+        """
+        Count the nodes and relationships that match the filter expression by the value of a field with a cypher
+        count aggregation, see :py:meth:`BaseAdapter.group_count_records`
+
+        :param field: The field to group by
+        :type field: provdbconnector.utils.filters.F
+        :param expression: The filter expression, None to count all records
+        :type expression: provdbconnector.utils.filters.FilterExpression
+        :return: The number of records by the value of the field
+        :rtype: dict
+        """
+        parameters = dict()
+        condition = "true"
+        if expression is not None:
+            condition = self._get_cypher_filter_expression(expression, "x", parameters)
+        group_property = self._get_cypher_property(field, "x")
+
+        session = self._create_session()
+        counts = dict()
+        for result in session.run(cypher_commands.NEO4J_GROUP_COUNT_RECORDS.format(condition=condition,
+                                                                                    group_property=group_property),
+                                  parameters):
+            value = get_group_key(result["value"])
+            counts[value] = counts.get(value, 0) + result["count"]
+        return counts
+
+    def get_records_tail(self, attributes_dict=None, metadata_dict=None, depth=None, fields=None):
         """
         Return all connected nodes form the origin.
 
@@ -415,6 +663,8 @@ class Neo4jAdapter(BaseAdapter):
         :param metadata_dict: Filter dict for metadata
         :type metadata_dict: dict
         :param depth: Max steps
+        :param fields: The attribute keys of the records, see :py:meth:`BaseAdapter.get_records_by_filter`
+        :type fields: list(str or prov.model.QualifiedName)
         :return: list of all nodes and relations that fit the conditions
         :rtype: list(DbRecord and DbRelation)
         """
@@ -431,8 +681,9 @@ class Neo4jAdapter(BaseAdapter):
             depth_str = "1..{max}".format(max=depth)
 
         session = self._create_session()
-        result_set = session.run(cypher_commands.NEO4J_GET_RECORDS_TAIL_BY_FILTER.format(filter_dict=cypher_str, depth=depth_str),
-                                 encoded_params)
+        command = cypher_commands.NEO4J_GET_RECORDS_TAIL_BY_FILTER.format(
+            filter_dict=cypher_str, depth=depth_str, projection=self._get_cypher_projection("re", fields))
+        result_set = session.run(command, encoded_params)
         records = list()
         for result in result_set:
             record = result["re"]
@@ -444,18 +695,170 @@ class Neo4jAdapter(BaseAdapter):
 
         return records
 
-    def get_bundle_records(self, bundle_identifier):
+    def get_lineage(self, identifier, direction=LINEAGE_UPSTREAM, relation_types=None, max_depth=None):
+        """
+        Return the lineage of a node with a directed variable length match, the relation types are part of the
+        pattern so only the matching relationships are expanded. See :py:meth:`BaseAdapter.get_lineage`
+
+        :param identifier: The identifier of the start node
+        :type identifier: str
+        :param direction: LINEAGE_UPSTREAM or LINEAGE_DOWNSTREAM
+        :type direction: str
+        :param relation_types: The prov types of the relations to follow, default to all relations
+        :type relation_types: list(prov.model.QualifiedName)
+        :param max_depth: The max number of relations between the start node and a result node, default to infinite
+        :type max_depth: int
+        :return: list of all nodes and relations, the first record is the start node
+        :rtype: list(DbRecord and DbRelation)
+        """
+        identifier = str(identifier)
+        if direction == LINEAGE_UPSTREAM:
+            (left, right) = ("", ">")
+        else:
+            (left, right) = ("<", "")
+
+        relation_types_str = ""
+        if relation_types is not None:
+            relation_types_str = ":" + "|".join(PROV_N_MAP[prov_type] for prov_type in relation_types)
+
+        depth_str = ""
+        if max_depth is not None:
+            depth_str = "1..{max}".format(max=max_depth)
+
+        session = self._create_session()
+        if max_depth == 0 or (relation_types is not None and len(relation_types) == 0):
+            command = cypher_commands.NEO4J_GET_LINEAGE_START_NODE
+        else:
+            command = cypher_commands.NEO4J_GET_LINEAGE.format(left=left, right=right,
+                                                               relation_types=relation_types_str, depth=depth_str)
+        result_set = session.run(command, {'meta:{}'.format(METADATA_KEY_IDENTIFIER): identifier})
+
+        start_record = None
+        records = list()
+        for result in result_set:
+            record = result["re"]
+
+            if record is None:
+                raise DatabaseException("Record response should not be None")
+            relation_record = self._split_attributes_metadata_from_node(record)
+            if not isinstance(record, Relationship) and relation_record.metadata[METADATA_KEY_IDENTIFIER] == identifier:
+                start_record = relation_record
+            else:
+                records.append(relation_record)
+
+        if start_record is None:
+            raise NotFoundException("Record {} not found".format(identifier))
+        return [start_record] + records
+
+    def get_path(self, from_identifier, to_identifier, max_depth=None, relation_types=None, directed=True):
+        """
+        Return a shortest path with the shortestPath function of cypher, see :py:meth:`BaseAdapter.get_path`
+
+        :param from_identifier: The identifier of the start node
+        :type from_identifier: str
+        :param to_identifier: The identifier of the end node
+        :type to_identifier: str
+        :param max_depth: The max number of relations in the path, default to infinite
+        :type max_depth: int
+        :param relation_types: The prov types of the relations to follow, default to all relations
+        :type relation_types: list(prov.model.QualifiedName)
+        :param directed: Follow the relations only in their direction
+        :type directed: bool
+        :return: list of the nodes and relations in the order of the path or an empty list
+        :rtype: list(DbRecord and DbRelation)
+        """
+        from_identifier = str(from_identifier)
+        to_identifier = str(to_identifier)
+        session = self._create_session()
+
+        if from_identifier == to_identifier or max_depth == 0 or (
+                relation_types is not None and len(relation_types) == 0):
+            for identifier in (from_identifier, to_identifier):
+                result = session.run(cypher_commands.NEO4J_GET_LINEAGE_START_NODE,
+                                     {'meta:{}'.format(METADATA_KEY_IDENTIFIER): identifier}).single()
+                if result is None:
+                    raise NotFoundException("Record {} not found".format(identifier))
+            if from_identifier != to_identifier:
+                return list()
+            return [self._split_attributes_metadata_from_node(result["re"])]
+
+        relation_types_str = ""
+        if relation_types is not None:
+            relation_types_str = ":" + "|".join(PROV_N_MAP[prov_type] for prov_type in relation_types)
+
+        depth_str = ""
+        if max_depth is not None:
+            depth_str = "..{max}".format(max=max_depth)
+
+        command = cypher_commands.NEO4J_GET_PATH.format(left="", right=">" if directed else "",
+                                                        relation_types=relation_types_str, depth=depth_str)
+        result = session.run(command, {"from_identifier": from_identifier, "to_identifier": to_identifier}).single()
+        if result is None:
+            raise NotFoundException("Record {} or {} not found".format(from_identifier, to_identifier))
+        if result["nodes"] is None:
+            return list()
+
+        records = list()
+        for (position, node) in enumerate(result["nodes"]):
+            if position > 0:
+                records.append(self._split_attributes_metadata_from_node(result["relations"][position - 1]))
+            records.append(self._split_attributes_metadata_from_node(node))
+        return records
+
+    def get_records_in_time_range(self, start, end, prov_types=None):
+        """
+        Return the records in the time range with the native datetime properties, see
+        :py:meth:`BaseAdapter.get_records_in_time_range`. The activities are found with the range index on the
+        Activity label, the relations (generation, usage, ...) are filtered by the relationship type.
+
+        :param start: The start of the range
+        :type start: datetime.datetime
+        :param end: The end of the range
+        :type end: datetime.datetime
+        :param prov_types: The prov types of the records, default to all records
+        :type prov_types: list(prov.model.QualifiedName)
+        :return: list of nodes and relations
+        :rtype: list(DbRecord and DbRelation)
+        """
+        if prov_types is None:
+            labels = ["Activity"]
+            relation_types_str = ""
+        else:
+            labels = [prov_type.localpart for prov_type in prov_types if
+                      not issubclass(PROV_REC_CLS[prov_type], ProvRelation)]
+            relation_types = [PROV_N_MAP[prov_type] for prov_type in prov_types if
+                              issubclass(PROV_REC_CLS[prov_type], ProvRelation)]
+            relation_types_str = ":" + "|".join(relation_types) if len(relation_types) > 0 else None
+
+        commands = [cypher_commands.NEO4J_GET_NODES_IN_TIME_RANGE.format(label=label) for label in labels]
+        if relation_types_str is not None:
+            commands.append(cypher_commands.NEO4J_GET_RELATIONS_IN_TIME_RANGE.format(relation_types=relation_types_str))
+
+        parameters = {"start": start.astimezone(timezone.utc), "end": end.astimezone(timezone.utc)}
+        session = self._create_session()
+        records = list()
+        for command in commands:
+            for result in session.run(command, parameters):
+                record = result["re"]
+                if record is None:
+                    raise DatabaseException("Record response should not be None")
+                records.append(self._split_attributes_metadata_from_node(record))
+        return records
+
+    def get_bundle_records(self, bundle_identifier, fields=None):
         """
         Return all records and relations for the bundle
 
 
         :param bundle_identifier:
+        :param fields: The attribute keys of the records, see :py:meth:`BaseAdapter.get_records_by_filter`
+        :type fields: list(str or prov.model.QualifiedName)
         :return:
         """
 
         session = self._create_session()
-        result_set = session.run(cypher_commands.NEO4J_GET_BUNDLE_RECORDS,
-                                 {'meta:{}'.format(METADATA_KEY_IDENTIFIER): str(bundle_identifier)})
+        command = cypher_commands.NEO4J_GET_BUNDLE_RECORDS.format(projection=self._get_cypher_projection("re", fields))
+        result_set = session.run(command, {'meta:{}'.format(METADATA_KEY_IDENTIFIER): str(bundle_identifier)})
         records = list()
         for result in result_set:
             record = result["re"]
@@ -0,0 +1 @@
+from provdbconnector.db_adapters.sqlite.sqliteadapter import SqliteAdapter
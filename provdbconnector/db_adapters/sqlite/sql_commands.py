@@ -0,0 +1,181 @@
+SQLITE_PRAGMAS = """
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+PRAGMA foreign_keys = ON;
+"""
+
+# schema
+SQLITE_CREATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    id INTEGER PRIMARY KEY,
+    identifier TEXT NOT NULL UNIQUE,
+    prov_type TEXT,
+    attributes TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS nodes_prov_type ON nodes (prov_type);
+
+CREATE TABLE IF NOT EXISTS node_properties (
+    node_id INTEGER NOT NULL REFERENCES nodes (id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS node_properties_key_value ON node_properties (key, value);
+CREATE INDEX IF NOT EXISTS node_properties_node_id ON node_properties (node_id);
+
+CREATE TABLE IF NOT EXISTS relations (
+    id INTEGER PRIMARY KEY,
+    merge_key TEXT NOT NULL UNIQUE,
+    from_identifier TEXT NOT NULL,
+    to_identifier TEXT NOT NULL,
+    prov_type TEXT,
+    type_attribute TEXT,
+    attributes TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS relations_from_identifier ON relations (from_identifier);
+CREATE INDEX IF NOT EXISTS relations_to_identifier ON relations (to_identifier, prov_type);
+"""
+
+# create
+SQLITE_SELECT_NODES_BY_IDENTIFIERS = "SELECT id, identifier, attributes, metadata FROM nodes WHERE identifier IN ({})"
+SQLITE_INSERT_NODE = "INSERT INTO nodes (identifier, prov_type, attributes, metadata) VALUES (?, ?, ?, ?)"
+SQLITE_UPDATE_NODE = "UPDATE nodes SET attributes = ?, metadata = ? WHERE id = ?"
+SQLITE_DELETE_NODE_PROPERTIES = "DELETE FROM node_properties WHERE node_id = ?"
+SQLITE_INSERT_NODE_PROPERTY = "INSERT INTO node_properties (node_id, key, value) VALUES (?, ?, ?)"
+
+SQLITE_SELECT_RELATIONS_BY_MERGE_KEYS = "SELECT id, merge_key, attributes, metadata FROM relations WHERE merge_key IN ({})"
+SQLITE_INSERT_RELATION = """
+INSERT INTO relations (merge_key, from_identifier, to_identifier, prov_type, type_attribute, attributes, metadata)
+VALUES (?, ?, ?, ?, ?, ?, ?)"""
+SQLITE_UPDATE_RELATION = "UPDATE relations SET attributes = ?, metadata = ? WHERE id = ?"
+
+# get
+SQLITE_GET_NODE = "SELECT attributes, metadata FROM nodes WHERE identifier = ?"
+SQLITE_GET_RELATION = "SELECT attributes, metadata FROM relations WHERE id = ?"
+
+# one condition per attribute or metadata filter, the conditions are combined with AND
+SQLITE_FILTER_CONDITION = """
+EXISTS (SELECT 1 FROM node_properties p WHERE p.node_id = n.id AND p.key = ? AND p.value = ?)"""
+
+SQLITE_GET_NODES_BY_FILTER = "SELECT n.attributes, n.metadata FROM nodes n WHERE {filter}"
+SQLITE_GET_RELATIONS_BY_FILTER = """
+WITH matched(identifier) AS (SELECT n.identifier FROM nodes n WHERE {filter})
+SELECT r.attributes, r.metadata FROM relations r
+WHERE r.from_identifier IN matched AND r.to_identifier IN matched"""
+
+# one page of the matching nodes ordered by the unique identifier, {after} is the condition for the previous page
+# args: filter parameters, (last identifier), limit
+SQLITE_GET_NODES_PAGE_BY_FILTER = """
+SELECT n.identifier, n.attributes, n.metadata FROM nodes n WHERE {filter}{after} ORDER BY n.identifier LIMIT ?"""
+SQLITE_PAGE_AFTER_CONDITION = " AND n.identifier > ?"
+# the relations that start at a node of the page and end at a matching node, the values placeholder is filled by the
+# chunked select
+# args: identifiers of the page, filter parameters
+SQLITE_GET_PAGE_RELATIONS_BY_FILTER = """
+SELECT r.attributes, r.metadata FROM relations r JOIN nodes n ON n.identifier = r.to_identifier
+WHERE r.from_identifier IN ({{}}) AND {filter}
+ORDER BY r.id"""
+
+# counts, the node values of a field are counted in the property table
+SQLITE_COUNT_RECORDS = "SELECT (SELECT COUNT(*) FROM nodes) + (SELECT COUNT(*) FROM relations)"
+SQLITE_COUNT_NODES = "SELECT COUNT(*) FROM nodes"
+SQLITE_NODE_PROPERTY_EXISTS = "SELECT 1 FROM node_properties WHERE key = ? LIMIT 1"
+SQLITE_GROUP_COUNT_NODE_PROPERTIES = "SELECT value, COUNT(*) FROM node_properties WHERE key = ? GROUP BY value"
+SQLITE_GROUP_COUNT_RELATION_TYPES = "SELECT prov_type, COUNT(*) FROM relations GROUP BY prov_type"
+SQLITE_GET_ALL_RELATIONS = "SELECT attributes, metadata FROM relations"
+
+# the tail are all relations that start at a processed node and the end nodes of this relations
+SQLITE_GET_RECORDS_TAIL = """
+WITH RECURSIVE processed(identifier) AS (
+    SELECT n.identifier FROM nodes n WHERE {filter}
+    UNION
+    SELECT r.to_identifier FROM processed p JOIN relations r ON r.from_identifier = p.identifier
+),
+tail_relations AS (
+    SELECT r.attributes, r.metadata, r.to_identifier FROM relations r WHERE r.from_identifier IN processed
+)
+SELECT n.attributes, n.metadata, 1 FROM nodes n WHERE n.identifier IN (SELECT to_identifier FROM tail_relations)
+UNION ALL
+SELECT t.attributes, t.metadata, 0 FROM tail_relations t"""
+
+# the depth limits the path length from the matched nodes, only nodes with depth < max depth are processed
+SQLITE_GET_RECORDS_TAIL_WITH_DEPTH = """
+WITH RECURSIVE processed(identifier, depth) AS (
+    SELECT n.identifier, 0 FROM nodes n WHERE {filter}
+    UNION
+    SELECT r.to_identifier, p.depth + 1 FROM processed p JOIN relations r ON r.from_identifier = p.identifier
+    WHERE p.depth + 1 < ?
+),
+tail_relations AS (
+    SELECT r.attributes, r.metadata, r.to_identifier FROM relations r
+    WHERE r.from_identifier IN (SELECT identifier FROM processed)
+)
+SELECT n.attributes, n.metadata, 1 FROM nodes n WHERE n.identifier IN (SELECT to_identifier FROM tail_relations)
+UNION ALL
+SELECT t.attributes, t.metadata, 0 FROM tail_relations t"""
+
+# the lineage follows the relations from the {start} to the {end} column, the {condition} filters the relation types,
+# the start node itself is not part of the result
+# args: start identifier, condition parameters, condition parameters, start identifier
+SQLITE_GET_LINEAGE = """
+WITH RECURSIVE lineage(identifier) AS (
+    SELECT ?
+    UNION
+    SELECT r.{end} FROM lineage l JOIN relations r ON r.{start} = l.identifier WHERE {condition}
+),
+lineage_relations AS (
+    SELECT r.attributes, r.metadata, r.{end} AS identifier FROM relations r WHERE r.{start} IN lineage AND {condition}
+)
+SELECT n.attributes, n.metadata, 1 FROM nodes n
+WHERE n.identifier IN (SELECT identifier FROM lineage_relations) AND n.identifier != ?
+UNION ALL
+SELECT l.attributes, l.metadata, 0 FROM lineage_relations l"""
+
+# only nodes with depth < max depth are processed
+# args: start identifier, max depth, condition parameters, condition parameters, start identifier
+SQLITE_GET_LINEAGE_WITH_DEPTH = """
+WITH RECURSIVE lineage(identifier, depth) AS (
+    SELECT ?, 0
+    UNION
+    SELECT r.{end}, l.depth + 1 FROM lineage l JOIN relations r ON r.{start} = l.identifier
+    WHERE l.depth + 1 < ? AND {condition}
+),
+lineage_relations AS (
+    SELECT r.attributes, r.metadata, r.{end} AS identifier FROM relations r
+    WHERE r.{start} IN (SELECT identifier FROM lineage) AND {condition}
+)
+SELECT n.attributes, n.metadata, 1 FROM nodes n
+WHERE n.identifier IN (SELECT identifier FROM lineage_relations) AND n.identifier != ?
+UNION ALL
+SELECT l.attributes, l.metadata, 0 FROM lineage_relations l"""
+
+SQLITE_LINEAGE_CONDITION = "r.type_attribute IS NOT ?"
+SQLITE_LINEAGE_TYPE_CONDITION = "r.prov_type IN ({})"
+
+# one level of the shortest path search, the values placeholder is filled by the chunked select
+# args: identifiers of the frontier, condition parameters
+SQLITE_GET_PATH_NEIGHBOURS = """
+SELECT r.{start}, r.{end}, r.id FROM relations r WHERE r.{start} IN ({values}) AND {condition}"""
+
+# args: bundle identifier, association type, bundle association type, mention type
+SQLITE_GET_BUNDLE_RECORDS = """
+WITH members(identifier) AS (
+    SELECT r.from_identifier FROM relations r
+    WHERE r.to_identifier = ? AND r.prov_type = ? AND r.type_attribute = ?
+)
+SELECT n.attributes, n.metadata, 1 FROM nodes n WHERE n.identifier IN members
+UNION ALL
+SELECT r.attributes, r.metadata, 0 FROM relations r
+WHERE r.from_identifier IN members AND (r.to_identifier IN members OR r.prov_type = ?)"""
+
+# delete
+SQLITE_DELETE_ALL_NODES = "DELETE FROM nodes"
+SQLITE_DELETE_ALL_RELATIONS = "DELETE FROM relations"
+SQLITE_DELETE_RELATIONS_BY_FILTER = """
+WITH matched(identifier) AS (SELECT n.identifier FROM nodes n WHERE {filter})
+DELETE FROM relations WHERE from_identifier IN matched OR to_identifier IN matched"""
+SQLITE_DELETE_NODES_BY_FILTER = "DELETE FROM nodes WHERE id IN (SELECT n.id FROM nodes n WHERE {filter})"
+SQLITE_DELETE_NODE = "DELETE FROM nodes WHERE identifier = ?"
+SQLITE_DELETE_NODE_RELATIONS = "DELETE FROM relations WHERE from_identifier = ? OR to_identifier = ?"
+SQLITE_DELETE_RELATION = "DELETE FROM relations WHERE id = ?"
@@ -0,0 +1,779 @@
+import json
+import logging
+import sqlite3
+from contextlib import contextmanager
+
+from prov.constants import PROV_ASSOCIATION, PROV_MENTION, PROV_TYPE
+from prov.identifier import Identifier
+from prov.model import PROV_REC_CLS
+
+import provdbconnector.db_adapters.sqlite.sql_commands as sql_commands
+from provdbconnector.db_adapters.baseadapter import BaseAdapter, DbRecord, DbRelation, DbBulkResult, DbPage, \
+    METADATA_KEY_IDENTIFIER, METADATA_KEY_PROV_TYPE, LINEAGE_UPSTREAM, PROJECTION_METADATA_KEYS
+from provdbconnector.exceptions.database import InvalidOptionsException, NotFoundException, DatabaseException
+from provdbconnector.utils.serializer import encode_string_value_to_primitive, encode_dict_values_to_primitive, \
+    merge_record, get_relation_merge_key, get_projection, encode_projected_dict_values_to_primitive, dumps_typed_json, \
+    loads_typed_json
+from provdbconnector.utils.filters import get_field_value, get_group_key
+from provdbconnector.utils.traversal import find_shortest_path
+
+log = logging.getLogger(__name__)
+
+# Supported options of the connect function
+SQLITE_OPTIONS = ("path", "timeout")
+
+SQLITE_META_PREFIX = "meta:"
+
+# Max number of variables in one statement, older sqlite versions support only 999
+SQLITE_MAX_VARIABLES = 500
+
+
+class SqliteAdapter(BaseAdapter):
+    """
+    Adapter for an embedded SQLite database, use the path ``:memory:`` for a temporary in memory database.
+
+    The attributes and metadata of the records are stored as json with the prov types of the values (see
+    :py:func:`provdbconnector.utils.serializer.dumps_typed_json`), so a database file contains only data. The filters
+    use a separate property table with one row per attribute and metadata value. The traversal of the relations is
+    done with recursive common table expressions.
+
+    .. code:: python
+
+        prov_api = ProvDb(adapter=SqliteAdapter, auth_info={"path": "prov.sqlite"})
+
+    """
+
+    def __init__(self, *args):
+        """
+        Setup the class
+
+        :param args: None
+        """
+        super(SqliteAdapter, self).__init__()
+        self.connection = None
+
+    def connect(self, authentication_info):
+        """
+        Open the database file and create the tables if necessary
+
+        :param authentication_info: None for an in memory database, or a dict with the "path" of the database file
+                                    and optionally the "timeout" in seconds to wait for a lock
+        :type authentication_info: dict or None
+        :return: True
+        :rtype: bool
+        :raises: InvalidOptionsException
+        """
+        if authentication_info is None:
+            authentication_info = dict()
+        if not isinstance(authentication_info, dict):
+            raise InvalidOptionsException("The options must be a dict")
+
+        unknown_options = set(authentication_info.keys()) - set(SQLITE_OPTIONS)
+        if len(unknown_options) > 0:
+            raise InvalidOptionsException("Unknown options {}".format(", ".join(sorted(unknown_options))))
+
+        path = authentication_info.get("path", ":memory:")
+        timeout = authentication_info.get("timeout", 5.0)
+        try:
+            # autocommit mode, the transactions are controlled by _transaction
+            connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+            connection.executescript(sql_commands.SQLITE_PRAGMAS)
+            connection.executescript(sql_commands.SQLITE_CREATE_SCHEMA)
+        except (sqlite3.Error, TypeError) as e:
+            raise InvalidOptionsException(e)
+
+        self.close()
+        self.connection = connection
+        return True
+
+    def close(self):
+        """
+        Close the database connection
+
+        """
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Context manager for a transaction, the transaction is rolled back on an exception
+
+        :return: The connection with the open transaction
+        :rtype: sqlite3.Connection
+        """
+        if self.connection is None:
+            raise DatabaseException("The adapter is not connected")
+
+        self.connection.execute("BEGIN")
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    def save_element(self, attributes, metadata):
+        """
+        Store a single node in the database and if necessary and possible merge the node
+
+        :param attributes: The actual provenance data
+        :type attributes: dict
+        :param metadata: Some metadata that are not PROV-O related
+        :type metadata: dict
+        :return: id of the record
+        :rtype: str
+        """
+        with self._transaction() as connection:
+            return self._save_elements(connection, [DbRecord(attributes, metadata)])[0]
+
+    def save_relation(self, from_node, to_node, attributes, metadata):
+        """
+        Store a single relation in the database, relations with the same start and end node, the same prov type and
+        the same formal attributes are merged
+
+        :param from_node: The identifier for the start node
+        :type from_node: prov.model.Identifier
+        :param to_node: The identifier for the end node
+        :type to_node: prov.model.Identifier
+        :param attributes: The actual provenance data
+        :type attributes: dict
+        :param metadata: Some metadata that are not PROV-O related
+        :type metadata: dict
+        :return: The id of the relation
+        :rtype: str
+        """
+        with self._transaction() as connection:
+            return self._save_relations(connection, [(from_node, to_node, attributes, metadata)])[0]
+
+    def save_bulk(self, elements, relations):
+        """
+        Saves a batch of elements and relations in one transaction.
+        The existing records are loaded with one query per chunk, merged in python and written with executemany.
+        If a merge fails the whole batch is rolled back.
+
+        :param elements: The elements as list of DbRecord(attributes, metadata)
+        :type elements: list
+        :param relations: The relations as list of DbBulkRelation(from_node, to_node, attributes, metadata)
+        :type relations: list
+        :return: The ids of the elements and relations in the same order as the input
+        :rtype: DbBulkResult
+        """
+        with self._transaction() as connection:
+            element_ids = self._save_elements(connection, elements)
+            relation_ids = self._save_relations(connection, relations)
+        return DbBulkResult(element_ids, relation_ids)
+
+    def _save_elements(self, connection, elements):
+        """
+        Insert or merge the elements, see :py:meth:`save_bulk`
+
+        :param connection: The connection with the open transaction
+        :type connection: sqlite3.Connection
+        :param elements: The elements as list of DbRecord(attributes, metadata)
+        :type elements: list
+        :return: The identifiers of the elements
+        :rtype: list
+        """
+        identifiers = [str(metadata[METADATA_KEY_IDENTIFIER]) for (attributes, metadata) in elements]
+
+        # identifier -> [node_id, stored attributes, stored metadata, attributes, metadata]
+        nodes = dict()
+        for (node_id, identifier, attributes, metadata) in self._select_chunked(
+                connection, sql_commands.SQLITE_SELECT_NODES_BY_IDENTIFIERS, set(identifiers)):
+            (attributes, metadata) = (loads_typed_json(attributes), loads_typed_json(metadata))
+            nodes[identifier] = [node_id, attributes, metadata, attributes, metadata]
+
+        for ((attributes, metadata), identifier) in zip(elements, identifiers):
+            node = nodes.get(identifier)
+            if node is None:
+                nodes[identifier] = [None, None, None, attributes, metadata]
+            else:
+                node[3:] = merge_record(node[3], node[4], attributes, metadata)
+
+        new_nodes = [identifier for (identifier, node) in nodes.items() if node[0] is None]
+        changed_nodes = [node for node in nodes.values() if
+                         node[0] is not None and (node[3] is not node[1] or node[4] is not node[2])]
+
+        connection.executemany(sql_commands.SQLITE_INSERT_NODE, (
+            (identifier, self._get_type_key(nodes[identifier][4].get(METADATA_KEY_PROV_TYPE)),
+             dumps_typed_json(nodes[identifier][3]), dumps_typed_json(nodes[identifier][4])) for
+            identifier in new_nodes))
+        for (node_id, identifier, attributes, metadata) in self._select_chunked(
+                connection, sql_commands.SQLITE_SELECT_NODES_BY_IDENTIFIERS, new_nodes):
+            nodes[identifier][0] = node_id
+
+        connection.executemany(sql_commands.SQLITE_UPDATE_NODE, (
+            (dumps_typed_json(node[3]), dumps_typed_json(node[4]), node[0]) for node in changed_nodes))
+        connection.executemany(sql_commands.SQLITE_DELETE_NODE_PROPERTIES, ((node[0],) for node in changed_nodes))
+
+        written_nodes = changed_nodes + [nodes[identifier] for identifier in new_nodes]
+        connection.executemany(sql_commands.SQLITE_INSERT_NODE_PROPERTY, (
+            (node[0], key, value) for node in written_nodes for (key, value) in
+            self._get_properties(node[3], node[4])))
+
+        return identifiers
+
+    def _save_relations(self, connection, relations):
+        """
+        Insert or merge the relations, see :py:meth:`save_bulk`
+
+        :param connection: The connection with the open transaction
+        :type connection: sqlite3.Connection
+        :param relations: The relations as list of DbBulkRelation(from_node, to_node, attributes, metadata)
+        :type relations: list
+        :return: The ids of the relations
+        :rtype: list
+        """
+        merge_keys = [get_relation_merge_key(from_node, to_node, attributes, metadata) for
+                      (from_node, to_node, attributes, metadata) in relations]
+
+        # merge_key -> [relation_id, stored attributes, stored metadata, attributes, metadata, from_node, to_node]
+        stored = dict()
+        for (relation_id, merge_key, attributes, metadata) in self._select_chunked(
+                connection, sql_commands.SQLITE_SELECT_RELATIONS_BY_MERGE_KEYS, set(merge_keys)):
+            (attributes, metadata) = (loads_typed_json(attributes), loads_typed_json(metadata))
+            stored[merge_key] = [relation_id, attributes, metadata, attributes, metadata, None, None]
+
+        for ((from_node, to_node, attributes, metadata), merge_key) in zip(relations, merge_keys):
+            relation = stored.get(merge_key)
+            if relation is None:
+                stored[merge_key] = [None, None, None, attributes, metadata, str(from_node), str(to_node)]
+            else:
+                relation[3:5] = merge_record(relation[3], relation[4], attributes, metadata)
+
+        new_relations = [merge_key for (merge_key, relation) in stored.items() if relation[0] is None]
+        connection.executemany(sql_commands.SQLITE_INSERT_RELATION, (
+            (merge_key, stored[merge_key][5], stored[merge_key][6],
+             self._get_type_key(stored[merge_key][4].get(METADATA_KEY_PROV_TYPE)),
+             self._get_type_attribute(stored[merge_key][3]), dumps_typed_json(stored[merge_key][3]),
+             dumps_typed_json(stored[merge_key][4])) for merge_key in new_relations))
+        for (relation_id, merge_key, attributes, metadata) in self._select_chunked(
+                connection, sql_commands.SQLITE_SELECT_RELATIONS_BY_MERGE_KEYS, new_relations):
+            stored[merge_key][0] = relation_id
+
+        connection.executemany(sql_commands.SQLITE_UPDATE_RELATION, (
+            (dumps_typed_json(relation[3]), dumps_typed_json(relation[4]), relation[0]) for
+            relation in stored.values() if
+            relation[1] is not None and (relation[3] is not relation[1] or relation[4] is not relation[2])))
+
+        return [str(stored[merge_key][0]) for merge_key in merge_keys]
+
+    @staticmethod
+    def _select_chunked(connection, statement, values, parameters=()):
+        """
+        Run a select with an IN condition in chunks of SQLITE_MAX_VARIABLES values
+
+        :param connection: The database connection
+        :type connection: sqlite3.Connection
+        :param statement: The statement with a {} placeholder for the parameter list
+        :type statement: str
+        :param values: The values for the IN condition
+        :type values: iterable
+        :param parameters: Further parameters of the statement after the IN condition
+        :type parameters: list
+        :return: Generator of the result rows
+        :rtype: generator
+        """
+        values = list(values)
+        for start in range(0, len(values), SQLITE_MAX_VARIABLES - len(parameters)):
+            chunk = values[start:start + SQLITE_MAX_VARIABLES - len(parameters)]
+            for row in connection.execute(statement.format(", ".join("?" * len(chunk))), chunk + list(parameters)):
+                yield row
+
+    @staticmethod
+    def _get_type_key(prov_type):
+        """
+        Returns the text representation of a prov type, qualified names are compared by the uri
+
+        :param prov_type: The prov type from the metadata
+        :type prov_type: prov.identifier.QualifiedName or str
+        :return: The prov type as text
+        :rtype: str
+        """
+        if prov_type is None:
+            return None
+        if isinstance(prov_type, Identifier):
+            return prov_type.uri
+        return str(prov_type)
+
+    @staticmethod
+    def _get_type_attribute(attributes):
+        """
+        Returns the prov:type attribute as text, used to find the bundle associations
+
+        :param attributes: The actual provenance data
+        :type attributes: dict
+        :return: The prov:type attribute or None
+        :rtype: str
+        """
+        prov_type = attributes.get(PROV_TYPE)
+        if prov_type is None:
+            return None
+        return str(prov_type)
+
+    @staticmethod
+    def _encode_property_value(value):
+        """
+        Returns the text of a value in the property table, the text is compared by the filters
+
+        :param value: The attribute or metadata value
+        :return: The value as json
+        :rtype: str
+        """
+        return json.dumps(encode_string_value_to_primitive(value), sort_keys=True, default=str)
+
+    def _get_properties(self, attributes, metadata):
+        """
+        Returns the rows of the property table for a node
+
+        :param attributes: The actual provenance data
+        :type attributes: dict
+        :param metadata: Some metadata that are not PROV-O related
+        :type metadata: dict
+        :return: Generator of (key, value) tuples
+        :rtype: generator
+        """
+        for (key, value) in attributes.items():
+            yield str(key), self._encode_property_value(value)
+        for (key, value) in metadata.items():
+            yield SQLITE_META_PREFIX + str(key), self._encode_property_value(value)
+
+    def _get_filter(self, attributes_dict, metadata_dict):
+        """
+        Returns the where condition and the parameters for a attributes and metadata filter
+
+        :param attributes_dict: A filter dict with a conjunction of all values in the attributes_dict and metadata_dict
+        :type attributes_dict: dict
+        :param metadata_dict: A filter for the metadata with a conjunction of all values (also in the attributes_dict )
+        :type metadata_dict: dict
+        :return: Tuple with (condition, parameters)
+        :rtype: tuple
+        """
+        if attributes_dict is None:
+            attributes_dict = dict()
+        if metadata_dict is None:
+            metadata_dict = dict()
+
+        properties = list(self._get_properties(attributes_dict, metadata_dict))
+        if len(properties) == 0:
+            return "1", list()
+
+        condition = " AND ".join([sql_commands.SQLITE_FILTER_CONDITION] * len(properties))
+        return condition, [parameter for property_row in properties for parameter in property_row]
+
+    @staticmethod
+    def _decode_row(attributes, metadata, projection=None):
+        """
+        Decode the stored attributes and metadata and encode the values to primitive types
+
+        :param attributes: The attributes as json
+        :type attributes: str
+        :param metadata: The metadata as json
+        :type metadata: str
+        :param projection: The attribute keys, only these values are encoded, None for all
+        :type projection: frozenset
+        :return: Tuple with (attributes, metadata)
+        :rtype: tuple
+        """
+        if projection is None:
+            return encode_dict_values_to_primitive(loads_typed_json(attributes)), \
+                encode_dict_values_to_primitive(loads_typed_json(metadata))
+        return encode_projected_dict_values_to_primitive(loads_typed_json(attributes), projection), \
+            encode_projected_dict_values_to_primitive(loads_typed_json(metadata), PROJECTION_METADATA_KEYS)
+
+    def _get_records(self, statement, parameters, projection=None):
+        """
+        Run a statement that returns (attributes, metadata, is_node) rows
+
+        :param statement: The sql statement
+        :type statement: str
+        :param parameters: The parameters of the statement
+        :type parameters: list
+        :param projection: The attribute keys of the records, None for all
+        :type projection: frozenset
+        :return: A list of DbRelations and DbRecords
+        :rtype: list(DbRelation or DbRecord)
+        """
+        records = list()
+        for (attributes, metadata, is_node) in self.connection.execute(statement, parameters):
+            record_cls = DbRecord if is_node else DbRelation
+            records.append(record_cls(*self._decode_row(attributes, metadata, projection)))
+        return records
+
+    def get_record(self, record_id):
+        """
+        Return a single record
+
+        :param record_id: The identifier of the node
+        :type record_id: str
+        :return: DbRecord
+        :rtype: DbRecord
+        """
+        row = self.connection.execute(sql_commands.SQLITE_GET_NODE, (str(record_id),)).fetchone()
+        if row is None:
+            raise NotFoundException("Record {} not found".format(record_id))
+        return DbRecord(*self._decode_row(*row))
+
+    def get_relation(self, relation_id):
+        """
+        Return a single relation
+
+        :param relation_id: The id of the relation
+        :type relation_id: str
+        :return: DbRelation
+        :rtype: DbRelation
+        """
+        try:
+            row_id = int(relation_id)
+        except (TypeError, ValueError):
+            raise NotFoundException("Relation {} not found".format(relation_id))
+
+        row = self.connection.execute(sql_commands.SQLITE_GET_RELATION, (row_id,)).fetchone()
+        if row is None:
+            raise NotFoundException("Relation {} not found".format(relation_id))
+        return DbRelation(*self._decode_row(*row))
+
+    def get_records_by_filter(self, attributes_dict=None, metadata_dict=None, fields=None):
+        """
+        Filter all nodes based on the provided attributes and metadata dict, the result contains the matching nodes
+        and the relations between them
+
+        :param attributes_dict: A filter dict with a conjunction of all values in the attributes_dict and metadata_dict
+        :type attributes_dict: dict
+        :param metadata_dict: A filter for the metadata with a conjunction of all values (also in the attributes_dict )
+        :type metadata_dict: dict
+        :param fields: The attribute keys of the records, see :py:meth:`BaseAdapter.get_records_by_filter`
+        :type fields: list(str or prov.model.QualifiedName)
+        :return: The list of matching relations and nodes
+        :rtype: List(DbRecord or Dbrelation)
+        """
+        (condition, parameters) = self._get_filter(attributes_dict, metadata_dict)
+        projection = get_projection(fields)
+
+        records = list()
+        for (attributes, metadata) in self.connection.execute(
+                sql_commands.SQLITE_GET_NODES_BY_FILTER.format(filter=condition), parameters):
+            records.append(DbRecord(*self._decode_row(attributes, metadata, projection)))
+        for (attributes, metadata) in self.connection.execute(
+                sql_commands.SQLITE_GET_RELATIONS_BY_FILTER.format(filter=condition), parameters):
+            records.append(DbRelation(*self._decode_row(attributes, metadata, projection)))
+        return records
+
+    def get_records_by_filter_page(self, attributes_dict=None, metadata_dict=None, limit=1000, after=None,
+                                   fields=None):
+        """
+        Returns one page of the matching nodes and their relations with the unique index of the identifier, see
+        :py:meth:`BaseAdapter.get_records_by_filter_page`
+
+        :param attributes_dict: A filter dict with a conjunction of all values in the attributes_dict and metadata_dict
+        :type attributes_dict: dict
+        :param metadata_dict: A filter for the metadata with a conjunction of all values (also in the attributes_dict )
+        :type metadata_dict: dict
+        :param limit: The max number of nodes in the page
+        :type limit: int
+        :param after: The last identifier of the previous page, None for the first page
+        :type after: str
+        :param fields: The attribute keys of the records, see :py:meth:`BaseAdapter.get_records_by_filter`
+        :type fields: list(str or prov.model.QualifiedName)
+        :return: The nodes and relations of the page and the identifier of the last node if there are more pages
+        :rtype: DbPage
+        """
+        (condition, parameters) = self._get_filter(attributes_dict, metadata_dict)
+        projection = get_projection(fields)
+        if after is None:
+            statement = sql_commands.SQLITE_GET_NODES_PAGE_BY_FILTER.format(filter=condition, after="")
+            page_parameters = parameters + [limit + 1]
+        else:
+            statement = sql_commands.SQLITE_GET_NODES_PAGE_BY_FILTER.format(
+                filter=condition, after=sql_commands.SQLITE_PAGE_AFTER_CONDITION)
+            page_parameters = parameters + [str(after), limit + 1]
+
+        with self._transaction() as connection:
+            # one more node to know if there is a next page
+            rows = connection.execute(statement, page_parameters).fetchall()
+            last_identifier = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                last_identifier = rows[-1][0]
+
+            records = [DbRecord(*self._decode_row(attributes, metadata, projection)) for
+                       (identifier, attributes, metadata) in rows]
+            for (attributes, metadata) in self._select_chunked(
+                    connection, sql_commands.SQLITE_GET_PAGE_RELATIONS_BY_FILTER.format(filter=condition),
+                    [row[0] for row in rows], parameters):
+                records.append(DbRelation(*self._decode_row(attributes, metadata, projection)))
+        return DbPage(records, last_identifier)
+
+    def count_records(self, expression=None):
+        """
+        Count the nodes and relations that match the filter expression, see :py:meth:`BaseAdapter.count_records`.
+        Without an expression the rows of the node and relation table are counted.
+
+        :param expression: The filter expression, None to count all records
+        :type expression: provdbconnector.utils.filters.FilterExpression
+        :return: The number of records
+        :rtype: int
+        """
+        if expression is not None:
+            return super(SqliteAdapter, self).count_records(expression)
+        (count,) = self.connection.execute(sql_commands.SQLITE_COUNT_RECORDS).fetchone()
+        return count
+
+    def document_exists(self, document_id):
+        """
+        Check if a document or bundle with the id is saved with a lookup of the metadata key in the index of the
+        property table, see :py:meth:`BaseAdapter.document_exists`
+
+        :param document_id: The document id or bundle id
+        :type document_id: str
+        :return: True if at least one record of the document is saved
+        :rtype: bool
+        """
+        row = self.connection.execute(sql_commands.SQLITE_NODE_PROPERTY_EXISTS,
+                                      (SQLITE_META_PREFIX + str(document_id),)).fetchone()
+        return row is not None
+
+    def group_count_records(self, field, expression=None):
+        """
+        Count the nodes and relations that match the filter expression by the value of a field, see
+        :py:meth:`BaseAdapter.group_count_records`.
+        Without an expression the nodes are grouped in the property table and the relations by the prov type column,
+        only for other fields of the relations the stored records are read.
+
+        :param field: The field to group by
+        :type field: provdbconnector.utils.filters.F
+        :param expression: The filter expression, None to count all records
+        :type expression: provdbconnector.utils.filters.FilterExpression
+        :return: The number of records by the value of the field
+        :rtype: dict
+        """
+        if expression is not None:
+            return super(SqliteAdapter, self).group_count_records(field, expression)
+
+        counts = dict()
+
+        def add(value, count):
+            counts[value] = counts.get(value, 0) + count
+
+        key = SQLITE_META_PREFIX + field.key if field.metadata else field.key
+        (missing,) = self.connection.execute(sql_commands.SQLITE_COUNT_NODES).fetchone()
+        for (value, count) in self.connection.execute(sql_commands.SQLITE_GROUP_COUNT_NODE_PROPERTIES, (key,)):
+            add(get_group_key(json.loads(value)), count)
+            missing -= count
+        if missing > 0:
+            add(None, missing)
+
+        if field.metadata and field.key == METADATA_KEY_PROV_TYPE:
+            # the column contains the uri of the type
+            type_keys = {self._get_type_key(prov_type): get_group_key(prov_type) for prov_type in PROV_REC_CLS}
+            for (prov_type, count) in self.connection.execute(sql_commands.SQLITE_GROUP_COUNT_RELATION_TYPES):
+                add(type_keys.get(prov_type, prov_type), count)
+        else:
+            for (attributes, metadata) in self.connection.execute(sql_commands.SQLITE_GET_ALL_RELATIONS):
+                add(get_field_value(field, loads_typed_json(attributes), loads_typed_json(metadata)), 1)
+        return counts
+
+    def get_records_tail(self, attributes_dict=None, metadata_dict=None, depth=None, fields=None):
+        """
+        Return the provenance based on a filter combination.
+        The filter dicts are only relevant for the start nodes, the connected nodes are found with a recursive query
+
+        :param attributes_dict: A filter dict with a conjunction of all values in the attributes_dict and metadata_dict
+        :type attributes_dict: dict
+        :param metadata_dict: A filter for the metadata with a conjunction of all values (also in the attributes_dict )
+        :type metadata_dict: dict
+        :param depth: The level of detail, default to infinite
+        :type depth: int
+        :param fields: The attribute keys of the records, see :py:meth:`BaseAdapter.get_records_by_filter`
+        :type fields: list(str or prov.model.QualifiedName)
+        :return: A list of DbRelations and DbRecords
+        :rtype: list(DbRelation or DbRecord)
+        """
+        if depth is not None and depth <= 0:
+            return list()
+
+        (condition, parameters) = self._get_filter(attributes_dict, metadata_dict)
+        if depth is None:
+            statement = sql_commands.SQLITE_GET_RECORDS_TAIL
+        else:
+            statement = sql_commands.SQLITE_GET_RECORDS_TAIL_WITH_DEPTH
+            parameters = parameters + [depth]
+
+        return self._get_records(statement.format(filter=condition), parameters, get_projection(fields))
+
+    def get_lineage(self, identifier, direction=LINEAGE_UPSTREAM, relation_types=None, max_depth=None):
+        """
+        Return the lineage of a node with a recursive query over the relation columns of the direction,
+        see :py:meth:`BaseAdapter.get_lineage`
+
+        :param identifier: The identifier of the start node
+        :type identifier: str
+        :param direction: LINEAGE_UPSTREAM or LINEAGE_DOWNSTREAM
+        :type direction: str
+        :param relation_types: The prov types of the relations to follow, default to all relations
+        :type relation_types: list(prov.model.QualifiedName)
+        :param max_depth: The max number of relations between the start node and a result node, default to infinite
+        :type max_depth: int
+        :return: A list of DbRelations and DbRecords, the first record is the start node
+        :rtype: list(DbRelation or DbRecord)
+        """
+        identifier = str(identifier)
+        records = [self.get_record(identifier)]
+        if max_depth == 0:
+            return records
+
+        if direction == LINEAGE_UPSTREAM:
+            (start, end) = ("from_identifier", "to_identifier")
+        else:
+            (start, end) = ("to_identifier", "from_identifier")
+
+        condition = sql_commands.SQLITE_LINEAGE_CONDITION
+        condition_parameters = ["prov:bundleAssociation"]
+        if relation_types is not None:
+            type_keys = [self._get_type_key(prov_type) for prov_type in relation_types]
+            condition += " AND " + sql_commands.SQLITE_LINEAGE_TYPE_CONDITION.format(", ".join("?" * len(type_keys)))
+            condition_parameters += type_keys
+
+        if max_depth is None:
+            statement = sql_commands.SQLITE_GET_LINEAGE
+            parameters = [identifier] + condition_parameters
+        else:
+            statement = sql_commands.SQLITE_GET_LINEAGE_WITH_DEPTH
+            parameters = [identifier, max_depth] + condition_parameters
+        parameters += condition_parameters + [identifier]
+
+        records += self._get_records(statement.format(start=start, end=end, condition=condition), parameters)
+        return records
+
+    def get_path(self, from_identifier, to_identifier, max_depth=None, relation_types=None, directed=True):
+        """
+        Bidirectional breadth first search with one query per level, see :py:meth:`BaseAdapter.get_path`
+
+        :param from_identifier: The identifier of the start node
+        :type from_identifier: str
+        :param to_identifier: The identifier of the end node
+        :type to_identifier: str
+        :param max_depth: The max number of relations in the path, default to infinite
+        :type max_depth: int
+        :param relation_types: The prov types of the relations to follow, default to all relations
+        :type relation_types: list(prov.model.QualifiedName)
+        :param directed: Follow the relations only in their direction
+        :type directed: bool
+        :return: The DbRecords and DbRelations in the order of the path or an empty list
+        :rtype: list(DbRelation or DbRecord)
+        """
+        from_identifier = str(from_identifier)
+        to_identifier = str(to_identifier)
+        for identifier in (from_identifier, to_identifier):
+            self.get_record(identifier)
+
+        condition = sql_commands.SQLITE_LINEAGE_CONDITION
+        condition_parameters = ["prov:bundleAssociation"]
+        if relation_types is not None:
+            type_keys = [self._get_type_key(prov_type) for prov_type in relation_types]
+            condition += " AND " + sql_commands.SQLITE_LINEAGE_TYPE_CONDITION.format(", ".join("?" * len(type_keys)))
+            condition_parameters += type_keys
+
+        outgoing = sql_commands.SQLITE_GET_PATH_NEIGHBOURS.format(start="from_identifier", end="to_identifier",
+                                                                  condition=condition, values="{}")
+        incoming = sql_commands.SQLITE_GET_PATH_NEIGHBOURS.format(start="to_identifier", end="from_identifier",
+                                                                  condition=condition, values="{}")
+
+        def expand(frontier, forward):
+            statements = (outgoing if forward else incoming,)
+            if not directed:
+                statements = (outgoing, incoming)
+            for statement in statements:
+                for row in self._select_chunked(self.connection, statement, frontier, condition_parameters):
+                    yield row
+
+        path = find_shortest_path(from_identifier, to_identifier, lambda frontier: expand(frontier, True),
+                                  lambda frontier: expand(frontier, False), max_depth)
+        if path is None:
+            return list()
+
+        records = list()
+        for (position, identifier) in enumerate(path.nodes):
+            if position > 0:
+                records.append(self.get_relation(path.edges[position - 1]))
+            records.append(self.get_record(identifier))
+        return records
+
+    def get_bundle_records(self, bundle_identifier, fields=None):
+        """
+        Get the records for a specific bundle identifier
+
+        This include all nodes that have a relation of the prov:type = prov:bundleAssociation and also
+        all relation where the start and end node are in the bundle.
+        Also the prov mentionOf relations where the start node is in the bundle are included.
+        See https://www.w3.org/TR/prov-links/
+
+        :param bundle_identifier: The identifier of the bundle
+        :type bundle_identifier: prov.model.Identifier
+        :param fields: The attribute keys of the records, see :py:meth:`BaseAdapter.get_records_by_filter`
+        :type fields: list(str or prov.model.QualifiedName)
+        :return: The list with the bundle nodes and all connections where the start node and end node in the bundle.
+        :rtype: list(DbRelation or DbRecord )
+        """
+        parameters = (str(bundle_identifier), PROV_ASSOCIATION.uri, "prov:bundleAssociation", PROV_MENTION.uri)
+        return self._get_records(sql_commands.SQLITE_GET_BUNDLE_RECORDS, parameters, get_projection(fields))
+
+    def delete_records_by_filter(self, attributes_dict=None, metadata_dict=None):
+        """
+        Delete a set of records based on filter conditions, the relations of the deleted nodes are also deleted
+
+        :param attributes_dict: A filter dict with a conjunction of all values in the attributes_dict and metadata_dict
+        :type attributes_dict: dict
+        :param metadata_dict: A filter for the metadata with a conjunction of all values (also in the attributes_dict )
+        :type metadata_dict: dict
+        :return: The result of the operation
+        :rtype: Bool
+        """
+        (condition, parameters) = self._get_filter(attributes_dict, metadata_dict)
+
+        with self._transaction() as connection:
+            if len(parameters) == 0:
+                # erase all if no filter set
+                connection.execute(sql_commands.SQLITE_DELETE_ALL_RELATIONS)
+                connection.execute(sql_commands.SQLITE_DELETE_ALL_NODES)
+            else:
+                connection.execute(sql_commands.SQLITE_DELETE_RELATIONS_BY_FILTER.format(filter=condition),
+                                   parameters)
+                connection.execute(sql_commands.SQLITE_DELETE_NODES_BY_FILTER.format(filter=condition), parameters)
+        return True
+
+    def delete_record(self, record_id):
+        """
+        Delete a single record and its relations
+
+        :param record_id: The node id
+        :type record_id: str
+        :return: Result of the delete operation
+        :rtype: Bool
+        """
+        with self._transaction() as connection:
+            if connection.execute(sql_commands.SQLITE_DELETE_NODE, (str(record_id),)).rowcount == 0:
+                raise NotFoundException("Record {} not found".format(record_id))
+            connection.execute(sql_commands.SQLITE_DELETE_NODE_RELATIONS, (str(record_id), str(record_id)))
+        return True
+
+    def delete_relation(self, relation_id):
+        """
+        Delete the relation
+
+        :param relation_id: The relation id
+        :type relation_id: str
+        :return: Result of the delete operation
+        :rtype: Bool
+        """
+        try:
+            row_id = int(relation_id)
+        except (TypeError, ValueError):
+            raise NotFoundException("Relation {} not found".format(relation_id))
+
+        with self._transaction() as connection:
+            connection.execute(sql_commands.SQLITE_DELETE_RELATION, (row_id,))
+        return True
+
@@ -2,6 +2,7 @@ import json
 import logging
 import os
 from collections import namedtuple
+from datetime import datetime
 from io import StringIO
 from uuid import uuid4
 
@@ -10,14 +11,25 @@ from prov.model import ProvDocument, ProvEntity, ProvBundle, ProvRecord, ProvEle
     ProvAssociation, PROV_REC_CLS, ProvActivity, ProvAgent, PROV_AGENT,PROV_ENTITY,PROV_ACTIVITY, PROV_ATTR_AGENT,PROV_ATTR_ACTIVITY, PROV_ATTR_ENTITY,PROV_ATTR_BUNDLE
 from provdbconnector.db_adapters.baseadapter import METADATA_KEY_PROV_TYPE, METADATA_KEY_IDENTIFIER, \
     METADATA_KEY_NAMESPACES, \
-    METADATA_KEY_TYPE_MAP, METADATA_KEY_IDENTIFIER_ORIGINAL
+    METADATA_KEY_TYPE_MAP, METADATA_KEY_IDENTIFIER_ORIGINAL, DbRecord, DbBulkRelation, LINEAGE_UPSTREAM, \
+    LINEAGE_DIRECTIONS, BaseAdapter
 from provdbconnector.exceptions.provapi import NoDataBaseAdapterException, InvalidArgumentTypeException, \
     InvalidProvRecordException
 from provdbconnector.exceptions.utils import ParseException
 from provdbconnector.exceptions.database import NotFoundException
 from provdbconnector.utils.converter import form_string, to_json, to_provn, to_xml
+from provdbconnector.utils.graph_export import export_graph_arrays
+from provdbconnector.utils.fingerprint import BundleContent, get_record_fingerprints, get_bundle_fingerprint, \
+    get_document_fingerprint, get_document_id, METADATA_KEY_BUNDLE_FINGERPRINT, METADATA_KEY_BUNDLE_ID
 from provdbconnector.utils.serializer import encode_json_representation, add_namespaces_to_bundle, create_prov_record, \
     PROV_ATTR_BASE_CLS, serialize_namespace
+from provdbconnector.utils.filters import FilterExpression, F
+from provdbconnector.utils.metrics import instrument, get_public_methods, OPERATION_PREFIX_ADAPTER, \
+    OPERATION_PREFIX_PROV_DB, COUNTER_CACHE_HITS, COUNTER_CACHE_MISSES
+from provdbconnector.utils.pagination import DEFAULT_PAGE_SIZE, encode_cursor, decode_cursor, check_page_size
+from provdbconnector.utils.temporal import to_utc_datetime
+from provdbconnector.utils.tracing import trace_span, profile_call, check_tracer, CallProfiler, SPAN_SAVE_DOCUMENT, \
+    SPAN_GET_DOCUMENT, SPAN_GET_BUNDLE, SPAN_PARSE, SPAN_FINGERPRINT, SPAN_SERIALIZE, SPAN_DATABASE, SPAN_DESERIALIZE
 
 LOG_LEVEL = os.environ.get('LOG_LEVEL', '')
 NUMERIC_LEVEL = getattr(logging, LOG_LEVEL.upper(), None)
@@ -27,6 +39,12 @@ log = logging.getLogger(__name__)
 
 PROV_API_BUNDLE_IDENTIFIER_PREFIX = "prov:bundle:{}"
 
+# Elements and relations that are saved together with one bulk operation of the adapter
+WriteBatch = namedtuple("WriteBatch", "elements, relations")
+
+# One page of a paged query, the cursor of the next page is None on the last page
+ProvPage = namedtuple("ProvPage", "document, cursor")
+
 
 class ProvDb(object):
     """
@@ -34,7 +52,8 @@ class ProvDb(object):
 
     """
 
-    def __init__(self, api_id=None, adapter=None, auth_info=None, *args):
+    def __init__(self, api_id=None, adapter=None, auth_info=None, *args, content_addressed=False, metrics=None,
+                 tracer=None, profiler=None):
         """
         Save a new instance of ProvAPI
 
@@ -44,6 +63,17 @@ class ProvDb(object):
         :type adapter: Baseadapter
         :param auth_info: A dict object that contains the information for authentication
         :type auth_info: dict or None
+        :param content_addressed: Derive the document id from the fingerprint of the document and store the
+            fingerprint of each bundle in the database. An unchanged document is not saved again, also by other ProvDb
+            instances, and for changed bundles only the new records are saved.
+        :type content_addressed: bool
+        :param metrics: A sink for the latency and throughput metrics of the public methods of the ProvDb and of the
+            adapter, see :py:mod:`provdbconnector.utils.metrics`. Default to no metrics
+        :type metrics: provdbconnector.utils.metrics.MetricsSink
+        :param tracer: A tracer for the spans of the phases of save_document and get_document_as_prov (parse,
+            serialize, database, deserialize), see :py:mod:`provdbconnector.utils.tracing`. Default to no tracing
+        :param profiler: Profile save_document and get_document_as_prov and keep the statistics of the slow calls
+        :type profiler: provdbconnector.utils.tracing.CallProfiler
         """
         if api_id is None:
             self.api_id = uuid4()
@@ -52,9 +82,35 @@ class ProvDb(object):
 
         if adapter is None:
             raise NoDataBaseAdapterException()
+        check_tracer(tracer)
+        if profiler is not None and not isinstance(profiler, CallProfiler):
+            raise InvalidArgumentTypeException("Should be {} but was {}".format(CallProfiler, type(profiler)))
+        self._tracer = tracer
+        self._profiler = profiler
+
         self._adapter = adapter()
+        self._adapter.tracer = tracer
         self._adapter.connect(auth_info)
 
+        self._content_addressed = content_addressed
+
+        self._metrics = metrics
+        if metrics is not None:
+            instrument(self._adapter, metrics, OPERATION_PREFIX_ADAPTER, get_public_methods(BaseAdapter))
+            instrument(self, metrics, OPERATION_PREFIX_PROV_DB, get_public_methods(type(self)))
+
+    def _increment_metric(self, counter, operation):
+        """
+        Increment a counter of the metrics sink, if the metrics are enabled
+
+        :param counter: The name of the counter, for example COUNTER_CACHE_HITS
+        :type counter: str
+        :param operation: The name of the public method
+        :type operation: str
+        """
+        if self._metrics is not None:
+            self._metrics.increment(counter, OPERATION_PREFIX_PROV_DB + operation)
+
     # Converter Methods
     def save_document_from_json(self, content=None):
         """
@@ -152,21 +208,171 @@ class ProvDb(object):
         :rtype: str
         """
 
-        # Try to convert the content into the provDocument, if it is already a ProvDocument instance the function will return this document
-        try:
-            content = form_string(content=content)
-        except ParseException as e:
-            raise InvalidArgumentTypeException(e)
+        with profile_call(self._profiler, SPAN_SAVE_DOCUMENT), trace_span(self._tracer, SPAN_SAVE_DOCUMENT):
+            # Try to convert the content into the provDocument, if it is already a ProvDocument instance the function will return this document
+            with trace_span(self._tracer, SPAN_PARSE):
+                try:
+                    content = form_string(content=content)
+                except ParseException as e:
+                    raise InvalidArgumentTypeException(e)
+
+            prov_document = content
+
+            if self._content_addressed:
+                return self._save_document_content_addressed(prov_document)
+
+            doc_id = self._save_bundle_internal(prov_document)
 
-        prov_document = content
+            for bundle in prov_document.bundles:
+                self.save_bundle(prov_bundle=bundle)
 
-        doc_id = self._save_bundle_internal(prov_document)
+            return doc_id
+
+    def _save_document_content_addressed(self, prov_document):
+        """
+        Saves the document only if the same document is not already in the database.
+        The document id is derived from the fingerprint, so the lookup is one count of the records with this id.
+        The bundles are saved first via _save_bundle_content_addressed and the records of the document last with one
+        bulk operation, so a document is only found after the whole document was saved.
+
+        :param prov_document: The document
+        :type prov_document: prov.model.ProvDocument
+        :return: Document id
+        :rtype: str
+        """
+        with trace_span(self._tracer, SPAN_FINGERPRINT):
+            bundle_fingerprints = dict()
+            for bundle in prov_document.bundles:
+                record_fingerprints = get_record_fingerprints(bundle)
+                bundle_fingerprints.update({
+                    bundle.identifier: (get_bundle_fingerprint(bundle, record_fingerprints), record_fingerprints)})
+
+            document_fingerprint = get_document_fingerprint(prov_document, {identifier: fingerprint for (
+                identifier, (fingerprint, record_fingerprints)) in bundle_fingerprints.items()})
+
+        doc_id = get_document_id(document_fingerprint)
+        if self._adapter.document_exists(doc_id):
+            self._increment_metric(COUNTER_CACHE_HITS, "save_document")
+            return doc_id
+        self._increment_metric(COUNTER_CACHE_MISSES, "save_document")
 
         for bundle in prov_document.bundles:
-            self.save_bundle(prov_bundle=bundle)
+            (fingerprint, record_fingerprints) = bundle_fingerprints[bundle.identifier]
+            self._save_bundle_content_addressed(bundle, fingerprint, record_fingerprints)
 
+        self._save_records(prov_document.get_records(), doc_id)
         return doc_id
 
+    def _save_bundle_content_addressed(self, prov_bundle, fingerprint=None, record_fingerprints=None):
+        """
+        Saves only the records of the bundle that are not already saved for the same bundle identifier.
+        The fingerprint and the bundle id are stored as metadata of the bundle entity after the records are saved.
+        For a changed bundle the saved records are read from the database to compare the record fingerprints
+
+        :param prov_bundle: The bundle
+        :type prov_bundle: prov.model.ProvBundle
+        :param fingerprint: The fingerprint of the bundle, calculated if None
+        :type fingerprint: str
+        :param record_fingerprints: The fingerprints of the bundle records, see get_record_fingerprints
+        :type record_fingerprints: dict
+        :return: The bundle id
+        :rtype: str
+        """
+        if record_fingerprints is None:
+            record_fingerprints = get_record_fingerprints(prov_bundle)
+        if fingerprint is None:
+            fingerprint = get_bundle_fingerprint(prov_bundle, record_fingerprints)
+
+        saved_bundle = self._get_saved_bundle(prov_bundle.identifier)
+        if saved_bundle is not None and saved_bundle.fingerprint == fingerprint and \
+                self._adapter.document_exists(saved_bundle.bundle_id):
+            self._increment_metric(COUNTER_CACHE_HITS, "save_bundle")
+            return saved_bundle.bundle_id
+        self._increment_metric(COUNTER_CACHE_MISSES, "save_bundle")
+
+        saved_record_fingerprints = frozenset()
+        if saved_bundle is not None:
+            saved_record_fingerprints = get_record_fingerprints(self.get_bundle(prov_bundle.identifier)).keys()
+
+        self._save_bundle_entity(prov_bundle)
+
+        bundle_id = str(uuid4())
+        self._save_records([record for (record_fingerprint, record) in record_fingerprints.items() if
+                            record_fingerprint not in saved_record_fingerprints], bundle_id)
+
+        self._save_bundle_entity(prov_bundle, BundleContent(fingerprint, bundle_id))
+        return bundle_id
+
+    def _get_saved_bundle(self, identifier):
+        """
+        Returns the fingerprint and the bundle id that are stored in the bundle entity by the content addressed mode
+
+        :param identifier: The identifier of the bundle
+        :type identifier: prov.model.QualifiedName
+        :return: The saved bundle or None if the bundle was not saved in the content addressed mode
+        :rtype: BundleContent
+        """
+        # Include namespace uri into the identifier to support e.g. different default namespaces
+        global_identifier = identifier.namespace.uri + identifier.localpart
+        for record in self._adapter.get_records_by_filter(metadata_dict={METADATA_KEY_IDENTIFIER: global_identifier}):
+            if METADATA_KEY_BUNDLE_FINGERPRINT in record.metadata:
+                return BundleContent(record.metadata[METADATA_KEY_BUNDLE_FINGERPRINT],
+                                     record.metadata[METADATA_KEY_BUNDLE_ID])
+        return None
+
+    def append_to_document(self, document_id, content):
+        """
+        Appends records to an already saved document, without saving the whole document again.
+        All records are written with one bulk operation of the adapter.
+        In the content addressed mode the document keeps its id, so a later save of the original document returns the
+        id of the extended document
+
+        .. code:: python
+
+            doc_id = prov_db.save_document(doc)
+
+            update = ProvDocument()
+            update.set_default_namespace("http://example.com")
+            update.entity("e2")
+            prov_db.append_to_document(doc_id, update)
+
+        :param document_id: The id of the document, see save_document
+        :type document_id: str
+        :param content: A ProvDocument, a single record or a list of records
+        :type content: ProvDocument or ProvRecord or list
+        :return: Document id
+        :rtype: str
+        :raise NotFoundException: If there is no record of the document
+        """
+        if type(document_id) is not str:
+            raise InvalidArgumentTypeException()
+
+        if isinstance(content, ProvDocument):
+            prov_records = content.get_records()
+            prov_bundles = content.bundles
+        elif isinstance(content, ProvRecord):
+            prov_records = [content]
+            prov_bundles = list()
+        elif isinstance(content, list):
+            prov_records = content
+            prov_bundles = list()
+        else:
+            raise InvalidArgumentTypeException()
+
+        for record in prov_records:
+            if not isinstance(record, ProvRecord):
+                raise InvalidArgumentTypeException("Should be {} but was {}".format(ProvRecord, type(record)))
+
+        if not self._adapter.document_exists(document_id):
+            raise NotFoundException("Can't find the document with id {}".format(document_id))
+
+        self._save_records(prov_records, document_id)
+
+        for bundle in prov_bundles:
+            self.save_bundle(prov_bundle=bundle)
+
+        return document_id
+
     def get_document_as_prov(self, document_id=None):
         """
         Get a ProvDocument from the database based on the document id
@@ -179,36 +385,65 @@ class ProvDb(object):
         if type(document_id) is not str:
             raise InvalidArgumentTypeException()
 
-        filter_meta = dict()
-        filter_prop = dict()
-        filter_meta.update({document_id: True})
-        filter_prop.update({PROV_TYPE: PROV_BUNDLE})
+        with profile_call(self._profiler, SPAN_GET_DOCUMENT), trace_span(self._tracer, SPAN_GET_DOCUMENT):
+            filter_meta = dict()
+            filter_prop = dict()
+            filter_meta.update({document_id: True})
+            filter_prop.update({PROV_TYPE: PROV_BUNDLE})
 
-        bundle_entities = self._adapter.get_records_by_filter(metadata_dict=filter_meta, attributes_dict=filter_prop)
-        document_records = self._adapter.get_records_by_filter(metadata_dict=filter_meta)
+            with trace_span(self._tracer, SPAN_DATABASE):
+                bundle_entities = self._adapter.get_records_by_filter(metadata_dict=filter_meta,
+                                                                      attributes_dict=filter_prop)
+                document_records = self._adapter.get_records_by_filter(metadata_dict=filter_meta)
 
-        # parse document
-        prov_document = ProvDocument()
-        for record in document_records:
-            self._parse_record(prov_document, record)
+            # parse document
+            prov_document = ProvDocument()
+            with trace_span(self._tracer, SPAN_DESERIALIZE):
+                for record in document_records:
+                    self._parse_record(prov_document, record)
 
-        bundle_doc = ProvDocument()# Document with all bundle entities
+            bundle_doc = ProvDocument()# Document with all bundle entities
 
-        for bundle_record in bundle_entities:
+            for bundle_record in bundle_entities:
 
-            # skip if we got some relations instead of only the bundle nodes
-            if str(PROV_TYPE) not in bundle_record.attributes:
-                continue
+                # skip if we got some relations instead of only the bundle nodes
+                if str(PROV_TYPE) not in bundle_record.attributes:
+                    continue
 
-            if str(bundle_record.attributes[str(PROV_TYPE)]) != str(PROV_BUNDLE):
-                continue
+                if str(bundle_record.attributes[str(PROV_TYPE)]) != str(PROV_BUNDLE):
+                    continue
+
+                bundle_entity= self._parse_record(bundle_doc,bundle_record)
+                prov_bundle = self.get_bundle(bundle_entity.identifier)
+                prov_document.add_bundle(prov_bundle,identifier=bundle_entity.identifier)
 
-            bundle_entity= self._parse_record(bundle_doc,bundle_record)
-            prov_bundle = self.get_bundle(bundle_entity.identifier)
-            prov_document.add_bundle(prov_bundle,identifier=bundle_entity.identifier)
 
+            return prov_document
 
-        return prov_document
+    def get_graph_arrays(self, document_id=None):
+        """
+        Export the stored graph as numpy arrays in the CSR format, see :py:func:`export_graph_arrays`.
+        Requires the optional numpy dependency.
+
+        .. code:: python
+
+            graph = prov_db.get_graph_arrays(document_id)
+            # the identifiers of all nodes that are derived from the first node
+            derived = [graph.identifiers[index] for index in graph.indices[graph.indptr[0]:graph.indptr[1]]]
+
+        :param document_id: The id of the document, default to all stored records
+        :type document_id: str
+        :return: The graph arrays
+        :rtype: GraphArrays
+        """
+        if document_id is None:
+            records = self._adapter.get_records_by_filter()
+        elif type(document_id) is str:
+            records = self._adapter.get_records_by_filter(metadata_dict={document_id: True})
+        else:
+            raise InvalidArgumentTypeException()
+
+        return export_graph_arrays(records)
 
     def save_element(self, prov_element, bundle_id=None):
         """
@@ -239,17 +474,45 @@ class ProvDb(object):
         if not isinstance(prov_element, ProvElement):
             raise InvalidArgumentTypeException("Should be {} but was {}".format(ProvElement, type(prov_element)))
 
+        batch = WriteBatch(list(), list())
+        self._add_element_to_batch(batch, prov_element, bundle_id=bundle_id)
+        self._save_batch(batch)
+
+        return prov_element.identifier
+
+    def _add_element_to_batch(self, batch, prov_element, bundle_id=None):
+        """
+        Adds the element and if necessary the bundle association to the write batch
+
+        :param batch: The write batch
+        :type batch: WriteBatch
+        :param prov_element: The ProvElement
+        :type prov_element: prov.model.ProvElement
+        :param bundle_id:
+        :type bundle_id: str
+        """
         (metadata, attributes) = self._get_metadata_and_attributes_for_record(prov_element, bundle_id=bundle_id)
-        self._adapter.save_element(attributes=attributes, metadata=metadata)
+        batch.elements.append(DbRecord(attributes, metadata))
 
         #Add bundle relation only if the record belongs to a bundle not to document
         if not isinstance(prov_element.bundle, ProvDocument):
             bundle_id_qualified = prov_element.bundle.valid_qualified_name(prov_element.bundle.identifier)
-            self._create_bundle_association([prov_element], bundle_id_qualified)
+            self._add_bundle_association_to_batch(batch, [prov_element], bundle_id_qualified)
 
-        return prov_element.identifier
+    def _save_batch(self, batch):
+        """
+        Saves all elements and relations of the batch with one bulk operation of the adapter
+
+        :param batch: The write batch
+        :type batch: WriteBatch
+        :return: The ids of the saved elements and relations
+        :rtype: DbBulkResult
+        """
+        with trace_span(self._tracer, SPAN_DATABASE, {"elements": len(batch.elements),
+                                                      "relations": len(batch.relations)}):
+            return self._adapter.save_bulk(batch.elements, batch.relations)
 
-    def get_elements(self, prov_element_cls):
+    def get_elements(self, prov_element_cls, limit=None, cursor=None, fields=None):
         """
         Return a document that contains the requested type
 
@@ -265,10 +528,35 @@ class ProvDb(object):
             print(document_with_all_agents)
             print(document_with_all_activities)
 
+        With a limit the elements are returned in pages ordered by the identifier, the cursor of a page is passed to
+        get the next page:
+
+        .. code:: python
+
+            page = prov_db.get_elements(ProvEntity, limit=1000)
+            while True:
+                print(page.document)
+                if page.cursor is None:
+                    break
+                page = prov_db.get_elements(ProvEntity, limit=1000, cursor=page.cursor)
+
+        With fields only these attributes are read from the database:
+
+        .. code:: python
+
+            labels = prov_db.get_elements(ProvEntity, fields=[PROV_LABEL])
 
         :param prov_element_cls:
-        :return: Prov document
-        :rtype prov.model.ProvDocument
+        :param limit: The max number of elements in a page, default to all elements without pages
+        :type limit: int
+        :param cursor: The cursor of the previous page, None for the first page
+        :type cursor: str
+        :param fields: The attributes of the elements, for example [PROV_LABEL] for a list view. The formal
+            attributes of the relations and prov:label are always included. Default to all attributes
+        :type fields: list(prov.model.QualifiedName)
+        :return: Prov document or the page with the document and the cursor of the next page if a limit or cursor is
+            provided
+        :rtype prov.model.ProvDocument or ProvPage
 
         """
         if prov_element_cls is ProvAgent:
@@ -282,14 +570,106 @@ class ProvDb(object):
 
         meta_filter = dict()
         meta_filter.update({METADATA_KEY_PROV_TYPE: prov_type})
+        fields = self._get_projection_fields(fields)
 
         doc = ProvDocument()
-        raw_results = self._adapter.get_records_by_filter(metadata_dict=meta_filter)
+        if limit is None and cursor is None:
+            raw_results = self._adapter.get_records_by_filter(metadata_dict=meta_filter, fields=fields)
+            next_cursor = None
+        else:
+            (raw_results, next_cursor) = self._get_records_page(None, meta_filter, limit, cursor, fields)
 
         for element in raw_results:
             if element.metadata[METADATA_KEY_PROV_TYPE] == str(prov_type):
                 self._parse_record(doc,element)
-        return doc
+
+        if limit is None and cursor is None:
+            return doc
+        return ProvPage(doc, next_cursor)
+
+    def get_records_by_filter_page(self, attributes_dict=None, metadata_dict=None, limit=DEFAULT_PAGE_SIZE,
+                                   cursor=None, fields=None):
+        """
+        Get one page of the elements that match the filter and of the relations between them.
+        The elements are ordered by the identifier and each relation is part of the page of its start element.
+
+        .. code:: python
+
+            page = prov_db.get_records_by_filter_page(metadata_dict={METADATA_KEY_PROV_TYPE: PROV_ENTITY}, limit=100)
+            next_page = prov_db.get_records_by_filter_page(metadata_dict={METADATA_KEY_PROV_TYPE: PROV_ENTITY},
+                                                           limit=100, cursor=page.cursor)
+
+        :param attributes_dict: A filter dict with a conjunction of all values in the attributes_dict and metadata_dict
+        :type attributes_dict: dict
+        :param metadata_dict: A filter for the metadata with a conjunction of all values (also in the attributes_dict )
+        :type metadata_dict: dict
+        :param limit: The max number of elements in the page
+        :type limit: int
+        :param cursor: The cursor of the previous page, None for the first page
+        :type cursor: str
+        :param fields: The attributes of the elements, for example [PROV_LABEL] for a list view. The formal
+            attributes of the relations and prov:label are always included. Default to all attributes
+        :type fields: list(prov.model.QualifiedName)
+        :return: The document of the page and the cursor of the next page, None on the last page
+        :rtype: ProvPage
+        """
+        for filter_dict in (attributes_dict, metadata_dict):
+            if filter_dict is not None and not isinstance(filter_dict, dict):
+                raise InvalidArgumentTypeException("The filter should be a dict but was {}".format(type(filter_dict)))
+
+        (records, next_cursor) = self._get_records_page(attributes_dict, metadata_dict, limit, cursor,
+                                                        self._get_projection_fields(fields))
+
+        doc = ProvDocument()
+        for record in records:
+            self._parse_record(doc, record)
+        return ProvPage(doc, next_cursor)
+
+    def _get_records_page(self, attributes_dict, metadata_dict, limit, cursor, fields=None):
+        """
+        Get a page from the adapter
+
+        :param attributes_dict: The attributes filter
+        :type attributes_dict: dict
+        :param metadata_dict: The metadata filter
+        :type metadata_dict: dict
+        :param limit: The max number of elements in the page, default to DEFAULT_PAGE_SIZE
+        :type limit: int
+        :param cursor: The cursor of the previous page
+        :type cursor: str
+        :param fields: The attribute keys, see _get_projection_fields
+        :type fields: list
+        :return: Tuple with (the records of the page, the cursor of the next page)
+        :rtype: tuple
+        """
+        if limit is None:
+            limit = DEFAULT_PAGE_SIZE
+        check_page_size(limit)
+        after = decode_cursor(cursor)
+
+        page = self._adapter.get_records_by_filter_page(attributes_dict, metadata_dict, limit=limit, after=after,
+                                                        fields=fields)
+        return page.records, encode_cursor(page.last_identifier)
+
+    @staticmethod
+    def _get_projection_fields(fields):
+        """
+        Returns the attribute keys for the adapter: the requested attributes, the formal attributes of the relations
+        and prov:label to recognize the internal bundle relations
+
+        :param fields: The requested attributes or None for all attributes
+        :type fields: list(prov.model.QualifiedName or str)
+        :return: The attribute keys or None
+        :rtype: list
+        """
+        if fields is None:
+            return None
+        if not isinstance(fields, (list, tuple, set, frozenset)):
+            raise InvalidArgumentTypeException("The fields should be a list but was {}".format(type(fields)))
+        for field in fields:
+            if not isinstance(field, (QualifiedName, str)):
+                raise InvalidArgumentTypeException("A field should be a QualifiedName but was {}".format(type(field)))
+        return list(fields) + list(PROV_ATTRIBUTES) + [PROV_LABEL]
 
     def get_element(self, identifier):
         """
@@ -334,6 +714,315 @@ class ProvDb(object):
         doc = ProvDocument()
         return self._parse_record(doc,element)
 
+    def get_lineage(self, identifier, direction=LINEAGE_UPSTREAM, relation_types=None, max_depth=None):
+        """
+        Get the lineage of a element, upstream all records it was derived from and downstream all records that
+        were derived from it. The relations are followed only in the direction, for example upstream from the
+        generated entity to the activity of a generation.
+
+        .. code:: python
+
+            doc = ProvDocument()
+
+            identifier = QualifiedName(doc, "ex:report")
+
+            # where did the report come from
+            ancestors = prov_db.get_lineage(identifier)
+            # the entities the report was derived from in max 2 steps
+            sources = prov_db.get_lineage(identifier, relation_types=[ProvDerivation], max_depth=2)
+            # everything that was derived from the report
+            descendants = prov_db.get_lineage(identifier, direction="downstream")
+
+        :param identifier: The identifier of the start element
+        :type identifier: prov.model.QualifiedName
+        :param direction: "upstream" or "downstream"
+        :type direction: str
+        :param relation_types: The relations to follow as prov types or relation classes, default to all relations
+        :type relation_types: list(prov.model.QualifiedName or type)
+        :param max_depth: The max number of relations between the start element and a result record, default to infinite
+        :type max_depth: int
+        :return: The start element and the reached records
+        :rtype: prov.model.ProvDocument
+        """
+        if not isinstance(identifier, QualifiedName):
+            raise InvalidArgumentTypeException("Should be {} but was {}".format(QualifiedName, type(identifier)))
+        if direction not in LINEAGE_DIRECTIONS:
+            raise InvalidArgumentTypeException("The direction must be one of {}".format(LINEAGE_DIRECTIONS))
+        if max_depth is not None and (type(max_depth) is not int or max_depth < 0):
+            raise InvalidArgumentTypeException("The max_depth must be a positive int, got {}".format(max_depth))
+
+        if relation_types is not None:
+            relation_types = [self._get_relation_prov_type(relation_type) for relation_type in relation_types]
+
+        # Include namespace uri into the identifier to support e.g. different default namespaces
+        global_identifier = identifier.namespace.uri + identifier.localpart
+
+        records = self._adapter.get_lineage(global_identifier, direction=direction, relation_types=relation_types,
+                                            max_depth=max_depth)
+
+        doc = ProvDocument()
+        for record in records:
+            self._parse_record(doc, record)
+        return doc
+
+    def is_reachable(self, source, target, relation_types=None):
+        """
+        Check if the source element is transitively connected to the target element, for example if an entity was
+        derived from or influenced by another one. The relations are followed in the same direction as the upstream
+        lineage, see :py:meth:`get_lineage`.
+
+        .. code:: python
+
+            doc = ProvDocument()
+
+            report = QualifiedName(doc, "ex:report")
+            dataset = QualifiedName(doc, "ex:dataset")
+
+            derived = prov_db.is_reachable(report, dataset, relation_types=[ProvDerivation])
+
+        Use the SimpleInMemoryAdapter with the ``reachability_index`` option for many queries.
+
+        :param source: The identifier of the start element
+        :type source: prov.model.QualifiedName
+        :param target: The identifier of the end element
+        :type target: prov.model.QualifiedName
+        :param relation_types: The relations to follow as prov types or relation classes, default to all relations
+        :type relation_types: list(prov.model.QualifiedName or type)
+        :return: True if there is a path from the source to the target
+        :rtype: bool
+        """
+        for identifier in (source, target):
+            if not isinstance(identifier, QualifiedName):
+                raise InvalidArgumentTypeException("Should be {} but was {}".format(QualifiedName, type(identifier)))
+
+        if relation_types is not None:
+            relation_types = [self._get_relation_prov_type(relation_type) for relation_type in relation_types]
+
+        # Include namespace uri into the identifier to support e.g. different default namespaces
+        global_source = source.namespace.uri + source.localpart
+        global_target = target.namespace.uri + target.localpart
+
+        return self._adapter.is_reachable(global_source, global_target, relation_types=relation_types)
+
+    def get_path(self, from_identifier, to_identifier, max_depth=None, relation_types=None, directed=True):
+        """
+        Get a shortest path between two elements, for example how a report is connected to a dataset.
+        A directed path follows the relations in the same direction as the upstream lineage (see
+        :py:meth:`get_lineage`), an undirected path follows them in both directions.
+
+        .. code:: python
+
+            doc = ProvDocument()
+
+            report = QualifiedName(doc, "ex:report")
+            dataset = QualifiedName(doc, "ex:dataset")
+
+            path = prov_db.get_path(report, dataset, max_depth=10)
+            # any connection of the two elements
+            connection = prov_db.get_path(report, dataset, directed=False)
+
+        :param from_identifier: The identifier of the start element
+        :type from_identifier: prov.model.QualifiedName
+        :param to_identifier: The identifier of the end element
+        :type to_identifier: prov.model.QualifiedName
+        :param max_depth: The max number of relations in the path, default to infinite
+        :type max_depth: int
+        :param relation_types: The relations to follow as prov types or relation classes, default to all relations
+        :type relation_types: list(prov.model.QualifiedName or type)
+        :param directed: Follow the relations only in their direction
+        :type directed: bool
+        :return: The elements and relations of the path, an empty document if there is no path
+        :rtype: prov.model.ProvDocument
+        """
+        for identifier in (from_identifier, to_identifier):
+            if not isinstance(identifier, QualifiedName):
+                raise InvalidArgumentTypeException("Should be {} but was {}".format(QualifiedName, type(identifier)))
+        if max_depth is not None and (type(max_depth) is not int or max_depth < 0):
+            raise InvalidArgumentTypeException("The max_depth must be a positive int, got {}".format(max_depth))
+
+        if relation_types is not None:
+            relation_types = [self._get_relation_prov_type(relation_type) for relation_type in relation_types]
+
+        # Include namespace uri into the identifier to support e.g. different default namespaces
+        global_from = from_identifier.namespace.uri + from_identifier.localpart
+        global_to = to_identifier.namespace.uri + to_identifier.localpart
+
+        records = self._adapter.get_path(global_from, global_to, max_depth=max_depth, relation_types=relation_types,
+                                         directed=directed)
+
+        doc = ProvDocument()
+        for record in records:
+            self._parse_record(doc, record)
+        return doc
+
+    def get_records_by_expression(self, expression):
+        """
+        Get all elements and relations that match a filter expression, the filter is evaluated by the database.
+        See :py:mod:`provdbconnector.utils.filters` for the operators.
+
+        .. code:: python
+
+            from provdbconnector import F
+
+            # the datasets with more than 10 rows
+            doc = prov_db.get_records_by_expression((F("prov:type") == "ex:Dataset") & (F("ex:rows") > 10))
+            # the activities of a document
+            doc = prov_db.get_records_by_expression((F("prov_type", metadata=True) == PROV_ACTIVITY) &
+                                                    F(document_id, metadata=True).exists())
+
+        :param expression: The filter expression
+        :type expression: provdbconnector.utils.filters.FilterExpression
+        :return: The matching records, the relations without their elements
+        :rtype: prov.model.ProvDocument
+        """
+        if not isinstance(expression, FilterExpression):
+            raise InvalidArgumentTypeException("Should be {} but was {}".format(FilterExpression, type(expression)))
+
+        records = self._adapter.get_records_by_expression(expression)
+
+        doc = ProvDocument()
+        for record in records:
+            self._parse_record(doc, record)
+        return doc
+
+    def count(self, expression=None):
+        """
+        Count the elements and relations in the database without reading them, the count is done by the database.
+
+        .. code:: python
+
+            # all records
+            size = prov_db.count()
+            # the records of a document
+            size = prov_db.count(F(document_id, metadata=True).exists())
+
+        :param expression: The filter expression, None to count all records
+        :type expression: provdbconnector.utils.filters.FilterExpression
+        :return: The number of records
+        :rtype: int
+        """
+        self._check_expression(expression)
+        return self._adapter.count_records(expression)
+
+    def group_count(self, by=METADATA_KEY_PROV_TYPE, expression=None):
+        """
+        Count the elements and relations in the database by the value of a field, the count is done by the database.
+
+        .. code:: python
+
+            # the records by the prov type, for example {"prov:Entity": 10, "prov:Generation": 4}
+            counts = prov_db.group_count()
+            # the entities by the prov:type attribute, entities without a prov:type are counted with the key None
+            counts = prov_db.group_count(PROV_TYPE, F("prov_type", metadata=True) == PROV_ENTITY)
+
+        :param by: The metadata key "prov_type", an attribute key or a field
+        :type by: str or prov.model.QualifiedName or provdbconnector.utils.filters.F
+        :param expression: The filter expression, None to count all records
+        :type expression: provdbconnector.utils.filters.FilterExpression
+        :return: The number of records by the value, the values are in the primitive representation (qualified names
+            as "prefix:localpart" and lists as tuples)
+        :rtype: dict
+        """
+        self._check_expression(expression)
+        if isinstance(by, F):
+            field = by
+        elif by == METADATA_KEY_PROV_TYPE:
+            field = F(METADATA_KEY_PROV_TYPE, metadata=True)
+        elif isinstance(by, (QualifiedName, str)):
+            field = F(by)
+        else:
+            raise InvalidArgumentTypeException("The field should be a QualifiedName but was {}".format(type(by)))
+        return self._adapter.group_count_records(field, expression)
+
+    @staticmethod
+    def _check_expression(expression):
+        """
+        Check that the expression is a filter expression or None
+
+        :param expression: The filter expression
+        :type expression: provdbconnector.utils.filters.FilterExpression
+        :raise InvalidArgumentTypeException:
+        """
+        if expression is not None and not isinstance(expression, FilterExpression):
+            raise InvalidArgumentTypeException("Should be {} but was {}".format(FilterExpression, type(expression)))
+
+    def get_records_in_time_range(self, start, end, prov_types=None):
+        """
+        Get the records with a time in the range: activities that ran in the range (prov:startTime and prov:endTime)
+        and the generations, usages, starts, ends and invalidations that happened in the range (prov:time).
+        Times without a timezone are interpreted as UTC.
+
+        .. code:: python
+
+            start = datetime(2017, 5, 1)
+            end = datetime(2017, 5, 2)
+
+            # everything that happened on the 1st of May
+            doc = prov_db.get_records_in_time_range(start, end)
+            # the activities that ran on the 1st of May
+            activities = prov_db.get_records_in_time_range(start, end, prov_types=[ProvActivity])
+
+        :param start: The start of the range, inclusive
+        :type start: datetime.datetime
+        :param end: The end of the range, inclusive
+        :type end: datetime.datetime
+        :param prov_types: The records to return as prov types or record classes, default to all records
+        :type prov_types: list(prov.model.QualifiedName or type)
+        :return: The records in the range, the relations without their elements
+        :rtype: prov.model.ProvDocument
+        """
+        for value in (start, end):
+            if not isinstance(value, datetime):
+                raise InvalidArgumentTypeException("Should be {} but was {}".format(datetime, type(value)))
+        start = to_utc_datetime(start)
+        end = to_utc_datetime(end)
+        if start > end:
+            raise InvalidArgumentTypeException("The start {} is after the end {}".format(start, end))
+
+        if prov_types is not None:
+            prov_types = [self._get_record_prov_type(prov_type) for prov_type in prov_types]
+
+        records = self._adapter.get_records_in_time_range(start, end, prov_types=prov_types)
+
+        doc = ProvDocument()
+        for record in records:
+            self._parse_record(doc, record)
+        return doc
+
+    @staticmethod
+    def _get_record_prov_type(record_type):
+        """
+        Returns the prov type for a record class or prov type
+
+        :param record_type: The record class (for example ProvActivity) or the prov type
+        :type record_type: type or prov.model.QualifiedName
+        :return: The prov type
+        :rtype: prov.model.QualifiedName
+        """
+        if isinstance(record_type, type) and issubclass(record_type, ProvRecord):
+            record_type = getattr(record_type, "_prov_type", None)
+
+        if record_type not in PROV_REC_CLS:
+            raise InvalidArgumentTypeException("Not a record type: {}".format(record_type))
+        return record_type
+
+    @staticmethod
+    def _get_relation_prov_type(relation_type):
+        """
+        Returns the prov type for a relation class or prov type
+
+        :param relation_type: The relation class (for example ProvDerivation) or the prov type
+        :type relation_type: type or prov.model.QualifiedName
+        :return: The prov type
+        :rtype: prov.model.QualifiedName
+        """
+        if isinstance(relation_type, type) and issubclass(relation_type, ProvRelation):
+            relation_type = relation_type._prov_type
+
+        if relation_type not in PROV_REC_CLS or not issubclass(PROV_REC_CLS[relation_type], ProvRelation):
+            raise InvalidArgumentTypeException("Not a relation type: {}".format(relation_type))
+        return relation_type
+
     def save_record(self, prov_record, bundle_id=None):
         """
         Saves a realtion or a element (Entity, Agent or Activity)
@@ -421,7 +1110,7 @@ class ProvDb(object):
         add_namespaces_to_bundle(prov_bundle, raw_record.metadata)
         return create_prov_record(prov_bundle, prov_type, prov_id, raw_record.attributes, type_map)
 
-    def get_bundle(self, identifier):
+    def get_bundle(self, identifier, fields=None):
         """
         Returns the whole bundle for the provided identifier
 
@@ -435,28 +1124,35 @@ class ProvDb(object):
 
         :param identifier: The identifier
         :type identifier: prov.model.QualifiedName
+        :param fields: The attributes of the elements, for example [PROV_LABEL] for a list view. The formal
+            attributes of the relations and prov:label are always included. Default to all attributes
+        :type fields: list(prov.model.QualifiedName)
         :return: The prov bundle instance
         :rtype prov.model.ProvBundle
         """
         if not isinstance(identifier, QualifiedName):
             raise InvalidArgumentTypeException()
+        fields = self._get_projection_fields(fields)
 
 
-        bundle_entity = self.get_element(identifier)
+        with trace_span(self._tracer, SPAN_GET_BUNDLE):
+            bundle_entity = self.get_element(identifier)
 
-        doc = ProvDocument()
-        doc.add_record(bundle_entity)#Add bundle entity to document
+            doc = ProvDocument()
+            doc.add_record(bundle_entity)#Add bundle entity to document
 
-        prov_bundle = doc.bundle(identifier=bundle_entity.identifier)
+            prov_bundle = doc.bundle(identifier=bundle_entity.identifier)
 
-        # Include namespace uri into the identifier to support e.g. different default namespaces
-        global_identifier = identifier.namespace.uri + identifier.localpart
-        bundle_records = self._adapter.get_bundle_records(global_identifier)
+            # Include namespace uri into the identifier to support e.g. different default namespaces
+            global_identifier = identifier.namespace.uri + identifier.localpart
+            with trace_span(self._tracer, SPAN_DATABASE):
+                bundle_records = self._adapter.get_bundle_records(global_identifier, fields=fields)
 
-        for record in bundle_records:
-            self._parse_record(prov_bundle, record)
+            with trace_span(self._tracer, SPAN_DESERIALIZE):
+                for record in bundle_records:
+                    self._parse_record(prov_bundle, record)
 
-        return prov_bundle
+            return prov_bundle
 
     def save_bundle(self,prov_bundle):
         """
@@ -480,12 +1176,41 @@ class ProvDb(object):
         if isinstance(prov_bundle, ProvDocument):
             raise  InvalidArgumentTypeException()
 
-        # create bundle entity
-        bundle_record = ProvEntity(prov_bundle.document, identifier=prov_bundle.identifier, attributes={PROV_TYPE: PROV_BUNDLE})
-        self.save_element(prov_element=bundle_record)
+        if self._content_addressed:
+            return self._save_bundle_content_addressed(prov_bundle)
+
+        self._save_bundle_entity(prov_bundle)
 
         return self._save_bundle_internal(prov_bundle)
 
+    def _save_bundle_entity(self, prov_bundle, content=None):
+        """
+        Saves the entity with the prov:type prov:Bundle that represents the bundle in the database
+
+        :param prov_bundle: The bundle
+        :type prov_bundle: prov.model.ProvBundle
+        :param content: The fingerprint and the bundle id of the saved records for the content addressed mode
+        :type content: BundleContent
+        """
+        batch = WriteBatch(list(), list())
+        self._add_bundle_entity_to_batch(batch, prov_bundle)
+        if content is not None:
+            batch.elements[0].metadata.update({METADATA_KEY_BUNDLE_FINGERPRINT: content.fingerprint,
+                                               METADATA_KEY_BUNDLE_ID: content.bundle_id})
+        self._save_batch(batch)
+
+    def _add_bundle_entity_to_batch(self, batch, prov_bundle):
+        """
+        Adds the entity with the prov:type prov:Bundle that represents the bundle to the write batch
+
+        :param batch: The write batch
+        :type batch: WriteBatch
+        :param prov_bundle: The bundle
+        :type prov_bundle: prov.model.ProvBundle
+        """
+        bundle_record = ProvEntity(prov_bundle.document, identifier=prov_bundle.identifier, attributes={PROV_TYPE: PROV_BUNDLE})
+        self._add_element_to_batch(batch, bundle_record)
+
     def _save_bundle_internal(self, prov_bundle):
         """
         Private method to create a bundle in the database
@@ -499,16 +1224,34 @@ class ProvDb(object):
             raise InvalidArgumentTypeException()
 
         bundle_id = str(uuid4())
-        # create nodes
-        for record in prov_bundle.get_records(ProvElement):
-            self.save_element(prov_element=record, bundle_id=bundle_id)
+        self._save_records(prov_bundle.get_records(), bundle_id)
+
+        return bundle_id
+
+    def _save_records(self, prov_records, bundle_id):
+        """
+        Saves the records with one bulk operation, first all elements and then the relations between them
+
+        :param prov_records: List of prov records
+        :type prov_records: list
+        :param bundle_id: The bundle id, see _save_bundle_internal
+        :type bundle_id: str
+        """
+        prov_records = list(prov_records)
+        batch = WriteBatch(list(), list())
 
-        # create relations
-        for relation in prov_bundle.get_records(ProvRelation):
+        with trace_span(self._tracer, SPAN_SERIALIZE, {"records": len(prov_records)}):
+            # create nodes
+            for record in prov_records:
+                if isinstance(record, ProvElement):
+                    self._add_element_to_batch(batch, record, bundle_id=bundle_id)
 
-            self.save_relation(relation, bundle_id)
+            # create relations
+            for relation in prov_records:
+                if isinstance(relation, ProvRelation):
+                    self._add_relation_to_batch(batch, relation, bundle_id=bundle_id)
 
-        return bundle_id
+        self._save_batch(batch)
 
     def save_relation(self, prov_relation, bundle_id=None):
         """
@@ -539,6 +1282,23 @@ class ProvDb(object):
                 "prov_relation was {}, expected: {}".format(type(prov_relation), type(ProvRelation)))
 
 
+        batch = WriteBatch(list(), list())
+        self._add_relation_to_batch(batch, prov_relation, bundle_id=bundle_id)
+
+        # the relation itself is always the last one in the batch
+        return self._save_batch(batch).relation_ids[-1]
+
+    def _add_relation_to_batch(self, batch, prov_relation, bundle_id=None):
+        """
+        Adds the relation and the start and end node of the relation to the write batch
+
+        :param batch: The write batch
+        :type batch: WriteBatch
+        :param prov_relation: The ProvRelation instance
+        :type prov_relation: ProvRelation
+        :param bundle_id
+        :type bundle_id: str
+        """
         # get from and to node
         from_tuple, to_tuple = prov_relation.formal_attributes[:2]
         from_qualified_name = from_tuple[1]
@@ -567,7 +1327,7 @@ class ProvDb(object):
             raise InvalidArgumentTypeException(
                 "Could not determinate typ for relation from: {}, to: {}, prov_relation was {}, ".format(from_type, to_type, type(prov_relation)))
         #save from and to node
-        self.save_element(prov_element=from_type_cls(prov_relation.bundle, identifier=from_qualified_name), bundle_id=bundle_id)
+        self._add_element_to_batch(batch, from_type_cls(prov_relation.bundle, identifier=from_qualified_name), bundle_id=bundle_id)
 
         to_bundle = prov_relation.bundle
 
@@ -583,7 +1343,7 @@ class ProvDb(object):
             to_bundle = ProvBundle(identifier=to_bundle_identifier)
 
 
-        self.save_element(prov_element=to_type_cls(to_bundle, identifier=to_qualified_name), bundle_id=bundle_id)
+        self._add_element_to_batch(batch, to_type_cls(to_bundle, identifier=to_qualified_name), bundle_id=bundle_id)
 
 
         # split metadata and attributes
@@ -593,13 +1353,14 @@ class ProvDb(object):
         global_from_qualified_name = from_qualified_name.namespace.uri + from_qualified_name.localpart
         global_to_qualified_name = to_qualified_name.namespace.uri + to_qualified_name.localpart
 
-        return self._adapter.save_relation(global_from_qualified_name, global_to_qualified_name,
-                                           attributes, metadata)
+        batch.relations.append(DbBulkRelation(global_from_qualified_name, global_to_qualified_name, attributes, metadata))
 
-    def _create_bundle_association(self, prov_elements, prov_bundle_identifier):
+    def _add_bundle_association_to_batch(self, batch, prov_elements, prov_bundle_identifier):
         """
-        This method saves a relation between the bundle entity and all nodes in the bundle
+        This method adds a relation between the bundle entity and all nodes in the bundle to the write batch
 
+        :param batch: The write batch
+        :type batch: WriteBatch
         :param prov_bundle_identifier: The bundle identifier
         :type prov_bundle_identifier: QualifiedName
         :param prov_elements: List of prov elements
@@ -609,7 +1370,7 @@ class ProvDb(object):
         # Ensure that the bundle entity exist
         doc = ProvDocument()
         to_bundle = ProvBundle(document=doc,identifier=prov_bundle_identifier)
-        self.save_bundle(to_bundle) # Save the empty bundle to create the bundle entity if necessary
+        self._add_bundle_entity_to_batch(batch, to_bundle) # Create the bundle entity if necessary
 
         belong_relation = ProvAssociation(bundle=to_bundle, identifier=None,
                                           attributes={PROV_TYPE: "prov:bundleAssociation"})
@@ -620,8 +1381,8 @@ class ProvDb(object):
             (metadata, attributes) = self._get_metadata_and_attributes_for_record(record)
             from_qualified_name = metadata[METADATA_KEY_IDENTIFIER]
             global_prov_to_identifier= to_qualified_name.namespace.uri + to_qualified_name.localpart
-            self._adapter.save_relation(from_qualified_name, global_prov_to_identifier,
-                                        belong_attributes, belong_metadata)
+            batch.relations.append(DbBulkRelation(from_qualified_name, global_prov_to_identifier,
+                                                  belong_attributes, belong_metadata))
 
 
     def _save_bundle_links(self, prov_bundle):
@@ -0,0 +1,114 @@
+from provdbconnector.exceptions.database import InvalidOptionsException
+from provdbconnector.db_adapters.baseadapter import METADATA_KEY_NAMESPACES
+from provdbconnector.db_adapters.in_memory import CompactInMemoryAdapter
+from provdbconnector.db_adapters.in_memory.compact_in_memory import CompactRecord
+from provdbconnector.prov_db import ProvDb
+from provdbconnector.tests import AdapterTestTemplate
+from provdbconnector.tests import ProvDbTestTemplate
+from provdbconnector.tests import examples
+
+
+class CompactInMemoryAdapterTest(AdapterTestTemplate):
+    """
+    This class implements the AdapterTestTemplate and only override some functions.
+
+    """
+    def setUp(self):
+        """
+        Connect to your database
+
+        """
+        self.instance = CompactInMemoryAdapter()
+        self.instance.connect(None)
+
+    def test_connect_invalid_options(self):
+        """
+        Test your connect function with invalid data
+
+        """
+        auth_info = {"invalid": "Invalid"}
+        with self.assertRaises(InvalidOptionsException):
+            self.instance.connect(auth_info)
+
+    def test_shared_storage(self):
+        """
+        Test that the records share the key tuples and metadata dicts
+
+        """
+        provapi = ProvDb(adapter=CompactInMemoryAdapter)
+        provapi._adapter.all_nodes = dict()
+        provapi._adapter.all_relations = dict()
+        provapi.save_document(examples.primer_example())
+
+        records = [record for record in provapi._adapter.all_nodes.values() if len(record.attribute_keys) == 0]
+        self.assertGreater(len(records), 1)
+        self.assertIsInstance(records[0], CompactRecord)
+
+        (first, second) = records[:2]
+        self.assertIs(first.attribute_keys, second.attribute_keys)
+        self.assertIs(first.metadata_keys, second.metadata_keys)
+
+        # the namespaces are modified by the caller, the stored dict must not change
+        (attributes, metadata) = first
+        namespaces = metadata[METADATA_KEY_NAMESPACES].copy()
+        provapi.save_document(examples.primer_example())
+        self.assertEqual(first.metadata[METADATA_KEY_NAMESPACES], namespaces)
+
+    def test_shared_storage_reset(self):
+        """
+        Test that the pools of the shared keys and values are replaced together with the dicts
+
+        """
+        self.clear_database()
+        provapi = ProvDb(adapter=CompactInMemoryAdapter)
+        provapi._adapter = self.instance
+        provapi.save_document(examples.primer_example())
+        shared_values = self.instance._get_indexes().shared_values
+        self.assertGreater(len(shared_values), 0)
+
+        self.clear_database()
+        self.assertEqual(len(self.instance._get_indexes().shared_values), 0)
+        provapi.save_document(examples.primer_example())
+        (attributes, metadata) = next(iter(self.instance.all_nodes.values()))
+        self.assertNotIn(id(metadata[METADATA_KEY_NAMESPACES]), set(id(value) for value in shared_values.values()))
+
+    def clear_database(self):
+        """
+        Clear the database
+
+        """
+        self.instance.all_nodes = dict()
+        self.instance.all_relations= dict()
+
+    def tearDown(self):
+        """
+        Delete your instance
+
+        """
+        del self.instance
+
+
+class CompactInMemoryAdapterProvDbTests(ProvDbTestTemplate):
+    """
+    This is the high level test for the CompactInMemoryAdapter
+
+    """
+    def setUp(self):
+        """
+        Setup a ProvDb instance
+        """
+        self.provapi = ProvDb(api_id=1, adapter=CompactInMemoryAdapter, auth_info=None)
+
+    def clear_database(self):
+        """
+        Clear function get called before each test starts
+
+        """
+        self.provapi._adapter.all_nodes = dict()
+        self.provapi._adapter.all_relations = dict()
+
+    def tearDown(self):
+        """
+        Delete prov api instance
+        """
+        del self.provapi
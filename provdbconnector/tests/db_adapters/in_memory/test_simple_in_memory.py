@@ -1,8 +1,31 @@
-from provdbconnector.exceptions.database import InvalidOptionsException
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from prov.constants import PROV_RECORD_IDS_MAP, PROV_ATTR_STARTTIME, PROV_ATTR_ENDTIME
+from prov.model import ProvDocument, ProvEntity
+
+from provdbconnector.exceptions.database import InvalidOptionsException, NotFoundException, DatabaseException
+from provdbconnector.db_adapters.baseadapter import METADATA_KEY_IDENTIFIER, METADATA_KEY_PROV_TYPE, DbRecord
 from provdbconnector.db_adapters.in_memory import SimpleInMemoryAdapter
+from provdbconnector.db_adapters.in_memory.temporal_index import TemporalIndex
 from provdbconnector.prov_db import ProvDb
 from provdbconnector.tests import AdapterTestTemplate
 from provdbconnector.tests import ProvDbTestTemplate
+from provdbconnector.tests.examples import base_connector_merge_example, primer_example
+from provdbconnector.utils.filters import F, compile_predicate
+from provdbconnector.utils.temporal import TimeInterval
+
+
+class SharedStoreAdapter(SimpleInMemoryAdapter):
+    """
+    Adapter with own class level dicts, to test adapters that share the dicts without the records of the other tests
+
+    """
+    all_nodes = dict()
+    all_relations = dict()
 
 
 class SimpleInMemoryAdapterTest(AdapterTestTemplate):
@@ -27,6 +50,746 @@ class SimpleInMemoryAdapterTest(AdapterTestTemplate):
         with self.assertRaises(InvalidOptionsException):
             self.instance.connect(auth_info)
 
+    def test_relation_index_after_delete(self):
+        """
+        Test that the relation index don't merge into deleted relations
+
+        """
+        self.clear_database()
+        example = base_connector_merge_example()
+        self.instance.save_element(example.from_node["attributes"], example.from_node["metadata"])
+        self.instance.save_element(example.to_node["attributes"], example.to_node["metadata"])
+
+        from_label = example.from_node["metadata"][METADATA_KEY_IDENTIFIER]
+        to_label = example.to_node["metadata"][METADATA_KEY_IDENTIFIER]
+
+        rel_id1 = self.instance.save_relation(from_label, to_label, example.relation["attributes"],
+                                              example.relation["metadata"])
+        self.instance.delete_relation(rel_id1)
+
+        with self.assertRaises(NotFoundException):
+            self.instance.get_relation(rel_id1)
+
+        rel_id2 = self.instance.save_relation(from_label, to_label, example.relation["attributes"],
+                                              example.relation["metadata"])
+        self.assertNotEqual(rel_id1, rel_id2)
+        self.assertIsNotNone(self.instance.get_relation(rel_id2))
+
+        # a replaced relations dict should also reset the index
+        self.clear_database()
+        self.instance.save_element(example.from_node["attributes"], example.from_node["metadata"])
+        self.instance.save_element(example.to_node["attributes"], example.to_node["metadata"])
+        rel_id3 = self.instance.save_relation(from_label, to_label, example.relation["attributes"],
+                                              example.relation["metadata"])
+        self.assertNotEqual(rel_id2, rel_id3)
+
+    def test_shared_store_relation_index(self):
+        """
+        Test that two adapters with the same class level dicts merge into the relations of each other
+
+        """
+        SharedStoreAdapter.all_nodes = dict()
+        SharedStoreAdapter.all_relations = dict()
+        first = SharedStoreAdapter()
+        second = SharedStoreAdapter()
+
+        example = base_connector_merge_example()
+        from_label = example.from_node["metadata"][METADATA_KEY_IDENTIFIER]
+        to_label = example.to_node["metadata"][METADATA_KEY_IDENTIFIER]
+        first.save_element(example.from_node["attributes"], example.from_node["metadata"])
+        first.save_element(example.to_node["attributes"], example.to_node["metadata"])
+        relation_id = first.save_relation(from_label, to_label, example.relation["attributes"],
+                                          example.relation["metadata"])
+
+        self.assertEqual(second.save_relation(from_label, to_label, example.relation["attributes"],
+                                              example.relation["metadata"]), relation_id)
+        self.assertEqual(second.get_relation(relation_id), first.get_relation(relation_id))
+        self.assertEqual(second.count_records(), 3)
+
+        second.delete_relation(relation_id)
+        with self.assertRaises(NotFoundException):
+            first.get_relation(relation_id)
+        self.assertEqual(first.count_records(), 2)
+
+    def test_shared_store_graph_index(self):
+        """
+        Test the traversals of an adapter over the relations that another adapter with the same class level dicts
+        saved after the graph was built
+
+        """
+        SharedStoreAdapter.all_nodes = dict()
+        SharedStoreAdapter.all_relations = dict()
+        first = ProvDb(adapter=SharedStoreAdapter)
+        second = ProvDb(adapter=SharedStoreAdapter)
+
+        prov_document = ProvDocument()
+        prov_document.set_default_namespace("http://example.com/")
+        source = prov_document.entity("a")
+        first.save_document(prov_document)
+        self.assertEqual(len(second.get_lineage(source.identifier).get_records()), 1)
+
+        prov_document = ProvDocument()
+        prov_document.set_default_namespace("http://example.com/")
+        bundle = prov_document.bundle("bundle")
+        bundle.set_default_namespace("http://example.com/")
+        bundle.entity("a")
+        derived = bundle.entity("b")
+        bundle.wasDerivedFrom("b", "a")
+        first.save_document(prov_document)
+
+        self.assertEqual(len(second.get_lineage(derived.identifier).get_records()), 3)
+        self.assertEqual(len(second.get_bundle(bundle.identifier).get_records()), 3)
+        tail_records = second._adapter.get_records_tail(metadata_dict={METADATA_KEY_IDENTIFIER: "http://example.com/b"})
+        self.assertIn("http://example.com/a",
+                      [str(record.metadata[METADATA_KEY_IDENTIFIER]) for record in tail_records])
+
+    def test_get_records_tail_graph_index(self):
+        """
+        Test the traversal over the graph index with a chain of nodes, before and after the compaction
+
+        """
+        self.clear_database()
+        example = base_connector_merge_example()
+        identifiers = ["ex:node{}".format(index) for index in range(5)]
+        for identifier in identifiers:
+            metadata = example.from_node["metadata"].copy()
+            metadata.update({METADATA_KEY_IDENTIFIER: identifier})
+            self.instance.save_element(example.from_node["attributes"], metadata)
+
+        relation_ids = list()
+        for index in range(1, len(identifiers)):
+            relation_ids.append(self.instance.save_relation(identifiers[index - 1], identifiers[index],
+                                                            example.relation["attributes"],
+                                                            example.relation["metadata"]))
+            if index == 2:
+                # the remaining relations are only in the delta buffer
+                self.instance._compact_graph()
+
+        tail_records = self.instance.get_records_tail(metadata_dict={METADATA_KEY_IDENTIFIER: identifiers[0]})
+        self.assertEqual(len(tail_records), 8)  # 4 nodes and 4 relations
+
+        tail_records = self.instance.get_records_tail(metadata_dict={METADATA_KEY_IDENTIFIER: identifiers[0]},
+                                                      depth=2)
+        self.assertEqual(len(tail_records), 4)  # 2 nodes and 2 relations
+
+        self.instance.delete_relation(relation_ids[1])
+        tail_records = self.instance.get_records_tail(metadata_dict={METADATA_KEY_IDENTIFIER: identifiers[0]})
+        self.assertEqual(len(tail_records), 2)
+
+        self.instance._compact_graph()
+        tail_records = self.instance.get_records_tail(metadata_dict={METADATA_KEY_IDENTIFIER: identifiers[0]})
+        self.assertEqual(len(tail_records), 2)
+
+        # diamond: node2 is first found over node1 at depth 2, but it is also a direct successor of node0
+        self.clear_database()
+        for identifier in identifiers[:4]:
+            metadata = example.from_node["metadata"].copy()
+            metadata.update({METADATA_KEY_IDENTIFIER: identifier})
+            self.instance.save_element(example.from_node["attributes"], metadata)
+        for (from_index, to_index) in ((0, 1), (1, 2), (2, 3), (0, 2)):
+            self.instance.save_relation(identifiers[from_index], identifiers[to_index], example.relation["attributes"],
+                                        example.relation["metadata"])
+
+        tail_records = self.instance.get_records_tail(metadata_dict={METADATA_KEY_IDENTIFIER: identifiers[0]},
+                                                      depth=2)
+        tail_nodes = [str(record.metadata[METADATA_KEY_IDENTIFIER]) for record in tail_records if
+                      isinstance(record, DbRecord)]
+        self.assertEqual(sorted(tail_nodes), identifiers[1:4])
+        self.assertEqual(len(tail_records), 7)  # 3 nodes and 4 relations
+
+    def test_snapshot(self):
+        """
+        Test save_snapshot and load_snapshot with a new adapter instance
+
+        """
+        self.clear_database()
+        provapi = ProvDb(adapter=SimpleInMemoryAdapter)
+        provapi._adapter = self.instance
+        document_id = provapi.save_document(primer_example())
+
+        example = base_connector_merge_example()
+        from_label = example.from_node["metadata"][METADATA_KEY_IDENTIFIER]
+        to_label = example.to_node["metadata"][METADATA_KEY_IDENTIFIER]
+        self.instance.save_element(example.from_node["attributes"], example.from_node["metadata"])
+        self.instance.save_element(example.to_node["attributes"], example.to_node["metadata"])
+        relation_id = self.instance.save_relation(from_label, to_label, example.relation["attributes"],
+                                                  example.relation["metadata"])
+
+        (handle, path) = tempfile.mkstemp(suffix=".snapshot")
+        os.close(handle)
+        try:
+            self.instance.save_snapshot(path)
+
+            loaded = SimpleInMemoryAdapter()
+            loaded.load_snapshot(path)
+            provapi._adapter = loaded
+
+            self.assertEqual(loaded.get_record(str(from_label)), self.instance.get_record(str(from_label)))
+            self.assertEqual(loaded.get_relation(relation_id), self.instance.get_relation(relation_id))
+            self.assertEqual(provapi.get_document_as_prov(document_id), primer_example())
+
+            # the indexes are restored, so the relation is merged
+            self.assertEqual(loaded.save_relation(from_label, to_label, example.relation["attributes"],
+                                                  example.relation["metadata"]), relation_id)
+        finally:
+            os.remove(path)
+
+    def test_load_snapshot_invalid_file(self):
+        """
+        Test load_snapshot with a file that is not a snapshot
+
+        """
+        with tempfile.NamedTemporaryFile(suffix=".snapshot") as snapshot_file:
+            snapshot_file.write(b"no snapshot" * 10)
+            snapshot_file.flush()
+            with self.assertRaises(DatabaseException):
+                self.instance.load_snapshot(snapshot_file.name)
+
+    def test_connect_write_ahead_log_invalid_options(self):
+        """
+        Test the write ahead log options with unknown keys and an invalid fsync policy
+
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            wal_path = os.path.join(directory, "prov.wal")
+            with self.assertRaises(InvalidOptionsException):
+                self.instance.connect({"wal_path": wal_path, "invalid": "Invalid"})
+            with self.assertRaises(InvalidOptionsException):
+                self.instance.connect({"wal_path": wal_path, "fsync": "sometimes"})
+            with self.assertRaises(InvalidOptionsException):
+                self.instance.connect({"fsync": "always"})
+
+    def test_write_ahead_log(self):
+        """
+        Test that the records are restored from the write ahead log and from the compacted log
+
+        """
+        example = base_connector_merge_example()
+        from_label = str(example.from_node["metadata"][METADATA_KEY_IDENTIFIER])
+        to_label = str(example.to_node["metadata"][METADATA_KEY_IDENTIFIER])
+
+        with tempfile.TemporaryDirectory() as directory:
+            options = {"wal_path": os.path.join(directory, "prov.wal"), "fsync": "always"}
+            self.instance.connect(options)
+            self.instance.save_element(example.from_node["attributes"], example.from_node["metadata"])
+            self.instance.save_element(example.to_node["attributes"], example.to_node["metadata"])
+            relation_id = self.instance.save_relation(from_label, to_label, example.relation["attributes"],
+                                                      example.relation["metadata"])
+            deleted_relation_id = self.instance.save_relation(to_label, from_label, example.relation["attributes"],
+                                                              example.relation["metadata"])
+            self.instance.delete_relation(deleted_relation_id)
+            self.instance.close()
+
+            restored = SimpleInMemoryAdapter()
+            restored.connect(options)
+            self.assertEqual(restored.get_record(from_label), self.instance.get_record(from_label))
+            self.assertEqual(restored.get_relation(relation_id), self.instance.get_relation(relation_id))
+            with self.assertRaises(NotFoundException):
+                restored.get_relation(deleted_relation_id)
+
+            # compact the log and add a record after the compaction
+            restored.compact_log(wait=True)
+            self.assertTrue(os.path.exists(os.path.join(directory, "prov.wal.snapshot")))
+            restored.delete_record(to_label)
+            restored.close()
+
+            compacted = SimpleInMemoryAdapter()
+            compacted.connect(options)
+            self.assertEqual(compacted.get_record(from_label), self.instance.get_record(from_label))
+            self.assertEqual(compacted.get_relation(relation_id), self.instance.get_relation(relation_id))
+            with self.assertRaises(NotFoundException):
+                compacted.get_record(to_label)
+            compacted.close()
+
+    def test_write_ahead_log_compaction_delete_by_filter(self):
+        """
+        Test that the records deleted by a filter are not restored if the delete starts a log compaction
+
+        """
+        example = base_connector_merge_example()
+        from_label = str(example.from_node["metadata"][METADATA_KEY_IDENTIFIER])
+
+        with tempfile.TemporaryDirectory() as directory:
+            options = {"wal_path": os.path.join(directory, "prov.wal"), "compaction_size": 1, "fsync": "always"}
+            self.instance.connect(options)
+            self.instance.save_element(example.from_node["attributes"], example.from_node["metadata"])
+            self.instance.save_element(example.to_node["attributes"], example.to_node["metadata"])
+            self.instance.compact_log(wait=True)
+            self.instance.delete_records_by_filter()
+            self.instance.close()
+
+            restored = SimpleInMemoryAdapter()
+            restored.connect(options)
+            with self.assertRaises(NotFoundException):
+                restored.get_record(from_label)
+            self.assertEqual(len(restored.all_nodes), 0)
+            restored.close()
+
+    def test_write_ahead_log_interrupted_compaction(self):
+        """
+        Test the recovery if the compaction was interrupted after the snapshot was written, the entries of the rotated
+        log are already part of the snapshot and must not be applied again
+
+        """
+        example = base_connector_merge_example()
+        from_label = str(example.from_node["metadata"][METADATA_KEY_IDENTIFIER])
+        first_attributes = example.from_node["attributes"].copy()
+        first_attributes.update({"ex:version": 1})
+        second_attributes = example.from_node["attributes"].copy()
+        second_attributes.update({"ex:version": 2})
+
+        with tempfile.TemporaryDirectory() as directory:
+            wal_path = os.path.join(directory, "prov.wal")
+            options = {"wal_path": wal_path, "fsync": "always"}
+            self.instance.connect(options)
+            self.instance.save_element(first_attributes, example.from_node["metadata"])
+            self.instance.delete_record(from_label)
+            self.instance.save_element(second_attributes, example.from_node["metadata"])
+            with open(wal_path, "rb") as wal_file:
+                old_log = wal_file.read()
+            self.instance.compact_log(wait=True)
+            self.instance.close()
+
+            # the rotated log was not removed after the snapshot was written
+            with open(wal_path + ".compacting", "wb") as rotated_file:
+                rotated_file.write(old_log)
+
+            restored = SimpleInMemoryAdapter()
+            restored.connect(options)
+            self.assertEqual(restored.get_record(from_label), self.instance.get_record(from_label))
+            self.assertFalse(os.path.exists(wal_path + ".compacting"))
+
+            restored.save_element(example.to_node["attributes"], example.to_node["metadata"])
+            restored.close()
+
+            restored = SimpleInMemoryAdapter()
+            restored.connect(options)
+            self.assertEqual(len(restored.all_nodes), 2)
+            self.assertEqual(restored.get_record(from_label), self.instance.get_record(from_label))
+            restored.close()
+
+    def test_write_ahead_log_failed_compaction(self):
+        """
+        Test that the log is kept if the snapshot for an interrupted compaction can't be written
+
+        """
+        example = base_connector_merge_example()
+        from_label = str(example.from_node["metadata"][METADATA_KEY_IDENTIFIER])
+        to_label = str(example.to_node["metadata"][METADATA_KEY_IDENTIFIER])
+
+        with tempfile.TemporaryDirectory() as directory:
+            wal_path = os.path.join(directory, "prov.wal")
+            options = {"wal_path": wal_path, "fsync": "always"}
+            self.instance.connect(options)
+            self.instance.save_element(example.from_node["attributes"], example.from_node["metadata"])
+            self.instance._wal.rotate(wal_path + ".compacting")
+            self.instance.save_element(example.to_node["attributes"], example.to_node["metadata"])
+            self.instance.close()
+
+            # a directory at the path of the temporary file, the snapshot can't be written
+            os.mkdir(wal_path + ".snapshot.tmp")
+            restored = SimpleInMemoryAdapter()
+            restored.connect(options)
+            restored.close()
+            self.assertGreater(os.path.getsize(wal_path), 0)
+
+            os.rmdir(wal_path + ".snapshot.tmp")
+            restored = SimpleInMemoryAdapter()
+            restored.connect(options)
+            self.assertEqual(restored.get_record(from_label), self.instance.get_record(from_label))
+            self.assertEqual(restored.get_record(to_label), self.instance.get_record(to_label))
+            restored.close()
+
+    def test_write_ahead_log_truncated(self):
+        """
+        Test that a broken entry at the end of the log is ignored and removed
+
+        """
+        example = base_connector_merge_example()
+        from_label = str(example.from_node["metadata"][METADATA_KEY_IDENTIFIER])
+
+        with tempfile.TemporaryDirectory() as directory:
+            wal_path = os.path.join(directory, "prov.wal")
+            self.instance.connect({"wal_path": wal_path})
+            self.instance.save_element(example.from_node["attributes"], example.from_node["metadata"])
+            self.instance.close()
+
+            valid_size = os.path.getsize(wal_path)
+            with open(wal_path, "ab") as wal_file:
+                wal_file.write(b"\x10\x00\x00")
+
+            restored = SimpleInMemoryAdapter()
+            restored.connect({"wal_path": wal_path})
+            self.assertEqual(restored.get_record(from_label), self.instance.get_record(from_label))
+            self.assertEqual(os.path.getsize(wal_path), valid_size)
+            restored.close()
+
+    def test_reachability_index(self):
+        """
+        Compare the reachability index with a breadth first search on a random graph with cycles, also after
+        deleted relations
+
+        """
+        self.clear_database()
+        self.instance.connect({"reachability_index": True})
+        example = base_connector_merge_example()
+        derivation_metadata = example.relation["metadata"].copy()
+        derivation_metadata.update({METADATA_KEY_PROV_TYPE: PROV_RECORD_IDS_MAP["wasDerivedFrom"]})
+        relation_types = (example.relation["metadata"][METADATA_KEY_PROV_TYPE], derivation_metadata[METADATA_KEY_PROV_TYPE])
+
+        identifiers = ["ex:node{}".format(index) for index in range(30)]
+        for identifier in identifiers:
+            metadata = example.from_node["metadata"].copy()
+            metadata.update({METADATA_KEY_IDENTIFIER: identifier})
+            self.instance.save_element(example.from_node["attributes"], metadata)
+
+        def bfs(source, target, edges, relation_type=None):
+            visited = {source}
+            queue = [source]
+            while len(queue) > 0:
+                node = queue.pop()
+                for (from_node, to_node, edge_type) in edges.values():
+                    if from_node == node and to_node not in visited and relation_type in (None, edge_type):
+                        visited.add(to_node)
+                        queue.append(to_node)
+            return target in visited
+
+        def check(edges):
+            for source in identifiers:
+                for target in identifiers:
+                    self.assertEqual(self.instance.is_reachable(source, target), bfs(source, target, edges),
+                                     "{} -> {}".format(source, target))
+                    self.assertEqual(self.instance.is_reachable(source, target, [relation_types[1]]),
+                                     bfs(source, target, edges, relation_types[1]),
+                                     "{} -> {} (derivation)".format(source, target))
+
+        generator = random.Random(42)
+        edges = dict()
+        for step in range(60):
+            (from_node, to_node) = generator.sample(identifiers, 2)
+            metadata = generator.choice([example.relation["metadata"], derivation_metadata])
+            relation_id = self.instance.save_relation(from_node, to_node, example.relation["attributes"], metadata)
+            edges[relation_id] = (from_node, to_node, metadata[METADATA_KEY_PROV_TYPE])
+            if step % 20 == 19:
+                check(edges)
+
+        for relation_id in generator.sample(sorted(edges.keys()), 10):
+            self.instance.delete_relation(relation_id)
+            del edges[relation_id]
+        check(edges)
+
+        with self.assertRaises(NotFoundException):
+            self.instance.is_reachable("ex:unknown", identifiers[0])
+
+    def test_shared_store_reachability_index(self):
+        """
+        Test the reachability index of an adapter after another adapter with the same class level dicts saved and
+        deleted a relation
+
+        """
+        SharedStoreAdapter.all_nodes = dict()
+        SharedStoreAdapter.all_relations = dict()
+        first = SharedStoreAdapter()
+        first.connect({"reachability_index": True})
+        second = SharedStoreAdapter()
+        second.connect({"reachability_index": True})
+
+        example = base_connector_merge_example()
+        from_label = str(example.from_node["metadata"][METADATA_KEY_IDENTIFIER])
+        to_label = str(example.to_node["metadata"][METADATA_KEY_IDENTIFIER])
+        first.save_element(example.from_node["attributes"], example.from_node["metadata"])
+        first.save_element(example.to_node["attributes"], example.to_node["metadata"])
+        self.assertFalse(second.is_reachable(from_label, to_label))
+
+        relation_id = first.save_relation(from_label, to_label, example.relation["attributes"],
+                                          example.relation["metadata"])
+        self.assertTrue(second.is_reachable(from_label, to_label))
+
+        first.delete_relation(relation_id)
+        self.assertFalse(second.is_reachable(from_label, to_label))
+
+    def test_temporal_index(self):
+        """
+        Compare the time range queries with a filter over all activities, also for activities that are saved after the
+        index was built and out of time order
+
+        """
+        self.clear_database()
+        example = base_connector_merge_example()
+        generator = random.Random(7)
+        base_time = datetime(2017, 1, 1, tzinfo=timezone.utc)
+        intervals = dict()
+
+        def save_activities(count):
+            for _ in range(count):
+                identifier = "ex:activity{}".format(len(intervals))
+                start = base_time + timedelta(hours=generator.randint(0, 24 * 365))
+                end = start + timedelta(minutes=generator.randint(0, 600))
+                metadata = example.from_node["metadata"].copy()
+                metadata.update({METADATA_KEY_IDENTIFIER: identifier})
+                self.instance.save_element({PROV_ATTR_STARTTIME: start, PROV_ATTR_ENDTIME: end}, metadata)
+                intervals[identifier] = (start, end)
+
+        def check():
+            for _ in range(20):
+                start = base_time + timedelta(hours=generator.randint(0, 24 * 365))
+                end = start + timedelta(hours=generator.randint(0, 48))
+                records = self.instance.get_records_in_time_range(start, end)
+                expected = sorted(identifier for (identifier, (first, last)) in intervals.items() if
+                                  first <= end and last >= start)
+                self.assertEqual(sorted(str(record.metadata[METADATA_KEY_IDENTIFIER]) for record in records), expected)
+
+        save_activities(300)
+        check()
+        save_activities(100)
+        check()
+
+        # one long activity is found by all queries, more activities out of time order are merged in the index
+        identifier = "ex:long_activity"
+        metadata = example.from_node["metadata"].copy()
+        metadata.update({METADATA_KEY_IDENTIFIER: identifier})
+        self.instance.save_element({PROV_ATTR_STARTTIME: base_time, PROV_ATTR_ENDTIME: base_time + timedelta(days=400)},
+                                   metadata)
+        intervals[identifier] = (base_time, base_time + timedelta(days=400))
+        save_activities(200)
+        check()
+
+        # a new nodes dict (clear the database) rebuilds the index
+        self.clear_database()
+        intervals.clear()
+        save_activities(10)
+        check()
+
+    def test_temporal_index_long_interval(self):
+        """
+        Test that a long interval doesn't widen the range of the short intervals that a query reads
+
+        """
+        index = TemporalIndex()
+        index.add("long", TimeInterval(0.0, 1000000.0))
+        for position in reversed(range(1000)):
+            index.add(position, TimeInterval(float(position), position + 1.0))
+        self.assertEqual(len(index), 1001)
+        self.assertEqual(sorted(index.search(500.2, 500.5), key=str), [500, "long"])
+        self.assertEqual(sorted(index.search(2000.0, 3000.0), key=str), ["long"])
+
+        short_run = index.runs[index.get_length_class(1.0)]
+        self.assertEqual(short_run.max_length, 1.0)
+        self.assertLess(len(short_run.pending), 64)
+
+    def test_shared_store_temporal_index(self):
+        """
+        Test the time range query of an adapter after another adapter with the same class level dicts saved an activity
+
+        """
+        SharedStoreAdapter.all_nodes = dict()
+        SharedStoreAdapter.all_relations = dict()
+        first = SharedStoreAdapter()
+        second = SharedStoreAdapter()
+
+        example = base_connector_merge_example()
+        start = datetime(2017, 1, 1, tzinfo=timezone.utc)
+        end = start + timedelta(days=1)
+        self.assertEqual(second.get_records_in_time_range(start, end), list())
+
+        metadata = example.from_node["metadata"].copy()
+        metadata.update({METADATA_KEY_IDENTIFIER: "ex:activity"})
+        first.save_element({PROV_ATTR_STARTTIME: start, PROV_ATTR_ENDTIME: end}, metadata)
+        records = second.get_records_in_time_range(start, end)
+        self.assertEqual([str(record.metadata[METADATA_KEY_IDENTIFIER]) for record in records], ["ex:activity"])
+
+    def test_identifier_index(self):
+        """
+        Test the pages after new nodes were saved out of order, the new identifiers are merged in one batch on the next
+        page, also the identifier of a deleted node that is saved again
+
+        """
+        self.clear_database()
+        example = base_connector_merge_example()
+
+        def save_nodes(identifiers):
+            for identifier in identifiers:
+                metadata = example.from_node["metadata"].copy()
+                metadata.update({METADATA_KEY_IDENTIFIER: identifier})
+                self.instance.save_element(dict(), metadata)
+
+        def get_identifiers():
+            identifiers = list()
+            after = None
+            while True:
+                page = self.instance.get_records_by_filter_page(limit=7, after=after)
+                identifiers.extend(str(record.metadata[METADATA_KEY_IDENTIFIER]) for record in page.records)
+                if page.last_identifier is None:
+                    return identifiers
+                after = page.last_identifier
+
+        generator = random.Random(3)
+        identifiers = ["ex:node{:03}".format(index) for index in range(100)]
+        generator.shuffle(identifiers)
+        save_nodes(identifiers[:50])
+        self.assertEqual(get_identifiers(), sorted(identifiers[:50]))
+
+        # the sorted list is not changed until the next page
+        save_nodes(identifiers[50:])
+        self.assertEqual(len(self.instance._get_indexes().sorted_identifiers), 50)
+        self.assertEqual(get_identifiers(), sorted(identifiers))
+
+        self.instance.delete_record(identifiers[0])
+        save_nodes(identifiers[:1])
+        self.assertEqual(get_identifiers(), sorted(identifiers))
+
+    def test_shared_store_identifier_index(self):
+        """
+        Test the pages of an adapter after another adapter with the same class level dicts saved new elements
+
+        """
+        SharedStoreAdapter.all_nodes = dict()
+        SharedStoreAdapter.all_relations = dict()
+        first = ProvDb(adapter=SharedStoreAdapter)
+        second = ProvDb(adapter=SharedStoreAdapter)
+
+        prov_document = ProvDocument()
+        prov_document.set_default_namespace("http://example.com/")
+        prov_document.entity("e1")
+        first.save_document(prov_document)
+        self.assertEqual(len(second.get_elements(ProvEntity, limit=10).document.get_records()), 1)
+
+        prov_document.entity("e2")
+        prov_document.entity("e3")
+        first.save_document(prov_document)
+        page = second.get_elements(ProvEntity, limit=10)
+        self.assertEqual(len(page.document.get_records()), 3)
+        self.assertIsNone(page.cursor)
+
+    def test_shared_store_node_type_counts(self):
+        """
+        Test the counts by the prov type of an adapter after another adapter with the same class level dicts saved new
+        nodes
+
+        """
+        SharedStoreAdapter.all_nodes = dict()
+        SharedStoreAdapter.all_relations = dict()
+        first = SharedStoreAdapter()
+        second = SharedStoreAdapter()
+        prov_type = F(METADATA_KEY_PROV_TYPE, metadata=True)
+
+        prov_document = ProvDocument()
+        first.save_element(dict(), {METADATA_KEY_IDENTIFIER: "ex:e1",
+                                    METADATA_KEY_PROV_TYPE: prov_document.valid_qualified_name("prov:Entity")})
+        self.assertEqual(second.group_count_records(prov_type), {"prov:Entity": 1})
+
+        first.save_element(dict(), {METADATA_KEY_IDENTIFIER: "ex:e2",
+                                    METADATA_KEY_PROV_TYPE: prov_document.valid_qualified_name("prov:Entity")})
+        self.assertEqual(second.group_count_records(prov_type), {"prov:Entity": 2})
+
+    def test_node_types_after_merge(self):
+        """
+        Test that a merge from an unknown prov type moves the node to the known type in the group count and the filter
+
+        """
+        self.clear_database()
+        example = base_connector_merge_example()
+        prov_document = ProvDocument()
+        prov_type = F(METADATA_KEY_PROV_TYPE, metadata=True)
+
+        metadata = dict(example.from_node["metadata"])
+        metadata[METADATA_KEY_PROV_TYPE] = prov_document.valid_qualified_name("prov:Unknown")
+        self.instance.save_element(example.from_node["attributes"], metadata)
+        self.assertEqual(self.instance.group_count_records(prov_type), {"prov:Unknown": 1})
+
+        self.instance.save_element(example.from_node["attributes"], example.from_node["metadata"])
+        self.assertEqual(self.instance.group_count_records(prov_type), {"prov:Activity": 1})
+        self.assertEqual(len(self.instance.get_records_by_expression(prov_type == "prov:Activity")), 1)
+        self.assertEqual(len(self.instance.get_records_by_expression(prov_type == "prov:Unknown")), 0)
+
+        self.instance.delete_record(str(example.from_node["metadata"][METADATA_KEY_IDENTIFIER]))
+        self.assertEqual(self.instance.group_count_records(prov_type), dict())
+
+    def test_prov_type_index(self):
+        """
+        Test that a filter by the prov type only checks the nodes and relations of this type
+
+        """
+        self.clear_database()
+        example = base_connector_merge_example()
+        self.instance.save_element(example.from_node["attributes"], example.from_node["metadata"])
+        self.instance.save_element(example.to_node["attributes"], example.to_node["metadata"])
+        self.instance.save_relation(example.from_node["metadata"][METADATA_KEY_IDENTIFIER],
+                                    example.to_node["metadata"][METADATA_KEY_IDENTIFIER],
+                                    example.relation["attributes"], example.relation["metadata"])
+        prov_document = ProvDocument()
+        for index in range(20):
+            self.instance.save_element(dict(), {METADATA_KEY_IDENTIFIER: "ex:e{}".format(index),
+                                                METADATA_KEY_PROV_TYPE: prov_document.valid_qualified_name(
+                                                    "prov:Entity")})
+
+        prov_type = F(METADATA_KEY_PROV_TYPE, metadata=True)
+        checked = list()
+
+        def counting_predicate(expression):
+            predicate = compile_predicate(expression)
+
+            def check(attributes, metadata):
+                checked.append(metadata)
+                return predicate(attributes, metadata)
+
+            return check
+
+        module = SimpleInMemoryAdapter.__module__
+        with mock.patch(module + ".compile_predicate", side_effect=counting_predicate):
+            records = self.instance.get_records_by_expression(prov_type.isin(["prov:Activity", "prov:Mention"]))
+        self.assertEqual(len(records), 3)
+        self.assertEqual(len(checked), 3)
+
+        del checked[:]
+        with mock.patch(module + ".compile_predicate", side_effect=counting_predicate):
+            records = self.instance.get_records_by_expression(prov_type == "prov:Entity")
+        self.assertEqual(len(records), 20)
+        self.assertEqual(len(checked), 20)
+
+    def test_count_document(self):
+        """
+        Test the size of a document from the membership index, also after a merge with another document and after
+        deletes
+
+        """
+        self.clear_database()
+        provapi = ProvDb(adapter=SimpleInMemoryAdapter)
+        provapi._adapter = self.instance
+
+        def count_all(expression):
+            predicate = compile_predicate(expression)
+            relations = [relation for relations in self.instance.all_relations.values() for relation in
+                         relations.values()]
+            return sum(1 for (attributes, metadata) in self.instance.all_nodes.values() if
+                       predicate(attributes, metadata)) + sum(1 for (to_identifier, attributes, metadata) in relations if
+                                                              predicate(attributes, metadata))
+
+        document_id = provapi.save_document(primer_example())
+        document = F(document_id, metadata=True).exists()
+        size = count_all(document)
+        self.assertGreater(size, 0)
+        with mock.patch.object(self.instance, "_get_expression_matches", side_effect=AssertionError("scan")):
+            self.assertEqual(self.instance.count_records(document), size)
+            self.assertEqual(self.instance.count_records(F("unknown", metadata=True).exists()), 0)
+
+        # the same records are merged and belong to both documents
+        other_id = provapi.save_document(primer_example())
+        other = F(other_id, metadata=True).exists()
+        self.assertEqual(self.instance.count_records(other), size)
+        self.assertEqual(self.instance.count_records(document), size)
+        self.assertEqual(len(self.instance.get_records_by_expression(other)), size)
+
+        entity = next(identifier for (identifier, (attributes, metadata)) in self.instance.all_nodes.items() if
+                      str(metadata[METADATA_KEY_PROV_TYPE]) == "prov:Entity")
+        self.instance.delete_record(entity)
+        relation_id = next(iter(next(relations for relations in self.instance.all_relations.values() if
+                                     len(relations) > 0)))
+        self.instance.delete_relation(relation_id)
+        self.assertEqual(self.instance.count_records(document), size - 1)
+        self.assertEqual(self.instance.count_records(document), count_all(document))
+        self.assertEqual(len(self.instance.get_records_by_expression(document)), size - 1)
+
     def clear_database(self):
         """
         Clear the database
@@ -67,3 +830,15 @@ class SimpleInMemoryAdapterProvDbTests(ProvDbTestTemplate):
         Delete prov api instance
         """
         del self.provapi
+
+
+class SimpleInMemoryAdapterReachabilityProvDbTests(SimpleInMemoryAdapterProvDbTests):
+    """
+    The high level test for the SimpleInMemoryAdapter with the reachability index
+
+    """
+    def setUp(self):
+        """
+        Setup a ProvDb instance
+        """
+        self.provapi = ProvDb(api_id=1, adapter=SimpleInMemoryAdapter, auth_info={"reachability_index": True})
@@ -0,0 +1,200 @@
+import os
+import tempfile
+import unittest
+
+from provdbconnector.exceptions.database import InvalidOptionsException
+from provdbconnector.db_adapters.baseadapter import METADATA_KEY_IDENTIFIER, DbRecord
+from provdbconnector.db_adapters.key_value import KeyValueAdapter
+from provdbconnector.db_adapters.key_value.key_value_adapter import OUTGOING_KEY, ID_FORMAT
+from provdbconnector.db_adapters.key_value.stores import lmdb
+from provdbconnector.prov_db import ProvDb
+from provdbconnector.tests import AdapterTestTemplate
+from provdbconnector.tests import ProvDbTestTemplate
+from provdbconnector.tests.examples import base_connector_merge_example, primer_example
+
+
+class KeyValueAdapterTest(AdapterTestTemplate):
+    """
+    This class implements the AdapterTestTemplate for the KeyValueAdapter with the default backend
+
+    """
+    def setUp(self):
+        """
+        Connect to your database
+
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.instance = KeyValueAdapter()
+        self.instance.connect({"path": os.path.join(self.directory.name, "prov.db")})
+
+    def test_connect_invalid_options(self):
+        """
+        Test your connect function with invalid data
+
+        """
+        auth_info = {"invalid": "Invalid"}
+        with self.assertRaises(InvalidOptionsException):
+            self.instance.connect(auth_info)
+        with self.assertRaises(InvalidOptionsException):
+            self.instance.connect({"path": os.path.join(self.directory.name, "other.db"), "backend": "unknown"})
+
+    def test_delete_record_with_relations(self):
+        """
+        Test that the relations and the adjacency entries are deleted together with the node
+
+        """
+        example = base_connector_merge_example()
+        from_label = example.from_node["metadata"][METADATA_KEY_IDENTIFIER]
+        to_label = example.to_node["metadata"][METADATA_KEY_IDENTIFIER]
+        self.instance.save_element(example.from_node["attributes"], example.from_node["metadata"])
+        self.instance.save_element(example.to_node["attributes"], example.to_node["metadata"])
+        relation_id = self.instance.save_relation(from_label, to_label, example.relation["attributes"],
+                                                  example.relation["metadata"])
+
+        self.instance.delete_record(str(to_label))
+        tail_records = self.instance.get_records_tail(metadata_dict={METADATA_KEY_IDENTIFIER: from_label})
+        self.assertEqual(tail_records, [])
+
+        # the relation is created again, the old merge key was removed
+        self.instance.save_element(example.to_node["attributes"], example.to_node["metadata"])
+        new_relation_id = self.instance.save_relation(from_label, to_label, example.relation["attributes"],
+                                                      example.relation["metadata"])
+        self.assertNotEqual(relation_id, new_relation_id)
+
+    def test_get_records_tail_depth(self):
+        """
+        Test the depth of the tail when a node is first found over a longer path, it is expanded with the shortest
+        distance
+
+        """
+        example = base_connector_merge_example()
+        for identifier in ("a", "b", "c", "d", "e", "f", "g"):
+            metadata = example.from_node["metadata"].copy()
+            metadata.update({METADATA_KEY_IDENTIFIER: identifier})
+            self.instance.save_element(example.from_node["attributes"], metadata)
+        # e has the distance 2 over b and 3 over c and d, so f has the distance 3 and g is in the tail
+        for (from_label, to_label) in (("a", "b"), ("a", "c"), ("c", "d"), ("d", "e"), ("b", "e"), ("e", "f"),
+                                       ("f", "g")):
+            self.instance.save_relation(from_label, to_label, example.relation["attributes"],
+                                        example.relation["metadata"])
+
+        tail_records = self.instance.get_records_tail(metadata_dict={METADATA_KEY_IDENTIFIER: "a"}, depth=4)
+        tail_nodes = [str(record.metadata[METADATA_KEY_IDENTIFIER]) for record in tail_records if
+                      isinstance(record, DbRecord)]
+        self.assertEqual(sorted(tail_nodes), ["b", "c", "d", "e", "f", "g"])
+        self.assertEqual(len(tail_records), 13)  # 6 nodes and 7 relations
+
+    def test_adjacency_keys(self):
+        """
+        Test that each relation has an own adjacency key, so a new relation doesn't rewrite the list of the node
+
+        """
+        example = base_connector_merge_example()
+        for identifier in ["center"] + ["node{}".format(index) for index in range(20)]:
+            metadata = example.from_node["metadata"].copy()
+            metadata.update({METADATA_KEY_IDENTIFIER: identifier})
+            self.instance.save_element(example.from_node["attributes"], metadata)
+        relation_ids = [self.instance.save_relation("center", "node{}".format(index), example.relation["attributes"],
+                                                    example.relation["metadata"]) for index in range(20)]
+
+        with self.instance._begin() as transaction:
+            center_id = self.instance._get_node_id(transaction, "center")
+            keys = list(transaction.keys(OUTGOING_KEY + ID_FORMAT.pack(center_id)))
+            self.assertEqual(len(keys), 20)
+            self.assertEqual(set(len(transaction.get(key)) for key in keys), {ID_FORMAT.size})
+
+        self.instance.delete_relation(relation_ids[5])
+        tail_records = self.instance.get_records_tail(metadata_dict={METADATA_KEY_IDENTIFIER: "center"}, depth=1)
+        self.assertEqual(len(tail_records), 38)  # 19 nodes and 19 relations
+
+    def test_dbm_persistence(self):
+        """
+        Test that the records of the dbm backend are available after a reconnect
+
+        """
+        auth_info = {"path": os.path.join(self.directory.name, "prov.dbm"), "backend": "dbm"}
+        provapi = ProvDb(adapter=KeyValueAdapter, auth_info=auth_info)
+        document_id = provapi.save_document(primer_example())
+        provapi._adapter.close()
+
+        reopened = ProvDb(adapter=KeyValueAdapter, auth_info=auth_info)
+        self.assertEqual(reopened.get_document_as_prov(document_id), primer_example())
+        reopened._adapter.close()
+
+    def clear_database(self):
+        """
+        Clear the database
+
+        """
+        self.instance.delete_records_by_filter()
+
+    def tearDown(self):
+        """
+        Delete your instance
+
+        """
+        self.instance.close()
+        del self.instance
+        self.directory.cleanup()
+
+
+@unittest.skipUnless(lmdb, "The lmdb package is not installed")
+class LmdbKeyValueAdapterTest(KeyValueAdapterTest):
+    """
+    The adapter tests with the LMDB backend
+
+    """
+    def setUp(self):
+        """
+        Connect to your database
+
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.instance = KeyValueAdapter()
+        self.instance.connect({"path": os.path.join(self.directory.name, "prov.lmdb"), "backend": "lmdb",
+                               "map_size": 2 ** 26})
+
+
+class KeyValueAdapterProvDbTests(ProvDbTestTemplate):
+    """
+    This is the high level test for the KeyValueAdapter
+
+    """
+    def setUp(self):
+        """
+        Setup a ProvDb instance
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.provapi = ProvDb(api_id=1, adapter=KeyValueAdapter,
+                              auth_info={"path": os.path.join(self.directory.name, "prov.db")})
+
+    def clear_database(self):
+        """
+        Clear function get called before each test starts
+
+        """
+        self.provapi._adapter.delete_records_by_filter()
+
+    def tearDown(self):
+        """
+        Delete prov api instance
+        """
+        self.provapi._adapter.close()
+        del self.provapi
+        self.directory.cleanup()
+
+
+@unittest.skipUnless(lmdb, "The lmdb package is not installed")
+class LmdbKeyValueAdapterProvDbTests(KeyValueAdapterProvDbTests):
+    """
+    The high level tests with the LMDB backend
+
+    """
+    def setUp(self):
+        """
+        Setup a ProvDb instance
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.provapi = ProvDb(api_id=1, adapter=KeyValueAdapter,
+                              auth_info={"path": os.path.join(self.directory.name, "prov.lmdb"), "backend": "lmdb",
+                                         "map_size": 2 ** 26})
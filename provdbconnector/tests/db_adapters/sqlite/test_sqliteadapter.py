@@ -0,0 +1,143 @@
+import json
+import os
+import tempfile
+
+from provdbconnector.exceptions.database import InvalidOptionsException, MergeException
+from provdbconnector.db_adapters.baseadapter import METADATA_KEY_IDENTIFIER, DbRecord, DbBulkRelation
+from provdbconnector.db_adapters.sqlite import SqliteAdapter
+from provdbconnector.prov_db import ProvDb
+from provdbconnector.tests import AdapterTestTemplate
+from provdbconnector.tests import ProvDbTestTemplate
+from provdbconnector.tests.examples import base_connector_merge_example, primer_example
+from provdbconnector.utils.serializer import loads_typed_json
+
+
+class SqliteAdapterTest(AdapterTestTemplate):
+    """
+    This class implements the AdapterTestTemplate for the SqliteAdapter with an in memory database
+
+    """
+    def setUp(self):
+        """
+        Connect to your database
+
+        """
+        self.instance = SqliteAdapter()
+        self.instance.connect(None)
+
+    def test_connect_invalid_options(self):
+        """
+        Test your connect function with invalid data
+
+        """
+        auth_info = {"invalid": "Invalid"}
+        with self.assertRaises(InvalidOptionsException):
+            self.instance.connect(auth_info)
+
+    def test_save_bulk_rollback(self):
+        """
+        Test that a failed merge rolls back the whole batch
+
+        """
+        example = base_connector_merge_example()
+        self.instance.save_element(example.from_node["attributes"], example.from_node["metadata"])
+
+        conflicting_attributes = {key: "conflict" for key in example.from_node["attributes"].keys()}
+        new_metadata = example.to_node["metadata"]
+        with self.assertRaises(MergeException):
+            self.instance.save_bulk([DbRecord(example.to_node["attributes"], new_metadata),
+                                     DbRecord(conflicting_attributes, example.from_node["metadata"])], list())
+
+        records = self.instance.get_records_by_filter()
+        self.assertEqual(len(records), 1)
+
+    def test_save_bulk_merge_in_batch(self):
+        """
+        Test that duplicate relations in one batch are merged into one relation
+
+        """
+        example = base_connector_merge_example()
+        from_label = example.from_node["metadata"][METADATA_KEY_IDENTIFIER]
+        to_label = example.to_node["metadata"][METADATA_KEY_IDENTIFIER]
+        relation = DbBulkRelation(from_label, to_label, example.relation["attributes"], example.relation["metadata"])
+
+        result = self.instance.save_bulk([DbRecord(example.from_node["attributes"], example.from_node["metadata"]),
+                                          DbRecord(example.to_node["attributes"], example.to_node["metadata"])],
+                                         [relation, relation])
+        self.assertEqual(result.element_ids, [str(from_label), str(to_label)])
+        self.assertEqual(result.relation_ids[0], result.relation_ids[1])
+        self.assertEqual(self.instance.save_relation(*relation), result.relation_ids[0])
+
+    def test_persistence(self):
+        """
+        Test that the records are available after a reconnect to the database file
+
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "prov.sqlite")
+            provapi = ProvDb(adapter=SqliteAdapter, auth_info={"path": path})
+            document_id = provapi.save_document(primer_example())
+            provapi._adapter.close()
+
+            reopened = ProvDb(adapter=SqliteAdapter, auth_info={"path": path})
+            self.assertEqual(reopened.get_document_as_prov(document_id), primer_example())
+            reopened._adapter.close()
+
+    def test_records_stored_as_json(self):
+        """
+        Test that the records are stored as json that keeps the prov types of the values, not as pickle
+
+        """
+        example = base_connector_merge_example()
+        self.instance.save_element(example.from_node["attributes"], example.from_node["metadata"])
+
+        (attributes, metadata) = self.instance.connection.execute("SELECT attributes, metadata FROM nodes").fetchone()
+        self.assertIsInstance(json.loads(attributes), dict)
+        self.assertEqual(loads_typed_json(attributes), example.from_node["attributes"])
+        self.assertEqual(loads_typed_json(metadata), example.from_node["metadata"])
+
+        # a merge compares the decoded values with the new record
+        label = example.from_node["metadata"][METADATA_KEY_IDENTIFIER]
+        self.assertEqual(self.instance.save_element(example.from_node["attributes"], example.from_node["metadata"]),
+                         str(label))
+
+    def clear_database(self):
+        """
+        Clear the database
+
+        """
+        self.instance.delete_records_by_filter()
+
+    def tearDown(self):
+        """
+        Delete your instance
+
+        """
+        self.instance.close()
+        del self.instance
+
+
+class SqliteAdapterProvDbTests(ProvDbTestTemplate):
+    """
+    This is the high level test for the SqliteAdapter
+
+    """
+    def setUp(self):
+        """
+        Setup a ProvDb instance
+        """
+        self.provapi = ProvDb(api_id=1, adapter=SqliteAdapter, auth_info=None)
+
+    def clear_database(self):
+        """
+        Clear function get called before each test starts
+
+        """
+        self.provapi._adapter.delete_records_by_filter()
+
+    def tearDown(self):
+        """
+        Delete prov api instance
+        """
+        self.provapi._adapter.close()
+        del self.provapi
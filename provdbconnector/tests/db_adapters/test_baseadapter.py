@@ -1,12 +1,15 @@
 import json
 import unittest
+from datetime import datetime, timezone
 
-from prov.constants import PROV_TYPE,PROV_RECORD_IDS_MAP
+from prov.constants import PROV_TYPE,PROV_RECORD_IDS_MAP, PROV_ATTR_STARTTIME, PROV_ATTR_ENDTIME, PROV_ATTR_TIME
 from prov.model import ProvDocument
-from provdbconnector.db_adapters.baseadapter import BaseAdapter, METADATA_KEY_IDENTIFIER, METADATA_KEY_TYPE_MAP, METADATA_KEY_NAMESPACES, METADATA_KEY_PROV_TYPE
+from provdbconnector.db_adapters.baseadapter import BaseAdapter, METADATA_KEY_IDENTIFIER, METADATA_KEY_TYPE_MAP, METADATA_KEY_NAMESPACES, METADATA_KEY_PROV_TYPE, \
+    LINEAGE_UPSTREAM, LINEAGE_DOWNSTREAM, DbRecord, DbRelation, DbPage, PROJECTION_METADATA_KEYS
 from provdbconnector.exceptions.database import NotFoundException, MergeException
 from provdbconnector.tests.examples import base_connector_record_parameter_example, primer_example,\
     base_connector_relation_parameter_example, base_connector_bundle_parameter_example, base_connector_merge_example
+from provdbconnector.utils.filters import F
 from provdbconnector.utils.serializer import encode_dict_values_to_primitive
 
 
@@ -2006,6 +2009,398 @@ class AdapterTestTemplate(unittest.TestCase):
         self.assertIsNotNone(id)
         self.assertIs(type(id), str, "id should be a string ")
 
+    def test_28_get_lineage(self):
+        """
+        Test the directed traversal from a start node
+
+        **Graph-Strucutre**
+
+        .. code-block:: none
+
+            a --mention--> b --mention--> c
+                           ^
+            d --derivation-+
+
+        Upstream from a are b and c, downstream from b are a and d
+
+        """
+        self.clear_database()
+        record_params = base_connector_record_parameter_example()
+        relation_params = base_connector_relation_parameter_example()
+
+        for name in ("a", "b", "c", "d"):
+            metadata = record_params["metadata"].copy()
+            metadata.update({METADATA_KEY_IDENTIFIER: "lineage_" + name})
+            self.instance.save_element(record_params["attributes"], metadata)
+
+        derivation_metadata = relation_params["metadata"].copy()
+        derivation_metadata.update({METADATA_KEY_PROV_TYPE: PROV_RECORD_IDS_MAP["wasDerivedFrom"]})
+
+        self.instance.save_relation("lineage_a", "lineage_b", relation_params["attributes"], relation_params["metadata"])
+        self.instance.save_relation("lineage_b", "lineage_c", relation_params["attributes"], relation_params["metadata"])
+        self.instance.save_relation("lineage_d", "lineage_b", relation_params["attributes"], derivation_metadata)
+
+        def get_identifiers(records):
+            return sorted(str(record.metadata[METADATA_KEY_IDENTIFIER]) for record in records if
+                          str(record.metadata[METADATA_KEY_IDENTIFIER]).startswith("lineage_"))
+
+        upstream = self.instance.get_lineage("lineage_a", direction=LINEAGE_UPSTREAM)
+        self.assertIsInstance(upstream, list)
+        self.assertEqual(len(upstream), 5)  # 3 Nodes and 2 relations
+        self.assertEqual(str(upstream[0].metadata[METADATA_KEY_IDENTIFIER]), "lineage_a")
+        self.assertEqual(get_identifiers(upstream), ["lineage_a", "lineage_b", "lineage_c"])
+
+        upstream = self.instance.get_lineage("lineage_a", direction=LINEAGE_UPSTREAM, max_depth=1)
+        self.assertEqual(len(upstream), 3)
+        self.assertEqual(get_identifiers(upstream), ["lineage_a", "lineage_b"])
+
+        downstream = self.instance.get_lineage("lineage_b", direction=LINEAGE_DOWNSTREAM)
+        self.assertEqual(len(downstream), 5)
+        self.assertEqual(get_identifiers(downstream), ["lineage_a", "lineage_b", "lineage_d"])
+
+        downstream = self.instance.get_lineage("lineage_b", direction=LINEAGE_DOWNSTREAM,
+                                               relation_types=[PROV_RECORD_IDS_MAP["wasDerivedFrom"]])
+        self.assertEqual(len(downstream), 3)
+        self.assertEqual(get_identifiers(downstream), ["lineage_b", "lineage_d"])
+
+        start_only = self.instance.get_lineage("lineage_b", max_depth=0)
+        self.assertEqual(len(start_only), 1)
+
+        with self.assertRaises(NotFoundException):
+            self.instance.get_lineage("lineage_unknown")
+
+    def test_29_get_path(self):
+        """
+        Test the shortest path between two nodes
+
+        **Graph-Strucutre**
+
+        .. code-block:: none
+
+            a --mention--> b --mention--> c --mention--> d
+            |                                            ^
+            +-----------------derivation-----------------+
+            e
+
+        The shortest path from a to d is the derivation, without derivations it goes over b and c.
+        There is no directed path from d to a and from a to e
+
+        """
+        self.clear_database()
+        record_params = base_connector_record_parameter_example()
+        relation_params = base_connector_relation_parameter_example()
+
+        for name in ("a", "b", "c", "d", "e"):
+            metadata = record_params["metadata"].copy()
+            metadata.update({METADATA_KEY_IDENTIFIER: "path_" + name})
+            self.instance.save_element(record_params["attributes"], metadata)
+
+        derivation_metadata = relation_params["metadata"].copy()
+        derivation_metadata.update({METADATA_KEY_PROV_TYPE: PROV_RECORD_IDS_MAP["wasDerivedFrom"]})
+
+        self.instance.save_relation("path_a", "path_b", relation_params["attributes"], relation_params["metadata"])
+        self.instance.save_relation("path_b", "path_c", relation_params["attributes"], relation_params["metadata"])
+        self.instance.save_relation("path_c", "path_d", relation_params["attributes"], relation_params["metadata"])
+        self.instance.save_relation("path_a", "path_d", relation_params["attributes"], derivation_metadata)
+
+        def get_identifiers(records):
+            return [str(record.metadata[METADATA_KEY_IDENTIFIER]) for record in records if
+                    isinstance(record, DbRecord)]
+
+        path = self.instance.get_path("path_a", "path_d")
+        self.assertIsInstance(path, list)
+        self.assertEqual(len(path), 3)  # 2 Nodes and 1 relation
+        self.assertEqual(get_identifiers(path), ["path_a", "path_d"])
+        self.assertIsInstance(path[1], DbRelation)
+
+        path = self.instance.get_path("path_a", "path_d", relation_types=[PROV_RECORD_IDS_MAP["mentionOf"]])
+        self.assertEqual(len(path), 7)
+        self.assertEqual(get_identifiers(path), ["path_a", "path_b", "path_c", "path_d"])
+
+        path = self.instance.get_path("path_a", "path_d", max_depth=2,
+                                      relation_types=[PROV_RECORD_IDS_MAP["mentionOf"]])
+        self.assertEqual(path, list())
+
+        self.assertEqual(self.instance.get_path("path_d", "path_a"), list())
+        path = self.instance.get_path("path_d", "path_b", directed=False)
+        self.assertEqual(len(path), 5)
+        self.assertEqual(get_identifiers(path)[0], "path_d")
+        self.assertEqual(get_identifiers(path)[-1], "path_b")
+
+        self.assertEqual(self.instance.get_path("path_a", "path_e", directed=False), list())
+        self.assertEqual(get_identifiers(self.instance.get_path("path_e", "path_e")), ["path_e"])
+
+        with self.assertRaises(NotFoundException):
+            self.instance.get_path("path_a", "path_unknown")
+        with self.assertRaises(NotFoundException):
+            self.instance.get_path("path_unknown", "path_a")
+
+
+    def test_30_get_records_in_time_range(self):
+        """
+        Test the time range query with activities (start and end time) and generations (time)
+
+        .. code-block:: none
+
+            time_a  |----|
+            time_b        |-------|
+            time_c                       x
+                  1:00  2:00    3:00   4:00
+
+        """
+        self.clear_database()
+        record_params = base_connector_record_parameter_example()
+        relation_params = base_connector_relation_parameter_example()
+
+        times = {
+            "time_a": {PROV_ATTR_STARTTIME: datetime(2017, 5, 1, 1), PROV_ATTR_ENDTIME: datetime(2017, 5, 1, 1, 30)},
+            "time_b": {PROV_ATTR_STARTTIME: datetime(2017, 5, 1, 2), PROV_ATTR_ENDTIME: datetime(2017, 5, 1, 3)},
+            "time_c": dict()
+        }
+        for (name, attributes) in times.items():
+            metadata = record_params["metadata"].copy()
+            metadata.update({METADATA_KEY_IDENTIFIER: name})
+            self.instance.save_element(attributes, metadata)
+
+        generation_metadata = relation_params["metadata"].copy()
+        generation_metadata.update({METADATA_KEY_PROV_TYPE: PROV_RECORD_IDS_MAP["wasGeneratedBy"]})
+        self.instance.save_relation("time_c", "time_b", {PROV_ATTR_TIME: datetime(2017, 5, 1, 4)},
+                                    generation_metadata)
+
+        def get_identifiers(records):
+            return sorted(str(record.metadata[METADATA_KEY_IDENTIFIER]) for record in records if
+                          isinstance(record, DbRecord))
+
+        records = self.instance.get_records_in_time_range(datetime(2017, 5, 1, 1, 15, tzinfo=timezone.utc),
+                                                          datetime(2017, 5, 1, 2, 30, tzinfo=timezone.utc))
+        self.assertIsInstance(records, list)
+        self.assertEqual(len(records), 2)
+        self.assertEqual(get_identifiers(records), ["time_a", "time_b"])
+
+        records = self.instance.get_records_in_time_range(datetime(2017, 5, 1, 3, tzinfo=timezone.utc),
+                                                          datetime(2017, 5, 1, 5, tzinfo=timezone.utc))
+        self.assertEqual(len(records), 2)
+        self.assertEqual(get_identifiers(records), ["time_b"])
+        self.assertEqual(len([record for record in records if isinstance(record, DbRelation)]), 1)
+
+        records = self.instance.get_records_in_time_range(datetime(2017, 5, 1, tzinfo=timezone.utc),
+                                                          datetime(2017, 5, 2, tzinfo=timezone.utc),
+                                                          prov_types=[PROV_RECORD_IDS_MAP["wasGeneratedBy"]])
+        self.assertEqual(len(records), 1)
+        self.assertIsInstance(records[0], DbRelation)
+
+        records = self.instance.get_records_in_time_range(datetime(2017, 5, 2, tzinfo=timezone.utc),
+                                                          datetime(2017, 5, 3, tzinfo=timezone.utc))
+        self.assertEqual(records, list())
+
+
+    def test_31_get_records_by_expression(self):
+        """
+        Test the filter expressions on nodes and relations
+
+        """
+        self.clear_database()
+        record_params = base_connector_record_parameter_example()
+        relation_params = base_connector_relation_parameter_example()
+        doc = ProvDocument()
+        doc.add_namespace("ex", "http://example.com/")
+        size = doc.valid_qualified_name("ex:size")
+
+        for (name, attributes) in (("filter_a", {PROV_TYPE: doc.valid_qualified_name("ex:Dataset"), size: 5}),
+                                   ("filter_b", {PROV_TYPE: doc.valid_qualified_name("ex:Dataset"), size: 50}),
+                                   ("filter_c", {PROV_TYPE: doc.valid_qualified_name("ex:Report")})):
+            metadata = record_params["metadata"].copy()
+            metadata.update({METADATA_KEY_IDENTIFIER: name})
+            self.instance.save_element(attributes, metadata)
+        self.instance.save_relation("filter_c", "filter_b", {size: 50}, relation_params["metadata"])
+
+        def get_identifiers(records):
+            return sorted(str(record.metadata[METADATA_KEY_IDENTIFIER]) for record in records)
+
+        records = self.instance.get_records_by_expression(F("prov:type") == "ex:Dataset")
+        self.assertIsInstance(records, list)
+        self.assertEqual(get_identifiers(records), ["filter_a", "filter_b"])
+
+        records = self.instance.get_records_by_expression((F("prov:type") == "ex:Dataset") & (F("ex:size") > 10))
+        self.assertEqual(get_identifiers(records), ["filter_b"])
+
+        records = self.instance.get_records_by_expression((F("ex:size") < 10) | ~F("ex:size").exists())
+        self.assertEqual(get_identifiers(records), ["filter_a", "filter_c"])
+
+        records = self.instance.get_records_by_expression(F("identifier", metadata=True).isin(["filter_a", "filter_c"]))
+        self.assertEqual(get_identifiers(records), ["filter_a", "filter_c"])
+
+        records = self.instance.get_records_by_expression(F("identifier", metadata=True).startswith("filter_"))
+        self.assertEqual(get_identifiers(records), ["filter_a", "filter_b", "filter_c"])
+
+        # the relation matches also
+        records = self.instance.get_records_by_expression(F("ex:size") == 50)
+        self.assertEqual(len(records), 2)
+        self.assertEqual(len([record for record in records if isinstance(record, DbRelation)]), 1)
+
+        records = self.instance.get_records_by_expression(
+            F("prov_type", metadata=True) == relation_params["metadata"][METADATA_KEY_PROV_TYPE])
+        self.assertEqual(len(records), 1)
+        self.assertIsInstance(records[0], DbRelation)
+
+        self.assertEqual(self.instance.get_records_by_expression(F("ex:size") > 100), list())
+
+
+    def test_32_get_records_by_filter_page(self):
+        """
+        Test the pages of a filter, each relation is part of the page of its start node
+
+        """
+        self.clear_database()
+        record_params = base_connector_record_parameter_example()
+        relation_params = base_connector_relation_parameter_example()
+        doc = ProvDocument()
+        doc.add_namespace("ex", "http://example.com/")
+        group = doc.valid_qualified_name("ex:group")
+
+        for index in range(7):
+            metadata = record_params["metadata"].copy()
+            metadata.update({METADATA_KEY_IDENTIFIER: "page_{}".format(index)})
+            self.instance.save_element({group: "b" if index == 3 else "a"}, metadata)
+        for (from_node, to_node) in (("page_0", "page_1"), ("page_1", "page_3"), ("page_5", "page_0")):
+            self.instance.save_relation(from_node, to_node, dict(), relation_params["metadata"])
+
+        def get_identifiers(records):
+            return [str(record.metadata[METADATA_KEY_IDENTIFIER]) for record in records if
+                    isinstance(record, DbRecord)]
+
+        page = self.instance.get_records_by_filter_page({group: "a"}, limit=4)
+        self.assertIsInstance(page, DbPage)
+        self.assertEqual(get_identifiers(page.records), ["page_0", "page_1", "page_2", "page_4"])
+        self.assertEqual(len([record for record in page.records if isinstance(record, DbRelation)]), 1)
+        self.assertEqual(page.last_identifier, "page_4")
+
+        page = self.instance.get_records_by_filter_page({group: "a"}, limit=4, after=page.last_identifier)
+        self.assertEqual(get_identifiers(page.records), ["page_5", "page_6"])
+        self.assertEqual(len([record for record in page.records if isinstance(record, DbRelation)]), 1)
+        self.assertIsNone(page.last_identifier)
+
+        # all pages together are the result of the filter
+        records = list()
+        after = None
+        while True:
+            page = self.instance.get_records_by_filter_page(limit=2, after=after)
+            self.assertLessEqual(len(get_identifiers(page.records)), 2)
+            records.extend(page.records)
+            after = page.last_identifier
+            if after is None:
+                break
+        self.assertEqual(get_identifiers(records), ["page_{}".format(index) for index in range(7)])
+        self.assertEqual(len(records), len(self.instance.get_records_by_filter()))
+
+        page = self.instance.get_records_by_filter_page({group: "c"}, limit=4)
+        self.assertEqual(page, DbPage(list(), None))
+
+    def test_33_fields_projection(self):
+        """
+        Test that the reads with fields return only the projected attributes and the metadata to parse the records
+
+        """
+        self.clear_database()
+        ids = insert_document_with_bundles(self.instance)
+        from_record = self.instance.get_record(ids["from_record_id"])
+        from_identifier = from_record.metadata[METADATA_KEY_IDENTIFIER]
+        bundle_identifier = self.instance.get_record(ids["bundle_id"]).metadata[METADATA_KEY_IDENTIFIER]
+        fields = ["ex:int value", "ex:missing value"]
+
+        def assert_projected(records):
+            self.assertGreater(len(records), 0)
+            for record in records:
+                for key in record.attributes.keys():
+                    self.assertIn(str(key), fields)
+                self.assertTrue(set(record.metadata.keys()).issubset(PROJECTION_METADATA_KEYS))
+                self.assertIn(METADATA_KEY_IDENTIFIER, record.metadata)
+
+        records = self.instance.get_records_by_filter(fields=fields)
+        assert_projected(records)
+        self.assertEqual(len(records), len(self.instance.get_records_by_filter()))
+        nodes = [record for record in records if isinstance(record, DbRecord) and
+                 str(record.metadata[METADATA_KEY_IDENTIFIER]) == str(from_identifier)]
+        self.assertEqual(len(nodes), 1)
+        self.assertEqual({str(key): value for (key, value) in nodes[0].attributes.items()}, {"ex:int value": 99})
+
+        tail = self.instance.get_records_tail(metadata_dict={METADATA_KEY_IDENTIFIER: from_identifier},
+                                              fields=fields)
+        assert_projected(tail)
+
+        page = self.instance.get_records_by_filter_page(limit=2, fields=fields)
+        assert_projected(page.records)
+
+        bundle_records = self.instance.get_bundle_records(bundle_identifier, fields=fields)
+        if len(bundle_records) > 0:
+            assert_projected(bundle_records)
+
+        # without projection the records are complete
+        self.assertGreater(len(from_record.attributes), 1)
+        self.assertIn(METADATA_KEY_NAMESPACES, from_record.metadata)
+
+    def test_34_count_records(self):
+        """
+        Test the count and the group count of the records, with and without filter expression
+
+        """
+        self.clear_database()
+        record_params = base_connector_record_parameter_example()
+        relation_params = base_connector_relation_parameter_example()
+        doc = ProvDocument()
+        doc.add_namespace("ex", "http://example.com/")
+        group = doc.valid_qualified_name("ex:group")
+
+        for index in range(5):
+            metadata = record_params["metadata"].copy()
+            metadata.update({METADATA_KEY_IDENTIFIER: "count_{}".format(index)})
+            if index == 4:
+                metadata.update({METADATA_KEY_PROV_TYPE: doc.valid_qualified_name("prov:Entity")})
+                entity_id = self.instance.save_element(dict(), metadata)
+            else:
+                self.instance.save_element({group: "b" if index == 3 else "a"}, metadata)
+        self.instance.save_relation("count_0", "count_1", dict(), relation_params["metadata"])
+        self.instance.save_relation("count_1", "count_2", dict(), relation_params["metadata"])
+
+        self.assertEqual(self.instance.count_records(), 7)
+        self.assertEqual(self.instance.count_records(F("ex:group") == "a"), 3)
+        self.assertEqual(self.instance.count_records(F("ex:group") == "c"), 0)
+
+        prov_type = F(METADATA_KEY_PROV_TYPE, metadata=True)
+        relation_type = str(relation_params["metadata"][METADATA_KEY_PROV_TYPE])
+        self.assertEqual(self.instance.group_count_records(prov_type),
+                         {"prov:Activity": 4, "prov:Entity": 1, relation_type: 2})
+        self.assertEqual(self.instance.group_count_records(F("ex:group")), {"a": 3, "b": 1, None: 3})
+        self.assertEqual(self.instance.group_count_records(prov_type, F("ex:group").exists()), {"prov:Activity": 4})
+
+        # the counts follow the deletes
+        self.instance.delete_record(entity_id)
+        self.assertEqual(self.instance.group_count_records(prov_type),
+                         {"prov:Activity": 4, relation_type: 2})
+        self.clear_database()
+        self.assertEqual(self.instance.count_records(), 0)
+        self.assertEqual(self.instance.group_count_records(prov_type), dict())
+
+    def test_35_document_exists(self):
+        """
+        Test the existence check of a document by the metadata key of its records
+
+        """
+        self.clear_database()
+        record_params = base_connector_record_parameter_example()
+        self.assertFalse(self.instance.document_exists("document_id"))
+
+        for index in range(3):
+            metadata = record_params["metadata"].copy()
+            metadata.update({METADATA_KEY_IDENTIFIER: "document_{}".format(index), "document_id": True})
+            self.instance.save_element(dict(), metadata)
+        self.assertTrue(self.instance.document_exists("document_id"))
+        self.assertFalse(self.instance.document_exists("other_document_id"))
+
+        self.instance.delete_records_by_filter(dict(), {"document_id": True})
+        self.assertFalse(self.instance.document_exists("document_id"))
+
+
 class BaseConnectorTests(unittest.TestCase):
     """
     This class is only to test that the BaseConnector is alright
@@ -0,0 +1,111 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from prov.model import ProvDocument
+
+from provdbconnector.cli import main, expand_paths, parse_option, format_duration
+from provdbconnector.tests import examples
+
+
+class CliTests(unittest.TestCase):
+    """
+    Test the import, the export and the stats of the command line tool with the sqlite adapter
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.directory.name, "input")
+        os.makedirs(os.path.join(self.input, "sub"))
+        self.documents = {
+            os.path.join(self.input, "primer.json"): examples.primer_example(),
+            os.path.join(self.input, "sub", "bundles.xml"): examples.bundles1(),
+        }
+        for (path, prov_document) in self.documents.items():
+            with open(path, "w") as prov_file:
+                prov_file.write(prov_document.serialize(format="json" if path.endswith(".json") else "xml"))
+        self.database = ["--quiet", "--adapter", "sqlite", "--option",
+                         "path=" + os.path.join(self.directory.name, "prov.sqlite")]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_cli(self, *argv):
+        """
+        Run the command line tool
+
+        :return: Tuple with (exit code, output, errors)
+        :rtype: tuple
+        """
+        output = io.StringIO()
+        errors = io.StringIO()
+        code = main(self.database + list(argv), output, errors)
+        return code, output.getvalue(), errors.getvalue()
+
+    def test_expand_paths(self):
+        """
+        Test the files of directories, glob patterns and files
+        """
+        with open(os.path.join(self.input, "notes.txt"), "w") as other_file:
+            other_file.write("not a prov document")
+        primer = os.path.join(self.input, "primer.json")
+
+        self.assertEqual(expand_paths([self.input]), sorted(self.documents.keys()))
+        self.assertEqual(expand_paths([os.path.join(self.input, "**", "*.xml"), primer, primer]),
+                         sorted(self.documents.keys()))
+        self.assertEqual(expand_paths([os.path.join(self.input, "notes.txt")]),
+                         [os.path.join(self.input, "notes.txt")])
+        self.assertEqual(expand_paths([os.path.join(self.input, "missing", "*.json")]), list())
+
+    def test_import_export(self):
+        """
+        Test that the exported documents are equal to the imported files
+        """
+        with open(os.path.join(self.input, "broken.json"), "w") as broken_file:
+            broken_file.write("{no json")
+
+        (code, output, errors) = self.run_cli("import", "--workers", "2", self.input)
+        self.assertEqual(code, 1)
+        self.assertIn("broken.json", errors)
+        document_ids = dict((path, document_id) for (document_id, path) in
+                            (line.split("\t") for line in output.splitlines()))
+        self.assertEqual(sorted(document_ids.keys()), sorted(self.documents.keys()))
+
+        ids_file = os.path.join(self.directory.name, "ids.tsv")
+        with open(ids_file, "w") as ids:
+            ids.write(output)
+        export_directory = os.path.join(self.directory.name, "export")
+        (code, output, errors) = self.run_cli("export", "--ids-file", ids_file, "--output", export_directory)
+        self.assertEqual(code, 0)
+        for (path, prov_document) in self.documents.items():
+            export_path = os.path.join(export_directory, document_ids[path] + ".json")
+            with open(export_path) as export_file:
+                exported_document = ProvDocument.deserialize(content=export_file.read(), format="json")
+            self.assertEqual(exported_document.flattened().unified(), prov_document.flattened().unified())
+
+    def test_stats(self):
+        """
+        Test the number of records by type
+        """
+        (code, output, errors) = self.run_cli("import", "--workers", "1", os.path.join(self.input, "primer.json"))
+        self.assertEqual(code, 0)
+        document_id = output.split("\t")[0]
+
+        (code, output, errors) = self.run_cli("stats", "--document-id", document_id)
+        self.assertEqual(code, 0)
+        lines = output.splitlines()
+        self.assertTrue(lines[0].startswith("records\t"))
+        self.assertIn("prov:Entity\t10", lines)
+
+    def test_options(self):
+        """
+        Test the parsing of the options
+        """
+        self.assertEqual(parse_option("path=prov.sqlite"), ("path", "prov.sqlite"))
+        self.assertEqual(parse_option("timeout=2.5"), ("timeout", 2.5))
+        self.assertEqual(parse_option("encrypted=true"), ("encrypted", True))
+        self.assertEqual(format_duration(3725), "1:02:05")
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            self.run_cli("import", "--writers", "0", self.input)
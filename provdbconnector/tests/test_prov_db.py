@@ -1,11 +1,16 @@
 import unittest
+from datetime import datetime, timezone
+from unittest import mock
 from uuid import UUID
 
 import pkg_resources
-from prov.model import ProvDocument, ProvAgent, ProvEntity, ProvActivity, QualifiedName, ProvRelation, ProvRecord, ProvBundle
+from prov.constants import PROV_ACTIVITY, PROV_DERIVATION, PROV_ENTITY, PROV_LABEL, PROV_ATTR_USED_ENTITY, PROV_TYPE
+from prov.model import ProvDocument, ProvAgent, ProvEntity, ProvActivity, QualifiedName, ProvRelation, ProvRecord, ProvBundle, \
+    ProvElement, ProvDerivation, ProvGeneration, Namespace
 
 from provdbconnector.tests import examples as examples
-from provdbconnector import ProvDb
+from provdbconnector import ProvDb, F, SimpleInMemoryAdapter
+from provdbconnector.prov_db import ProvPage
 from provdbconnector.exceptions.database import InvalidOptionsException, NotFoundException
 from provdbconnector import Neo4jAdapter, NEO4J_USER, NEO4J_PASS, NEO4J_HOST, NEO4J_BOLT_PORT
 from provdbconnector.db_adapters.baseadapter import METADATA_KEY_TYPE_MAP, METADATA_KEY_PROV_TYPE, \
@@ -198,6 +203,470 @@ class ProvDbTestTemplate(unittest.TestCase):
 
         self.assertEqual(stored_document, prov_document)
 
+    def test_save_document_content_addressed(self):
+        """
+        This test saves the same document twice in the content addressed mode.
+        The second save should return the same id without any write operation and a changed bundle is merged.
+
+        :return:
+        """
+        self.clear_database()
+        self.provapi._content_addressed = True
+
+        prov_document = examples.bundles2()
+        stored_document_id = self.provapi.save_document_from_prov(prov_document)
+
+        # the saved document is found with a lookup of its id, without counting the records
+        with mock.patch.object(self.provapi._adapter, "save_element") as save_element, \
+                mock.patch.object(self.provapi._adapter, "save_relation") as save_relation, \
+                mock.patch.object(self.provapi._adapter, "count_records", side_effect=AssertionError("scan")):
+            self.assertEqual(self.provapi.save_document(examples.bundles2()), stored_document_id)
+            save_element.assert_not_called()
+            save_relation.assert_not_called()
+
+        # add a new record to one bundle
+        changed_document = examples.bundles2()
+        bundle = sorted(changed_document.bundles, key=lambda b: str(b.identifier))[0]
+        bundle.entity("ex:new_entity")
+
+        changed_document_id = self.provapi.save_document(changed_document)
+        self.assertNotEqual(changed_document_id, stored_document_id)
+
+        stored_document = self.provapi.get_document_as_prov(changed_document_id)
+        self.assertEqual(stored_document, changed_document)
+
+    def test_save_document_content_addressed_other_instance(self):
+        """
+        This test saves the same document with another ProvDb instance on the same database in the content addressed
+        mode, the fingerprints are stored in the database. After the database was cleared the document is saved again.
+
+        :return:
+        """
+        self.clear_database()
+        self.provapi._content_addressed = True
+        stored_document_id = self.provapi.save_document(examples.bundles2())
+
+        other_provapi = ProvDb(adapter=SimpleInMemoryAdapter, content_addressed=True)
+        other_provapi._adapter = self.provapi._adapter
+
+        with mock.patch.object(self.provapi._adapter, "save_bulk") as save_bulk:
+            self.assertEqual(other_provapi.save_document(examples.bundles2()), stored_document_id)
+            save_bulk.assert_not_called()
+
+        # from the bundles only the new record is saved, the records of the document are saved with the new id
+        changed_document = examples.bundles2()
+        bundle = sorted(changed_document.bundles, key=lambda b: str(b.identifier))[0]
+        bundle.entity("ex:new_entity")
+        with mock.patch.object(self.provapi._adapter, "save_bulk", wraps=self.provapi._adapter.save_bulk) as save_bulk:
+            changed_document_id = other_provapi.save_document(changed_document)
+            saved_identifiers = set(str(metadata[METADATA_KEY_IDENTIFIER]) for call in save_bulk.call_args_list for
+                                    (attributes, metadata) in call[0][0])
+        self.assertIn("http://www.example.com/new_entity", saved_identifiers)
+        for identifier in ("report1", "report1bis", "report2"):
+            self.assertNotIn("http://www.example.com/" + identifier, saved_identifiers)
+        self.assertEqual(other_provapi.get_document_as_prov(changed_document_id), changed_document)
+
+        self.clear_database()
+        self.assertEqual(self.provapi.save_document(examples.bundles2()), stored_document_id)
+        self.assertEqual(self.provapi.get_document_as_prov(stored_document_id), examples.bundles2())
+
+    def test_append_to_document(self):
+        """
+        This test appends single records and a partial document to a saved document
+
+        :return:
+        """
+        self.clear_database()
+
+        prov_document = ProvDocument()
+        prov_document.set_default_namespace("http://example.com")
+        prov_document.entity("e1")
+        document_id = self.provapi.save_document(prov_document)
+
+        update = ProvDocument()
+        update.set_default_namespace("http://example.com")
+        activity = update.activity("a1")
+        usage = update.usage("a1", "e1")
+
+        self.assertEqual(self.provapi.append_to_document(document_id, [activity, usage]), document_id)
+
+        partial_document = ProvDocument()
+        partial_document.set_default_namespace("http://example.com")
+        partial_document.agent("ag1")
+        partial_document.association("a1", "ag1")
+        self.assertEqual(self.provapi.append_to_document(document_id, partial_document), document_id)
+
+        expected_document = ProvDocument()
+        expected_document.set_default_namespace("http://example.com")
+        expected_document.entity("e1")
+        expected_document.activity("a1")
+        expected_document.usage("a1", "e1")
+        expected_document.agent("ag1")
+        expected_document.association("a1", "ag1")
+
+        stored_document = self.provapi.get_document_as_prov(document_id)
+        self.assertEqual(stored_document, expected_document)
+
+    def test_append_to_document_invalid_arguments(self):
+        """
+        Test append_to_document with invalid arguments
+
+        :return:
+        """
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.append_to_document(None, ProvDocument())
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.append_to_document("doc_id", "invalid")
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.append_to_document("doc_id", ["invalid"])
+
+    def test_append_to_document_not_found(self):
+        """
+        Test append_to_document with an unknown document id, no record is saved
+
+        :return:
+        """
+        self.clear_database()
+        self.provapi.save_document(examples.primer_example())
+        records_count = self.provapi.count()
+
+        update = ProvDocument()
+        update.set_default_namespace("http://example.com")
+        with self.assertRaises(NotFoundException):
+            self.provapi.append_to_document("unknown_document_id", update.entity("e1"))
+        self.assertEqual(self.provapi.count(), records_count)
+
+    def test_get_lineage(self):
+        """
+        Test the upstream and downstream lineage of an entity
+
+        :return:
+        """
+        self.clear_database()
+
+        prov_document = ProvDocument()
+        prov_document.set_default_namespace("http://example.com/")
+        prov_document.entity("raw")
+        prov_document.entity("clean")
+        prov_document.entity("report")
+        prov_document.activity("cleaning")
+        prov_document.agent("alice")
+        prov_document.wasDerivedFrom("clean", "raw")
+        prov_document.wasDerivedFrom("report", "clean")
+        prov_document.wasGeneratedBy("clean", "cleaning")
+        prov_document.wasAssociatedWith("cleaning", "alice")
+        bundle = prov_document.bundle("bundle")
+        bundle.set_default_namespace("http://example.com/")
+        bundle.entity("report")
+        self.provapi.save_document(prov_document)
+
+        def get_identifiers(document):
+            return sorted(record.identifier.localpart for record in document.get_records(ProvElement))
+
+        report = QualifiedName(Namespace("ex", "http://example.com/"), "report")
+        upstream = self.provapi.get_lineage(report)
+        self.assertIsInstance(upstream, ProvDocument)
+        self.assertEqual(get_identifiers(upstream), ["alice", "clean", "cleaning", "raw", "report"])
+        self.assertEqual(len(list(upstream.get_records(ProvRelation))), 4)
+
+        derivations = self.provapi.get_lineage(report, relation_types=[ProvDerivation], max_depth=1)
+        self.assertEqual(get_identifiers(derivations), ["clean", "report"])
+
+        raw = QualifiedName(Namespace("ex", "http://example.com/"), "raw")
+        downstream = self.provapi.get_lineage(raw, direction="downstream")
+        self.assertEqual(get_identifiers(downstream), ["clean", "raw", "report"])
+        self.assertEqual(len(list(downstream.get_records(ProvRelation))), 2)
+
+    def test_is_reachable(self):
+        """
+        Test the reachability between elements, also with a cycle
+
+        :return:
+        """
+        self.clear_database()
+
+        prov_document = ProvDocument()
+        prov_document.set_default_namespace("http://example.com/")
+        prov_document.wasDerivedFrom("clean", "raw")
+        prov_document.wasDerivedFrom("report", "clean")
+        prov_document.wasGeneratedBy("report", "writing")
+        prov_document.wasInformedBy("draft", "review")
+        prov_document.wasInformedBy("review", "draft")
+        prov_document.entity("other")
+        self.provapi.save_document(prov_document)
+
+        namespace = Namespace("ex", "http://example.com/")
+        (report, raw, writing, draft, review, other) = [QualifiedName(namespace, name) for name in
+                                                         ("report", "raw", "writing", "draft", "review", "other")]
+
+        self.assertTrue(self.provapi.is_reachable(report, raw))
+        self.assertTrue(self.provapi.is_reachable(report, raw, relation_types=[ProvDerivation]))
+        self.assertFalse(self.provapi.is_reachable(raw, report))
+        self.assertTrue(self.provapi.is_reachable(report, writing))
+        self.assertFalse(self.provapi.is_reachable(report, writing, relation_types=[ProvDerivation]))
+        self.assertTrue(self.provapi.is_reachable(draft, review))
+        self.assertTrue(self.provapi.is_reachable(review, draft))
+        self.assertFalse(self.provapi.is_reachable(report, other))
+        self.assertTrue(self.provapi.is_reachable(other, other))
+
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.is_reachable("ex:report", raw)
+        with self.assertRaises(NotFoundException):
+            self.provapi.is_reachable(QualifiedName(namespace, "unknown"), raw)
+
+    def test_get_path(self):
+        """
+        Test the shortest path between two elements
+
+        :return:
+        """
+        self.clear_database()
+
+        prov_document = ProvDocument()
+        prov_document.set_default_namespace("http://example.com/")
+        prov_document.wasDerivedFrom("clean", "raw")
+        prov_document.wasDerivedFrom("report", "clean")
+        prov_document.wasGeneratedBy("report", "writing")
+        prov_document.used("writing", "raw")
+        prov_document.entity("other")
+        bundle = prov_document.bundle("bundle")
+        bundle.set_default_namespace("http://example.com/")
+        bundle.entity("report")
+        bundle.entity("other")
+        self.provapi.save_document(prov_document)
+
+        namespace = Namespace("ex", "http://example.com/")
+        (report, raw, clean, other) = [QualifiedName(namespace, name) for name in ("report", "raw", "clean", "other")]
+
+        path = self.provapi.get_path(report, raw)
+        self.assertIsInstance(path, ProvDocument)
+        self.assertEqual(len(list(path.get_records(ProvElement))), 3)
+        self.assertEqual(len(list(path.get_records(ProvRelation))), 2)
+
+        path = self.provapi.get_path(report, raw, relation_types=[ProvDerivation])
+        self.assertEqual(sorted(record.identifier.localpart for record in path.get_records(ProvElement)),
+                         ["clean", "raw", "report"])
+
+        self.assertEqual(len(self.provapi.get_path(report, raw, max_depth=1).get_records()), 0)
+        self.assertEqual(len(self.provapi.get_path(raw, report).get_records()), 0)
+        self.assertEqual(len(self.provapi.get_path(raw, report, directed=False).get_records()), 5)
+
+        # the bundle associations are not part of a path
+        self.assertEqual(len(self.provapi.get_path(report, other, directed=False).get_records()), 0)
+
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.get_path("ex:report", raw)
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.get_path(report, raw, max_depth="1")
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.get_path(report, raw, relation_types=[ProvEntity])
+        with self.assertRaises(NotFoundException):
+            self.provapi.get_path(report, QualifiedName(namespace, "unknown"))
+
+    def test_get_records_in_time_range(self):
+        """
+        Test the time range query for activities and generations
+
+        :return:
+        """
+        self.clear_database()
+
+        prov_document = ProvDocument()
+        prov_document.set_default_namespace("http://example.com/")
+        prov_document.activity("cleaning", datetime(2017, 5, 1, 10), datetime(2017, 5, 1, 11))
+        prov_document.activity("writing", datetime(2017, 5, 2, 10), datetime(2017, 5, 2, 11))
+        prov_document.activity("planning")
+        prov_document.wasGeneratedBy("report", "writing", datetime(2017, 5, 2, 11))
+        self.provapi.save_document(prov_document)
+
+        doc = self.provapi.get_records_in_time_range(datetime(2017, 5, 1), datetime(2017, 5, 2))
+        self.assertIsInstance(doc, ProvDocument)
+        self.assertEqual([record.identifier.localpart for record in doc.get_records(ProvActivity)], ["cleaning"])
+
+        doc = self.provapi.get_records_in_time_range(datetime(2017, 5, 2), datetime(2017, 5, 3))
+        self.assertEqual([record.identifier.localpart for record in doc.get_records(ProvActivity)], ["writing"])
+        self.assertEqual(len(list(doc.get_records(ProvGeneration))), 1)
+
+        doc = self.provapi.get_records_in_time_range(datetime(2017, 5, 2), datetime(2017, 5, 3),
+                                                     prov_types=[ProvGeneration])
+        self.assertEqual(len(list(doc.get_records(ProvActivity))), 0)
+        self.assertEqual(len(list(doc.get_records(ProvGeneration))), 1)
+
+        doc = self.provapi.get_records_in_time_range(datetime(2017, 5, 1, 11, 30, tzinfo=timezone.utc),
+                                                     datetime(2017, 5, 1, 12, tzinfo=timezone.utc))
+        self.assertEqual(len(doc.get_records()), 0)
+
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.get_records_in_time_range("2017-05-01", datetime(2017, 5, 2))
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.get_records_in_time_range(datetime(2017, 5, 2), datetime(2017, 5, 1))
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.get_records_in_time_range(datetime(2017, 5, 1), datetime(2017, 5, 2), prov_types=["ex:x"])
+
+    def test_get_elements_pages(self):
+        """
+        Test the pages of the elements and of a filter
+
+        :return:
+        """
+        self.clear_database()
+
+        prov_document = ProvDocument()
+        prov_document.set_default_namespace("http://example.com/")
+        for index in range(5):
+            prov_document.entity("entity_{}".format(index))
+        prov_document.agent("agent")
+        prov_document.wasDerivedFrom("entity_4", "entity_0")
+        self.provapi.save_document(prov_document)
+
+        identifiers = list()
+        pages = 0
+        page = self.provapi.get_elements(ProvEntity, limit=2)
+        while True:
+            self.assertIsInstance(page, ProvPage)
+            self.assertIsInstance(page.document, ProvDocument)
+            records = list(page.document.get_records(ProvElement))
+            self.assertLessEqual(len(records), 2)
+            self.assertTrue(all(isinstance(record, ProvEntity) for record in records))
+            identifiers.extend(record.identifier.localpart for record in records)
+            pages += 1
+            if page.cursor is None:
+                break
+            page = self.provapi.get_elements(ProvEntity, limit=2, cursor=page.cursor)
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(identifiers, ["entity_{}".format(index) for index in range(5)])
+
+        # the relation is part of the page of its start element
+        page = self.provapi.get_records_by_filter_page(metadata_dict={METADATA_KEY_PROV_TYPE: PROV_ENTITY}, limit=10)
+        self.assertIsNone(page.cursor)
+        self.assertEqual(len(list(page.document.get_records(ProvElement))), 5)
+        self.assertEqual(len(list(page.document.get_records(ProvDerivation))), 1)
+
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.get_elements(ProvEntity, limit=0)
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.get_elements(ProvEntity, limit=2, cursor="not a cursor")
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.get_records_by_filter_page(metadata_dict="prov:Entity")
+
+    def test_get_elements_fields(self):
+        """
+        Test the projection of the attributes
+
+        :return:
+        """
+        self.clear_database()
+
+        prov_document = ProvDocument()
+        prov_document.set_default_namespace("http://example.com/")
+        prov_document.entity("data", {PROV_LABEL: "Data", "size": 20, "format": "csv"})
+        prov_document.entity("report", {"size": 10})
+        prov_document.wasDerivedFrom("report", "data")
+        self.provapi.save_document(prov_document)
+
+        entities = self.provapi.get_elements(ProvEntity, fields=[PROV_LABEL])
+        records = {record.identifier.localpart: record for record in entities.get_records(ProvEntity)}
+        self.assertEqual(set(records.keys()), {"data", "report"})
+        self.assertEqual(set(records["data"].get_attribute(PROV_LABEL)), {"Data"})
+        self.assertEqual(len(records["data"].attributes), 1)
+        self.assertEqual(len(records["report"].attributes), 0)
+
+        # the formal attributes of the relations are always included
+        page = self.provapi.get_records_by_filter_page(metadata_dict={METADATA_KEY_PROV_TYPE: PROV_ENTITY},
+                                                       fields=["ex:size"])
+        derivations = list(page.document.get_records(ProvDerivation))
+        self.assertEqual(len(derivations), 1)
+        self.assertEqual(derivations[0].get_attribute(PROV_ATTR_USED_ENTITY), {prov_document.valid_qualified_name("data")})
+
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.get_elements(ProvEntity, fields="prov:label")
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.get_elements(ProvEntity, fields=[None])
+
+    def test_count(self):
+        """
+        Test the count and the group count of the records
+
+        :return:
+        """
+        self.clear_database()
+
+        prov_document = ProvDocument()
+        prov_document.set_default_namespace("http://example.com/")
+        prov_document.entity("data", {PROV_TYPE: prov_document.valid_qualified_name("Dataset")})
+        prov_document.entity("report")
+        prov_document.activity("analysis")
+        prov_document.wasDerivedFrom("report", "data")
+        self.provapi.save_document(prov_document)
+
+        self.assertEqual(self.provapi.count(), 4)
+        self.assertEqual(self.provapi.count(F("prov_type", metadata=True) == PROV_ENTITY), 2)
+
+        self.assertEqual(self.provapi.group_count(),
+                         {"prov:Entity": 2, "prov:Activity": 1, "prov:Derivation": 1})
+        self.assertEqual(self.provapi.group_count(PROV_TYPE, F("prov_type", metadata=True) == PROV_ENTITY),
+                         {str(prov_document.valid_qualified_name("Dataset")): 1, None: 1})
+
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.count("prov:Entity")
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.group_count(None)
+
+    def test_get_records_by_expression(self):
+        """
+        Test the filter expressions
+
+        :return:
+        """
+        self.clear_database()
+
+        prov_document = ProvDocument()
+        prov_document.set_default_namespace("http://example.com/")
+        prov_document.add_namespace("ex", "http://example.com/")
+        prov_document.entity("raw", {"prov:type": "ex:Dataset", "ex:rows": 5})
+        prov_document.entity("clean", {"prov:type": "ex:Dataset", "ex:rows": 50})
+        prov_document.entity("report", {"prov:type": "ex:Report"})
+        prov_document.activity("cleaning")
+        prov_document.wasDerivedFrom("clean", "raw")
+        self.provapi.save_document(prov_document)
+
+        def get_identifiers(document):
+            return sorted(record.identifier.localpart for record in document.get_records(ProvElement))
+
+        doc = self.provapi.get_records_by_expression((F("prov:type") == "ex:Dataset") & (F("ex:rows") > 10))
+        self.assertIsInstance(doc, ProvDocument)
+        self.assertEqual(get_identifiers(doc), ["clean"])
+
+        doc = self.provapi.get_records_by_expression(F("prov:type").isin(["ex:Dataset", "ex:Report"]))
+        self.assertEqual(get_identifiers(doc), ["clean", "raw", "report"])
+
+        doc = self.provapi.get_records_by_expression(F("prov_type", metadata=True).isin([PROV_ACTIVITY,
+                                                                                         PROV_DERIVATION]))
+        self.assertEqual(get_identifiers(doc), ["cleaning"])
+        self.assertEqual(len(list(doc.get_records(ProvDerivation))), 1)
+
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.get_records_by_expression({"prov:type": "ex:Dataset"})
+
+    def test_get_lineage_invalid_arguments(self):
+        """
+        Test get_lineage with invalid arguments
+
+        :return:
+        """
+        identifier = QualifiedName(Namespace("ex", "http://example.com/"), "unknown")
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.get_lineage("ex:unknown")
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.get_lineage(identifier, direction="sideways")
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.get_lineage(identifier, relation_types=[ProvEntity])
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.get_lineage(identifier, max_depth=-1)
+        with self.assertRaises(NotFoundException):
+            self.provapi.get_lineage(identifier)
+
 
 class ProvDbTests(unittest.TestCase):
     """
@@ -0,0 +1,133 @@
+import unittest
+
+from prov.constants import PROV_ACTIVITY, PROV_TYPE
+from prov.model import ProvDocument
+
+from provdbconnector.db_adapters.neo4j.neo4jadapter import Neo4jAdapter
+from provdbconnector.exceptions.provapi import InvalidArgumentTypeException
+from provdbconnector.utils.filters import F, And, Or, compile_predicate, get_equality_candidates, get_field_value, \
+    get_required_keys
+
+
+class FilterExpressionTests(unittest.TestCase):
+    """
+    Test the evaluation and the compilation of the filter expressions
+    """
+
+    def setUp(self):
+        doc = ProvDocument()
+        doc.add_namespace("ex", "http://example.com/")
+        self.attributes = {
+            PROV_TYPE: doc.valid_qualified_name("ex:Dataset"),
+            doc.valid_qualified_name("ex:size"): 20,
+            doc.valid_qualified_name("ex:format"): "csv"
+        }
+        self.metadata = {"prov_type": PROV_ACTIVITY, "identifier": "http://example.com/data"}
+
+    def matches(self, expression):
+        return compile_predicate(expression)(self.attributes, self.metadata)
+
+    def test_comparisons(self):
+        """
+        Test each operator with a matching and a not matching value
+        """
+        self.assertTrue(self.matches(F("prov:type") == "ex:Dataset"))
+        self.assertFalse(self.matches(F("prov:type") == "ex:Report"))
+        self.assertTrue(self.matches(F("ex:size") != 10))
+        self.assertTrue(self.matches(F("ex:size") > 10))
+        self.assertFalse(self.matches(F("ex:size") < 10))
+        self.assertTrue(self.matches(F("ex:size") >= 20))
+        self.assertTrue(self.matches(F("ex:size") <= 20))
+        self.assertTrue(self.matches(F("ex:format").isin(["csv", "json"])))
+        self.assertFalse(self.matches(F("ex:format").isin(("xml",))))
+        self.assertTrue(self.matches(F("prov:type").startswith("ex:")))
+        self.assertFalse(self.matches(F("ex:size").startswith("2")))
+        self.assertTrue(self.matches(F("ex:size").exists()))
+        self.assertFalse(self.matches(F("ex:missing").exists()))
+        self.assertTrue(self.matches(F("prov_type", metadata=True) == PROV_ACTIVITY))
+        self.assertTrue(self.matches(F("identifier", metadata=True).startswith("http://example.com/")))
+
+    def test_combinations(self):
+        """
+        Test and, or, not and the unknown result of missing fields and incompatible types
+        """
+        self.assertTrue(self.matches((F("prov:type") == "ex:Dataset") & (F("ex:size") > 10)))
+        self.assertFalse(self.matches((F("prov:type") == "ex:Dataset") & (F("ex:size") > 30)))
+        self.assertTrue(self.matches((F("ex:size") > 30) | (F("ex:format") == "csv")))
+        self.assertTrue(self.matches(~(F("ex:size") > 30)))
+        self.assertTrue(self.matches(~F("ex:missing").exists()))
+
+        # unknown like null in cypher
+        self.assertFalse(self.matches(F("ex:missing") != 10))
+        self.assertFalse(self.matches(~(F("ex:missing") == 10)))
+        self.assertFalse(self.matches(~(F("ex:format") > 10)))
+        self.assertTrue(self.matches((F("ex:missing") == 10) | (F("ex:size") == 20)))
+
+        expression = (F("ex:a") == 1) & (F("ex:b") == 2) & ((F("ex:c") == 3) | (F("ex:d") == 4) | (F("ex:e") == 5))
+        self.assertIsInstance(expression, And)
+        self.assertEqual(len(expression.operands), 3)
+        self.assertIsInstance(expression.operands[2], Or)
+        self.assertEqual(len(expression.operands[2].operands), 3)
+
+    def test_invalid_expressions(self):
+        """
+        Test the python boolean operators and invalid operands
+        """
+        with self.assertRaises(InvalidArgumentTypeException):
+            (F("ex:a") == 1) and (F("ex:b") == 2)
+        with self.assertRaises(InvalidArgumentTypeException):
+            (F("ex:a") == 1) & True
+        with self.assertRaises(InvalidArgumentTypeException):
+            F("ex:a").isin("abc")
+
+    def test_get_equality_candidates(self):
+        """
+        Test the values of a field that are required by a conjunction
+        """
+        expression = (F("identifier", metadata=True).isin(["a", "b", "c"])) & (F("identifier", metadata=True) != "b")
+        self.assertEqual(get_equality_candidates(expression, "identifier"), {"a", "b", "c"})
+
+        expression = F("identifier", metadata=True).isin(["a", "b"]) & (F("identifier", metadata=True) == "b")
+        self.assertEqual(get_equality_candidates(expression, "identifier"), {"b"})
+
+        self.assertIsNone(get_equality_candidates(F("identifier") == "a", "identifier"))
+        self.assertIsNone(get_equality_candidates((F("identifier", metadata=True) == "a") |
+                                                  (F("ex:size") == 1), "identifier"))
+
+    def test_get_required_keys(self):
+        """
+        Test the keys that are required by a conjunction
+        """
+        expression = F("document", metadata=True).exists() & (F("prov_type", metadata=True) == PROV_ACTIVITY) & \
+            (F("ex:size") > 10) & ~F("bundle", metadata=True).exists()
+        self.assertEqual(get_required_keys(expression), {"document", "prov_type"})
+        self.assertEqual(get_required_keys(expression, metadata=False), {"ex:size"})
+        self.assertEqual(get_required_keys(F("document", metadata=True).exists() | (F("ex:size") > 10)), set())
+
+    def test_get_field_value(self):
+        """
+        Test the hashable values of the fields for the group counts
+        """
+        self.assertEqual(get_field_value(F("prov:type"), self.attributes, self.metadata), "ex:Dataset")
+        self.assertEqual(get_field_value(F("ex:size"), self.attributes, self.metadata), 20)
+        self.assertEqual(get_field_value(F("prov_type", metadata=True), self.attributes, self.metadata),
+                         "prov:Activity")
+        self.assertIsNone(get_field_value(F("ex:missing"), self.attributes, self.metadata))
+        self.assertEqual(get_field_value(F("ex:list"), {"ex:list": ["a", PROV_ACTIVITY]}, self.metadata),
+                         ("a", "prov:Activity"))
+
+    def test_cypher_filter_expression(self):
+        """
+        Test the compilation into a cypher condition
+        """
+        parameters = dict()
+        expression = ((F("prov:type") == "ex:Dataset") & (F("ex:size") > 10)) | ~F("prov_type", metadata=True).exists()
+        condition = Neo4jAdapter._get_cypher_filter_expression(expression, "x", parameters)
+        self.assertEqual(condition, "((x.`prov:type` = {filter_0} AND x.`ex:size` > {filter_1}) OR "
+                                    "(NOT exists(x.`meta:prov_type`)))")
+        self.assertEqual(parameters, {"filter_0": "ex:Dataset", "filter_1": 10})
+
+        parameters = dict()
+        condition = Neo4jAdapter._get_cypher_filter_expression(F("ex:format").isin(["csv"]), "x", parameters)
+        self.assertEqual(condition, "x.`ex:format` IN {filter_0}")
+        self.assertEqual(parameters, {"filter_0": ["csv"]})
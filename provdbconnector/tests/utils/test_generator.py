@@ -0,0 +1,118 @@
+import io
+import unittest
+
+from prov.constants import PROV_DERIVATION, PROV_ASSOCIATION, PROV_USAGE
+from prov.model import ProvDocument, ProvEntity, ProvActivity, ProvAgent, ProvRelation
+
+from provdbconnector import ProvDb, SimpleInMemoryAdapter
+from provdbconnector.exceptions.provapi import InvalidArgumentTypeException
+from provdbconnector.utils.generator import WorkloadGenerator
+
+
+def get_all_records(prov_document):
+    """
+    Returns the records of the document and of all bundles
+
+    :param prov_document: The document
+    :type prov_document: ProvDocument
+    :rtype: list
+    """
+    records = list(prov_document.get_records())
+    for bundle in prov_document.bundles:
+        records.extend(bundle.get_records())
+    return records
+
+
+class WorkloadGeneratorTests(unittest.TestCase):
+    """
+    Test the generated documents
+    """
+
+    def setUp(self):
+        self.generator = WorkloadGenerator(entities=60, activities=20, agents=5, relations=80, degree_skew=1.0,
+                                           bundles=3, mentions=4, attributes=2, attribute_size=10, seed=7)
+
+    def test_generate_document(self):
+        """
+        Test the counts, the payload and that the same seed generates the same document
+        """
+        prov_document = self.generator.generate_document()
+        records = get_all_records(prov_document)
+
+        self.assertEqual(len(prov_document.bundles), 3)
+        self.assertEqual(len([record for record in records if isinstance(record, ProvEntity)]), 60 + 4)
+        self.assertEqual(len([record for record in records if isinstance(record, ProvActivity)]), 20)
+        self.assertEqual(len([record for record in records if isinstance(record, ProvAgent)]), 5)
+        self.assertEqual(len([record for record in records if isinstance(record, ProvRelation)]), 80 + 4)
+
+        entity = prov_document.get_record("ex:entity0")[0]
+        payload = [value for (name, value) in entity.attributes if name.localpart == "payload1"]
+        self.assertEqual(len(payload[0]), 10)
+
+        self.assertEqual(self.generator.generate_document(), prov_document)
+        other = WorkloadGenerator(entities=60, activities=20, agents=5, relations=80, degree_skew=1.0, bundles=3,
+                                  mentions=4, attributes=2, attribute_size=10, seed=8)
+        self.assertNotEqual(other.generate_document(), prov_document)
+
+    def test_relation_mix(self):
+        """
+        Test that only the relation types of the mix are generated
+        """
+        generator = WorkloadGenerator(entities=20, activities=5, agents=2, relations=40,
+                                      relation_mix={PROV_DERIVATION: 3, PROV_ASSOCIATION: 1, PROV_USAGE: 0})
+        relation_types = set(record.get_type() for record in generator.generate_document().get_records(ProvRelation))
+        self.assertEqual(relation_types, {PROV_DERIVATION, PROV_ASSOCIATION})
+
+    def test_iter_documents(self):
+        """
+        Test that the parts contain all records of the document
+        """
+        prov_document = self.generator.generate_document()
+        parts = list(self.generator.iter_documents(chunk_size=25))
+
+        sizes = [len(get_all_records(part)) for part in parts]
+        self.assertTrue(all(size == 25 for size in sizes[:-1]))
+        self.assertEqual(sum(sizes), len(get_all_records(prov_document)))
+
+        merged = ProvDocument()
+        for part in parts:
+            merged.update(part)
+        self.assertEqual(merged, prov_document)
+
+    def test_write(self):
+        """
+        Test the streamed PROV-N and the PROV-JSON
+        """
+        stream = io.StringIO()
+        self.generator.write_provn(stream, chunk_size=7)
+        self.assertEqual(stream.getvalue(), self.generator.generate_document().get_provn() + "\n")
+
+        stream = io.StringIO()
+        self.generator.write_json(stream)
+        self.assertEqual(ProvDocument.deserialize(content=stream.getvalue(), format="json"),
+                         self.generator.generate_document())
+
+    def test_save_document(self):
+        """
+        Test that the generated document can be saved and restored
+        """
+        provapi = ProvDb(adapter=SimpleInMemoryAdapter, auth_info=None)
+        provapi._adapter.all_nodes = dict()
+        provapi._adapter.all_relations = dict()
+
+        prov_document = self.generator.generate_document()
+        document_id = provapi.save_document(prov_document)
+        self.assertEqual(provapi.get_document_as_prov(document_id), prov_document)
+
+    def test_invalid_settings(self):
+        """
+        Test the validation of the settings
+        """
+        with self.assertRaises(InvalidArgumentTypeException):
+            WorkloadGenerator(entities=-1)
+        with self.assertRaises(InvalidArgumentTypeException):
+            WorkloadGenerator(relation_mix={"wasDerivedFrom": 1})
+        with self.assertRaises(InvalidArgumentTypeException):
+            WorkloadGenerator(bundles=1, mentions=1)
+        with self.assertRaises(InvalidArgumentTypeException):
+            list(WorkloadGenerator().iter_documents(chunk_size=0))
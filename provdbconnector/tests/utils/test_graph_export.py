@@ -0,0 +1,77 @@
+import unittest
+
+from prov.model import ProvDocument
+
+from provdbconnector.db_adapters.in_memory import SimpleInMemoryAdapter
+from provdbconnector.exceptions.provapi import InvalidArgumentTypeException
+from provdbconnector.prov_db import ProvDb
+from provdbconnector.tests.examples import primer_example
+from provdbconnector.utils import graph_export
+
+
+@unittest.skipIf(graph_export.numpy is None, "The graph export requires numpy")
+class GraphExportTests(unittest.TestCase):
+    """
+    Test the export of the stored graph as numpy arrays
+    """
+
+    def setUp(self):
+        self.provapi = ProvDb(adapter=SimpleInMemoryAdapter, auth_info=None)
+        self.provapi._adapter.all_nodes = dict()
+        self.provapi._adapter.all_relations = dict()
+
+    def tearDown(self):
+        del self.provapi
+
+    def test_get_graph_arrays(self):
+        """
+        Test the CSR arrays of a small chain
+        """
+        doc = ProvDocument()
+        doc.add_namespace("ex", "http://example.com/")
+        doc.entity("ex:a")
+        doc.entity("ex:b")
+        doc.activity("ex:c")
+        doc.wasDerivedFrom("ex:b", "ex:a")
+        doc.wasGeneratedBy("ex:b", "ex:c")
+        document_id = self.provapi.save_document(doc)
+
+        graph = self.provapi.get_graph_arrays(document_id)
+        self.assertEqual(len(graph.identifiers), 3)
+        self.assertEqual(len(graph.indptr), 4)
+        self.assertEqual(len(graph.indices), 2)
+
+        index = {identifier: position for (position, identifier) in enumerate(graph.identifiers)}
+        node_b = index["http://example.com/b"]
+        targets = sorted(graph.identifiers[target] for target in
+                         graph.indices[graph.indptr[node_b]:graph.indptr[node_b + 1]])
+        self.assertEqual(targets, ["http://example.com/a", "http://example.com/c"])
+
+        edge_types = sorted(graph.edge_type_names[code] for code in graph.edge_types)
+        self.assertEqual(edge_types, ["prov:Derivation", "prov:Generation"])
+        self.assertEqual(graph.node_type_names[graph.node_types[index["http://example.com/c"]]], "prov:Activity")
+
+    def test_get_graph_arrays_document_filter(self):
+        """
+        Test that only the records of the document are exported
+        """
+        document_id = self.provapi.save_document(primer_example())
+        doc = ProvDocument()
+        doc.add_namespace("ex", "http://other.com/")
+        doc.entity("ex:other")
+        self.provapi.save_document(doc)
+
+        graph = self.provapi.get_graph_arrays(document_id)
+        self.assertNotIn("http://other.com/other", graph.identifiers)
+        self.assertEqual(graph.indptr[-1], len(graph.indices))
+        self.assertGreater(len(graph.indices), 0)
+
+        all_graph = self.provapi.get_graph_arrays()
+        self.assertIn("http://other.com/other", all_graph.identifiers)
+
+    def test_get_graph_arrays_invalid_arguments(self):
+        """
+        Test the export with an invalid document id
+        """
+        with self.assertRaises(InvalidArgumentTypeException):
+            self.provapi.get_graph_arrays(1)
@@ -0,0 +1,131 @@
+import unittest
+
+from prov.model import ProvDocument
+
+from provdbconnector import ProvDb, SimpleInMemoryAdapter
+from provdbconnector.db_adapters.baseadapter import METADATA_KEY_IDENTIFIER, METADATA_KEY_PROV_TYPE
+from provdbconnector.exceptions.database import MergeException
+from provdbconnector.exceptions.provapi import InvalidArgumentTypeException
+from provdbconnector.tests import examples
+from provdbconnector.utils.metrics import MetricsRegistry, StatsdSink, COUNTER_MERGE_CONFLICTS, COUNTER_CACHE_HITS, \
+    COUNTER_CACHE_MISSES, instrument
+
+
+class MetricsRegistryTests(unittest.TestCase):
+    """
+    Test the statistics and the export of the registry
+    """
+
+    def test_observe_call(self):
+        """
+        Test the counts, the cumulative histogram and the counters
+        """
+        registry = MetricsRegistry(latency_buckets=(0.001, 0.01))
+        registry.observe_call("adapter.save_element", 0.0005, 1, 10, False)
+        registry.observe_call("adapter.save_element", 0.005, 2, 0, True)
+        registry.observe_call("adapter.save_element", 1.0, 0, 0, False)
+        registry.increment(COUNTER_MERGE_CONFLICTS, "adapter.save_element")
+
+        stats = registry.get_stats("adapter.save_element")
+        self.assertEqual(stats.calls, 3)
+        self.assertEqual(stats.errors, 1)
+        self.assertEqual(stats.latency_buckets, (1, 2))
+        self.assertAlmostEqual(stats.latency_sum, 1.0055)
+        self.assertEqual(stats.records, 3)
+        self.assertEqual(stats.bytes, 10)
+        self.assertEqual(registry.get_stats("adapter.get_record").calls, 0)
+        self.assertEqual(registry.get_counter(COUNTER_MERGE_CONFLICTS), 1)
+        self.assertEqual(registry.get_counter(COUNTER_MERGE_CONFLICTS, "adapter.save_relation"), 0)
+
+        registry.reset()
+        self.assertEqual(registry.get_operations(), list())
+
+    def test_prometheus_text(self):
+        """
+        Test the prometheus text format
+        """
+        registry = MetricsRegistry(latency_buckets=(0.001,))
+        registry.observe_call("prov_db.save_document", 0.0005, 4, 0, False)
+        registry.increment(COUNTER_CACHE_HITS, "prov_db.save_document")
+
+        text = registry.to_prometheus_text()
+        self.assertIn('provdb_calls_total{operation="prov_db.save_document"} 1\n', text)
+        self.assertIn("# TYPE provdb_latency_seconds histogram\n", text)
+        self.assertIn('provdb_latency_seconds_bucket{operation="prov_db.save_document",le="0.001"} 1\n', text)
+        self.assertIn('provdb_latency_seconds_bucket{operation="prov_db.save_document",le="+Inf"} 1\n', text)
+        self.assertIn('provdb_records_total{operation="prov_db.save_document"} 4\n', text)
+        self.assertIn('provdb_cache_hits_total{operation="prov_db.save_document"} 1\n', text)
+
+    def test_statsd_sink(self):
+        """
+        Test the metrics of the statsd callback
+        """
+        metrics = list()
+        sink = StatsdSink(lambda name, value, metric_type: metrics.append((name, value, metric_type)))
+        sink.observe_call("adapter.get_record", 0.002, 1, 0, False)
+        sink.increment(COUNTER_CACHE_MISSES, "prov_db.save_bundle")
+
+        self.assertEqual(metrics[0], ("provdb.adapter.get_record.calls", 1, "c"))
+        self.assertEqual(metrics[1][0], "provdb.adapter.get_record.latency")
+        self.assertAlmostEqual(metrics[1][1], 2.0)
+        self.assertEqual(metrics[2], ("provdb.adapter.get_record.records", 1, "c"))
+        self.assertEqual(metrics[3], ("provdb.prov_db.save_bundle.cache_misses", 1, "c"))
+
+
+class InstrumentationTests(unittest.TestCase):
+    """
+    Test the metrics of a ProvDb with the in memory adapter
+    """
+
+    def test_prov_db_metrics(self):
+        """
+        Test the calls of the ProvDb and of the adapter and the cache hits of the content addressed saves
+        """
+        registry = MetricsRegistry()
+        provapi = ProvDb(adapter=SimpleInMemoryAdapter, auth_info=None, content_addressed=True, metrics=registry)
+        provapi._adapter.all_nodes = dict()
+        provapi._adapter.all_relations = dict()
+        prov_document = examples.primer_example()
+
+        document_id = provapi.save_document(prov_document)
+        provapi.save_document(prov_document)
+        provapi.get_document_as_prov(document_id)
+
+        self.assertEqual(registry.get_stats("prov_db.save_document").calls, 2)
+        self.assertEqual(registry.get_counter(COUNTER_CACHE_HITS, "prov_db.save_document"), 1)
+        self.assertEqual(registry.get_counter(COUNTER_CACHE_MISSES, "prov_db.save_document"), 1)
+        self.assertEqual(registry.get_stats("adapter.save_bulk").calls, 1)
+        self.assertGreater(registry.get_stats("adapter.save_bulk").records, 0)
+        self.assertEqual(registry.get_stats("prov_db.get_document_as_prov").records,
+                         len(provapi.get_document_as_prov(document_id).records))
+
+        # without metrics nothing is wrapped
+        provapi = ProvDb(adapter=SimpleInMemoryAdapter, auth_info=None)
+        self.assertNotIn("save_document", vars(provapi))
+        self.assertNotIn("save_element", vars(provapi._adapter))
+
+    def test_merge_conflicts(self):
+        """
+        Test that a merge exception is counted as error and merge conflict
+        """
+        registry = MetricsRegistry()
+        adapter = SimpleInMemoryAdapter()
+        adapter.all_nodes = dict()
+        adapter.all_relations = dict()
+        instrument(adapter, registry, "adapter.", ["save_element"])
+
+        doc = ProvDocument()
+        doc.add_namespace("ex", "http://example.com/")
+        metadata = {METADATA_KEY_IDENTIFIER: doc.valid_qualified_name("ex:node"),
+                    METADATA_KEY_PROV_TYPE: doc.valid_qualified_name("prov:Entity")}
+        adapter.save_element({"ex:value": 1}, metadata)
+        with self.assertRaises(MergeException):
+            adapter.save_element({"ex:value": 2}, metadata)
+
+        stats = registry.get_stats("adapter.save_element")
+        self.assertEqual(stats.calls, 2)
+        self.assertEqual(stats.errors, 1)
+        self.assertEqual(registry.get_counter(COUNTER_MERGE_CONFLICTS, "adapter.save_element"), 1)
+
+        with self.assertRaises(InvalidArgumentTypeException):
+            instrument(adapter, "not a sink", "adapter.", ["get_record"])
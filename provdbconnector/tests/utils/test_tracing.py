@@ -0,0 +1,105 @@
+import os
+import pstats
+import tempfile
+import unittest
+
+from provdbconnector import ProvDb, SimpleInMemoryAdapter
+from provdbconnector.exceptions.provapi import InvalidArgumentTypeException
+from provdbconnector.tests import examples
+from provdbconnector.utils.converter import to_json
+from provdbconnector.utils.tracing import CallbackTracer, CallProfiler, SPAN_SAVE_DOCUMENT, SPAN_GET_DOCUMENT, \
+    SPAN_GET_BUNDLE, SPAN_PARSE, SPAN_SERIALIZE, SPAN_DATABASE, SPAN_DESERIALIZE
+
+
+class TracingTests(unittest.TestCase):
+    """
+    Test the spans and the profiles of the ProvDb calls with the in memory adapter
+    """
+
+    def setUp(self):
+        self.events = list()
+        self.tracer = CallbackTracer(on_start=lambda name, attributes: self.events.append(("start", name)),
+                                     on_end=lambda name, seconds, error: self.events.append(("end", name)))
+
+    def create_prov_db(self, **kwargs):
+        provapi = ProvDb(adapter=SimpleInMemoryAdapter, auth_info=None, **kwargs)
+        provapi._adapter.all_nodes = dict()
+        provapi._adapter.all_relations = dict()
+        return provapi
+
+    def test_save_document_spans(self):
+        """
+        Test the phases of save_document, the spans are nested in the span of the call
+        """
+        provapi = self.create_prov_db(tracer=self.tracer)
+        provapi.save_document(to_json(examples.primer_example()).encode("utf-8"))
+
+        names = [name for (event, name) in self.events if event == "start"]
+        self.assertEqual(names[:2], [SPAN_SAVE_DOCUMENT, SPAN_PARSE])
+        self.assertIn(SPAN_SERIALIZE, names)
+        self.assertIn(SPAN_DATABASE, names)
+        self.assertEqual(self.events[-1], ("end", SPAN_SAVE_DOCUMENT))
+        self.assertLess(self.events.index(("end", SPAN_SERIALIZE)), self.events.index(("start", SPAN_DATABASE)))
+
+    def test_get_document_spans(self):
+        """
+        Test the phases of get_document_as_prov with bundles
+        """
+        provapi = self.create_prov_db(tracer=self.tracer)
+        document_id = provapi.save_document(examples.bundles1())
+        del self.events[:]
+
+        provapi.get_document_as_prov(document_id)
+        names = [name for (event, name) in self.events if event == "start"]
+        self.assertEqual(names[:3], [SPAN_GET_DOCUMENT, SPAN_DATABASE, SPAN_DESERIALIZE])
+        self.assertEqual(names.count(SPAN_GET_BUNDLE), 2)
+        self.assertEqual(self.events[-1], ("end", SPAN_GET_DOCUMENT))
+
+    def test_error_span(self):
+        """
+        Test that the span gets the exception
+        """
+        errors = list()
+        tracer = CallbackTracer(on_end=lambda name, seconds, error: errors.append((name, error)))
+        provapi = self.create_prov_db(tracer=tracer)
+        with self.assertRaises(InvalidArgumentTypeException):
+            provapi.save_document("not a document")
+        self.assertEqual(errors[0][0], SPAN_PARSE)
+        self.assertIsInstance(errors[0][1], InvalidArgumentTypeException)
+        self.assertEqual(errors[-1][0], SPAN_SAVE_DOCUMENT)
+
+    def test_profiler(self):
+        """
+        Test the statistics of the slow calls
+        """
+        profiles = list()
+        with tempfile.TemporaryDirectory() as directory:
+            profiler = CallProfiler(0, directory=directory,
+                                    callback=lambda name, seconds, stats: profiles.append((name, stats)))
+            provapi = self.create_prov_db(profiler=profiler)
+            document_id = provapi.save_document(examples.primer_example())
+            provapi.get_document_as_prov(document_id)
+
+            self.assertEqual([name for (name, stats) in profiles], [SPAN_SAVE_DOCUMENT, SPAN_GET_DOCUMENT])
+            self.assertIsInstance(profiles[0][1], pstats.Stats)
+            files = os.listdir(directory)
+            self.assertEqual(len(files), 2)
+            self.assertTrue(all(file_name.endswith(".pstats") for file_name in files))
+
+        # fast calls are not kept
+        profiles = list()
+        profiler = CallProfiler(60, callback=lambda name, seconds, stats: profiles.append(name))
+        provapi = self.create_prov_db(profiler=profiler)
+        provapi.save_document(examples.primer_example())
+        self.assertEqual(profiles, list())
+
+    def test_invalid_options(self):
+        """
+        Test the validation of the tracer and the profiler
+        """
+        with self.assertRaises(InvalidArgumentTypeException):
+            ProvDb(adapter=SimpleInMemoryAdapter, tracer=object())
+        with self.assertRaises(InvalidArgumentTypeException):
+            ProvDb(adapter=SimpleInMemoryAdapter, profiler=0.5)
+        with self.assertRaises(InvalidArgumentTypeException):
+            CallProfiler(-1)
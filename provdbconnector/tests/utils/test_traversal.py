@@ -0,0 +1,84 @@
+import random
+import unittest
+
+from provdbconnector.utils.traversal import find_shortest_path
+
+
+class TraversalTests(unittest.TestCase):
+    """
+    Test the bidirectional shortest path search
+    """
+
+    @staticmethod
+    def create_expand(adjacency):
+        def expand(frontier):
+            for node in frontier:
+                for (neighbour, edge) in adjacency.get(node, list()):
+                    yield node, neighbour, edge
+        return expand
+
+    @staticmethod
+    def get_distance(adjacency, source, target):
+        """
+        Breadth first search from the source as reference
+        """
+        distances = {source: 0}
+        frontier = [source]
+        while len(frontier) > 0:
+            next_frontier = list()
+            for node in frontier:
+                for (neighbour, edge) in adjacency.get(node, list()):
+                    if neighbour not in distances:
+                        distances[neighbour] = distances[node] + 1
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+        return distances.get(target)
+
+    def test_find_shortest_path(self):
+        """
+        Test a small graph with a shortcut
+        """
+        successors = {"a": [("b", "ab"), ("d", "ad")], "b": [("c", "bc")], "c": [("e", "ce")], "d": [("e", "de")]}
+        predecessors = {"b": [("a", "ab")], "c": [("b", "bc")], "d": [("a", "ad")], "e": [("c", "ce"), ("d", "de")]}
+
+        path = find_shortest_path("a", "e", self.create_expand(successors), self.create_expand(predecessors))
+        self.assertEqual(path.nodes, ["a", "d", "e"])
+        self.assertEqual(path.edges, ["ad", "de"])
+
+        self.assertIsNone(find_shortest_path("a", "e", self.create_expand(successors),
+                                             self.create_expand(predecessors), max_depth=1))
+        self.assertIsNone(find_shortest_path("e", "a", self.create_expand(successors),
+                                             self.create_expand(predecessors)))
+        self.assertEqual(find_shortest_path("a", "a", self.create_expand(successors),
+                                            self.create_expand(predecessors)).nodes, ["a"])
+
+    def test_find_shortest_path_random(self):
+        """
+        Compare the length and the edges of the paths with a breadth first search on random graphs
+        """
+        generator = random.Random(3)
+        for _ in range(50):
+            successors = dict()
+            predecessors = dict()
+            edges = set()
+            for edge in range(generator.randint(0, 80)):
+                (source, target) = (generator.randrange(30), generator.randrange(30))
+                successors.setdefault(source, list()).append((target, edge))
+                predecessors.setdefault(target, list()).append((source, edge))
+                edges.add((source, target, edge))
+
+            for _ in range(20):
+                (source, target) = (generator.randrange(30), generator.randrange(30))
+                max_depth = generator.choice([None, 1, 2, 4])
+                path = find_shortest_path(source, target, self.create_expand(successors),
+                                          self.create_expand(predecessors), max_depth)
+                distance = self.get_distance(successors, source, target)
+                if distance is None or (max_depth is not None and distance > max_depth):
+                    self.assertIsNone(path)
+                    continue
+
+                self.assertEqual(len(path.edges), distance)
+                self.assertEqual(path.nodes[0], source)
+                self.assertEqual(path.nodes[-1], target)
+                for (position, edge) in enumerate(path.edges):
+                    self.assertIn((path.nodes[position], path.nodes[position + 1], edge), edges)
@@ -0,0 +1,409 @@
+"""
+Filter expressions for :py:meth:`provdbconnector.prov_db.ProvDb.get_records_by_expression`.
+
+An expression is built from fields with the python operators and combined with ``&`` (and), ``|`` (or) and
+``~`` (not):
+
+.. code:: python
+
+    expression = (F("prov:type") == "ex:Dataset") & (F("ex:size") > 10)
+    expression = F("ex:format").isin(["csv", "json"]) | ~F("ex:size").exists()
+    expression = F("prov_type", metadata=True) == PROV_ACTIVITY
+
+The values are compared in their primitive representation (see
+:py:func:`provdbconnector.utils.serializer.encode_string_value_to_primitive`), for example a qualified name as
+"prefix:localpart" string. The comparison of a missing field or of incompatible types is unknown, like null in Cypher,
+so ``F("ex:size") != 10`` and ``~(F("ex:size") == 10)`` only match records with a size.
+
+"""
+from provdbconnector.exceptions.provapi import InvalidArgumentTypeException
+from provdbconnector.utils.serializer import encode_string_value_to_primitive
+
+# Operators of a comparison, the same as in Cypher
+OPERATOR_EQ = "="
+OPERATOR_NE = "<>"
+OPERATOR_LT = "<"
+OPERATOR_LE = "<="
+OPERATOR_GT = ">"
+OPERATOR_GE = ">="
+OPERATOR_IN = "IN"
+OPERATOR_STARTS_WITH = "STARTS WITH"
+OPERATOR_EXISTS = "EXISTS"
+
+_COMPARE_FUNCTIONS = {
+    OPERATOR_EQ: lambda value, other: value == other,
+    OPERATOR_NE: lambda value, other: value != other,
+    OPERATOR_LT: lambda value, other: value < other,
+    OPERATOR_LE: lambda value, other: value <= other,
+    OPERATOR_GT: lambda value, other: value > other,
+    OPERATOR_GE: lambda value, other: value >= other,
+    OPERATOR_IN: lambda value, other: value in other,
+    OPERATOR_STARTS_WITH: lambda value, other: isinstance(value, str) and value.startswith(other),
+}
+
+
+class F(object):
+    """
+    A field of the attributes or of the metadata of a record, the comparison operators return a
+    :py:class:`Comparison`
+
+    """
+
+    def __init__(self, key, metadata=False):
+        """
+        :param key: The attribute key (for example "prov:type") or the metadata key (for example "prov_type")
+        :type key: str or prov.model.QualifiedName
+        :param metadata: True for a metadata field
+        :type metadata: bool
+        """
+        self.key = str(key)
+        self.metadata = metadata
+
+    def __repr__(self):
+        return "F({!r}, metadata={})".format(self.key, self.metadata)
+
+    def __eq__(self, value):
+        return Comparison(self, OPERATOR_EQ, value)
+
+    def __ne__(self, value):
+        return Comparison(self, OPERATOR_NE, value)
+
+    def __lt__(self, value):
+        return Comparison(self, OPERATOR_LT, value)
+
+    def __le__(self, value):
+        return Comparison(self, OPERATOR_LE, value)
+
+    def __gt__(self, value):
+        return Comparison(self, OPERATOR_GT, value)
+
+    def __ge__(self, value):
+        return Comparison(self, OPERATOR_GE, value)
+
+    __hash__ = None
+
+    def isin(self, values):
+        """
+        The field value is one of the values
+
+        :param values: The values
+        :type values: list or tuple or set
+        :rtype: Comparison
+        """
+        if not isinstance(values, (list, tuple, set, frozenset)):
+            raise InvalidArgumentTypeException("The values must be a list, got {}".format(type(values)))
+        return Comparison(self, OPERATOR_IN, list(values))
+
+    def startswith(self, prefix):
+        """
+        The field value is a string that starts with the prefix
+
+        :param prefix: The prefix
+        :type prefix: str
+        :rtype: Comparison
+        """
+        return Comparison(self, OPERATOR_STARTS_WITH, str(prefix))
+
+    def exists(self):
+        """
+        The record has the field
+
+        :rtype: Comparison
+        """
+        return Comparison(self, OPERATOR_EXISTS, None)
+
+
+class FilterExpression(object):
+    """
+    Base class of the expressions
+
+    """
+
+    def __and__(self, other):
+        return And([self, other])
+
+    def __or__(self, other):
+        return Or([self, other])
+
+    def __invert__(self):
+        return Not(self)
+
+    def __bool__(self):
+        raise InvalidArgumentTypeException("Use & | ~ instead of and, or, not to combine filter expressions")
+
+    def get_fields(self):
+        """
+        Returns all fields of the expression
+
+        :rtype: list(F)
+        """
+        raise NotImplementedError("Abstract method")
+
+    def evaluate(self, attribute_values, metadata_values):
+        """
+        Evaluate the expression with three valued logic
+
+        :param attribute_values: The encoded attribute values by the string key
+        :type attribute_values: dict
+        :param metadata_values: The encoded metadata values by the key
+        :type metadata_values: dict
+        :return: True, False or None if the result is unknown
+        :rtype: bool or None
+        """
+        raise NotImplementedError("Abstract method")
+
+
+class Comparison(FilterExpression):
+    """
+    Compare a field with a value
+
+    """
+
+    def __init__(self, field, operator, value):
+        """
+        :param field: The field
+        :type field: F
+        :param operator: One of the OPERATOR constants
+        :type operator: str
+        :param value: The value, a list for OPERATOR_IN
+        """
+        if operator == OPERATOR_IN:
+            value = [encode_string_value_to_primitive(item) for item in value]
+        elif operator != OPERATOR_EXISTS:
+            value = encode_string_value_to_primitive(value)
+
+        self.field = field
+        self.operator = operator
+        self.value = value
+
+    def __repr__(self):
+        return "Comparison({!r}, {!r}, {!r})".format(self.field, self.operator, self.value)
+
+    def get_fields(self):
+        return [self.field]
+
+    def evaluate(self, attribute_values, metadata_values):
+        values = metadata_values if self.field.metadata else attribute_values
+        if self.field.key not in values:
+            return False if self.operator == OPERATOR_EXISTS else None
+        if self.operator == OPERATOR_EXISTS:
+            return True
+        try:
+            return bool(_COMPARE_FUNCTIONS[self.operator](values[self.field.key], self.value))
+        except TypeError:
+            return None
+
+
+class And(FilterExpression):
+    """
+    Conjunction of expressions
+
+    """
+
+    def __init__(self, operands):
+        """
+        :param operands: The expressions, nested conjunctions are flattened
+        :type operands: list(FilterExpression)
+        """
+        self.operands = list()
+        for operand in operands:
+            if not isinstance(operand, FilterExpression):
+                raise InvalidArgumentTypeException("Not a filter expression: {}".format(operand))
+            self.operands.extend(operand.operands if isinstance(operand, And) else [operand])
+
+    def __repr__(self):
+        return "And({!r})".format(self.operands)
+
+    def get_fields(self):
+        return [field for operand in self.operands for field in operand.get_fields()]
+
+    def evaluate(self, attribute_values, metadata_values):
+        result = True
+        for operand in self.operands:
+            value = operand.evaluate(attribute_values, metadata_values)
+            if value is False:
+                return False
+            if value is None:
+                result = None
+        return result
+
+
+class Or(FilterExpression):
+    """
+    Disjunction of expressions
+
+    """
+
+    def __init__(self, operands):
+        """
+        :param operands: The expressions, nested disjunctions are flattened
+        :type operands: list(FilterExpression)
+        """
+        self.operands = list()
+        for operand in operands:
+            if not isinstance(operand, FilterExpression):
+                raise InvalidArgumentTypeException("Not a filter expression: {}".format(operand))
+            self.operands.extend(operand.operands if isinstance(operand, Or) else [operand])
+
+    def __repr__(self):
+        return "Or({!r})".format(self.operands)
+
+    def get_fields(self):
+        return [field for operand in self.operands for field in operand.get_fields()]
+
+    def evaluate(self, attribute_values, metadata_values):
+        result = False
+        for operand in self.operands:
+            value = operand.evaluate(attribute_values, metadata_values)
+            if value is True:
+                return True
+            if value is None:
+                result = None
+        return result
+
+
+class Not(FilterExpression):
+    """
+    Negation of an expression
+
+    """
+
+    def __init__(self, operand):
+        """
+        :param operand: The expression
+        :type operand: FilterExpression
+        """
+        if not isinstance(operand, FilterExpression):
+            raise InvalidArgumentTypeException("Not a filter expression: {}".format(operand))
+        self.operand = operand
+
+    def __repr__(self):
+        return "Not({!r})".format(self.operand)
+
+    def get_fields(self):
+        return self.operand.get_fields()
+
+    def evaluate(self, attribute_values, metadata_values):
+        value = self.operand.evaluate(attribute_values, metadata_values)
+        if value is None:
+            return None
+        return not value
+
+
+def compile_predicate(expression):
+    """
+    Returns a function `(attributes, metadata) -> bool` for the expression.
+    Only the values of the fields in the expression are encoded, the keys of the attributes can be qualified names or
+    strings.
+
+    :param expression: The filter expression
+    :type expression: FilterExpression
+    :return: The predicate, True if the record matches
+    :rtype: function
+    """
+    fields = expression.get_fields()
+    attribute_keys = frozenset(field.key for field in fields if not field.metadata)
+    metadata_keys = frozenset(field.key for field in fields if field.metadata)
+
+    def predicate(attributes, metadata):
+        attribute_values = dict()
+        if len(attribute_keys) > 0:
+            for (key, value) in attributes.items():
+                key = str(key)
+                if key in attribute_keys:
+                    attribute_values[key] = encode_string_value_to_primitive(value)
+
+        metadata_values = dict()
+        for key in metadata_keys:
+            if key in metadata:
+                metadata_values[key] = encode_string_value_to_primitive(metadata[key])
+
+        return expression.evaluate(attribute_values, metadata_values) is True
+
+    return predicate
+
+
+def get_equality_candidates(expression, field_key, metadata=True):
+    """
+    Returns the values a field must have to match the expression, from the equality and in comparisons of the
+    conjunction. Used to look up the records in an index instead of a scan.
+
+    :param expression: The filter expression
+    :type expression: FilterExpression
+    :param field_key: The key of the field
+    :type field_key: str
+    :param metadata: True for a metadata field
+    :type metadata: bool
+    :return: The set of values or None if the field can have any value
+    :rtype: set
+    """
+    operands = expression.operands if isinstance(expression, And) else [expression]
+    candidates = None
+    for operand in operands:
+        if not isinstance(operand, Comparison) or operand.field.key != field_key or \
+                operand.field.metadata != metadata:
+            continue
+        try:
+            if operand.operator == OPERATOR_EQ:
+                values = {operand.value}
+            elif operand.operator == OPERATOR_IN:
+                values = set(operand.value)
+            else:
+                continue
+        except TypeError:
+            # unhashable values (lists) can't be looked up
+            continue
+        candidates = values if candidates is None else candidates & values
+    return candidates
+
+
+def get_required_keys(expression, metadata=True):
+    """
+    Returns the keys that a record must have to match the expression, from the comparisons of the conjunction (a
+    comparison of a missing field is never true). Used to look up the records in an index of the keys.
+
+    :param expression: The filter expression
+    :type expression: FilterExpression
+    :param metadata: True for the metadata keys, False for the attribute keys
+    :type metadata: bool
+    :return: The set of keys
+    :rtype: set
+    """
+    operands = expression.operands if isinstance(expression, And) else [expression]
+    return set(operand.field.key for operand in operands if
+               isinstance(operand, Comparison) and operand.field.metadata == metadata)
+
+
+def get_group_key(value):
+    """
+    Returns the primitive representation of a value that can be used as dict key, lists are converted into tuples
+
+    :param value: The attribute or metadata value
+    :return: The hashable value or None
+    """
+    if value is None:
+        return None
+    value = encode_string_value_to_primitive(value)
+    if isinstance(value, list):
+        return tuple(get_group_key(item) for item in value)
+    return value
+
+
+def get_field_value(field, attributes, metadata):
+    """
+    Returns the value of a field of a record for the group counts, see :py:func:`get_group_key`
+
+    :param field: The field
+    :type field: F
+    :param attributes: The attributes of the record, the keys can be qualified names or strings
+    :type attributes: dict
+    :param metadata: The metadata of the record
+    :type metadata: dict
+    :return: The hashable value or None if the record has no value
+    """
+    if field.metadata:
+        return get_group_key(metadata.get(field.key))
+    for (key, value) in attributes.items():
+        if str(key) == field.key:
+            return get_group_key(value)
+    return None
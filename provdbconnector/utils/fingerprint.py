@@ -0,0 +1,146 @@
+import hashlib
+from collections import namedtuple
+from datetime import datetime
+from uuid import uuid5, NAMESPACE_URL
+
+from prov.model import Literal, Identifier, QualifiedName, ProvBundle, ProvRecord
+
+from provdbconnector.exceptions.provapi import InvalidArgumentTypeException
+
+# Metadata keys of the bundle entity in the content addressed mode, written after the records of the bundle
+METADATA_KEY_BUNDLE_FINGERPRINT = "bundle_fingerprint"
+METADATA_KEY_BUNDLE_ID = "bundle_id"
+
+# The fingerprint of a saved bundle and the bundle id of the saved records
+BundleContent = namedtuple("BundleContent", "fingerprint, bundle_id")
+
+
+def get_record_fingerprint(prov_record):
+    """
+    Returns a canonical hash of a prov record.
+    Two records with the same type, identifier and attributes (in any order) have the same fingerprint
+
+    :param prov_record: The prov record
+    :type prov_record: prov.model.ProvRecord
+    :return: The fingerprint as hex string
+    :rtype: str
+    """
+    if not isinstance(prov_record, ProvRecord):
+        raise InvalidArgumentTypeException("Should be {} but was {}".format(ProvRecord, type(prov_record)))
+
+    attributes = sorted("{}={}".format(_encode_canonical_value(key), _encode_canonical_value(value))
+                        for (key, value) in prov_record.attributes)
+
+    parts = [_encode_canonical_value(prov_record.get_type()), _encode_canonical_value(prov_record.identifier)]
+    parts.extend(attributes)
+
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def get_record_fingerprints(prov_bundle):
+    """
+    Returns the fingerprints of all records in the bundle, the records of sub bundles are not included
+
+    :param prov_bundle: The bundle or document
+    :type prov_bundle: prov.model.ProvBundle
+    :return: dict with the fingerprint as key and the record as value
+    :rtype: dict
+    """
+    if not isinstance(prov_bundle, ProvBundle):
+        raise InvalidArgumentTypeException("Should be {} but was {}".format(ProvBundle, type(prov_bundle)))
+
+    return {get_record_fingerprint(record): record for record in prov_bundle.get_records()}
+
+
+def get_bundle_fingerprint(prov_bundle, record_fingerprints=None):
+    """
+    Returns a canonical hash of a bundle, based on the namespaces and the fingerprints of the records
+
+    :param prov_bundle: The bundle
+    :type prov_bundle: prov.model.ProvBundle
+    :param record_fingerprints: The already calculated fingerprints, see get_record_fingerprints
+    :type record_fingerprints: dict or set
+    :return: The fingerprint as hex string
+    :rtype: str
+    """
+    if record_fingerprints is None:
+        record_fingerprints = get_record_fingerprints(prov_bundle)
+
+    parts = [_encode_canonical_value(prov_bundle.identifier)]
+    parts.extend(_get_namespace_parts(prov_bundle))
+    parts.extend(sorted(record_fingerprints))
+
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def get_document_fingerprint(prov_document, bundle_fingerprints=None):
+    """
+    Returns a canonical hash of a document including all bundles
+
+    :param prov_document: The document
+    :type prov_document: prov.model.ProvDocument
+    :param bundle_fingerprints: The already calculated bundle fingerprints as dict {bundle_identifier: fingerprint}
+    :type bundle_fingerprints: dict
+    :return: The fingerprint as hex string
+    :rtype: str
+    """
+    if bundle_fingerprints is None:
+        bundle_fingerprints = {bundle.identifier: get_bundle_fingerprint(bundle) for bundle in prov_document.bundles}
+
+    parts = [get_bundle_fingerprint(prov_document)]
+    parts.extend(sorted("{}={}".format(_encode_canonical_value(identifier), fingerprint)
+                        for (identifier, fingerprint) in bundle_fingerprints.items()))
+
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def get_document_id(document_fingerprint):
+    """
+    Returns the document id for the content addressed mode, the same fingerprint always results in the same id
+
+    :param document_fingerprint: The fingerprint of the document, see get_document_fingerprint
+    :type document_fingerprint: str
+    :return: The document id as uuid string
+    :rtype: str
+    """
+    return str(uuid5(NAMESPACE_URL, "urn:sha1:" + document_fingerprint))
+
+
+def _get_namespace_parts(prov_bundle):
+    """
+    Returns the namespaces of the bundle as sorted list of strings, the prefixes are part of the stored data
+
+    :param prov_bundle: The bundle
+    :type prov_bundle: prov.model.ProvBundle
+    :return: list of strings
+    :rtype: list
+    """
+    parts = sorted("ns:{}={}".format(namespace.prefix, namespace.uri) for namespace in prov_bundle.namespaces)
+
+    default_namespace = prov_bundle.get_default_namespace()
+    if default_namespace is not None:
+        parts.append("default={}".format(default_namespace.uri))
+
+    return parts
+
+
+def _encode_canonical_value(value):
+    """
+    Encode a value into a string, that also contains the type information of the value
+
+    :param value: The attribute value or key
+    :return: The value as string
+    :rtype: str
+    """
+    if value is None:
+        return "-"
+    elif isinstance(value, QualifiedName):
+        return "q:{}|{}".format(value, value.uri)
+    elif isinstance(value, Identifier):
+        return "i:{}".format(value.uri)
+    elif isinstance(value, Literal):
+        return "l:{}|{}|{}".format(value.value, value.datatype, value.langtag)
+    elif isinstance(value, datetime):
+        return "d:{}".format(value.isoformat())
+    return "{}:{}".format(type(value).__name__, value)
+
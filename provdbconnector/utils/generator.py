@@ -0,0 +1,408 @@
+"""
+Seeded generator of synthetic PROV documents for load and scale tests.
+
+The generator creates entities, activities and agents, relations between them with a configurable type mix and
+degree distribution, bundles, mentionOf links between the bundles and attributes with a payload of a given size.
+The same settings and seed always produce the same document.
+
+.. code:: python
+
+    generator = WorkloadGenerator(entities=10000, activities=2000, agents=50, bundles=4, mentions=10, seed=1)
+
+    # in memory
+    prov_api.save_document(generator.generate_document())
+
+    # streamed in documents of at most 1000 records
+    for prov_document in generator.iter_documents(chunk_size=1000):
+        prov_api.save_document(prov_document)
+
+    # streamed into a PROV-N file
+    with open("workload.provn", "w") as stream:
+        generator.write_provn(stream)
+
+"""
+import random
+import string
+from itertools import accumulate
+
+from prov.constants import PROV_ENTITY, PROV_ACTIVITY, PROV_AGENT, PROV_GENERATION, PROV_USAGE, PROV_COMMUNICATION, \
+    PROV_DERIVATION, PROV_ATTRIBUTION, PROV_ASSOCIATION, PROV_DELEGATION
+from prov.model import ProvDocument
+
+from provdbconnector.exceptions.provapi import InvalidArgumentTypeException
+
+DEFAULT_NAMESPACE = ("ex", "http://example.com/")
+
+# The method of the ProvBundle and the prefix of the identifiers for each element type
+ELEMENT_TYPES = {
+    PROV_ENTITY: ("entity", "entity"),
+    PROV_ACTIVITY: ("activity", "activity"),
+    PROV_AGENT: ("agent", "agent"),
+}
+
+# The method of the ProvBundle and the element types of the start and the end node for each relation type
+RELATION_TYPES = {
+    PROV_GENERATION: ("wasGeneratedBy", PROV_ENTITY, PROV_ACTIVITY),
+    PROV_USAGE: ("used", PROV_ACTIVITY, PROV_ENTITY),
+    PROV_COMMUNICATION: ("wasInformedBy", PROV_ACTIVITY, PROV_ACTIVITY),
+    PROV_DERIVATION: ("wasDerivedFrom", PROV_ENTITY, PROV_ENTITY),
+    PROV_ATTRIBUTION: ("wasAttributedTo", PROV_ENTITY, PROV_AGENT),
+    PROV_ASSOCIATION: ("wasAssociatedWith", PROV_ACTIVITY, PROV_AGENT),
+    PROV_DELEGATION: ("actedOnBehalfOf", PROV_AGENT, PROV_AGENT),
+}
+
+# The relative frequency of the relation types
+DEFAULT_RELATION_MIX = {
+    PROV_GENERATION: 0.25,
+    PROV_USAGE: 0.25,
+    PROV_COMMUNICATION: 0.05,
+    PROV_DERIVATION: 0.25,
+    PROV_ATTRIBUTION: 0.1,
+    PROV_ASSOCIATION: 0.08,
+    PROV_DELEGATION: 0.02,
+}
+
+_SPEC_ELEMENT = "element"
+_SPEC_RELATION = "relation"
+_SPEC_MENTION = "mention"
+
+_PAYLOAD_CHARACTERS = string.ascii_letters + string.digits
+
+
+class WorkloadGenerator(object):
+    """
+    Generates a deterministic synthetic PROV document.
+
+    The elements and the relations are distributed round robin over the document and the bundles, the relations only
+    connect elements of the same bundle. The end nodes of the relations are drawn with a zipf distribution: with
+    `degree_skew` 0 all elements have the same expected degree, with 1 or more the first elements of each type become
+    hub nodes with a large degree. The mentionOf links are saved in the bundles from the second bundle on and refer to
+    an entity of the previous bundle.
+
+    """
+
+    def __init__(self, entities=1000, activities=200, agents=20, relations=None, relation_mix=None, degree_skew=0.0,
+                 bundles=0, mentions=0, attributes=1, attribute_size=16, seed=0, namespace=DEFAULT_NAMESPACE):
+        """
+        :param entities: The number of entities
+        :type entities: int
+        :param activities: The number of activities
+        :type activities: int
+        :param agents: The number of agents
+        :type agents: int
+        :param relations: The number of relations, by default the number of elements
+        :type relations: int
+        :param relation_mix: The relative frequency by relation type, by default DEFAULT_RELATION_MIX
+        :type relation_mix: dict
+        :param degree_skew: The exponent of the zipf distribution of the relation end nodes
+        :type degree_skew: float
+        :param bundles: The number of bundles
+        :type bundles: int
+        :param mentions: The number of mentionOf links, requires at least 2 bundles
+        :type mentions: int
+        :param attributes: The number of payload attributes per element
+        :type attributes: int
+        :param attribute_size: The length of each payload attribute value
+        :type attribute_size: int
+        :param seed: The seed of the random generator
+        :type seed: int
+        :param namespace: The prefix and the uri of the namespace of the generated identifiers
+        :type namespace: tuple(str, str)
+        """
+        for (name, value) in (("entities", entities), ("activities", activities), ("agents", agents),
+                              ("bundles", bundles), ("mentions", mentions), ("attributes", attributes),
+                              ("attribute_size", attribute_size)):
+            _check_count(name, value)
+        if relations is None:
+            relations = entities + activities + agents
+        _check_count("relations", relations)
+        if relation_mix is None:
+            relation_mix = DEFAULT_RELATION_MIX
+        if not isinstance(relation_mix, dict) or len(relation_mix) == 0:
+            raise InvalidArgumentTypeException("The relation_mix should be a non empty dict but was {}".format(
+                relation_mix))
+        for (relation_type, weight) in relation_mix.items():
+            if relation_type not in RELATION_TYPES:
+                raise InvalidArgumentTypeException("Unsupported relation type {}, use any of {}".format(
+                    relation_type, list(RELATION_TYPES.keys())))
+            if not isinstance(weight, (int, float)) or weight < 0:
+                raise InvalidArgumentTypeException("The weight of {} must be a positive number".format(relation_type))
+        if not isinstance(degree_skew, (int, float)) or degree_skew < 0:
+            raise InvalidArgumentTypeException("The degree_skew must be a positive number, got {}".format(degree_skew))
+        if mentions > 0 and bundles < 2:
+            raise InvalidArgumentTypeException("The mentionOf links require at least 2 bundles")
+
+        self.counts = {PROV_ENTITY: entities, PROV_ACTIVITY: activities, PROV_AGENT: agents}
+        self.relations = relations
+        self.relation_mix = dict(relation_mix)
+        self.degree_skew = degree_skew
+        self.bundles = bundles
+        self.mentions = mentions
+        self.attributes = attributes
+        self.attribute_size = attribute_size
+        self.seed = seed
+        self.namespace = tuple(namespace)
+
+    def generate_document(self):
+        """
+        Returns the whole document
+
+        :rtype: prov.model.ProvDocument
+        """
+        prov_document = self._create_document()
+        bundles = dict()
+        for (partition, spec) in self._iter_specs():
+            if partition not in bundles:
+                bundles[partition] = self._get_bundle(prov_document, partition)
+            _apply_spec(bundles[partition], spec)
+        return prov_document
+
+    def iter_documents(self, chunk_size=1000):
+        """
+        Returns the document in parts of at most chunk_size records, each part is a document that contains a slice of
+        the records of the whole document. A bundle can be spread over several parts.
+        The relations of a part can refer to elements of the previous parts.
+
+        :param chunk_size: The max number of records per document
+        :type chunk_size: int
+        :return: Generator of documents
+        :rtype: generator
+        """
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            raise InvalidArgumentTypeException("The chunk_size must be at least 1, got {}".format(chunk_size))
+        prov_document = None
+        bundles = dict()
+        size = 0
+        for (partition, spec) in self._iter_specs():
+            if prov_document is None:
+                prov_document = self._create_document()
+                bundles = dict()
+            if partition not in bundles:
+                bundles[partition] = self._get_bundle(prov_document, partition)
+            _apply_spec(bundles[partition], spec)
+            size += 1
+            if size == chunk_size:
+                yield prov_document
+                prov_document = None
+                size = 0
+        if prov_document is not None:
+            yield prov_document
+
+    def write_provn(self, stream, chunk_size=1000):
+        """
+        Write the document as PROV-N into a text stream, only one part of chunk_size records is kept in memory
+
+        :param stream: The text stream
+        :param chunk_size: The number of records that are generated at once
+        :type chunk_size: int
+        """
+        (prefix, uri) = self.namespace
+        stream.write("document\n")
+        stream.write("  prefix {} <{}>\n".format(prefix, uri))
+        stream.write("  \n")
+        current_bundle = None
+        for prov_document in self.iter_documents(chunk_size):
+            for record in prov_document.get_records():
+                stream.write("  {}\n".format(record.get_provn()))
+            for bundle in prov_document.bundles:
+                if bundle.identifier != current_bundle:
+                    if current_bundle is not None:
+                        stream.write("  endBundle\n")
+                    stream.write("  bundle {}\n".format(bundle.identifier))
+                    current_bundle = bundle.identifier
+                for record in bundle.get_records():
+                    stream.write("    {}\n".format(record.get_provn()))
+        if current_bundle is not None:
+            stream.write("  endBundle\n")
+        stream.write("endDocument\n")
+
+    def write_json(self, stream):
+        """
+        Write the document as PROV-JSON into a stream, the whole document is generated in memory
+
+        :param stream: The text stream
+        """
+        self.generate_document().serialize(stream, format="json")
+
+    def _create_document(self):
+        """
+        Returns an empty document with the namespace
+
+        :rtype: prov.model.ProvDocument
+        """
+        prov_document = ProvDocument()
+        prov_document.add_namespace(*self.namespace)
+        return prov_document
+
+    def _get_bundle(self, prov_document, partition):
+        """
+        Returns the document for partition 0 and the bundle of the other partitions
+
+        :param prov_document: The document
+        :type prov_document: prov.model.ProvDocument
+        :param partition: The partition
+        :type partition: int
+        :rtype: prov.model.ProvBundle
+        """
+        if partition == 0:
+            return prov_document
+        return prov_document.bundle(self._get_identifier("bundle", partition - 1))
+
+    def _get_identifier(self, kind, index):
+        """
+        Returns the identifier of the index-th record of a kind
+
+        :param kind: The prefix of the local part
+        :type kind: str
+        :param index: The global index
+        :type index: int
+        :rtype: str
+        """
+        return "{}:{}{}".format(self.namespace[0], kind, index)
+
+    def _get_element_identifier(self, prov_type, partition, index):
+        """
+        Returns the identifier of the index-th element of a type in a partition
+
+        :param prov_type: The element type
+        :type prov_type: prov.identifier.QualifiedName
+        :param partition: The partition
+        :type partition: int
+        :param index: The index in the partition
+        :type index: int
+        :rtype: str
+        """
+        return self._get_identifier(ELEMENT_TYPES[prov_type][1], partition + index * (self.bundles + 1))
+
+    def _iter_specs(self):
+        """
+        Returns the specifications of all records partition by partition, with the elements first
+
+        :return: Generator of (partition, spec) tuples
+        :rtype: generator
+        """
+        rng = random.Random(self.seed)
+        partitions = self.bundles + 1
+        for partition in range(partitions):
+            # the number of elements of each type in this partition
+            counts = dict((prov_type, len(range(partition, count, partitions))) for (prov_type, count) in
+                          self.counts.items())
+            for prov_type in (PROV_ENTITY, PROV_ACTIVITY, PROV_AGENT):
+                for index in range(counts[prov_type]):
+                    identifier = self._get_element_identifier(prov_type, partition, index)
+                    yield partition, (_SPEC_ELEMENT, ELEMENT_TYPES[prov_type][0], identifier,
+                                      self._get_attributes(rng, identifier))
+
+            relation_types = [relation_type for relation_type in sorted(self.relation_mix.keys(), key=str) if
+                              self.relation_mix[relation_type] > 0 and
+                              _is_possible(RELATION_TYPES[relation_type], counts)]
+            if len(relation_types) > 0:
+                relation_weights = list(accumulate(self.relation_mix[relation_type] for relation_type in
+                                                   relation_types))
+                node_weights = dict((prov_type, list(accumulate(1.0 / (index + 1) ** self.degree_skew for index in
+                                                                range(count)))) for (prov_type, count) in
+                                    counts.items())
+                for _ in range(len(range(partition, self.relations, partitions))):
+                    relation_type = rng.choices(relation_types, cum_weights=relation_weights)[0]
+                    (method, from_type, to_type) = RELATION_TYPES[relation_type]
+                    from_index = self._choose_node(rng, node_weights[from_type])
+                    to_index = self._choose_node(rng, node_weights[to_type])
+                    if from_type is to_type and from_index == to_index:
+                        # no self loops, take the next node instead
+                        to_index = (to_index + 1) % counts[to_type]
+                    yield partition, (_SPEC_RELATION, method,
+                                      self._get_element_identifier(from_type, partition, from_index),
+                                      self._get_element_identifier(to_type, partition, to_index))
+
+            if partition >= 2:
+                for mention_index in range(partition - 2, self.mentions, self.bundles - 1):
+                    general_partition = partition - 1
+                    general_count = len(range(general_partition, self.counts[PROV_ENTITY], partitions))
+                    if general_count == 0:
+                        continue
+                    general = self._get_element_identifier(PROV_ENTITY, general_partition,
+                                                           rng.randrange(general_count))
+                    specific = self._get_identifier("mention", mention_index)
+                    yield partition, (_SPEC_ELEMENT, ELEMENT_TYPES[PROV_ENTITY][0], specific, dict())
+                    yield partition, (_SPEC_MENTION, specific, general,
+                                      self._get_identifier("bundle", general_partition - 1))
+
+    @staticmethod
+    def _choose_node(rng, cum_weights):
+        """
+        Returns the index of a node drawn with the cumulative weights
+
+        :param rng: The random generator
+        :type rng: random.Random
+        :param cum_weights: The cumulative weights of the nodes
+        :type cum_weights: list(float)
+        :rtype: int
+        """
+        return rng.choices(range(len(cum_weights)), cum_weights=cum_weights)[0]
+
+    def _get_attributes(self, rng, identifier):
+        """
+        Returns the attributes of an element
+
+        :param rng: The random generator
+        :type rng: random.Random
+        :param identifier: The identifier of the element
+        :type identifier: str
+        :rtype: dict
+        """
+        prefix = self.namespace[0]
+        attributes = {"{}:name".format(prefix): identifier.split(":", 1)[1]}
+        for index in range(self.attributes):
+            attributes["{}:payload{}".format(prefix, index)] = "".join(
+                rng.choices(_PAYLOAD_CHARACTERS, k=self.attribute_size))
+        return attributes
+
+
+def _check_count(name, value):
+    """
+    Check that the value is a positive int
+
+    :param name: The name of the setting
+    :type name: str
+    :param value: The value
+    :raise InvalidArgumentTypeException:
+    """
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        raise InvalidArgumentTypeException("The {} must be a positive int, got {}".format(name, value))
+
+
+def _is_possible(relation, counts):
+    """
+    Check that a partition has the elements for a relation type
+
+    :param relation: The entry of RELATION_TYPES
+    :type relation: tuple
+    :param counts: The number of elements by type in the partition
+    :type counts: dict
+    :rtype: bool
+    """
+    (method, from_type, to_type) = relation
+    if from_type is to_type:
+        return counts[from_type] >= 2
+    return counts[from_type] > 0 and counts[to_type] > 0
+
+
+def _apply_spec(prov_bundle, spec):
+    """
+    Add the record of a specification to the bundle
+
+    :param prov_bundle: The document or bundle
+    :type prov_bundle: prov.model.ProvBundle
+    :param spec: The specification
+    :type spec: tuple
+    """
+    kind = spec[0]
+    if kind == _SPEC_ELEMENT:
+        (kind, method, identifier, attributes) = spec
+        getattr(prov_bundle, method)(identifier, other_attributes=attributes)
+    elif kind == _SPEC_RELATION:
+        (kind, method, from_identifier, to_identifier) = spec
+        getattr(prov_bundle, method)(from_identifier, to_identifier)
+    else:
+        (kind, specific, general, bundle) = spec
+        prov_bundle.mentionOf(specific, general, bundle)
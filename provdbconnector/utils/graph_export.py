@@ -0,0 +1,153 @@
+import json
+from collections import namedtuple
+
+from prov.constants import PROV_TYPE
+from prov.model import PROV_REC_CLS
+
+from provdbconnector.db_adapters.baseadapter import DbRelation, METADATA_KEY_IDENTIFIER, \
+    METADATA_KEY_IDENTIFIER_ORIGINAL, METADATA_KEY_NAMESPACES, METADATA_KEY_PROV_TYPE
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+GraphArrays = namedtuple("GraphArrays",
+                         "identifiers, node_types, node_type_names, indptr, indices, edge_types, edge_type_names")
+"""
+The graph in the compressed sparse row (CSR) format:
+
+- identifiers: The node identifiers, the position is the node index
+- node_types: Array with the type code of each node, the code is the position in node_type_names
+- indptr: The outgoing edges of node ``n`` are at the positions ``indptr[n]:indptr[n + 1]``
+- indices: The end node index of each edge
+- edge_types: Array with the type code of each edge, the code is the position in edge_type_names
+"""
+
+# The formal attributes for the start and end node of each relation type
+RELATION_ENDPOINTS = {str(prov_type): (str(record_cls.FORMAL_ATTRIBUTES[0]), str(record_cls.FORMAL_ATTRIBUTES[1])) for
+                      (prov_type, record_cls) in PROV_REC_CLS.items() if len(record_cls.FORMAL_ATTRIBUTES) >= 2}
+
+BUNDLE_ASSOCIATION_TYPE = "prov:bundleAssociation"
+
+
+def export_graph_arrays(records):
+    """
+    Convert the records of an adapter into numpy arrays.
+    The edges point from the first to the second formal attribute of the relation (for example from the generated to
+    the used entity of a derivation), the internal bundle associations and edges to unknown nodes are skipped.
+
+    The arrays can be used directly with scipy:
+
+    .. code:: python
+
+        graph = export_graph_arrays(records)
+        matrix = scipy.sparse.csr_matrix((numpy.ones(len(graph.indices)), graph.indices, graph.indptr))
+
+    :param records: The records as returned by the adapter, see :py:meth:`BaseAdapter.get_records_by_filter`
+    :type records: list(DbRecord or DbRelation)
+    :return: The graph arrays
+    :rtype: GraphArrays
+    """
+    if numpy is None:
+        raise ImportError("The graph export requires numpy, install prov-db-connector[numpy]")
+
+    node_indexes = dict()
+    original_indexes = dict()
+    node_type_codes = dict()
+    node_types = list()
+    relations = list()
+
+    for record in records:
+        if isinstance(record, DbRelation):
+            relations.append(record)
+            continue
+
+        identifier = str(record.metadata[METADATA_KEY_IDENTIFIER])
+        if identifier in node_indexes:
+            continue
+        node_indexes[identifier] = len(node_types)
+        original_identifier = record.metadata.get(METADATA_KEY_IDENTIFIER_ORIGINAL)
+        if original_identifier is not None:
+            original_indexes.setdefault(str(original_identifier), node_indexes[identifier])
+        node_types.append(node_type_codes.setdefault(str(record.metadata[METADATA_KEY_PROV_TYPE]),
+                                                     len(node_type_codes)))
+
+    edge_type_codes = dict()
+    sources = list()
+    targets = list()
+    edge_types = list()
+    for relation in relations:
+        prov_type = str(relation.metadata[METADATA_KEY_PROV_TYPE])
+        endpoints = RELATION_ENDPOINTS.get(prov_type)
+        if endpoints is None or str(relation.attributes.get(str(PROV_TYPE))) == BUNDLE_ASSOCIATION_TYPE:
+            continue
+
+        namespaces = _get_namespaces(relation.metadata)
+        (source, target) = [_get_node_index(relation.attributes.get(key), namespaces, node_indexes, original_indexes)
+                            for key in endpoints]
+        if source is None or target is None:
+            continue
+
+        sources.append(source)
+        targets.append(target)
+        edge_types.append(edge_type_codes.setdefault(prov_type, len(edge_type_codes)))
+
+    sources = numpy.asarray(sources, dtype=numpy.int64)
+    order = numpy.argsort(sources, kind="stable")
+    indptr = numpy.zeros(len(node_types) + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(sources, minlength=len(node_types)), out=indptr[1:])
+
+    return GraphArrays(identifiers=list(node_indexes.keys()),
+                       node_types=numpy.asarray(node_types, dtype=numpy.int32),
+                       node_type_names=list(node_type_codes.keys()),
+                       indptr=indptr,
+                       indices=numpy.asarray(targets, dtype=numpy.int64)[order],
+                       edge_types=numpy.asarray(edge_types, dtype=numpy.int32)[order],
+                       edge_type_names=list(edge_type_codes.keys()))
+
+
+def _get_namespaces(metadata):
+    """
+    Returns the namespaces of a record as dict with the structure `(prefix, uri)`
+
+    :param metadata: The encoded metadata of the record
+    :type metadata: dict
+    :rtype: dict
+    """
+    namespaces = metadata.get(METADATA_KEY_NAMESPACES, dict())
+    if isinstance(namespaces, str):
+        namespaces = json.loads(namespaces)
+    return namespaces
+
+
+def _get_node_index(value, namespaces, node_indexes, original_indexes):
+    """
+    Returns the node index for the value of a formal attribute, the qualified name is expanded with the namespaces of
+    the relation to match the stored identifier
+
+    :param value: The formal attribute value, for example "ex:entity"
+    :type value: str
+    :param namespaces: The namespaces of the relation
+    :type namespaces: dict
+    :param node_indexes: The node indexes by identifier
+    :type node_indexes: dict
+    :param original_indexes: The node indexes by the original identifier
+    :type original_indexes: dict
+    :return: The node index or None
+    :rtype: int
+    """
+    if value is None:
+        return None
+    value = str(value)
+
+    (prefix, separator, local_part) = value.partition(":")
+    if separator and prefix in namespaces:
+        node_index = node_indexes.get(namespaces[prefix] + local_part)
+        if node_index is not None:
+            return node_index
+
+    node_index = node_indexes.get(value)
+    if node_index is not None:
+        return node_index
+    return original_indexes.get(value)
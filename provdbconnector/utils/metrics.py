@@ -0,0 +1,373 @@
+"""
+Latency and throughput metrics of :py:class:`provdbconnector.prov_db.ProvDb` and the database adapters.
+
+The metrics are enabled with a sink, the public methods of the ProvDb instance and of its adapter are then wrapped to
+record the calls, the latency, the records and bytes per call and the merge conflicts. Without a sink nothing is
+wrapped, so the disabled metrics don't cost anything.
+
+.. code:: python
+
+    registry = MetricsRegistry()
+    prov_api = ProvDb(adapter=SimpleInMemoryAdapter, metrics=registry)
+    prov_api.save_document(doc)
+
+    stats = registry.get_stats("adapter.save_bulk")
+    text = registry.to_prometheus_text()
+
+"""
+import functools
+import threading
+from collections import namedtuple
+from time import perf_counter
+
+from prov.model import ProvBundle, ProvRecord
+
+from provdbconnector.db_adapters.baseadapter import DbPage, DbBulkResult
+from provdbconnector.exceptions.database import MergeException
+from provdbconnector.exceptions.provapi import InvalidArgumentTypeException
+
+# Upper bounds of the latency histogram buckets in seconds
+DEFAULT_LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+# Counters besides the calls
+COUNTER_MERGE_CONFLICTS = "merge_conflicts"
+COUNTER_CACHE_HITS = "cache_hits"
+COUNTER_CACHE_MISSES = "cache_misses"
+
+# The prefixes of the operation names
+OPERATION_PREFIX_PROV_DB = "prov_db."
+OPERATION_PREFIX_ADAPTER = "adapter."
+
+PROMETHEUS_NAMESPACE = "provdb"
+
+# Statistics of one operation, the bucket counts are cumulative like in prometheus
+CallStats = namedtuple("CallStats", "calls, errors, latency_sum, latency_buckets, records, bytes")
+
+
+class MetricsSink(object):
+    """
+    Interface of the metrics receivers
+
+    """
+
+    def observe_call(self, operation, seconds, records, size, error):
+        """
+        Record one call of an operation
+
+        :param operation: The name of the operation, for example "adapter.save_element"
+        :type operation: str
+        :param seconds: The latency of the call
+        :type seconds: float
+        :param records: The number of records in the arguments and the result of the call
+        :type records: int
+        :param size: The bytes of the string arguments and results
+        :type size: int
+        :param error: True if the call raised an exception
+        :type error: bool
+        """
+        raise NotImplementedError("Abstract method")
+
+    def increment(self, counter, operation, value=1):
+        """
+        Increment a counter, for example COUNTER_MERGE_CONFLICTS
+
+        :param counter: The name of the counter
+        :type counter: str
+        :param operation: The name of the operation
+        :type operation: str
+        :param value: The increment
+        :type value: int
+        """
+        raise NotImplementedError("Abstract method")
+
+
+class MetricsRegistry(MetricsSink):
+    """
+    In process sink, keeps the statistics of all operations
+
+    """
+
+    def __init__(self, latency_buckets=DEFAULT_LATENCY_BUCKETS):
+        """
+        :param latency_buckets: The sorted upper bounds of the latency histogram in seconds
+        :type latency_buckets: tuple(float)
+        """
+        self.latency_buckets = tuple(latency_buckets)
+        self._lock = threading.Lock()
+        self._calls = dict()
+        """
+        The statistics by operation as list [calls, errors, latency sum, bucket counts, records, bytes]
+        """
+        self._counters = dict()
+
+    def observe_call(self, operation, seconds, records, size, error):
+        with self._lock:
+            stats = self._calls.get(operation)
+            if stats is None:
+                stats = [0, 0, 0.0, [0] * len(self.latency_buckets), 0, 0]
+                self._calls[operation] = stats
+            stats[0] += 1
+            if error:
+                stats[1] += 1
+            stats[2] += seconds
+            for (index, bound) in enumerate(self.latency_buckets):
+                if seconds <= bound:
+                    stats[3][index] += 1
+                    break
+            stats[4] += records
+            stats[5] += size
+
+    def increment(self, counter, operation, value=1):
+        with self._lock:
+            key = (counter, operation)
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def get_operations(self):
+        """
+        Returns the names of the recorded operations
+
+        :rtype: list(str)
+        """
+        with self._lock:
+            return sorted(self._calls.keys())
+
+    def get_stats(self, operation):
+        """
+        Returns the statistics of an operation
+
+        :param operation: The name of the operation
+        :type operation: str
+        :return: The statistics, all zero if the operation was never called
+        :rtype: CallStats
+        """
+        with self._lock:
+            stats = self._calls.get(operation)
+            if stats is None:
+                return CallStats(0, 0, 0.0, tuple(0 for bound in self.latency_buckets), 0, 0)
+            cumulative = list()
+            total = 0
+            for count in stats[3]:
+                total += count
+                cumulative.append(total)
+            return CallStats(stats[0], stats[1], stats[2], tuple(cumulative), stats[4], stats[5])
+
+    def get_counter(self, counter, operation=None):
+        """
+        Returns the value of a counter
+
+        :param counter: The name of the counter
+        :type counter: str
+        :param operation: The name of the operation, None for the sum of all operations
+        :type operation: str
+        :rtype: int
+        """
+        with self._lock:
+            if operation is not None:
+                return self._counters.get((counter, operation), 0)
+            return sum(value for ((name, other), value) in self._counters.items() if name == counter)
+
+    def reset(self):
+        """
+        Remove all statistics
+
+        """
+        with self._lock:
+            self._calls = dict()
+            self._counters = dict()
+
+    def to_prometheus_text(self):
+        """
+        Returns the statistics in the prometheus text exposition format
+
+        :rtype: str
+        """
+        lines = list()
+
+        def add_family(name, metric_type, samples):
+            lines.append("# TYPE {}_{} {}".format(PROMETHEUS_NAMESPACE, name, metric_type))
+            for (suffix, labels, value) in samples:
+                label_text = ",".join('{}="{}"'.format(key, _escape_label(label)) for (key, label) in labels)
+                lines.append("{}_{}{}{{{}}} {}".format(PROMETHEUS_NAMESPACE, name, suffix, label_text, value))
+
+        operations = self.get_operations()
+        all_stats = [(operation, self.get_stats(operation)) for operation in operations]
+        add_family("calls_total", "counter",
+                   [("", [("operation", operation)], stats.calls) for (operation, stats) in all_stats])
+        add_family("errors_total", "counter",
+                   [("", [("operation", operation)], stats.errors) for (operation, stats) in all_stats])
+        add_family("records_total", "counter",
+                   [("", [("operation", operation)], stats.records) for (operation, stats) in all_stats])
+        add_family("bytes_total", "counter",
+                   [("", [("operation", operation)], stats.bytes) for (operation, stats) in all_stats])
+
+        samples = list()
+        for (operation, stats) in all_stats:
+            for (bound, count) in zip(self.latency_buckets, stats.latency_buckets):
+                samples.append(("_bucket", [("operation", operation), ("le", repr(float(bound)))], count))
+            samples.append(("_bucket", [("operation", operation), ("le", "+Inf")], stats.calls))
+            samples.append(("_sum", [("operation", operation)], repr(stats.latency_sum)))
+            samples.append(("_count", [("operation", operation)], stats.calls))
+        add_family("latency_seconds", "histogram", samples)
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+        for counter in sorted(set(name for ((name, operation), value) in counters)):
+            add_family(counter + "_total", "counter", [("", [("operation", operation)], value) for
+                                                       ((name, operation), value) in counters if name == counter])
+        return "\n".join(lines) + "\n"
+
+
+class StatsdSink(MetricsSink):
+    """
+    Sink that reports each call to a statsd style callback `callback(name, value, metric_type)`, with the metric
+    types "c" (counter) and "ms" (timer)
+
+    .. code:: python
+
+        client = statsd.StatsClient()
+        sink = StatsdSink(lambda name, value, metric_type: client.incr(name, value) if metric_type == "c" else
+                          client.timing(name, value))
+
+    """
+
+    def __init__(self, callback, prefix=PROMETHEUS_NAMESPACE):
+        """
+        :param callback: The function that sends a metric
+        :type callback: function
+        :param prefix: The prefix of the metric names
+        :type prefix: str
+        """
+        self.callback = callback
+        self.prefix = prefix
+
+    def observe_call(self, operation, seconds, records, size, error):
+        name = "{}.{}".format(self.prefix, operation)
+        self.callback(name + ".calls", 1, "c")
+        self.callback(name + ".latency", seconds * 1000.0, "ms")
+        if records > 0:
+            self.callback(name + ".records", records, "c")
+        if size > 0:
+            self.callback(name + ".bytes", size, "c")
+        if error:
+            self.callback(name + ".errors", 1, "c")
+
+    def increment(self, counter, operation, value=1):
+        self.callback("{}.{}.{}".format(self.prefix, operation, counter), value, "c")
+
+
+def _escape_label(value):
+    """
+    Escape a label value of the prometheus text format
+
+    :param value: The label value
+    :type value: str
+    :rtype: str
+    """
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def get_record_count(value):
+    """
+    Returns the number of records of an argument or a result: the length of a list, the records of a page, the ids of
+    a bulk result or the records of a prov document or bundle
+
+    :param value: The argument or result of a call
+    :return: The number of records, 0 for other values
+    :rtype: int
+    """
+    if isinstance(value, ProvRecord):
+        return 1
+    if isinstance(value, list):
+        return len(value)
+    if isinstance(value, DbPage):
+        return len(value.records)
+    if isinstance(value, DbBulkResult):
+        return len(value.element_ids) + len(value.relation_ids)
+    if isinstance(value, ProvBundle):
+        return len(value.records)
+    # a page of the ProvDb
+    document = getattr(value, "document", None)
+    if isinstance(document, ProvBundle):
+        return len(document.records)
+    return 0
+
+
+def get_size(values):
+    """
+    Returns the bytes of the strings and bytes in the values, for example the serialized documents
+
+    :param values: The arguments and the result of a call
+    :type values: iterable
+    :rtype: int
+    """
+    size = 0
+    for value in values:
+        if isinstance(value, (bytes, bytearray)):
+            size += len(value)
+        elif isinstance(value, str):
+            size += len(value.encode("utf-8"))
+    return size
+
+
+def get_public_methods(cls):
+    """
+    Returns the names of the public methods of a class
+
+    :param cls: The class
+    :type cls: type
+    :rtype: list(str)
+    """
+    return sorted(name for name in dir(cls) if not name.startswith("_") and callable(getattr(cls, name)))
+
+
+def instrument(instance, sink, operation_prefix, method_names):
+    """
+    Replace the methods of the instance with wrappers that report each call to the sink.
+    Only the instance is changed, other instances of the class are not instrumented.
+
+    :param instance: The ProvDb or adapter instance
+    :param sink: The metrics sink
+    :type sink: MetricsSink
+    :param operation_prefix: The prefix of the operation names, for example OPERATION_PREFIX_ADAPTER
+    :type operation_prefix: str
+    :param method_names: The names of the methods to instrument
+    :type method_names: list(str)
+    """
+    if not isinstance(sink, MetricsSink):
+        raise InvalidArgumentTypeException("The sink should be a {} but was {}".format(MetricsSink, type(sink)))
+    for name in method_names:
+        setattr(instance, name, _wrap_method(getattr(instance, name), sink, operation_prefix + name))
+
+
+def _wrap_method(method, sink, operation):
+    """
+    Returns the wrapper of a bound method that measures the calls
+
+    :param method: The bound method
+    :type method: function
+    :param sink: The metrics sink
+    :type sink: MetricsSink
+    :param operation: The name of the operation
+    :type operation: str
+    :rtype: function
+    """
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        result = None
+        error = True
+        try:
+            result = method(*args, **kwargs)
+            error = False
+            return result
+        except MergeException:
+            sink.increment(COUNTER_MERGE_CONFLICTS, operation)
+            raise
+        finally:
+            seconds = perf_counter() - start
+            values = args + tuple(kwargs.values()) + (result,)
+            sink.observe_call(operation, seconds, sum(get_record_count(value) for value in values), get_size(values),
+                              error)
+
+    return wrapper
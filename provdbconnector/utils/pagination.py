@@ -0,0 +1,63 @@
+"""
+Opaque cursors for the paged queries of :py:class:`provdbconnector.prov_db.ProvDb`.
+A cursor contains the identifier of the last node of a page, the next page starts after this identifier
+(keyset pagination), so the cost of a page doesn't depend on the number of previous pages.
+
+"""
+import base64
+import binascii
+import json
+
+from provdbconnector.exceptions.provapi import InvalidArgumentTypeException
+
+DEFAULT_PAGE_SIZE = 1000
+
+CURSOR_KEY_AFTER = "after"
+
+
+def encode_cursor(last_identifier):
+    """
+    Returns the cursor for the page after the identifier
+
+    :param last_identifier: The identifier of the last node of a page or None if it was the last page
+    :type last_identifier: str
+    :return: The cursor as url safe string or None
+    :rtype: str
+    """
+    if last_identifier is None:
+        return None
+    content = json.dumps({CURSOR_KEY_AFTER: str(last_identifier)}).encode("utf-8")
+    return base64.urlsafe_b64encode(content).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """
+    Returns the identifier of the last node of the previous page
+
+    :param cursor: The cursor of the previous page, None for the first page
+    :type cursor: str
+    :return: The identifier or None
+    :rtype: str
+    :raise InvalidArgumentTypeException: If the cursor is not a cursor of encode_cursor
+    """
+    if cursor is None:
+        return None
+    if not isinstance(cursor, str):
+        raise InvalidArgumentTypeException("The cursor must be a str, got {}".format(type(cursor)))
+    try:
+        content = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+        return str(content[CURSOR_KEY_AFTER])
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError) as e:
+        raise InvalidArgumentTypeException("Invalid cursor {}: {}".format(cursor, e))
+
+
+def check_page_size(limit):
+    """
+    Check that the page size is a positive int
+
+    :param limit: The max number of nodes in a page
+    :type limit: int
+    :raise InvalidArgumentTypeException:
+    """
+    if not isinstance(limit, int) or isinstance(limit, bool) or limit <= 0:
+        raise InvalidArgumentTypeException("The limit must be a positive int, got {}".format(limit))
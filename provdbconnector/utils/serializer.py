@@ -1,9 +1,12 @@
+import copyreg
+import hashlib
 import json
 import logging
+import pickle
 import sys
 from collections import namedtuple
 from datetime import datetime
-from io import StringIO
+from io import StringIO, BytesIO
 
 import six
 from prov.constants import PROV_QUALIFIEDNAME, PROV_ATTRIBUTES_ID_MAP, PROV_ATTRIBUTES, PROV_MEMBERSHIP, \
@@ -16,7 +19,7 @@ from prov.constants import PROV_QUALIFIEDNAME, PROV_ATTRIBUTES_ID_MAP, PROV_ATTR
 from prov.model import Literal, Identifier, QualifiedName, Namespace, parse_xsd_datetime, PROV_REC_CLS, ProvAgent, \
     ProvEntity, ProvActivity, ProvElement
 from provdbconnector.db_adapters.baseadapter import METADATA_KEY_NAMESPACES, METADATA_KEY_PROV_TYPE, \
-    METADATA_KEY_TYPE_MAP
+    METADATA_KEY_TYPE_MAP, PROJECTION_METADATA_KEYS
 from provdbconnector.exceptions.database import MergeException
 from provdbconnector.exceptions.provapi import InvalidArgumentTypeException
 from provdbconnector.exceptions.utils import SerializerException
@@ -66,6 +69,11 @@ PROV_ATTR_BASE_CLS = {
     PROV_ATTR_COLLECTION: ProvEntity
 }
 
+# Formal attribute names per prov type, precomputed for the split_into_formal_and_other_attributes function
+FORMAL_ATTRIBUTE_KEYS = {prov_type: frozenset(record_cls.FORMAL_ATTRIBUTES) for (prov_type, record_cls) in
+                         PROV_REC_CLS.items()}
+
+
 def encode_dict_values_to_primitive(dict_values):
     """
     This function transforms a dict with all kind of types into a dict with only
@@ -88,6 +96,63 @@ def encode_dict_values_to_primitive(dict_values):
     return new_dict_values
 
 
+def get_projection(fields):
+    """
+    Returns the attribute keys of a projection as text
+
+    :param fields: The attribute keys or None for all attributes
+    :type fields: list(str or prov.model.QualifiedName)
+    :return: The keys or None
+    :rtype: frozenset
+    """
+    if fields is None:
+        return None
+    return frozenset(str(field) for field in fields)
+
+
+def encode_projected_dict_values_to_primitive(dict_values, keys):
+    """
+    Like :py:func:`encode_dict_values_to_primitive` but only for the keys, the other values are not encoded
+
+    :param dict_values: The attributes or metadata
+    :type dict_values: dict
+    :param keys: The keys as text or None for all keys
+    :type keys: frozenset
+    :return: The projected dict with primitive values
+    :rtype: dict
+    """
+    if keys is None:
+        return encode_dict_values_to_primitive(dict_values)
+
+    new_dict_values = dict()
+    for key, value in dict_values.items():
+        key_simple = str(key)
+        if key_simple in keys:
+            new_dict_values[key_simple] = encode_string_value_to_primitive(value)
+    return new_dict_values
+
+
+def encode_projected_record(record_cls, attributes, metadata, projection):
+    """
+    Returns the record with the projected attributes and the metadata of PROJECTION_METADATA_KEYS
+
+    :param record_cls: DbRecord or DbRelation
+    :type record_cls: type
+    :param attributes: The attributes
+    :type attributes: dict
+    :param metadata: The metadata
+    :type metadata: dict
+    :param projection: The attribute keys, see get_projection, or None for the whole record
+    :type projection: frozenset
+    :return: The encoded record
+    :rtype: DbRecord or DbRelation
+    """
+    if projection is None:
+        return record_cls(encode_dict_values_to_primitive(attributes), encode_dict_values_to_primitive(metadata))
+    return record_cls(encode_projected_dict_values_to_primitive(attributes, projection),
+                      encode_projected_dict_values_to_primitive(metadata, PROJECTION_METADATA_KEYS))
+
+
 def encode_string_value_to_primitive(value):
     """
     Convert a value into one of the following types:
@@ -344,22 +409,92 @@ def split_into_formal_and_other_attributes(attributes, metadata):
     :return: namedtuple(formal_attributes, other_attributes)
     :rtype: FormalAndOtherAttributes
     """
-    prov_type = metadata[METADATA_KEY_PROV_TYPE]
-
-    if str(prov_type) == "prov:Unknown":
-        formal_qualified_names = set()
-    else:
-        class_type = PROV_REC_CLS[prov_type]
-        formal_qualified_names = class_type.FORMAL_ATTRIBUTES
+    formal_qualified_names = get_formal_attribute_keys(metadata[METADATA_KEY_PROV_TYPE])
 
-    formal_attributes = {key: attributes[key] for key in attributes.keys() if key in formal_qualified_names}
-    other_attributes = {key: attributes[key] for key in attributes.keys() if key not in formal_qualified_names}
+    formal_attributes = dict()
+    other_attributes = dict()
+    for key, value in attributes.items():
+        if key in formal_qualified_names:
+            formal_attributes[key] = value
+        else:
+            other_attributes[key] = value
 
     return FormalAndOtherAttributes(formal_attributes, other_attributes)
 
+
+def get_formal_attribute_keys(prov_type):
+    """
+    Returns the precomputed set of formal attribute names for a prov type
+
+    :param prov_type: The prov type like prov:Usage
+    :type prov_type: prov.model.QualifiedName
+    :return: The formal attribute names, empty for the prov:Unknown type
+    :rtype: frozenset
+    """
+    try:
+        return FORMAL_ATTRIBUTE_KEYS[prov_type]
+    except KeyError:
+        if str(prov_type) != "prov:Unknown":
+            raise
+        return frozenset()
+
+
+def get_formal_attributes_key(formal_attributes):
+    """
+    Returns a hashable representation of the formal attributes, to compare relations without splitting them again
+
+    :param formal_attributes: The formal attributes, see split_into_formal_and_other_attributes
+    :type formal_attributes: dict
+    :return: The formal attributes as hashable key
+    :rtype: frozenset
+    """
+    try:
+        return frozenset(formal_attributes.items())
+    except TypeError:
+        # Some value is not hashable (like a list), fall back to the representation of the values
+        return frozenset((key, repr(value)) for (key, value) in formal_attributes.items())
+
+
+def get_relation_merge_key(from_node, to_node, attributes, metadata):
+    """
+    Returns a stable text key that identifies a relation for the merge, to store it in a database index.
+    Two relations are the same if they have the same start and end node, the same prov type and the same formal
+    attributes, qualified names are compared by the uri
+
+    :param from_node: The identifier for the start node
+    :type from_node: str
+    :param to_node: The identifier for the end node
+    :type to_node: str
+    :param attributes: The actual provenance data
+    :type attributes: dict
+    :param metadata: Some metadata that are not PROV-O related
+    :type metadata: dict
+    :return: The merge key as sha1 hex digest
+    :rtype: str
+    """
+    formal_attributes = split_into_formal_and_other_attributes(attributes, metadata).formal
+    formal_values = sorted([str(key), _encode_merge_key_value(value)] for (key, value) in formal_attributes.items())
+    key = [str(from_node), str(to_node), _encode_merge_key_value(metadata.get(METADATA_KEY_PROV_TYPE)), formal_values]
+    return hashlib.sha1(json.dumps(key).encode("utf-8")).hexdigest()
+
+
+def _encode_merge_key_value(value):
+    """
+    Returns the text of a value in the relation merge key
+
+    :param value: The attribute or metadata value
+    :return: The uri of an identifier or the primitive value as json
+    :rtype: str
+    """
+    if isinstance(value, Identifier):
+        return value.uri
+    return json.dumps(encode_string_value_to_primitive(value), sort_keys=True, default=str)
+
+
 def merge_record(attributes, metadata, other_attributes, other_metadata):
     """
-    Merge 2 records into one
+    Merge 2 records into one.
+    The original dicts are never modified, if the other record adds nothing new they are returned unchanged.
 
     :param attributes: The original attributes
     :param metadata: The original metadata
@@ -368,9 +503,6 @@ def merge_record(attributes, metadata, other_attributes, other_metadata):
     :return: tuple(attributes, metadata)
     :rtype: Tuple(attributes,metadata)
     """
-    attributes_merged = attributes.copy()
-    attributes_merged.update(other_attributes)
-
     metadata_prov_typ = metadata[METADATA_KEY_PROV_TYPE]
     other_metadata_prov_typ = other_metadata[METADATA_KEY_PROV_TYPE]
 
@@ -393,29 +525,191 @@ def merge_record(attributes, metadata, other_attributes, other_metadata):
         raise MergeException(
             "Prov type should be the same but is: {}:{}".format(metadata_prov_typ, other_metadata_prov_typ))
 
-    for (key, value) in attributes.items():
-        if attributes_merged[key] != value:
+    # Fast path: the same record is saved again (for example the start and end nodes of each relation)
+    if attributes == other_attributes and metadata == other_metadata:
+        return attributes, metadata
+
+    # Only the keys of the other record can change something, so check and merge only them
+    new_attributes = dict()
+    for (key, value) in other_attributes.items():
+        if key not in attributes:
+            new_attributes[key] = value
+        elif attributes[key] != value:
             raise MergeException(
                 "Invalid data, it is not allowed to override existing attributes key:{}, value:{} with value:{}".format(
-                    key, value, attributes_merged[key]))
+                    key, attributes[key], value))
 
-    merged_metadata_namespaces = metadata[METADATA_KEY_NAMESPACES].copy()
-    merged_metadata_namespaces.update(other_metadata[METADATA_KEY_NAMESPACES])
+    attributes_merged = attributes
+    if len(new_attributes) > 0:
+        attributes_merged = attributes.copy()
+        attributes_merged.update(new_attributes)
 
-    merged_metadata_type_map = metadata[METADATA_KEY_TYPE_MAP].copy()
-    merged_metadata_type_map.update(other_metadata[METADATA_KEY_TYPE_MAP])
+    changed_metadata = dict()
+    for (key, value) in other_metadata.items():
+        if key in (METADATA_KEY_PROV_TYPE, METADATA_KEY_NAMESPACES, METADATA_KEY_TYPE_MAP):
+            continue
+        if key not in metadata or metadata[key] != value:
+            changed_metadata[key] = value
+
+    merged_metadata_namespaces = _merge_dict(metadata[METADATA_KEY_NAMESPACES], other_metadata[METADATA_KEY_NAMESPACES])
+    merged_metadata_type_map = _merge_dict(metadata[METADATA_KEY_TYPE_MAP], other_metadata[METADATA_KEY_TYPE_MAP])
+
+    if len(changed_metadata) == 0 \
+            and merged_prov_typ == metadata_prov_typ \
+            and merged_metadata_namespaces is metadata[METADATA_KEY_NAMESPACES] \
+            and merged_metadata_type_map is metadata[METADATA_KEY_TYPE_MAP]:
+        return attributes_merged, metadata
 
     merged_metadata = metadata.copy()
-    merged_metadata.update(other_metadata)
+    merged_metadata.update(changed_metadata)
     merged_metadata.update({METADATA_KEY_PROV_TYPE: merged_prov_typ})
     merged_metadata.update({METADATA_KEY_NAMESPACES: merged_metadata_namespaces})
     merged_metadata.update({METADATA_KEY_TYPE_MAP: merged_metadata_type_map})
 
     return attributes_merged, merged_metadata
 
+
+def _merge_dict(values, other_values):
+    """
+    Merge the other dict into the values dict, without copy if the other dict contains nothing new
+
+    :param values: The original dict
+    :type values: dict
+    :param other_values: The dict to merge
+    :type other_values: dict
+    :return: The merged dict
+    :rtype: dict
+    """
+    for (key, value) in other_values.items():
+        if key not in values or values[key] != value:
+            merged_values = values.copy()
+            merged_values.update(other_values)
+            return merged_values
+    return values
+
+
 def serialize_namespace(namespace: Namespace):
     prefix = namespace.prefix
 
     if prefix == "" or prefix is None:
         prefix = "default"
     return {str(prefix): str(namespace.uri)}
+
+
+# The namespaces cache all created qualified names, pickle only the prefix and uri
+PICKLE_DISPATCH_TABLE = copyreg.dispatch_table.copy()
+PICKLE_DISPATCH_TABLE.update({
+    Namespace: lambda namespace: (Namespace, (namespace.prefix, namespace.uri)),
+    QualifiedName: lambda qualified_name: (QualifiedName, (qualified_name.namespace, qualified_name.localpart))
+})
+
+
+def dumps_pickle(value):
+    """
+    Pickle the value for the files of the embedded adapters (log, snapshot and key value store), qualified names are
+    pickled without the cache of the namespace
+
+    :param value: The value to pickle
+    :return: The pickled value
+    :rtype: bytes
+    """
+    buffer = BytesIO()
+    pickler = pickle.Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL)
+    pickler.dispatch_table = PICKLE_DISPATCH_TABLE
+    pickler.dump(value)
+    return buffer.getvalue()
+
+
+# Type tags of the typed json, see dumps_typed_json
+JSON_TAG_DICT = "dict"
+JSON_TAG_QUALIFIED_NAME = "qname"
+JSON_TAG_IDENTIFIER = "uri"
+JSON_TAG_NAMESPACE = "namespace"
+JSON_TAG_LITERAL = "literal"
+JSON_TAG_DATETIME = "datetime"
+
+
+def _encode_typed_json_value(value):
+    """
+    Returns the json compatible representation of an attribute or metadata value, see :py:func:`dumps_typed_json`
+
+    :param value: The value
+    :return: The value with json types
+    :raises SerializerException: For a value of an unsupported type
+    """
+    if value is None or type(value) in (str, int, float, bool):
+        return value
+    elif type(value) is list:
+        return [_encode_typed_json_value(item) for item in value]
+    elif type(value) is dict:
+        return {JSON_TAG_DICT: [[_encode_typed_json_value(key), _encode_typed_json_value(item)] for
+                                (key, item) in value.items()]}
+    elif isinstance(value, QualifiedName):
+        return {JSON_TAG_QUALIFIED_NAME: [value.namespace.prefix, value.namespace.uri, value.localpart]}
+    elif isinstance(value, Identifier):
+        return {JSON_TAG_IDENTIFIER: value.uri}
+    elif isinstance(value, Namespace):
+        return {JSON_TAG_NAMESPACE: [value.prefix, value.uri]}
+    elif isinstance(value, Literal):
+        return {JSON_TAG_LITERAL: [_encode_typed_json_value(value.value), _encode_typed_json_value(value.datatype),
+                                   value.langtag]}
+    elif isinstance(value, datetime):
+        return {JSON_TAG_DATETIME: value.isoformat()}
+    raise SerializerException("Can't serialize the value {!r} of type {}".format(value, type(value)))
+
+
+def _decode_typed_json_value(value):
+    """
+    Returns the attribute or metadata value of a json representation, see :py:func:`_encode_typed_json_value`
+
+    :param value: The value with json types
+    :return: The value
+    """
+    if type(value) is list:
+        return [_decode_typed_json_value(item) for item in value]
+    elif type(value) is not dict:
+        return value
+
+    ((tag, content),) = value.items()
+    if tag == JSON_TAG_DICT:
+        return {_decode_typed_json_value(key): _decode_typed_json_value(item) for (key, item) in content}
+    elif tag == JSON_TAG_QUALIFIED_NAME:
+        (prefix, uri, localpart) = content
+        return QualifiedName(Namespace(prefix, uri), localpart)
+    elif tag == JSON_TAG_IDENTIFIER:
+        return Identifier(content)
+    elif tag == JSON_TAG_NAMESPACE:
+        return Namespace(*content)
+    elif tag == JSON_TAG_LITERAL:
+        (literal_value, datatype, langtag) = content
+        return Literal(_decode_typed_json_value(literal_value), _decode_typed_json_value(datatype), langtag)
+    elif tag == JSON_TAG_DATETIME:
+        return datetime.fromisoformat(content)
+    raise SerializerException("Unknown type tag {} in the json value".format(tag))
+
+
+def dumps_typed_json(values):
+    """
+    Serialize the attributes or metadata of a record as json. In contrast to pickle the result contains only data:
+    the keys and values keep their prov types (qualified names, literals, datetimes ...) with a type tag and a file
+    from an untrusted source can't execute code when it is loaded.
+
+    :param values: The attributes or metadata
+    :type values: dict
+    :return: The json text
+    :rtype: str
+    :raises SerializerException: For a value of an unsupported type
+    """
+    return json.dumps(_encode_typed_json_value(values), separators=(",", ":"))
+
+
+def loads_typed_json(text):
+    """
+    Deserialize the attributes or metadata of :py:func:`dumps_typed_json`
+
+    :param text: The json text
+    :type text: str
+    :return: The attributes or metadata
+    :rtype: dict
+    """
+    return _decode_typed_json_value(json.loads(text))
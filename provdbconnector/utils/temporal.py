@@ -0,0 +1,80 @@
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from prov.constants import PROV_ATTR_STARTTIME, PROV_ATTR_ENDTIME, PROV_ATTR_TIME
+from prov.model import parse_xsd_datetime
+
+TimeInterval = namedtuple("TimeInterval", "start, end")
+"""
+The time of a record as seconds since the epoch (UTC), start and end are equal for instantaneous events
+"""
+
+_START_TIME_KEY = str(PROV_ATTR_STARTTIME)
+_END_TIME_KEY = str(PROV_ATTR_ENDTIME)
+_TIME_KEY = str(PROV_ATTR_TIME)
+
+
+def to_utc_datetime(value):
+    """
+    Convert a datetime or a xsd:dateTime string into a timezone aware datetime in UTC.
+    A datetime without timezone is interpreted as UTC.
+
+    :param value: The time
+    :type value: datetime or str
+    :return: The datetime in UTC or None if the value is not a time
+    :rtype: datetime
+    """
+    if not isinstance(value, datetime):
+        if not isinstance(value, str):
+            return None
+        value = parse_xsd_datetime(value)
+        if value is None:
+            return None
+
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def to_timestamp(value):
+    """
+    Convert a datetime or a xsd:dateTime string into seconds since the epoch, see :py:func:`to_utc_datetime`
+
+    :param value: The time
+    :type value: datetime or str
+    :return: The seconds since the epoch or None if the value is not a time
+    :rtype: float
+    """
+    value = to_utc_datetime(value)
+    if value is None:
+        return None
+    return value.timestamp()
+
+
+def get_time_interval(attributes):
+    """
+    Returns the time of a record from the prov:startTime and prov:endTime (activities) or the prov:time attribute
+    (generation, usage, start, end and invalidation). An activity without end time is treated as instantaneous
+    event at the start time and the other way around.
+
+    :param attributes: The attributes of the record, the keys can be qualified names or strings
+    :type attributes: dict
+    :return: The interval or None if the record has no time
+    :rtype: TimeInterval
+    """
+    times = dict()
+    for (key, value) in attributes.items():
+        key = str(key)
+        if key == _START_TIME_KEY or key == _END_TIME_KEY or key == _TIME_KEY:
+            timestamp = to_timestamp(value)
+            if timestamp is not None:
+                times[key] = timestamp
+
+    if len(times) == 0:
+        return None
+    if _TIME_KEY in times:
+        return TimeInterval(times[_TIME_KEY], times[_TIME_KEY])
+
+    start = times.get(_START_TIME_KEY, times.get(_END_TIME_KEY))
+    end = times.get(_END_TIME_KEY, start)
+    return TimeInterval(min(start, end), max(start, end))
@@ -0,0 +1,236 @@
+"""
+Tracing of the phases of :py:meth:`provdbconnector.prov_db.ProvDb.save_document` and
+:py:meth:`provdbconnector.prov_db.ProvDb.get_document_as_prov` and profiling of slow calls.
+
+A tracer is any object with the method `start_as_current_span(name, attributes=None)` that returns a context
+manager, like the tracers of OpenTelemetry. For simple start and end callbacks use the :py:class:`CallbackTracer`:
+
+.. code:: python
+
+    tracer = CallbackTracer(on_end=lambda name, seconds, error: print(name, seconds))
+    prov_api = ProvDb(adapter=SimpleInMemoryAdapter, tracer=tracer)
+
+    # or with opentelemetry
+    prov_api = ProvDb(adapter=SimpleInMemoryAdapter, tracer=trace.get_tracer("provdbconnector"))
+
+The :py:class:`CallProfiler` runs the calls with cProfile and keeps the statistics of each call that took longer than
+a threshold:
+
+.. code:: python
+
+    prov_api = ProvDb(adapter=SimpleInMemoryAdapter, profiler=CallProfiler(0.5, directory="/tmp/profiles"))
+
+"""
+import cProfile
+import os
+import pstats
+import threading
+from contextlib import nullcontext
+from time import perf_counter, time
+
+from provdbconnector.exceptions.provapi import InvalidArgumentTypeException
+
+# The spans of the ProvDb calls and their phases
+SPAN_SAVE_DOCUMENT = "prov_db.save_document"
+SPAN_GET_DOCUMENT = "prov_db.get_document_as_prov"
+SPAN_GET_BUNDLE = "prov_db.get_bundle"
+SPAN_PARSE = "prov_db.parse"
+SPAN_FINGERPRINT = "prov_db.fingerprint"
+SPAN_SERIALIZE = "prov_db.serialize"
+SPAN_DATABASE = "prov_db.database"
+SPAN_DESERIALIZE = "prov_db.deserialize"
+
+# The spans inside the neo4j adapter
+SPAN_BUILD_QUERY = "neo4j.build_query"
+SPAN_RUN_QUERY = "neo4j.run_query"
+
+_NO_SPAN = nullcontext()
+
+
+def trace_span(tracer, name, attributes=None):
+    """
+    Returns the context manager of a span, a no-op context if there is no tracer
+
+    .. code:: python
+
+        with trace_span(self._tracer, SPAN_PARSE):
+            prov_document = form_string(content)
+
+    :param tracer: The tracer or None
+    :param name: The name of the span
+    :type name: str
+    :param attributes: The attributes of the span
+    :type attributes: dict
+    :return: The context manager
+    """
+    if tracer is None:
+        return _NO_SPAN
+    return tracer.start_as_current_span(name, attributes=attributes)
+
+
+def profile_call(profiler, name):
+    """
+    Returns the context manager that profiles a call, a no-op context if there is no profiler
+
+    :param profiler: The profiler or None
+    :type profiler: CallProfiler
+    :param name: The name of the call
+    :type name: str
+    :return: The context manager
+    """
+    if profiler is None:
+        return _NO_SPAN
+    return profiler.profile(name)
+
+
+def check_tracer(tracer):
+    """
+    Check that the tracer is None or has a start_as_current_span method
+
+    :param tracer: The tracer
+    :raise InvalidArgumentTypeException:
+    """
+    if tracer is not None and not callable(getattr(tracer, "start_as_current_span", None)):
+        raise InvalidArgumentTypeException("The tracer should have a start_as_current_span method")
+
+
+class CallbackTracer(object):
+    """
+    Tracer that calls `on_start(name, attributes)` at the start and `on_end(name, seconds, error)` at the end of each
+    span, the error is the exception or None
+
+    """
+
+    def __init__(self, on_start=None, on_end=None):
+        """
+        :param on_start: The start callback, optional
+        :type on_start: function
+        :param on_end: The end callback, optional
+        :type on_end: function
+        """
+        self.on_start = on_start
+        self.on_end = on_end
+
+    def start_as_current_span(self, name, attributes=None):
+        """
+        Returns the context manager of a span
+
+        :param name: The name of the span
+        :type name: str
+        :param attributes: The attributes of the span
+        :type attributes: dict
+        :rtype: CallbackSpan
+        """
+        return CallbackSpan(self, name, attributes)
+
+
+class CallbackSpan(object):
+    """
+    A span of the :py:class:`CallbackTracer`
+
+    """
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self._start = None
+
+    def __enter__(self):
+        if self.tracer.on_start is not None:
+            self.tracer.on_start(self.name, self.attributes)
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.tracer.on_end is not None:
+            self.tracer.on_end(self.name, perf_counter() - self._start, exc_value)
+        return False
+
+
+class CallProfiler(object):
+    """
+    Profiles the calls with cProfile and keeps the statistics of the calls that took at least the threshold.
+    The statistics are written to a pstats file in the directory and / or passed to the callback
+    `callback(name, seconds, stats)`. Nested calls are part of the profile of the outer call.
+
+    """
+
+    def __init__(self, threshold, directory=None, callback=None):
+        """
+        :param threshold: The min latency of a call in seconds
+        :type threshold: float
+        :param directory: The directory of the pstats files, optional
+        :type directory: str
+        :param callback: Function that gets the pstats.Stats of each slow call, optional
+        :type callback: function
+        """
+        if not isinstance(threshold, (int, float)) or isinstance(threshold, bool) or threshold < 0:
+            raise InvalidArgumentTypeException("The threshold must be a positive number, got {}".format(threshold))
+        self.threshold = threshold
+        self.directory = directory
+        self.callback = callback
+        self._active = threading.local()
+
+    def profile(self, name):
+        """
+        Returns the context manager that profiles a call, a no-op context inside of another profiled call
+
+        :param name: The name of the call, used for the file name
+        :type name: str
+        """
+        if getattr(self._active, "value", False):
+            return _NO_SPAN
+        return _ProfiledCall(self, name)
+
+    def _finish(self, name, seconds, profile):
+        """
+        Keep the statistics of a call if it is slow
+
+        :param name: The name of the call
+        :type name: str
+        :param seconds: The latency of the call
+        :type seconds: float
+        :param profile: The disabled profile
+        :type profile: cProfile.Profile
+        """
+        if seconds < self.threshold:
+            return
+        stats = pstats.Stats(profile)
+        if self.directory is not None:
+            file_name = "{}-{}-{}.pstats".format(name, int(time() * 1000), threading.get_ident())
+            stats.dump_stats(os.path.join(self.directory, file_name))
+        if self.callback is not None:
+            self.callback(name, seconds, stats)
+
+
+class _ProfiledCall(object):
+    """
+    Context manager of a profiled call
+
+    """
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self._profile = None
+        self._start = None
+
+    def __enter__(self):
+        self.profiler._active.value = True
+        self._profile = cProfile.Profile()
+        try:
+            self._profile.enable()
+        except ValueError:
+            # another profiler is already active
+            self._profile = None
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = perf_counter() - self._start
+        self.profiler._active.value = False
+        if self._profile is not None:
+            self._profile.disable()
+            self.profiler._finish(self.name, seconds, self._profile)
+        return False
@@ -0,0 +1,120 @@
+from collections import namedtuple
+
+SearchPath = namedtuple("SearchPath", "nodes, edges")
+"""
+A path of the graph search: the nodes from the start to the end node and the edges between them,
+``edges[n]`` connects ``nodes[n]`` and ``nodes[n + 1]``
+"""
+
+
+def find_shortest_path(source, target, expand_forward, expand_backward, max_depth=None):
+    """
+    Bidirectional breadth first search between two nodes.
+    Each step expands one level of the smaller frontier, so the searches meet in the middle and only the nodes up to
+    about half of the path length are visited from each side.
+
+    The expand functions get a list of nodes (the frontier) and return the neighbours as iterable of
+    `(node, neighbour, edge)` tuples, the edge can be any value that identifies the connection for the caller:
+
+    .. code:: python
+
+        def expand_forward(frontier):
+            for node in frontier:
+                for (neighbour, edge) in successors(node):
+                    yield node, neighbour, edge
+
+    :param source: The start node
+    :type source: hashable
+    :param target: The end node
+    :type target: hashable
+    :param expand_forward: Returns the neighbours in the direction from the source to the target
+    :type expand_forward: function
+    :param expand_backward: Returns the neighbours in the direction from the target to the source
+    :type expand_backward: function
+    :param max_depth: The max number of edges in the path, default to infinite
+    :type max_depth: int
+    :return: The shortest path or None if there is no path
+    :rtype: SearchPath
+    """
+    if source == target:
+        return SearchPath([source], list())
+
+    # the parent of each visited node with the structure `(node, (parent, edge))`
+    forward_parents = {source: None}
+    backward_parents = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    depth = 0
+    while len(forward_frontier) > 0 and len(backward_frontier) > 0 and depth != max_depth:
+        depth += 1
+        if len(forward_frontier) <= len(backward_frontier):
+            (forward_frontier, meeting_node) = _expand_frontier(forward_frontier, expand_forward, forward_parents,
+                                                                backward_parents)
+        else:
+            (backward_frontier, meeting_node) = _expand_frontier(backward_frontier, expand_backward,
+                                                                 backward_parents, forward_parents)
+        if meeting_node is not None:
+            return _build_path(meeting_node, forward_parents, backward_parents)
+
+    return None
+
+
+def _expand_frontier(frontier, expand, parents, other_parents):
+    """
+    Expand one level of a search direction
+
+    :param frontier: The nodes of the last level
+    :type frontier: list
+    :param expand: The expand function of the direction
+    :type expand: function
+    :param parents: The visited nodes of the direction
+    :type parents: dict
+    :param other_parents: The visited nodes of the other direction
+    :type other_parents: dict
+    :return: Tuple with (next frontier, node that is visited by both directions or None)
+    :rtype: tuple
+    """
+    next_frontier = list()
+    for (node, neighbour, edge) in expand(frontier):
+        if neighbour in parents:
+            continue
+        parents[neighbour] = (node, edge)
+        if neighbour in other_parents:
+            return next_frontier, neighbour
+        next_frontier.append(neighbour)
+    return next_frontier, None
+
+
+def _build_path(meeting_node, forward_parents, backward_parents):
+    """
+    Join the two halves of the path at the meeting node
+
+    :param meeting_node: The node that is visited by both directions
+    :type meeting_node: hashable
+    :param forward_parents: The visited nodes of the forward direction
+    :type forward_parents: dict
+    :param backward_parents: The visited nodes of the backward direction
+    :type backward_parents: dict
+    :rtype: SearchPath
+    """
+    nodes = [meeting_node]
+    edges = list()
+
+    parent = forward_parents[meeting_node]
+    while parent is not None:
+        (node, edge) = parent
+        nodes.append(node)
+        edges.append(edge)
+        parent = forward_parents[node]
+    nodes.reverse()
+    edges.reverse()
+
+    parent = backward_parents[meeting_node]
+    while parent is not None:
+        (node, edge) = parent
+        nodes.append(node)
+        edges.append(edge)
+        parent = backward_parents[node]
+
+    return SearchPath(nodes, edges)
@@ -54,7 +54,14 @@ setup(
         'test': tests_require,
         'dev': tests_require + docs_require,
         'docs': docs_require,
+        'lmdb': ['lmdb'],
+        'numpy': ['numpy'],
     },
 
     test_suite='provdbconnector.tests',
+    entry_points={
+        'console_scripts': [
+            'provdb=provdbconnector.cli:main',
+        ],
+    },
 )